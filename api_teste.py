@@ -2,18 +2,52 @@
 API simples e independente para o DataBridge Bank com endpoints CRUD.
 Este arquivo serve como uma alternativa para testes rápidos no Insomnia.
 """
-from fastapi import FastAPI, HTTPException, Depends, status, Request
+from fastapi import FastAPI, HTTPException, Depends, status, Request, Response, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
-from pydantic import BaseModel, Field, UUID4
-from typing import List, Optional, Dict, Any
+from fastapi.responses import HTMLResponse, FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, UUID4, ValidationError
+from typing import List, Optional, Dict, Any, Sequence
+from contextlib import asynccontextmanager
 from datetime import datetime
 import uvicorn
-import uuid
+import asyncio
+import json
+import time
 import os
+import base64
+import binascii
 from pathlib import Path
 
+from busca_clientes import ClientSearchIndex
+from cache_respostas import create_response_cache
+from compressao import CompressionMiddleware, compression_settings
+from condicional import not_modified, validators
+from contas import AccountLedger
+from estatisticas import BUCKETS, TransactionStats
+from exportacao import EXPORT_FORMATS, RECORD_EXPORT_COLUMNS, TRANSACTION_EXPORT_COLUMNS, iter_export
+from filtros_conteudo import WhereSyntaxError, parse_where
+from idempotencia import IdempotencyCache, IdempotencyConflictError
+from metricas import MetricsMiddleware, create_metrics_registry
+from ingestao import (
+    FileIngestion,
+    check_record_batch,
+    IngestionTracker,
+    LineTooLongError,
+    MultipartError,
+    detect_file_type,
+    disposition_params,
+    iter_multipart,
+    iter_ndjson_lines,
+    multipart_boundary,
+)
+from regras_roteamento import RoutingRulesError, create_routing_engine
+from tarefas import Job, QueueFullError, create_job_queue
+from serializacao import fast_list_response, fast_path_enabled
+from repositorios import (
+    CLIENTS, TRANSACTIONS, FILES, RECORDS, DuplicateKeyError, InvalidCursorError, create_repository
+)
+
 # Modelos de dados simplificados para a API de teste
 class ClientBase(BaseModel):
     name: str
@@ -47,9 +81,37 @@ class TransactionRead(TransactionBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+class AccountBalance(BaseModel):
+    account: str
+    balances: Dict[str, float]
+    movements: int
+    last_movement_at: Optional[datetime] = None
+
+class AccountMovement(BaseModel):
+    transaction_id: str
+    direction: str
+    amount: float
+    currency: str
+    counterpart_account: str
+    reversal: bool
+    balance_after: float
+    posted_at: Optional[datetime] = None
+
 class MessageResponse(BaseModel):
     message: str
 
+class BatchItemError(BaseModel):
+    line: int
+    errors: List[Dict[str, Any]]
+
+class BatchIngestResponse(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[BatchItemError]
+    errors_truncated: bool = False
+    elapsed_seconds: float
+    transactions_per_second: float
+
 class HealthResponse(BaseModel):
     status: str = "online"
     version: str = "1.0.0"
@@ -71,9 +133,19 @@ class FileUploadRead(BaseModel):
     created_at: datetime
     processed_at: Optional[datetime] = None
 
-class FileUploadCreate(BaseModel):
+class FileIngestProgress(BaseModel):
+    file_id: str
     filename: str
-    file_type: str
+    file_type: Optional[str] = None
+    status: str
+    bytes: int
+    records: int
+    rejected: int
+    errors: List[str]
+    error: Optional[str] = None
+    elapsed_seconds: float
+    records_per_second: float
+    megabytes_per_second: float
 
 class DataRecordRead(BaseModel):
     id: str
@@ -82,17 +154,186 @@ class DataRecordRead(BaseModel):
     status: str
     created_at: datetime
 
-# Armazenamento em memória para os testes
-clients_db = {}
-transactions_db = {}
-files_db = {}
-records_db = {}
+class JobRead(BaseModel):
+    id: str
+    kind: str
+    target: str
+    status: str
+    rows_done: int
+    elapsed_seconds: float
+    rows_per_second: float
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+# Repositório escolhido por DATABRIDGE_DB_MODE (memory, sqlite, postgres ou mongodb)
+repository = create_repository()
+
+# Regras de roteamento compiladas (DATABRIDGE_ROUTING_RULES), recarregadas quando o arquivo muda
+routing_engine = create_routing_engine()
+ROUTING_RELOAD_SECONDS = float(os.environ.get("DATABRIDGE_ROUTING_RELOAD_SECONDS", "5"))
+
+# Cache de idempotência da criação de transações (chave: Idempotency-Key ou reference_id)
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+idempotency_cache = IdempotencyCache(
+    max_entries=int(os.environ.get("DATABRIDGE_IDEMPOTENCY_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.environ.get("DATABRIDGE_IDEMPOTENCY_TTL", "86400"))
+)
+
+# Com vários workers (DATABRIDGE_WORKERS > 1, definida por --workers; com o uvicorn direto, defina-a) cada
+# processo teria a sua cópia do índice de busca, dos agregados, do razão e do cache de idempotência, sem ver
+# as escritas dos demais: as consultas passam a montar o que precisam a partir do banco compartilhado, a
+# idempotência passa a usar o reference_id gravado e as listagens deixam de passar pelo cache de respostas
+MULTI_WORKER = int(os.environ.get("DATABRIDGE_WORKERS", "1")) > 1
+
+# Índice de busca de clientes por nome, e-mail, CPF/CNPJ e telefone, montado na primeira busca
+client_search = ClientSearchIndex()
+
+# Agregados de transações (contagem, soma, mínimo e máximo), montados na primeira consulta
+transaction_stats = TransactionStats()
+
+# Saldos e extratos por conta, lançados quando uma transação é concluída
+account_ledger = AccountLedger()
+
+# Cache das páginas de listagem já codificadas (DATABRIDGE_RESPONSE_CACHE_MB, 0 desativa), invalidado pelas escritas
+response_cache = create_response_cache(repository.mode)
+
+# Fila de trabalhos em segundo plano (DATABRIDGE_JOB_WORKERS processos, DATABRIDGE_JOB_QUEUE_SIZE pendentes)
+jobs = create_job_queue()
+
+# Métricas no formato do Prometheus, expostas em /metrics (DATABRIDGE_METRICS=false desliga a coleta)
+metrics = create_metrics_registry()
+
+async def store_rows():
+    return [({"entity": entity}, await repository.count(entity)) for entity in (CLIENTS, TRANSACTIONS, FILES, RECORDS)]
+
+metrics.gauge("store_rows", "Linhas por entidade no repositório (estimativa no PostgreSQL e no MongoDB).", store_rows)
+metrics.gauge("response_cache_entries", "Páginas no cache de respostas.",
+              lambda: [({}, response_cache.stats()["entries"])])
+metrics.gauge("response_cache_bytes", "Bytes ocupados pelo cache de respostas.",
+              lambda: [({}, response_cache.bytes)])
+metrics.gauge("response_cache_lookups_total", "Consultas ao cache de respostas por resultado.",
+              lambda: [({"result": "hit"}, response_cache.hits), ({"result": "miss"}, response_cache.misses)],
+              kind="counter")
+metrics.gauge("response_cache_removals_total", "Páginas descartadas do cache de respostas por motivo.",
+              lambda: [({"reason": "eviction"}, response_cache.evictions),
+                       ({"reason": "invalidation"}, response_cache.invalidations),
+                       ({"reason": "expiration"}, response_cache.expirations)],
+              kind="counter")
+metrics.gauge("idempotency_cache_entries", "Chaves no cache de idempotência.",
+              lambda: [({}, len(idempotency_cache))])
+metrics.gauge("client_search_documents", "Clientes no índice de busca (0 até a primeira busca).",
+              lambda: [({}, len(client_search))])
+metrics.gauge("jobs", "Trabalhos em segundo plano conhecidos, por status.",
+              lambda: [({"status": name}, count) for name, count in jobs.stats()["jobs"].items()])
+metrics.gauge("jobs_pending", "Trabalhos aguardando na fila.", lambda: [({}, jobs.stats()["pending"])])
+
+# ------ Paginação por cursor ------
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(key: Any) -> str:
+    """Codifica a chave ordenada da última linha da página em um cursor opaco."""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Any:
+    """Decodifica um cursor recebido do cliente."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+# Maior página aceita pelas listagens
+MAX_PAGE_LIMIT = 10000
+
+async def paginate(entity: str, filters: Dict[str, Any], response: Response,
+                   skip: int, limit: int, cursor: Optional[str],
+                   where: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Busca uma página no repositório por cursor ou, por compatibilidade, por skip.
+
+    Quando existem mais linhas, o cursor da próxima página segue no cabeçalho
+    X-Next-Cursor, mantendo o corpo da resposta como uma lista simples.
+    ``where`` traz condições sobre o conteúdo (por exemplo amount>1000).
+    """
+    if skip < 0:
+        raise HTTPException(status_code=400, detail="skip não pode ser negativo")
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit deve estar entre 1 e {MAX_PAGE_LIMIT}")
+    after = decode_cursor(cursor) if cursor else None
+    try:
+        conditions = parse_where(where or ())
+    except WhereSyntaxError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    try:
+        page = await repository.find(entity, filters, skip=skip, limit=limit, after=after, where=conditions)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if page.next_key is not None:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(page.next_key)
+    return page.rows
+
+def list_response(endpoint: str, rows: List[Dict[str, Any]], model: type, response: Response):
+    """Devolve a página pelo caminho rápido de serialização quando ele está ativo no endpoint.
+
+    As linhas vêm do repositório e já seguem o modelo de leitura, então o
+    caminho rápido pula a revalidação do response_model.
+    """
+    if not fast_path_enabled(endpoint):
+        return rows
+    headers = {}
+    if NEXT_CURSOR_HEADER in response.headers:
+        headers[NEXT_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+    return fast_list_response(rows, model, headers)
+
+async def cached_list(endpoint: str, entity: str, filters: Dict[str, Any], model: type, response: Response,
+                      skip: int, limit: int, cursor: Optional[str], where: Optional[List[str]] = None):
+    """Página de uma listagem, servida do cache de respostas quando ela já foi codificada.
+
+    Só as páginas do caminho rápido entram no cache, porque são elas que
+    saem já em bytes; as escritas descartam as páginas que podem alterar.
+    """
+    cacheable = response_cache.enabled and not MULTI_WORKER and fast_path_enabled(endpoint)
+    if cacheable:
+        key = response_cache.key(endpoint, filters, skip=skip, limit=limit, cursor=cursor, where=tuple(where or ()))
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+        version = response_cache.version(entity)
+    rows = await paginate(entity, filters, response, skip, limit, cursor, where)
+    result = list_response(endpoint, rows, model, response)
+    if cacheable:
+        response_cache.put(key, entity, filters, result, version)
+    return result
+
+def export_response(entity: str, filters: Dict[str, Any], export_format: str,
+                    columns: Sequence[str], filename: str) -> StreamingResponse:
+    """Resposta em fluxo com a exportação de uma entidade em NDJSON ou CSV."""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido. Use um dos seguintes: {', '.join(EXPORT_FORMATS)}")
+    return StreamingResponse(
+        iter_export(repository, entity, filters, export_format, columns),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Conecta o repositório na inicialização e o fecha no encerramento."""
+    await repository.connect()
+    await jobs.start()
+    routing_watcher = asyncio.create_task(routing_engine.watch(ROUTING_RELOAD_SECONDS))
+    yield
+    routing_watcher.cancel()
+    await jobs.close()
+    await repository.close()
 
 # Criar aplicação FastAPI
 app = FastAPI(
     title="DataBridge Bank API",
     description="API REST para o sistema DataBridge Bank - Ponte de dados financeiros",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Adicionar middleware CORS
@@ -104,6 +345,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressão gzip/brotli negociada pelo Accept-Encoding, inclusive das exportações em fluxo
+app.add_middleware(CompressionMiddleware, **compression_settings())
+
+# Métricas por rota; adicionado por último para ser o mais externo e medir os bytes já comprimidos
+app.add_middleware(MetricsMiddleware, registry=metrics)
+
 # Criar API Router para versão v1
 api_v1 = FastAPI(
     title="DataBridge Bank API",
@@ -121,6 +368,11 @@ async def root():
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Métricas da API no formato de exposição do Prometheus."""
+    return PlainTextResponse(await metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Servir arquivos estáticos do frontend
 frontend_dir = Path("c:/Users/Cesar/OneDrive/Área de Trabalho/Data-Bridge-Bank/databridge/frontend")
 if frontend_dir.exists():
@@ -140,14 +392,36 @@ async def health_check():
     """
     return HealthResponse()
 
+async def conditional_get(entity: str, row_id: str, request: Request, response: Response,
+                          missing_detail: str):
+    """Leitura de um recurso com ETag e Last-Modified pelo updated_at.
+
+    Se o cliente já tem a versão atual (If-None-Match ou If-Modified-Since),
+    a resposta é 304 sem corpo e sem ler nem serializar a linha inteira.
+    """
+    updated_at = await repository.version(entity, row_id)
+    if updated_at is not None:
+        headers = validators(updated_at)
+        if not_modified(request.headers, headers):
+            return Response(status_code=304, headers=headers)
+    row = await repository.get(entity, row_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=missing_detail)
+    if row.get("updated_at") is not None:
+        # Da linha lida, caso ela tenha mudado depois da consulta da versão
+        response.headers.update(validators(row["updated_at"]))
+    return row
+
 # ------ Endpoints de Clientes ------
+def duplicate_client(exc: DuplicateKeyError) -> HTTPException:
+    """409 para um tax_id ou e-mail que já pertence a outro cliente."""
+    return HTTPException(status_code=409, detail=f"Já existe um cliente com este {exc.field}")
+
 @api_v1.post("/clients", response_model=ClientRead, status_code=status.HTTP_201_CREATED)
 async def create_client(client: ClientCreate):
-    """Cria um novo cliente no sistema."""
-    client_id = str(uuid.uuid4())
+    """Cria um novo cliente no sistema (tax_id e e-mail não podem repetir os de outro cliente)."""
     now = datetime.now()
     client_data = {
-        "id": client_id,
         "name": client.name,
         "email": client.email,
         "phone": client.phone,
@@ -155,60 +429,123 @@ async def create_client(client: ClientCreate):
         "created_at": now,
         "updated_at": now
     }
-    clients_db[client_id] = client_data
+    try:
+        client_data = await repository.insert(CLIENTS, client_data)
+    except DuplicateKeyError as exc:
+        raise duplicate_client(exc)
+    client_search.created(client_data, repository.sort_key(CLIENTS, client_data))
+    response_cache.invalidate(CLIENTS, client_data)
     return client_data
 
 @api_v1.get("/clients", response_model=List[ClientRead])
-async def list_clients(skip: int = 0, limit: int = 100):
+async def list_clients(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
     """Lista os clientes cadastrados no sistema."""
-    return list(clients_db.values())[skip:skip+limit]
+    return await cached_list("list_clients", CLIENTS, {}, ClientRead, response, skip, limit, cursor)
+
+@api_v1.get("/clients/search", response_model=List[ClientRead])
+async def search_clients(q: str, limit: int = 20):
+    """Busca clientes por nome ou e-mail (o último termo vale como prefixo) ou pelo CPF/CNPJ ou telefone exato."""
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit deve estar entre 1 e 100")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Informe o texto da busca em q")
+    index = ClientSearchIndex() if MULTI_WORKER else client_search
+    await index.ensure_ready(repository, CLIENTS)
+    rows = []
+    for client_id in index.search(q, limit):
+        client_data = await repository.get(CLIENTS, client_id)
+        if client_data is not None:
+            rows.append(client_data)
+    return rows
 
 @api_v1.get("/clients/{client_id}", response_model=ClientRead)
-async def get_client(client_id: str):
-    """Obtém os detalhes de um cliente específico."""
-    if client_id not in clients_db:
-        raise HTTPException(status_code=404, detail="Cliente não encontrado")
-    return clients_db[client_id]
+async def get_client(client_id: str, request: Request, response: Response):
+    """Obtém os detalhes de um cliente específico (304 com If-None-Match ou If-Modified-Since atuais)."""
+    return await conditional_get(CLIENTS, client_id, request, response, "Cliente não encontrado")
 
 @api_v1.put("/clients/{client_id}", response_model=ClientRead)
 async def update_client(client_id: str, client: ClientCreate):
     """Atualiza os dados de um cliente."""
-    if client_id not in clients_db:
+    try:
+        client_data = await repository.update(CLIENTS, client_id, {
+            "name": client.name,
+            "email": client.email,
+            "phone": client.phone,
+            "tax_id": client.tax_id,
+            "updated_at": datetime.now()
+        })
+    except DuplicateKeyError as exc:
+        raise duplicate_client(exc)
+    if client_data is None:
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
     
-    client_data = clients_db[client_id]
-    client_data["name"] = client.name
-    client_data["email"] = client.email
-    client_data["phone"] = client.phone
-    client_data["tax_id"] = client.tax_id
-    client_data["updated_at"] = datetime.now()
-    
+    client_search.updated(client_data, repository.sort_key(CLIENTS, client_data))
+    response_cache.invalidate(CLIENTS, client_data)
     return client_data
 
 @api_v1.delete("/clients/{client_id}", response_model=MessageResponse)
 async def delete_client(client_id: str):
     """Remove um cliente do sistema."""
-    if client_id not in clients_db:
+    if not await repository.delete(CLIENTS, client_id):
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
     
-    del clients_db[client_id]
+    client_search.deleted(client_id)
+    response_cache.invalidate(CLIENTS)
     return {"message": f"Cliente {client_id} removido com sucesso"}
 
 # ------ Endpoints de Transações ------
-@api_v1.post("/transactions", response_model=TransactionRead, status_code=status.HTTP_201_CREATED)
-async def create_transaction(transaction: TransactionCreate):
-    """Cria uma nova transação financeira."""
-    transaction_id = str(uuid.uuid4())
-    now = datetime.now()
-    
-    # Roteamento inteligente simplificado
-    if transaction.amount > 10000:
-        routing = {"route": "high_value", "priority": "high"}
-    else:
-        routing = {"route": "standard", "priority": "normal"}
-    
-    transaction_data = {
-        "id": transaction_id,
+def route_transaction(transaction: TransactionCreate) -> Dict[str, Any]:
+    """Roteamento inteligente pela tabela de regras compilada."""
+    return routing_engine.decide(
+        transaction.currency,
+        transaction.transaction_type,
+        transaction.origin_account,
+        transaction.amount
+    )
+
+async def insert_transaction(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Grava uma nova transação, a soma aos agregados e descarta as páginas em cache que ela altera."""
+    transaction_data = await repository.insert(TRANSACTIONS, row)
+    transaction_stats.created(transaction_data, repository.sort_key(TRANSACTIONS, transaction_data))
+    response_cache.invalidate(TRANSACTIONS, transaction_data)
+    return transaction_data
+
+async def insert_transactions(rows: List[Dict[str, Any]]) -> None:
+    """Grava um bloco de novas transações e as soma aos agregados."""
+    inserted = await repository.insert_many(TRANSACTIONS, rows)
+    for transaction_data in inserted:
+        transaction_stats.created(transaction_data, repository.sort_key(TRANSACTIONS, transaction_data))
+    response_cache.invalidate_rows(TRANSACTIONS, (
+        {"status": row["status"], "transaction_type": row["transaction_type"]} for row in inserted
+    ))
+
+async def set_transaction_status(transaction_id: str, new_status: str) -> Optional[Dict[str, Any]]:
+    """Muda o status de uma transação, move o valor dela nos agregados e lança ou estorna nas contas.
+
+    A gravação só vale se o status ainda for o lido antes dela; se outra
+    escrita o mudou no meio, a transação é relida e a mudança refeita. Assim
+    o status anterior passado aos agregados e ao razão é sempre o que a
+    gravação substituiu, e duas conclusões simultâneas lançam uma vez só.
+    """
+    while True:
+        previous = await repository.get(TRANSACTIONS, transaction_id)
+        if previous is None:
+            return None
+        transaction_data = await repository.update(
+            TRANSACTIONS, transaction_id, {"status": new_status, "updated_at": datetime.now()},
+            expected={"status": previous["status"]}
+        )
+        if transaction_data is not None:
+            break
+    key = repository.sort_key(TRANSACTIONS, transaction_data)
+    transaction_stats.status_changed(previous["status"], transaction_data, key)
+    account_ledger.status_changed(previous["status"], transaction_data, key)
+    response_cache.invalidate(TRANSACTIONS, previous, transaction_data)
+    return transaction_data
+
+def build_transaction(transaction: TransactionCreate, now: datetime) -> Dict[str, Any]:
+    """Monta a linha armazenada de uma nova transação, já roteada e pendente."""
+    return {
         "origin_account": transaction.origin_account,
         "destination_account": transaction.destination_account,
         "amount": transaction.amount,
@@ -217,170 +554,510 @@ async def create_transaction(transaction: TransactionCreate):
         "description": transaction.description,
         "reference_id": transaction.reference_id,
         "status": "pending",
-        "routing_info": routing,
+        "routing_info": route_transaction(transaction),
         "created_at": now,
         "updated_at": now
     }
+
+@api_v1.post("/transactions", response_model=TransactionRead, status_code=status.HTTP_201_CREATED)
+async def create_transaction(
+    transaction: TransactionCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
+):
+    """Cria uma nova transação financeira.
+
+    Com o cabeçalho Idempotency-Key (ou, na falta dele, um reference_id), uma
+    repetição da mesma requisição devolve a transação já criada em vez de
+    gravar outra.
+    """
+    key = idempotency_key or transaction.reference_id
+    if not key:
+        return await insert_transaction(build_transaction(transaction, datetime.now()))
+    if MULTI_WORKER:
+        # A repetição pode cair em outro worker, que não tem este cache: vale a transação já gravada
+        if not transaction.reference_id:
+            raise HTTPException(status_code=400, detail="Com vários workers a idempotência usa o reference_id "
+                                                        "gravado: envie o reference_id da transação")
+        transaction_data = await stored_transaction(transaction)
+        if transaction_data is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return transaction_data
+
+    try:
+        transaction_data, replayed = await idempotency_cache.run(
+            f"transactions:{key}",
+            transaction.model_dump_json(),
+            lambda: insert_transaction(build_transaction(transaction, datetime.now()))
+        )
+    except IdempotencyConflictError:
+        raise HTTPException(status_code=409, detail="Chave de idempotência já usada com outra transação")
     
-    transactions_db[transaction_id] = transaction_data
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
     return transaction_data
 
+async def stored_transaction(transaction: TransactionCreate) -> Optional[Dict[str, Any]]:
+    """Transação já gravada com o mesmo reference_id; 409 se ela tem outro conteúdo."""
+    page = await repository.find(TRANSACTIONS, {"reference_id": transaction.reference_id}, limit=1)
+    if not page.rows:
+        return None
+    transaction_data = page.rows[0]
+    if any(transaction_data[field] != value for field, value in transaction.model_dump().items()):
+        raise HTTPException(status_code=409, detail="Chave de idempotência já usada com outra transação")
+    return transaction_data
+
+# Limite de erros detalhados devolvidos por lote; os demais entram só na contagem
+MAX_BATCH_ERRORS = 1000
+
+@api_v1.post("/transactions/batch", response_model=BatchIngestResponse)
+async def create_transactions_batch(request: Request, chunk_size: int = 1000):
+    """Ingere transações enviadas como NDJSON (uma transação JSON por linha).
+
+    O corpo é lido em fluxo: cada linha é validada e roteada assim que chega,
+    e as transações válidas são gravadas em blocos de ``chunk_size``. Linhas
+    inválidas são reportadas pelo número, sem interromper o lote.
+    """
+    if not 1 <= chunk_size <= 10000:
+        raise HTTPException(status_code=400, detail="chunk_size deve estar entre 1 e 10000")
+    
+    started = time.perf_counter()
+    accepted = 0
+    rejected = 0
+    errors: List[Dict[str, Any]] = []
+    pending: List[Dict[str, Any]] = []
+    
+    async for line_number, line in iter_ndjson_lines(request.stream()):
+        try:
+            if isinstance(line, LineTooLongError):
+                raise line
+            transaction = TransactionCreate.model_validate_json(line)
+        except (ValidationError, LineTooLongError) as exc:
+            rejected += 1
+            if len(errors) < MAX_BATCH_ERRORS:
+                detail = (
+                    [{"loc": list(error["loc"]), "msg": error["msg"]} for error in exc.errors()]
+                    if isinstance(exc, ValidationError) else [{"loc": [], "msg": str(exc)}]
+                )
+                errors.append({"line": line_number, "errors": detail})
+            continue
+        
+        pending.append(build_transaction(transaction, datetime.now()))
+        if len(pending) >= chunk_size:
+            await insert_transactions(pending)
+            accepted += len(pending)
+            pending = []
+    
+    if pending:
+        await insert_transactions(pending)
+        accepted += len(pending)
+    
+    elapsed = time.perf_counter() - started
+    return {
+        "accepted": accepted,
+        "rejected": rejected,
+        "errors": errors,
+        "errors_truncated": rejected > len(errors),
+        "elapsed_seconds": round(elapsed, 6),
+        "transactions_per_second": round(accepted / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
 @api_v1.get("/transactions", response_model=List[TransactionRead])
 async def list_transactions(
+    response: Response,
     skip: int = 0, 
     limit: int = 100,
     status: Optional[str] = None,
-    type: Optional[str] = None
+    type: Optional[str] = None,
+    cursor: Optional[str] = None
 ):
     """Lista as transações financeiras com filtros opcionais."""
-    transactions = list(transactions_db.values())
-    
-    # Aplicar filtros
-    if status:
-        transactions = [t for t in transactions if t["status"] == status]
-    if type:
-        transactions = [t for t in transactions if t["transaction_type"] == type]
-    
-    return transactions[skip:skip+limit]
+    # No modo memória os filtros usam os índices secundários de status e tipo
+    filters = {"status": status or None, "transaction_type": type or None}
+    return await cached_list("list_transactions", TRANSACTIONS, filters, TransactionRead, response, skip, limit, cursor)
+
+@api_v1.get("/transactions/stats")
+async def get_transaction_stats(bucket: Optional[str] = None, buckets: int = 60):
+    """Contagem, soma, mínimo e máximo das transações por moeda, também dentro de cada tipo, status e rota.
+
+    Os agregados são atualizados a cada criação e mudança de status, então
+    a consulta não percorre as transações (só a primeira, que monta o cubo).
+    Com ``bucket=minute`` ou ``bucket=hour`` vêm também as ``buckets``
+    janelas mais recentes pela data de criação.
+    """
+    if bucket is not None and bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket inválido. Use um dos seguintes: {', '.join(BUCKETS)}")
+    if not 1 <= buckets <= 1440:
+        raise HTTPException(status_code=400, detail="buckets deve estar entre 1 e 1440")
+    # Com vários workers o cubo é montado a cada consulta, para incluir as escritas dos outros processos
+    stats = TransactionStats() if MULTI_WORKER else transaction_stats
+    await stats.ensure_ready(repository, TRANSACTIONS)
+    return stats.summary(bucket, buckets)
+
+@api_v1.get("/transactions/export")
+async def export_transactions(
+    format: str = "ndjson",
+    status: Optional[str] = None,
+    type: Optional[str] = None
+):
+    """Exporta as transações filtradas em NDJSON ou CSV, em fluxo e com memória constante."""
+    filters = {"status": status or None, "transaction_type": type or None}
+    return export_response(TRANSACTIONS, filters, format, TRANSACTION_EXPORT_COLUMNS, "transactions")
 
 @api_v1.get("/transactions/{transaction_id}", response_model=TransactionRead)
-async def get_transaction(transaction_id: str):
-    """Obtém os detalhes de uma transação específica."""
-    if transaction_id not in transactions_db:
-        raise HTTPException(status_code=404, detail="Transação não encontrada")
-    return transactions_db[transaction_id]
+async def get_transaction(transaction_id: str, request: Request, response: Response):
+    """Obtém os detalhes de uma transação específica (304 com If-None-Match ou If-Modified-Since atuais)."""
+    return await conditional_get(TRANSACTIONS, transaction_id, request, response, "Transação não encontrada")
 
 @api_v1.put("/transactions/{transaction_id}", response_model=TransactionRead)
 async def update_transaction(transaction_id: str, status: str):
     """Atualiza o status de uma transação."""
-    if transaction_id not in transactions_db:
-        raise HTTPException(status_code=404, detail="Transação não encontrada")
-    
     valid_statuses = ["pending", "processing", "completed", "failed", "cancelled"]
     if status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Status inválido. Use um dos seguintes: {', '.join(valid_statuses)}")
     
-    transaction_data = transactions_db[transaction_id]
-    transaction_data["status"] = status
-    transaction_data["updated_at"] = datetime.now()
+    transaction_data = await set_transaction_status(transaction_id, status)
+    if transaction_data is None:
+        raise HTTPException(status_code=404, detail="Transação não encontrada")
     
     return transaction_data
 
 @api_v1.delete("/transactions/{transaction_id}", response_model=MessageResponse)
 async def delete_transaction(transaction_id: str):
     """Cancela uma transação (marcando como cancelada)."""
-    if transaction_id not in transactions_db:
+    transaction_data = await set_transaction_status(transaction_id, "cancelled")
+    if transaction_data is None:
         raise HTTPException(status_code=404, detail="Transação não encontrada")
     
-    transaction_data = transactions_db[transaction_id]
-    transaction_data["status"] = "cancelled"
-    transaction_data["updated_at"] = datetime.now()
-    
     return {"message": f"Transação {transaction_id} cancelada com sucesso"}
 
+# ------ Endpoints de Contas ------
+async def ledger_for(account: str) -> AccountLedger:
+    """Razão por conta, montado na primeira consulta com as contas ordenadas no pool de processos.
+
+    Com vários workers o razão de cada processo não veria as conclusões dos
+    outros, então cada consulta lê do banco só as transações da conta.
+    """
+    if MULTI_WORKER:
+        ledger = AccountLedger()
+        await ledger.rebuild(repository, TRANSACTIONS, account=account)
+        return ledger
+    await account_ledger.ensure_ready(repository, TRANSACTIONS, jobs.run_in_pool, jobs.process_workers)
+    return account_ledger
+
+@api_v1.get("/accounts/{account}/balance", response_model=AccountBalance)
+async def get_account_balance(account: str):
+    """Saldo por moeda de uma conta, mantido a cada transação concluída (sem varrer as transações)."""
+    balance = (await ledger_for(account)).balance(account)
+    if balance is None:
+        raise HTTPException(status_code=404, detail="Conta sem lançamentos")
+    return balance
+
+@api_v1.get("/accounts/{account}/movements", response_model=List[AccountMovement])
+async def list_account_movements(account: str, response: Response, limit: int = 100, cursor: Optional[str] = None):
+    """Extrato de uma conta em ordem de lançamento, paginado pelo cursor em X-Next-Cursor."""
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit deve estar entre 1 e 1000")
+    after = decode_cursor(cursor) if cursor else None
+    ledger = await ledger_for(account)
+    try:
+        page = ledger.movements(account, limit, after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if page is None:
+        raise HTTPException(status_code=404, detail="Conta sem lançamentos")
+    rows, next_key = page
+    if next_key is not None:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(next_key)
+    return rows
+
+async def rebuild_ledger(job: Job) -> None:
+    """Reconstrói o razão por conta a partir das transações concluídas."""
+    def progress(transactions: int) -> None:
+        job.rows_done = transactions
+    await account_ledger.rebuild(repository, TRANSACTIONS, jobs.run_in_pool, jobs.process_workers, progress)
+
+@api_v1.post("/accounts/rebuild", response_model=JobRead, status_code=202)
+async def rebuild_accounts(response: Response):
+    """Enfileira a reconstrução do razão por conta e devolve o trabalho criado.
+
+    Enquanto ela roda, saldos e extratos continuam sendo servidos (e
+    atualizados) pelo razão atual, trocado pelo novo ao final.
+    """
+    if MULTI_WORKER:
+        raise HTTPException(status_code=409, detail="Com vários workers saldos e extratos já são lidos do banco "
+                                                    "a cada consulta; não há razão em memória para reconstruir")
+    try:
+        job = jobs.submit("rebuild_ledger", "accounts", rebuild_ledger)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "1"})
+    response.headers["Location"] = f"/api/v1/jobs/{job.id}"
+    return job.to_dict()
+
+# ------ Endpoints de Roteamento ------
+@api_v1.get("/routing/rules")
+async def get_routing_rules():
+    """Mostra a origem e o tamanho da tabela de regras de roteamento em uso."""
+    return routing_engine.describe()
+
+@api_v1.post("/routing/reload")
+async def reload_routing_rules():
+    """Recarrega e recompila o arquivo de regras de roteamento sem reiniciar a API."""
+    try:
+        rules = routing_engine.reload()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Arquivo de regras não encontrado: {routing_engine.path}")
+    except RoutingRulesError as exc:
+        raise HTTPException(status_code=400, detail=f"Regras inválidas: {exc}")
+    return {"message": f"{rules} regras de roteamento carregadas", **routing_engine.describe()}
+
+@api_v1.get("/idempotency/stats")
+async def idempotency_stats():
+    """Contadores do cache de idempotência (acertos, falhas, colapsos e remoções)."""
+    return idempotency_cache.stats()
+
+@api_v1.get("/cache/stats")
+async def response_cache_stats():
+    """Contadores do cache de respostas das listagens (acertos, taxa de acerto, invalidações e remoções)."""
+    return {**response_cache.stats(), "enabled": response_cache.enabled and not MULTI_WORKER}
+
+@api_v1.get("/persistence/stats")
+async def persistence_stats():
+    """Log de escrita e snapshots do modo memória: fsyncs, amplificação de escrita e tempo de recuperação."""
+    persistence = getattr(repository, "persistence", None)
+    if persistence is None:
+        raise HTTPException(status_code=404, detail="Persistência em disco desativada")
+    return persistence.stats()
+
 # ------ Endpoints de Arquivos ------
 @api_v1.get("/files", response_model=List[FileUploadRead])
-async def list_files(status: Optional[str] = None, file_type: Optional[str] = None):
+async def list_files(
+    response: Response,
+    status: Optional[str] = None,
+    file_type: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+):
     """Lista os arquivos com filtros opcionais."""
-    files = list(files_db.values())
-    
-    # Aplicar filtros
-    if status:
-        files = [f for f in files if f["status"] == status]
-    if file_type:
-        files = [f for f in files if f["file_type"] == file_type]
-    
-    return files
+    filters = {"status": status or None, "file_type": file_type or None}
+    return await cached_list("list_files", FILES, filters, FileUploadRead, response, skip, limit, cursor)
 
 @api_v1.get("/files/{file_id}", response_model=FileUploadRead)
 async def get_file(file_id: str):
     """Obtém os detalhes de um arquivo específico."""
-    if file_id not in files_db:
+    file_data = await repository.get(FILES, file_id)
+    if file_data is None:
         raise HTTPException(status_code=404, detail="Arquivo não encontrado")
-    return files_db[file_id]
+    return file_data
+
+# Progresso das ingestões recentes, consultável enquanto o upload ainda chega
+ingestions = IngestionTracker()
+
+async def finish_ingestion(ingestion: FileIngestion) -> Dict[str, Any]:
+    await ingestion.finish()
+    file_data = await repository.update(FILES, ingestion.file_id, {"status": ingestion.status, "processed_at": datetime.now()})
+    if file_data is not None:
+        response_cache.invalidate(FILES, {"status": "processing"}, file_data)
+    return ingestion.progress()
+
+@api_v1.post("/files/upload", response_model=List[FileIngestProgress])
+async def upload_files(request: Request, chunk_size: int = 1000):
+    """Recebe arquivos CSV, JSON ou XML em multipart/form-data e grava seus registros.
+
+    O corpo é lido em fluxo: cada arquivo é interpretado à medida que os
+    blocos chegam e os registros são gravados em lotes de ``chunk_size``,
+    então a memória não cresce com o tamanho do arquivo. Cada arquivo vira
+    uma entrada em /files (processed, ou failed se não puder ser lido) e o
+    andamento fica em /files/{file_id}/progress durante o upload.
+    """
+    if not 1 <= chunk_size <= 10000:
+        raise HTTPException(status_code=400, detail="chunk_size deve estar entre 1 e 10000")
+    try:
+        boundary = multipart_boundary(request.headers.get("content-type", ""))
+    except MultipartError as exc:
+        raise HTTPException(status_code=415, detail=str(exc))
+
+    async def insert_batch(batch: List[Dict[str, Any]]) -> None:
+        await repository.insert_many(RECORDS, batch)
+        response_cache.invalidate_rows(RECORDS, (
+            {"file_id": row["file_id"], "record_type": row["record_type"]} for row in batch
+        ))
 
-@api_v1.post("/files/upload", response_model=List[FileUploadRead])
-async def upload_files(files: List[FileUploadCreate]):
-    """Faz upload de múltiplos arquivos com suas metainformações."""
     result = []
-    
-    for file in files:
-        file_id = str(uuid.uuid4())
-        now = datetime.now()
-        
-        file_data = {
-            "id": file_id,
-            "filename": file.filename,
-            "file_type": file.file_type,
-            "status": "pending",
-            "created_at": now,
-            "processed_at": None
-        }
-        
-        files_db[file_id] = file_data
-        
-        # Criar alguns registros de exemplo para este arquivo
-        for i in range(3):
-            record_id = str(uuid.uuid4())
-            record_data = {
-                "id": record_id,
-                "file_id": file_id,
-                "record_type": f"record_type_{i+1}",
-                "content": f'{{"field1": "value{i+1}", "field2": {i+10}, "amount": {1000*(i+1)}}}',
-                "status": "processed",
-                "created_at": now
-            }
-            records_db[record_id] = record_data
-        
-        # Atualizar o status do arquivo após criar os registros
-        file_data["status"] = "processed"
-        file_data["processed_at"] = datetime.now()
-        
-        result.append(file_data)
+    current: Optional[FileIngestion] = None
+    try:
+        async for event, value in iter_multipart(request.stream(), boundary):
+            if event == "part":
+                params = disposition_params(value.get("content-disposition", ""))
+                if "filename" not in params:
+                    continue  # campo comum do formulário
+                filename = params["filename"] or "sem_nome"
+                file_type = detect_file_type(filename, value.get("content-type"))
+                file_data = await repository.insert(FILES, {
+                    "filename": filename,
+                    "file_type": file_type or "unknown",
+                    "status": "processing",
+                    "created_at": datetime.now(),
+                    "processed_at": None
+                })
+                response_cache.invalidate(FILES, file_data)
+                current = FileIngestion(file_data["id"], filename, file_type, insert_batch, chunk_size)
+                ingestions.track(current)
+            elif event == "data":
+                if current is not None:
+                    await current.feed(value)
+            elif current is not None:
+                result.append(await finish_ingestion(current))
+                current = None
+    except MultipartError as exc:
+        if current is not None:
+            current.error = str(exc)
+        raise HTTPException(status_code=400, detail=str(exc))
+    finally:
+        # Corpo malformado ou cliente que desconectou no meio de um arquivo
+        if current is not None:
+            current.error = current.error or "Upload interrompido antes do fim do arquivo"
+            await finish_ingestion(current)
     
     return result
 
-@api_v1.post("/files/{file_id}/process", response_model=FileUploadRead)
-async def process_file(file_id: str):
-    """Processa um arquivo que esteja no status pendente."""
-    if file_id not in files_db:
-        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
-    
-    file_data = files_db[file_id]
-    file_data["status"] = "processing"
-    
-    # Simulação de processamento
-    file_data["status"] = "processed"
-    file_data["processed_at"] = datetime.now()
-    
+@api_v1.get("/files/{file_id}/progress", response_model=FileIngestProgress)
+async def get_file_progress(file_id: str):
+    """Andamento da ingestão de um arquivo: bytes lidos, registros gravados e taxas."""
+    ingestion = ingestions.get(file_id)
+    if ingestion is None:
+        raise HTTPException(status_code=404, detail="Nenhuma ingestão recente para este arquivo")
+    return ingestion.progress()
+
+# Registros validados por vez no pool de processos
+PROCESS_BATCH_SIZE = 1000
+
+async def set_file_status(file_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Grava o status de um arquivo; o status anterior não é conhecido, então caem as páginas de todos os status do tipo."""
+    file_data = await repository.update(FILES, file_id, changes)
+    if file_data is not None:
+        response_cache.invalidate(FILES, {"file_type": file_data["file_type"]})
     return file_data
 
+async def process_file_records(job: Job) -> None:
+    """Valida e normaliza, em lotes no pool de processos, os registros de um arquivo e grava o resultado de cada um."""
+    file_id = job.target
+    file_data = await set_file_status(file_id, {"status": "processing"})
+    file_type = file_data["file_type"] if file_data is not None else None
+    try:
+        after = None
+        while True:
+            page = await repository.find(RECORDS, {"file_id": file_id}, limit=PROCESS_BATCH_SIZE, after=after)
+            if page.rows:
+                results = await jobs.run_in_pool(check_record_batch, file_type,
+                                                 [row["content"] for row in page.rows])
+                for row, (record_status, content) in zip(page.rows, results):
+                    changes = {} if row["status"] == record_status else {"status": record_status}
+                    if content is not None:
+                        changes["content"] = content
+                    if changes:
+                        await repository.update(RECORDS, row["id"], changes)
+                response_cache.invalidate(RECORDS, {"file_id": file_id})
+                job.rows_done += len(page.rows)
+            if page.next_key is None:
+                break
+            after = page.next_key
+    except BaseException:
+        await set_file_status(file_id, {"status": "failed", "processed_at": datetime.now()})
+        raise
+    await set_file_status(file_id, {"status": "processed", "processed_at": datetime.now()})
+
+@api_v1.post("/files/{file_id}/process", response_model=JobRead, status_code=202)
+async def process_file(file_id: str, response: Response):
+    """Enfileira o processamento de um arquivo e devolve o trabalho criado.
+
+    O andamento fica em /jobs/{job_id}. Pedir de novo enquanto o arquivo
+    ainda está na fila devolve o mesmo trabalho; com a fila cheia a
+    resposta é 429, com Retry-After.
+    """
+    if await repository.get(FILES, file_id) is None:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    try:
+        job = jobs.submit("process_file", file_id, process_file_records)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "1"})
+    response.headers["Location"] = f"/api/v1/jobs/{job.id}"
+    return job.to_dict()
+
+@api_v1.get("/files/{file_id}/records", response_model=List[DataRecordRead])
+async def list_file_records(
+    file_id: str,
+    response: Response,
+    record_type: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+):
+    """Lista, em páginas, os registros gerados por um arquivo."""
+    if await repository.get(FILES, file_id) is None:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    filters = {"file_id": file_id, "record_type": record_type or None}
+    return await cached_list("list_file_records", RECORDS, filters, DataRecordRead, response, skip, limit, cursor)
+
+# ------ Endpoints de Trabalhos ------
+@api_v1.get("/jobs/{job_id}", response_model=JobRead)
+async def get_job(job_id: str):
+    """Status de um trabalho em segundo plano, com as linhas já processadas e a vazão."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabalho não encontrado")
+    return job.to_dict()
+
 # ------ Endpoints de Registros ------
 @api_v1.get("/records", response_model=List[DataRecordRead])
-async def list_records(file_id: Optional[str] = None, record_type: Optional[str] = None):
-    """Lista os registros de dados com filtros opcionais."""
-    records = list(records_db.values())
-    
-    # Aplicar filtros
-    if file_id:
-        records = [r for r in records if r["file_id"] == file_id]
-    if record_type:
-        records = [r for r in records if r["record_type"] == record_type]
-    
-    return records
+async def list_records(
+    response: Response,
+    file_id: Optional[str] = None,
+    record_type: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    where: Optional[List[str]] = Query(None)
+):
+    """Lista os registros de dados com filtros opcionais.
+
+    ``where`` filtra pelos campos do conteúdo, como ``where=amount>1000``
+    (operadores =, !=, >, >=, <, <=; repita o parâmetro ou use ``and`` para
+    combinar condições).
+    """
+    filters = {"file_id": file_id or None, "record_type": record_type or None}
+    return await cached_list("list_records", RECORDS, filters, DataRecordRead, response, skip, limit, cursor, where)
+
+@api_v1.get("/records/export")
+async def export_records(
+    format: str = "ndjson",
+    file_id: Optional[str] = None,
+    record_type: Optional[str] = None
+):
+    """Exporta os registros filtrados em NDJSON ou CSV, em fluxo e com memória constante."""
+    filters = {"file_id": file_id or None, "record_type": record_type or None}
+    return export_response(RECORDS, filters, format, RECORD_EXPORT_COLUMNS, "records")
 
 @api_v1.get("/records/{record_id}", response_model=DataRecordRead)
 async def get_record(record_id: str):
     """Obtém os detalhes de um registro específico."""
-    if record_id not in records_db:
+    record_data = await repository.get(RECORDS, record_id)
+    if record_data is None:
         raise HTTPException(status_code=404, detail="Registro não encontrado")
-    return records_db[record_id]
+    return record_data
 
 # Incluir a API v1 como um submount
 app.mount("/api/v1", api_v1)
 
 # Iniciar a API se executada diretamente
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="API de teste do DataBridge Bank")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("DATABRIDGE_WORKERS", "1")),
+                        help="número de processos do uvicorn (padrão: DATABRIDGE_WORKERS ou 1)")
+    args = parser.parse_args()
+
     print("\n" + "="*60)
     print(" "*15 + "API DATABRIDGE SIMPLIFICADA" + " "*15)
     print("="*60 + "\n")
@@ -393,4 +1070,14 @@ if __name__ == "__main__":
     print("-"*60 + "\n")
     
     # Iniciar o servidor
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    if args.workers > 1:
+        # Cada worker é um processo: o estado precisa ficar num backend compartilhado
+        if repository.mode == "memory":
+            os.environ["DATABRIDGE_DB_MODE"] = "sqlite"
+            print(f"Modo multi-worker ({args.workers} processos): usando o SQLite compartilhado "
+                  f"{os.environ.get('DATABRIDGE_SQLITE_PATH', 'databridge.db')}\n")
+        # Os workers leem isto ao importar o módulo e deixam de usar as estruturas em memória de cada processo
+        os.environ["DATABRIDGE_WORKERS"] = str(args.workers)
+        uvicorn.run("api_teste:app", host="127.0.0.1", port=8000, workers=args.workers)
+    else:
+        uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
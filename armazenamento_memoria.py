@@ -0,0 +1,503 @@
+"""
+Estruturas de armazenamento em memória para a API do DataBridge Bank.
+Mantém índices secundários ordenados para que as listagens filtradas não
+precisem varrer a tabela inteira a cada requisição, e guarda cada linha em
+um formato compacto para reduzir o consumo de RAM no modo memória.
+"""
+import sys
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from itertools import islice
+from operator import attrgetter
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple, Type
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Valores aninhados repetidos (como routing_info) compartilham a mesma tupla
+_NESTED_POOL: Dict[Tuple[Tuple[str, Any], ...], Tuple[Tuple[str, Any], ...]] = {}
+
+
+def encode_datetime(value: Optional[datetime]) -> Optional[int]:
+    """Converte um datetime (sem fuso) em microssegundos desde a época."""
+    if value is None:
+        return None
+    return (value - EPOCH) // MICROSECOND
+
+
+def decode_datetime(value: Optional[int]) -> Optional[datetime]:
+    """Reconstrói o datetime a partir dos microssegundos armazenados."""
+    if value is None:
+        return None
+    return EPOCH + timedelta(0, 0, value)
+
+
+def intern_value(value: Optional[str]) -> Optional[str]:
+    """Interna strings de baixa cardinalidade para que as linhas compartilhem o objeto."""
+    if value is None:
+        return None
+    return sys.intern(value)
+
+
+def encode_nested(value: Optional[Dict[str, Any]]) -> Optional[Tuple[Tuple[str, Any], ...]]:
+    """Transforma um dicionário pequeno em uma tupla compartilhada entre linhas iguais."""
+    if value is None:
+        return None
+    items = tuple((sys.intern(key), intern_value(item) if isinstance(item, str) else item)
+                  for key, item in value.items())
+    return _NESTED_POOL.setdefault(items, items)
+
+
+def decode_nested(value: Optional[Tuple[Tuple[str, Any], ...]]) -> Optional[Dict[str, Any]]:
+    if value is None:
+        return None
+    return dict(value)
+
+
+def restore_nested(value: Optional[Sequence[Sequence[Any]]]) -> Optional[Tuple[Tuple[str, Any], ...]]:
+    """Volta ao formato interno um valor aninhado lido de disco (pares como listas)."""
+    if value is None:
+        return None
+    return encode_nested(dict(value))
+
+
+class CompactRow:
+    """Linha compacta: atributos em __slots__, datas como inteiros e valores repetidos internados.
+
+    As subclasses são criadas por ``compact_row_type``. O formato interno nunca
+    sai da tabela: leituras recebem um dicionário comum via ``as_dict``.
+    """
+
+    __slots__ = ("_seq",)
+
+    fields: Tuple[str, ...] = ()
+    datetime_fields: FrozenSet[str] = frozenset()
+    _encoders: Dict[str, Callable[[Any], Any]] = {}
+    _decoders: Tuple[Tuple[str, Optional[Callable[[Any], Any]]], ...] = ()
+    _restorers: Dict[str, Callable[[Any], Any]] = {}
+    _getter: Callable[["CompactRow"], Tuple[Any, ...]] = staticmethod(lambda row: ())
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CompactRow":
+        row = cls.__new__(cls)
+        encoders = cls._encoders
+        for field in cls.fields:
+            value = data.get(field)
+            encoder = encoders.get(field)
+            setattr(row, field, value if encoder is None else encoder(value))
+        return row
+
+    @classmethod
+    def encode(cls, field: str, value: Any) -> Any:
+        encoder = cls._encoders.get(field)
+        return value if encoder is None else encoder(value)
+
+    @classmethod
+    def from_encoded(cls, values: Sequence[Any]) -> "CompactRow":
+        """Reconstrói a linha a partir dos valores internos gravados por ``encoded``."""
+        row = cls.__new__(cls)
+        restorers = cls._restorers
+        for field, value in zip(cls.fields, values):
+            restorer = restorers.get(field)
+            setattr(row, field, value if restorer is None else restorer(value))
+        return row
+
+    @classmethod
+    def restore_value(cls, field: str, value: Any) -> Any:
+        restorer = cls._restorers.get(field)
+        return value if restorer is None else restorer(value)
+
+    def encoded(self) -> Tuple[Any, ...]:
+        """Valores no formato interno, na ordem de ``fields`` (usado pelos snapshots)."""
+        return self._getter(self)
+
+    def as_dict(self) -> Dict[str, Any]:
+        # Substituído em cada subclasse por uma versão gerada em compact_row_type
+        return {
+            field: getattr(self, field) if decoder is None else decoder(getattr(self, field))
+            for field, decoder in self._decoders
+        }
+
+
+def _build_as_dict(fields: Tuple[str, ...], decoders: Dict[str, Callable[[Any], Any]]) -> Callable:
+    """Gera um as_dict sem laço nem getattr dinâmico, como fazem namedtuple e dataclasses."""
+    namespace = {f"_decode_{field}": decoder for field, decoder in decoders.items()}
+    items = ", ".join(
+        f"{field!r}: _decode_{field}(self.{field})" if field in decoders else f"{field!r}: self.{field}"
+        for field in fields
+    )
+    exec(f"def as_dict(self):\n    return {{{items}}}\n", namespace)
+    return namespace["as_dict"]
+
+
+def compact_row_type(
+    name: str,
+    fields: Iterable[str],
+    datetime_fields: Iterable[str] = (),
+    interned_fields: Iterable[str] = (),
+    nested_fields: Iterable[str] = (),
+) -> Type[CompactRow]:
+    """Cria uma classe de linha compacta para uma entidade."""
+    fields = tuple(fields)
+    encoders: Dict[str, Callable[[Any], Any]] = {}
+    decoders: Dict[str, Callable[[Any], Any]] = {}
+    # Valores lidos de disco já estão no formato interno, mas perderam o internamento
+    restorers: Dict[str, Callable[[Any], Any]] = {}
+    for field in datetime_fields:
+        encoders[field] = encode_datetime
+        decoders[field] = decode_datetime
+    for field in interned_fields:
+        encoders[field] = intern_value
+        restorers[field] = intern_value
+    for field in nested_fields:
+        encoders[field] = encode_nested
+        decoders[field] = decode_nested
+        restorers[field] = restore_nested
+    return type(name, (CompactRow,), {
+        "__slots__": fields,
+        "fields": fields,
+        "datetime_fields": frozenset(datetime_fields),
+        "_encoders": encoders,
+        "_decoders": tuple((field, decoders.get(field)) for field in fields),
+        "_restorers": restorers,
+        "_getter": staticmethod(attrgetter(*fields)),
+        "as_dict": _build_as_dict(fields, decoders),
+    })
+
+
+ClientRow = compact_row_type(
+    "ClientRow",
+    ("id", "name", "email", "phone", "tax_id", "created_at", "updated_at"),
+    datetime_fields=("created_at", "updated_at"),
+)
+
+TransactionRow = compact_row_type(
+    "TransactionRow",
+    ("id", "origin_account", "destination_account", "amount", "currency", "transaction_type",
+     "description", "reference_id", "status", "routing_info", "created_at", "updated_at"),
+    datetime_fields=("created_at", "updated_at"),
+    interned_fields=("currency", "transaction_type", "status"),
+    nested_fields=("routing_info",),
+)
+
+FileRow = compact_row_type(
+    "FileRow",
+    ("id", "filename", "file_type", "status", "created_at", "processed_at"),
+    datetime_fields=("created_at", "processed_at"),
+    interned_fields=("file_type", "status"),
+)
+
+RecordRow = compact_row_type(
+    "RecordRow",
+    ("id", "file_id", "record_type", "content", "status", "created_at"),
+    datetime_fields=("created_at",),
+    interned_fields=("file_id", "record_type", "status"),
+)
+
+
+# Marca de linha do snapshot mapeado que ainda não foi materializada
+_UNTOUCHED = object()
+
+
+class MemoryTable:
+    """Tabela em memória indexada pela chave primária "id" e por campos secundários.
+
+    Cada linha recebe um número de sequência crescente no momento da inserção.
+    Os índices secundários guardam, para cada valor, a lista ordenada das
+    sequências das linhas com aquele valor, preservando a ordem de inserção
+    da listagem sem filtros. A mesma sequência serve de chave de paginação
+    por cursor: novas inserções nunca alteram a posição das linhas antigas.
+    As linhas também ficam numa lista densa indexada pela sequência (com None
+    nas posições removidas), o que custa um ponteiro por linha e permite
+    posicionar um cursor sem busca.
+
+    A tabela pode partir de um snapshot mapeado (``attach_base``): as
+    sequências abaixo de ``_base_slots`` são lidas do arquivo e só viram
+    objetos em memória (``_overlay``) quando alteradas; as listas de
+    sequências dos índices continuam no arquivo até a primeira alteração.
+    Linhas que o log recoloca em posições vazias do snapshot não estão na
+    tabela hash do arquivo e ficam registradas em ``_restored``.
+    """
+
+    def __init__(self, row_type: Type[CompactRow], indexed_fields: Iterable[str] = ()):
+        self.row_type = row_type
+        self._rows: Dict[str, CompactRow] = {}
+        self._by_seq: List[Optional[CompactRow]] = []
+        self._indexes: Dict[str, Dict[Any, Sequence[int]]] = {field: {} for field in indexed_fields}
+        self._base = None
+        self._base_slots = 0
+        self._base_live = 0
+        self._overlay: Dict[int, Optional[CompactRow]] = {}
+        self._restored: Dict[str, int] = {}
+
+    @property
+    def indexed_fields(self) -> Tuple[str, ...]:
+        return tuple(self._indexes)
+
+    @property
+    def next_seq(self) -> int:
+        return self._base_slots + len(self._by_seq)
+
+    def attach_base(self, base) -> None:
+        """Passa a servir as linhas de um snapshot mapeado (MappedTable); a tabela deve estar vazia."""
+        if self._rows or self._by_seq or self._base is not None:
+            raise ValueError("O snapshot mapeado só pode ser associado a uma tabela vazia")
+        self._base = base
+        self._base_slots = base.slots
+        self._base_live = base.live
+        for field, index in self._indexes.items():
+            postings = base.postings(field)
+            if postings is None:
+                # Campo indexado depois do snapshot: monta a lista lendo a coluna
+                for seq in range(base.slots):
+                    row = base.row(seq)
+                    if row is not None:
+                        self._postings(index, getattr(row, field)).append(seq)
+            else:
+                index.update(postings)
+
+    def _row_at(self, seq: int) -> Optional[CompactRow]:
+        if seq >= self._base_slots:
+            return self._by_seq[seq - self._base_slots]
+        row = self._overlay.get(seq, _UNTOUCHED)
+        return self._base.row(seq) if row is _UNTOUCHED else row
+
+    def _lookup(self, row_id: str) -> Optional[CompactRow]:
+        row = self._rows.get(row_id)
+        if row is None and self._base is not None:
+            seq = self._base.seq_of_id(row_id)
+            if seq is None:
+                seq = self._restored.get(row_id)
+            if seq is not None:
+                row = self._row_at(seq)
+        return row
+
+    def _materialize(self, row_id: str) -> CompactRow:
+        """Linha que vai ser alterada; as do snapshot passam a viver em memória."""
+        row = self._rows.get(row_id)
+        if row is None:
+            row = self._lookup(row_id)
+            if row is None:
+                raise KeyError(row_id)
+            self._overlay[row._seq] = row
+        return row
+
+    def __contains__(self, row_id: str) -> bool:
+        return self._lookup(row_id) is not None
+
+    def __getitem__(self, row_id: str) -> Dict[str, Any]:
+        row = self._lookup(row_id)
+        if row is None:
+            raise KeyError(row_id)
+        return row.as_dict()
+
+    def __len__(self) -> int:
+        return self._base_live + len(self._rows)
+
+    def get(self, row_id: str) -> Optional[Dict[str, Any]]:
+        row = self._lookup(row_id)
+        return None if row is None else row.as_dict()
+
+    def values(self) -> Iterator[Dict[str, Any]]:
+        return (row.as_dict() for row in self._rows_after(None))
+
+    def insert(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Insere uma nova linha e registra seus valores nos índices."""
+        row = self.row_type.from_dict(data)
+        seq = self.next_seq
+        row._seq = seq
+        self._rows[row.id] = row
+        self._by_seq.append(row)
+        for field, index in self._indexes.items():
+            # Sequências novas são sempre as maiores, então basta anexar
+            self._postings(index, getattr(row, field)).append(seq)
+        return row.as_dict()
+
+    def update(self, row_id: str, **changes: Any) -> Dict[str, Any]:
+        """Altera campos de uma linha mantendo os índices secundários em dia."""
+        encode = self.row_type.encode
+        self.update_encoded(row_id, {field: encode(field, value) for field, value in changes.items()})
+        return self._lookup(row_id).as_dict()
+
+    def update_encoded(self, row_id: str, changes: Dict[str, Any]) -> None:
+        """Como ``update``, mas com valores já no formato interno."""
+        row = self._materialize(row_id)
+        seq = row._seq
+        for field, value in changes.items():
+            index = self._indexes.get(field)
+            old_value = getattr(row, field)
+            if index is not None and old_value != value:
+                self._index_remove(index, old_value, seq)
+                insort(self._postings(index, value), seq)
+            setattr(row, field, value)
+
+    def delete(self, row_id: str) -> Dict[str, Any]:
+        """Remove uma linha da tabela e de todos os índices."""
+        row = self._materialize(row_id)
+        seq = row._seq
+        if seq < self._base_slots:
+            self._overlay[seq] = None
+            self._restored.pop(row_id, None)
+            self._base_live -= 1
+        else:
+            del self._rows[row_id]
+            self._by_seq[seq - self._base_slots] = None
+        for field, index in self._indexes.items():
+            self._index_remove(index, getattr(row, field), seq)
+        return row.as_dict()
+
+    def restore(self, seq: int, values: Sequence[Any]) -> None:
+        """Recoloca uma linha na sua sequência original, a partir dos valores internos.
+
+        Usado na reaplicação do log de escrita. Se a linha já existe, seus
+        campos são sobrescritos (a reaplicação pode repetir alterações que o
+        snapshot já contém).
+        """
+        row = self.row_type.from_encoded(values)
+        if self._lookup(row.id) is not None:
+            self.update_encoded(row.id, dict(zip(row.fields, row.encoded())))
+            return
+        if seq < self.next_seq and self._row_at(seq) is not None:
+            raise ValueError(f"Sequência {seq} já ocupada por outra linha")
+        row._seq = seq
+        if seq < self._base_slots:
+            self._overlay[seq] = row
+            self._restored[row.id] = seq
+            self._base_live += 1
+        else:
+            by_seq = self._by_seq
+            position = seq - self._base_slots
+            if position >= len(by_seq):
+                by_seq.extend([None] * (position + 1 - len(by_seq)))
+            self._rows[row.id] = row
+            by_seq[position] = row
+        for field, index in self._indexes.items():
+            seqs = self._postings(index, getattr(row, field))
+            if not seqs or seqs[-1] < seq:
+                seqs.append(seq)
+            else:
+                insort(seqs, seq)
+
+    def encoded_row(self, row_id: str) -> Tuple[int, Tuple[Any, ...]]:
+        """Sequência e valores internos de uma linha."""
+        row = self._lookup(row_id)
+        return row._seq, row.encoded()
+
+    def encoded_fields(self, row_id: str, fields: Iterable[str]) -> Dict[str, Any]:
+        """Valores internos de alguns campos de uma linha."""
+        row = self._lookup(row_id)
+        return {field: getattr(row, field) for field in fields}
+
+    def iter_encoded(self, stop: Optional[int] = None) -> Iterator[Tuple[int, Tuple[Any, ...]]]:
+        """Percorre (sequência, valores internos) em ordem de inserção, até ``stop`` se informado.
+
+        Lê a lista densa por posição, então pode rodar numa thread enquanto
+        o event loop continua inserindo linhas no fim da tabela.
+        """
+        seq = 0
+        while seq < (self.next_seq if stop is None else stop):
+            row = self._row_at(seq)
+            if row is not None:
+                yield seq, row.encoded()
+            seq += 1
+
+    def seq_of(self, row_id: str) -> int:
+        """Sequência de inserção da linha, usada como chave do cursor."""
+        return self._lookup(row_id)._seq
+
+    def count(self, field: str, value: Any) -> int:
+        """Quantidade de linhas com o valor informado em um campo indexado."""
+        return len(self._indexes[field].get(value, ()))
+
+    def find(
+        self,
+        filters: Dict[str, Any],
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[int] = None,
+        seqs: Optional[Sequence[int]] = None,
+        predicate: Optional[Callable[["CompactRow"], bool]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Retorna uma página de linhas que atendem a todos os filtros de igualdade.
+
+        Filtros com valor None são ignorados. Quando há filtros em campos
+        indexados, a busca percorre apenas o menor índice envolvido e confere
+        os demais campos diretamente na linha, de modo que o custo acompanha
+        o tamanho da página e não o da tabela. Com ``after`` a página começa
+        logo depois da sequência informada, localizada por busca binária.
+        ``seqs`` é uma lista ordenada de candidatas vinda de um índice externo
+        (usada se for a menor) e ``predicate`` confere cada linha.
+        """
+        if limit <= 0:
+            return []
+        skip = max(skip, 0)
+        filters = {field: value for field, value in filters.items() if value is not None}
+        indexed = [field for field in filters if field in self._indexes]
+        driver = None
+        if indexed:
+            driver = min(indexed, key=lambda field: len(self._indexes[field].get(filters[field], ())))
+            postings = self._indexes[driver].get(filters[driver], [])
+            if seqs is None or len(postings) <= len(seqs):
+                seqs = postings
+            else:
+                driver = None
+
+        if seqs is not None:
+            remaining = {field: value for field, value in filters.items() if field != driver}
+            row_at = self._row_at
+            rows = (row_at(seq) for seq in self._seqs_after(seqs, after))
+        else:
+            remaining = filters
+            rows = self._rows_after(after)
+
+        if remaining:
+            rows = (row for row in rows if self._matches(row, remaining))
+        if predicate is not None:
+            rows = filter(predicate, rows)
+        return [row.as_dict() for row in islice(rows, skip, skip + limit)]
+
+    def _rows_after(self, after: Optional[int]) -> Iterator[CompactRow]:
+        row_at = self._row_at
+        for seq in range(0 if after is None else after + 1, self.next_seq):
+            row = row_at(seq)
+            if row is not None:
+                yield row
+
+    @staticmethod
+    def _seqs_after(seqs: Sequence[int], after: Optional[int]) -> Iterator[int]:
+        start = 0 if after is None else bisect_right(seqs, after)
+        for position in range(start, len(seqs)):
+            yield seqs[position]
+
+    @staticmethod
+    def _matches(row: CompactRow, filters: Dict[str, Any]) -> bool:
+        return all(getattr(row, field) == value for field, value in filters.items())
+
+    @staticmethod
+    def _postings(index: Dict[Any, Sequence[int]], value: Any) -> List[int]:
+        """Lista de sequências de um valor, pronta para ser alterada.
+
+        As listas vindas do snapshot mapeado são só leitura; na primeira
+        alteração viram um array de inteiros copiado do arquivo.
+        """
+        seqs = index.get(value)
+        if seqs is None:
+            seqs = index[value] = []
+        elif type(seqs) is memoryview:
+            copy = array("q")
+            copy.frombytes(seqs.cast("B"))
+            seqs = index[value] = copy
+        return seqs
+
+    @classmethod
+    def _index_remove(cls, index: Dict[Any, Sequence[int]], value: Any, seq: int) -> None:
+        seqs = index.get(value)
+        if not seqs:
+            return
+        seqs = cls._postings(index, value)
+        position = bisect_left(seqs, seq)
+        if position < len(seqs) and seqs[position] == seq:
+            del seqs[position]
+        if not seqs:
+            del index[value]
@@ -0,0 +1,119 @@
+"""
+Benchmark da busca de clientes.
+Grava N clientes sintéticos no repositório em memória e compara, para
+buscas por prefixo de nome, por nome e sobrenome, por e-mail e por CPF, o
+tempo de percorrer a listagem de clientes comparando o texto (o que o
+atendimento fazia) com o do índice de busca, além do tempo e da memória
+para montar o índice.
+
+Uso:
+    python benchmark_busca_clientes.py
+    python benchmark_busca_clientes.py --rows 1000000
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import time
+from datetime import datetime
+
+from busca_clientes import ClientSearchIndex, digits, normalize
+from repositorios import CLIENTS, MemoryRepository
+
+FIRST_NAMES = ("Ana", "João", "Maria", "José", "Antônio", "Francisca", "Carlos", "Paulo", "Pedro", "Lucas",
+               "Luiz", "Marcos", "Luís", "Gabriel", "Rafael", "Daniel", "Marcelo", "Bruno", "Eduardo", "Felipe",
+               "Raimundo", "Rodrigo", "Juliana", "Márcia", "Fernanda", "Patrícia", "Aline", "Sandra", "Camila")
+LAST_NAMES = ("Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima",
+              "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes",
+              "Vieira", "Barbosa", "Rocha", "Dias", "Nascimento", "Andrade", "Moreira", "Nunes", "Marques")
+
+
+def client_row(i, rng, now):
+    first, middle, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), rng.choice(LAST_NAMES)
+    user = normalize(f"{first}.{last}{i}")
+    return {
+        "name": f"{first} {middle} {last}",
+        "email": f"{user}@{rng.choice(('gmail.com', 'banco.com.br', 'exemplo.org'))}",
+        "phone": f"(11) 9{i:08d}",
+        "tax_id": f"{i:011d}",
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def search_by_listing(repository, query, limit):
+    """Referência: percorre os clientes em páginas e compara o texto de cada um."""
+    terms, number, found, after = normalize(query).split(), digits(query), [], None
+    while True:
+        page = await repository.find(CLIENTS, {}, limit=1000, after=after)
+        for row in page.rows:
+            text = normalize(f"{row['name']} {row['email']}")
+            if (number and number in (digits(row["tax_id"]), digits(row["phone"]))) or (
+                    not number and all(term in text for term in terms)):
+                found.append(row["id"])
+                if len(found) == limit:
+                    return found
+        if page.next_key is None:
+            return found
+        after = page.next_key
+
+
+def rss_mb():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+async def run(rows, seed, limit):
+    rng = random.Random(seed)
+    repository = MemoryRepository()
+    now = datetime.now()
+    for i in range(rows):
+        await repository.insert(CLIENTS, client_row(i, rng, now))
+
+    index = ClientSearchIndex()
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    await index.ensure_ready(repository, CLIENTS)
+    build_s = time.perf_counter() - started
+    rss_growth = rss_mb() - rss_before
+
+    queries = ["marc", "rafael nascimento", "juliana.barbosa", f"{rows - 1:011d}", "zzz"]
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        await search_by_listing(repository, query, limit)
+        listing_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        for _ in range(100):
+            found = index.search(query, limit)
+        index_ms = (time.perf_counter() - started) * 1000 / 100
+        results.append({"query": query, "found": len(found), "listing_ms": round(listing_ms, 2),
+                        "index_ms": round(index_ms, 4)})
+    return {"rows": rows, "build_seconds": round(build_s, 2), "index_rss_mb": round(rss_growth, 1),
+            "queries": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Busca de clientes: varredura da listagem x índice invertido")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=20, help="clientes por busca")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.rows, args.seed, args.limit))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"\nBusca entre {result['rows']:,} clientes (até {args.limit} resultados)")
+    print(f"Índice montado em {result['build_seconds']:.2f}s, {result['index_rss_mb']:.1f} MiB\n")
+    print(f"{'busca':<22}{'achados':>9}{'varredura':>14}{'índice':>12}")
+    print("-" * 57)
+    for query in result["queries"]:
+        print(f"{query['query']:<22}{query['found']:>9}{query['listing_ms']:>12.2f}ms{query['index_ms']:>10.4f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark do cache de respostas das listagens.
+Grava N transações no repositório em memória e simula painéis que listam
+as transações por status (e sem filtro) em páginas de ``--limit``,
+intercalando mudanças de status numa proporção configurável de escritas
+por leitura. Com o mesmo roteiro, compara a latência das leituras sem o
+cache e com ele, e mostra a taxa de acerto e quantas páginas cada escrita
+descartou. As requisições vão direto para a aplicação ASGI, sem rede.
+
+Uso:
+    python benchmark_cache_respostas.py
+    python benchmark_cache_respostas.py --transactions 100000 --reads 5000 --write-ratio 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("DATABRIDGE_DB_MODE", "memory")
+
+import api_teste  # noqa: E402
+from benchmark_etag import call  # noqa: E402
+from cache_respostas import ResponseCache  # noqa: E402
+
+STATUSES = ("pending", "processing", "completed", "failed", "cancelled")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def workload(ids, script, limit, cache_mb):
+    cache = api_teste.response_cache = ResponseCache(max_bytes=int(cache_mb * 2 ** 20))
+    latencies = []
+    for action, value in script:
+        if action == "write":
+            await api_teste.set_transaction_status(ids[value[0]], value[1])
+            continue
+        query = f"limit={limit}" + (f"&status={value}" if value else "")
+        started = time.perf_counter()
+        status, _, _ = await call(api_teste.app, "GET", "/api/v1/transactions", query=query.encode())
+        latencies.append(time.perf_counter() - started)
+        assert status == 200
+    reads = len(latencies)
+    return {
+        "reads": reads,
+        "mean_us": round(sum(latencies) * 1e6 / reads, 1),
+        "p50_us": round(percentile(latencies, 0.50) * 1e6, 1),
+        "p99_us": round(percentile(latencies, 0.99) * 1e6, 1),
+        "cache": cache.stats(),
+    }
+
+
+async def run(transactions, reads, write_ratio, limit, cache_mb, seed):
+    rng = random.Random(seed)
+    async with api_teste.lifespan(api_teste.app):
+        now = api_teste.datetime.now()
+        rows = [{
+            "origin_account": f"{i:06d}-1", "destination_account": f"{i:06d}-2",
+            "amount": round(rng.uniform(1, 5000), 2), "currency": "BRL", "transaction_type": "pix",
+            "description": "Painel " + "x" * 30, "reference_id": f"ref-{i}", "status": rng.choice(STATUSES),
+            "routing_info": {"route": "instant", "priority": "normal", "processor": "spi"},
+            "created_at": now, "updated_at": now,
+        } for i in range(transactions)]
+        for start in range(0, transactions, 5000):
+            await api_teste.insert_transactions(rows[start:start + 5000])
+        ids = [row["id"] for row in (await api_teste.repository.find(
+            api_teste.TRANSACTIONS, {}, limit=transactions)).rows]
+
+        script = []
+        for _ in range(reads):
+            if rng.random() < write_ratio:
+                script.append(("write", (rng.randrange(transactions), rng.choice(STATUSES))))
+            script.append(("read", rng.choice((None,) + STATUSES)))
+        without = await workload(ids, script, limit, 0)
+        with_cache = await workload(ids, script, limit, cache_mb)
+    return {"transactions": transactions, "reads": reads, "write_ratio": write_ratio, "limit": limit,
+            "without_cache": without, "with_cache": with_cache}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Listagens repetidas com e sem o cache de respostas")
+    parser.add_argument("--transactions", type=int, default=50000)
+    parser.add_argument("--reads", type=int, default=3000)
+    parser.add_argument("--write-ratio", type=float, default=0.02, help="mudanças de status por leitura")
+    parser.add_argument("--limit", type=int, default=100, help="linhas por página")
+    parser.add_argument("--cache-mb", type=float, default=32)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.transactions, args.reads, args.write_ratio, args.limit, args.cache_mb, args.seed))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"\n{args.reads:,} listagens de {args.limit} linhas entre {args.transactions:,} transações, "
+          f"{args.write_ratio:.0%} de escritas por leitura\n")
+    print(f"{'modo':<12}{'média':>12}{'p50':>12}{'p99':>12}{'acertos':>10}{'invalidações':>15}")
+    print("-" * 73)
+    for name, label in (("without_cache", "sem cache"), ("with_cache", "com cache")):
+        data = result[name]
+        print(f"{label:<12}{data['mean_us']:>10.1f}µs{data['p50_us']:>10.1f}µs{data['p99_us']:>10.1f}µs"
+              f"{data['cache']['hit_rate']:>10.1%}{data['cache']['invalidations']:>15,}")
+    speedup = result["without_cache"]["mean_us"] / result["with_cache"]["mean_us"]
+    print(f"\nLatência média {speedup:.1f}x menor com o cache")
+
+
+if __name__ == "__main__":
+    main()
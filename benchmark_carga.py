@@ -0,0 +1,359 @@
+"""
+Teste de carga da API do DataBridge Bank.
+Dispara uma carga mista contra a API, no mesmo processo (pela interface
+ASGI, sem rede, com o repositório escolhido em --db-mode) ou por HTTP de
+verdade contra uma API já no ar (--target http://host:porta). A carga
+combina criação, listagem, leitura e atualização de clientes e de
+transações, busca de clientes, upload de arquivos e consultas de
+registros, com os pesos do perfil (--profile) ou de --mix, e roda por --duration segundos em cada
+nível de --concurrency (usuários virtuais simultâneos). Antes da medição
+a API recebe clientes, transações e um arquivo, para as leituras terem o
+que buscar.
+
+O resultado traz vazão e latência (média, p50, p95, p99 e máxima) no
+total e por operação, além dos status HTTP recebidos; com --json ou
+--output sai em JSON, para comparar execuções. No modo ASGI a carga e a
+API dividem o mesmo laço de eventos, então a latência inclui a espera por
+ele e o número mede o custo de CPU da API, não o da rede.
+
+Uso:
+    python benchmark_carga.py
+    python benchmark_carga.py --concurrency 1 8 32 --duration 20 --db-mode sqlite
+    python benchmark_carga.py --profile read_heavy --json
+    python benchmark_carga.py --target http://127.0.0.1:8000 --mix transaction_get=10,transaction_list=5
+    python benchmark_carga.py --output carga.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import httpx
+
+STATUSES = ("pending", "processing", "completed", "failed")
+
+# Operações da carga e o peso padrão de cada uma
+DEFAULT_MIX = {
+    "client_create": 4,
+    "client_list": 4,
+    "client_get": 8,
+    "client_update": 2,
+    "client_search": 3,
+    "transaction_create": 12,
+    "transaction_list": 12,
+    "transaction_get": 20,
+    "transaction_update": 5,
+    "file_upload": 1,
+    "record_list": 4,
+    "record_query": 3,
+}
+
+# Perfis prontos de carga; --mix substitui o perfil
+PROFILES = {
+    "mixed": DEFAULT_MIX,
+    "read_heavy": {"client_get": 10, "client_list": 5, "client_search": 5, "transaction_get": 40,
+                   "transaction_list": 25, "record_list": 5, "record_query": 5, "transaction_create": 3,
+                   "transaction_update": 2},
+    "write_heavy": {"client_create": 10, "client_update": 10, "transaction_create": 40, "transaction_update": 25,
+                    "transaction_get": 10, "transaction_list": 5},
+    "ingestion": {"file_upload": 5, "record_list": 10, "record_query": 10, "transaction_list": 2},
+}
+
+
+def percentile(ordered, fraction):
+    """Percentil pelo posto mais próximo de uma lista já ordenada."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def latency_summary(latencies):
+    ordered = sorted(latencies)
+    return {
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99": round(percentile(ordered, 0.99) * 1000, 3),
+        "max": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+def parse_mix(text):
+    """Pesos no formato operacao=peso,operacao=peso; só as operações listadas entram na carga."""
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Operação desconhecida: {name}. Use: {', '.join(DEFAULT_MIX)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Peso inválido para {name}: {weight!r}")
+    return mix
+
+
+class Workload:
+    """Operações da carga sobre um cliente HTTP, com os ids criados até aqui.
+
+    Os CPF/CNPJ e e-mails levam um prefixo da execução, então rodar de novo
+    contra a mesma API não esbarra na unicidade dos clientes.
+    """
+
+    def __init__(self, client, seed):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.sequence = itertools.count()
+        self.clients = []
+        self.transactions = []
+        self.files = []
+
+    def client_payload(self, number):
+        return {
+            "name": f"Cliente {self.rng.choice(('Ana', 'João', 'Maria', 'Pedro', 'Lucas'))} {number}",
+            "email": f"carga.{self.run_id}.{number}@exemplo.com",
+            "phone": f"(11) 9{number % 10 ** 8:08d}",
+            "tax_id": f"{self.run_id}{number:011d}",
+        }
+
+    def transaction_payload(self):
+        number = next(self.sequence)
+        return {
+            "origin_account": f"{self.rng.randrange(10 ** 6):06d}-1",
+            "destination_account": f"{self.rng.randrange(10 ** 6):06d}-2",
+            "amount": round(self.rng.uniform(1, 20000), 2),
+            "currency": self.rng.choice(("BRL", "BRL", "BRL", "USD")),
+            "transaction_type": self.rng.choice(("pix", "ted", "transfer")),
+            "description": f"Carga {number}",
+            "reference_id": f"carga-{self.run_id}-{number}",
+        }
+
+    def upload_files(self, rows):
+        number = next(self.sequence)
+        lines = ["id,origin_account,amount,currency"]
+        lines += [f"{i},{i:06d}-1,{self.rng.uniform(1, 5000):.2f},BRL" for i in range(rows)]
+        return {"file": (f"carga-{self.run_id}-{number}.csv", ("\n".join(lines) + "\n").encode(), "text/csv")}
+
+    async def seed(self, clients, transactions, upload_rows):
+        """Popula a API antes da medição e guarda os ids para as leituras."""
+        # Pelo menos um de cada, para as leituras sempre terem um id
+        clients, transactions = max(1, clients), max(1, transactions)
+        for _ in range(clients):
+            await self.client_create()
+        body = "".join(json.dumps(self.transaction_payload()) + "\n" for _ in range(transactions))
+        response = await self.client.post("/api/v1/transactions/batch", content=body.encode(), timeout=300)
+        response.raise_for_status()
+        cursor = None
+        while len(self.transactions) < transactions:
+            params = {"limit": 1000, **({"cursor": cursor} if cursor else {})}
+            response = await self.client.get("/api/v1/transactions", params=params)
+            response.raise_for_status()
+            self.transactions += [row["id"] for row in response.json()]
+            cursor = response.headers.get("x-next-cursor")
+            if cursor is None:
+                break
+        await self.file_upload(upload_rows)
+
+    async def client_create(self):
+        payload = self.client_payload(next(self.sequence))
+        response = await self.client.post("/api/v1/clients", json=payload)
+        if response.status_code == 201:
+            self.clients.append((response.json()["id"], payload))
+        return response
+
+    async def client_list(self):
+        return await self.client.get("/api/v1/clients", params={"limit": 50})
+
+    async def client_get(self):
+        client_id, _ = self.rng.choice(self.clients)
+        return await self.client.get(f"/api/v1/clients/{client_id}")
+
+    async def client_update(self):
+        client_id, payload = self.rng.choice(self.clients)
+        return await self.client.put(f"/api/v1/clients/{client_id}",
+                                     json={**payload, "phone": f"(21) 9{self.rng.randrange(10 ** 8):08d}"})
+
+    async def client_search(self):
+        return await self.client.get("/api/v1/clients/search",
+                                     params={"q": self.rng.choice(("ana", "joão", "maria", "ped", "luc"))})
+
+    async def transaction_create(self):
+        response = await self.client.post("/api/v1/transactions", json=self.transaction_payload())
+        if response.status_code == 201:
+            self.transactions.append(response.json()["id"])
+        return response
+
+    async def transaction_list(self):
+        params = {"limit": 100}
+        if self.rng.random() < 0.5:
+            params["status"] = self.rng.choice(STATUSES)
+        return await self.client.get("/api/v1/transactions", params=params)
+
+    async def transaction_get(self):
+        return await self.client.get(f"/api/v1/transactions/{self.rng.choice(self.transactions)}")
+
+    async def transaction_update(self):
+        return await self.client.put(f"/api/v1/transactions/{self.rng.choice(self.transactions)}",
+                                     params={"status": self.rng.choice(STATUSES)})
+
+    async def file_upload(self, rows=200):
+        response = await self.client.post("/api/v1/files/upload", files=self.upload_files(rows))
+        if response.is_success:
+            self.files += [item["file_id"] for item in response.json()]
+        return response
+
+    async def record_list(self):
+        return await self.client.get("/api/v1/records", params={"file_id": self.rng.choice(self.files), "limit": 50})
+
+    async def record_query(self):
+        return await self.client.get("/api/v1/records",
+                                     params={"where": f"amount>{self.rng.randrange(1000, 4900)}", "limit": 50})
+
+
+async def run_level(workload, mix, concurrency, duration):
+    """Roda a carga com ``concurrency`` usuários virtuais por ``duration`` segundos."""
+    names = list(mix)
+    weights = list(itertools.accumulate(mix[name] for name in names))
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    statuses = {}
+    deadline = time.perf_counter() + duration
+
+    async def user(rng):
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, cum_weights=weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await getattr(workload, name)()
+                status = str(response.status_code)
+                failed = not response.is_success
+            except httpx.HTTPError as exc:
+                status, failed = type(exc).__name__, True
+            samples[name].append(time.perf_counter() - started)
+            errors[name] += failed
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(random.Random(workload.rng.random())) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    everything = [latency for latencies in samples.values() for latency in latencies]
+    return {
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests": len(everything),
+        "errors": sum(errors.values()),
+        "throughput_rps": round(len(everything) / elapsed, 1),
+        "latency_ms": latency_summary(everything),
+        "status_codes": dict(sorted(statuses.items())),
+        "operations": {
+            name: {"requests": len(samples[name]), "errors": errors[name],
+                   "throughput_rps": round(len(samples[name]) / elapsed, 1),
+                   "latency_ms": latency_summary(samples[name])}
+            for name in names if samples[name]
+        },
+    }
+
+
+@asynccontextmanager
+async def open_client(target, db_mode, max_connections):
+    """Cliente HTTP para a API no ar ou, com ``target="asgi"``, para a aplicação neste processo."""
+    if target != "asgi":
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        async with httpx.AsyncClient(base_url=target.rstrip("/"), limits=limits, timeout=60) as client:
+            yield client
+        return
+    os.environ["DATABRIDGE_DB_MODE"] = db_mode
+    import api_teste
+    async with api_teste.lifespan(api_teste.app):
+        transport = httpx.ASGITransport(app=api_teste.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://databridge", timeout=60) as client:
+            yield client
+
+
+async def run(args):
+    async with open_client(args.target, args.db_mode, max(args.concurrency)) as client:
+        workload = Workload(client, args.seed)
+        started = time.perf_counter()
+        await workload.seed(args.seed_clients, args.seed_transactions, args.upload_rows)
+        seed_seconds = time.perf_counter() - started
+        if args.warmup > 0:
+            await run_level(workload, args.mix, min(args.concurrency), args.warmup)
+        levels = [await run_level(workload, args.mix, concurrency, args.duration) for concurrency in args.concurrency]
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "target": args.target,
+        "db_mode": args.db_mode if args.target == "asgi" else None,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "duration_seconds": args.duration,
+        "profile": args.profile if args.mix == PROFILES[args.profile] else "custom",
+        "mix": args.mix,
+        "seed": {"clients": args.seed_clients, "transactions": args.seed_transactions,
+                 "upload_rows": args.upload_rows, "seconds": round(seed_seconds, 2)},
+        "levels": levels,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga mista contra a API, no mesmo processo ou por HTTP")
+    parser.add_argument("--target", default="asgi", help='"asgi" (mesmo processo) ou a URL da API no ar')
+    parser.add_argument("--db-mode", choices=["memory", "sqlite", "postgres", "mongodb"],
+                        default=os.environ.get("DATABRIDGE_DB_MODE") or "memory",
+                        help="repositório da API no modo asgi")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32], help="usuários virtuais simultâneos")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos de carga por nível")
+    parser.add_argument("--warmup", type=float, default=2.0, help="segundos de aquecimento, fora da medição")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="mixed", help="perfil de carga pronto")
+    parser.add_argument("--mix", type=parse_mix, default=None,
+                        help="pesos das operações, como transaction_get=20,client_create=5 (substitui o perfil)")
+    parser.add_argument("--seed-clients", type=int, default=200)
+    parser.add_argument("--seed-transactions", type=int, default=5000)
+    parser.add_argument("--upload-rows", type=int, default=200, help="linhas do CSV de cada upload")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="grava o resultado em JSON neste arquivo")
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+    if args.mix is None:
+        args.mix = dict(PROFILES[args.profile])
+
+    result = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(result, output, indent=2, ensure_ascii=False)
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+
+    target = f"ASGI no mesmo processo ({args.db_mode})" if args.target == "asgi" else args.target
+    print(f"\nCarga mista contra {target}, {args.duration:g}s por nível "
+          f"(população: {result['seed']['seconds']:.1f}s)\n")
+    print(f"{'usuários':>9}{'requisições':>13}{'req/s':>10}{'p50':>11}{'p95':>11}{'p99':>11}{'erros':>8}")
+    print("-" * 73)
+    for level in result["levels"]:
+        latency = level["latency_ms"]
+        print(f"{level['concurrency']:>9}{level['requests']:>13,}{level['throughput_rps']:>10,.1f}"
+              f"{latency['p50']:>9.2f}ms{latency['p95']:>9.2f}ms{latency['p99']:>9.2f}ms{level['errors']:>8}")
+
+    last = result["levels"][-1]
+    print(f"\nPor operação com {last['concurrency']} usuários:\n")
+    print(f"{'operação':<20}{'requisições':>13}{'p50':>11}{'p95':>11}{'p99':>11}{'erros':>8}")
+    print("-" * 74)
+    for name, operation in last["operations"].items():
+        latency = operation["latency_ms"]
+        print(f"{name:<20}{operation['requests']:>13,}{latency['p50']:>9.2f}ms{latency['p95']:>9.2f}ms"
+              f"{latency['p99']:>9.2f}ms{operation['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark da compressão das respostas.
+Monta uma página de listagem de transações (JSON, corpo inteiro) e uma
+exportação NDJSON entregue em blocos de 1000 linhas (em fluxo, com flush a
+cada bloco, como faz o middleware) e comprime ambas em cada nível de gzip
+e de brotli (quando o pacote está instalado). Para cada nível mostra a
+taxa de compressão, a vazão e a CPU por MiB, e o tempo estimado de
+entrega num enlace de ``--link-mbps`` (CPU de compressão mais bytes no
+fio), que é a troca entre nível e latência nos enlaces entre regiões.
+
+Uso:
+    python benchmark_compressao.py
+    python benchmark_compressao.py --rows 50000 --link-mbps 50 --json
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from compressao import Compressor, brotli
+from exportacao import EXPORT_PAGE_SIZE, TRANSACTION_EXPORT_COLUMNS, encode_ndjson
+from serializacao import dumps
+
+GZIP_LEVELS = (1, 3, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6, 9, 11)
+
+
+def transaction_rows(count, seed):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    return [{
+        "id": f"{rng.getrandbits(128):032x}",
+        "origin_account": f"{rng.randrange(10 ** 6):06d}-{rng.randrange(10)}",
+        "destination_account": f"{rng.randrange(10 ** 6):06d}-{rng.randrange(10)}",
+        "amount": round(rng.uniform(1, 50000), 2),
+        "currency": rng.choice(("BRL", "BRL", "BRL", "USD", "EUR")),
+        "transaction_type": rng.choice(("pix", "ted", "doc", "boleto")),
+        "description": rng.choice(("Pagamento fornecedor", "Transferência", None, "Conciliação")),
+        "reference_id": f"ref-{i}",
+        "status": rng.choice(("pending", "processing", "completed", "failed")),
+        "routing_info": {"route": rng.choice(("instant", "standard")), "priority": "normal", "processor": "spi"},
+        "created_at": start + timedelta(seconds=i * 7),
+        "updated_at": start + timedelta(seconds=i * 7 + 3),
+    } for i in range(count)]
+
+
+def measure(chunks, encoding, level, link_mbps):
+    """Comprime os blocos como o middleware (flush por bloco quando há mais de um)."""
+    raw = sum(len(chunk) for chunk in chunks)
+    rounds = max(1, int(2e7 // (raw * (level + 1))))
+    started = time.process_time()
+    for _ in range(rounds):
+        compressor = Compressor(encoding, gzip_level=level, brotli_quality=level)
+        size = sum(len(compressor.chunk(chunk)) for chunk in chunks[:-1]) + len(compressor.finish(chunks[-1]))
+    cpu = (time.process_time() - started) / rounds
+    wire = size * 8 / (link_mbps * 1e6)
+    return {
+        "encoding": encoding, "level": level, "bytes": size, "ratio": round(raw / size, 2),
+        "mib_per_second": round(raw / 2 ** 20 / cpu, 1), "cpu_ms_per_mib": round(cpu * 1000 / (raw / 2 ** 20), 2),
+        "cpu_ms": round(cpu * 1000, 2), "delivery_ms": round((cpu + wire) * 1000, 1),
+    }
+
+
+def run(rows, page_rows, link_mbps, seed):
+    data = transaction_rows(rows, seed)
+    payloads = {
+        "list_page": [dumps(data[:page_rows])],
+        "export_stream": [encode_ndjson(data[start:start + EXPORT_PAGE_SIZE], TRANSACTION_EXPORT_COLUMNS)
+                          for start in range(0, rows, EXPORT_PAGE_SIZE)],
+    }
+    levels = [("gzip", level) for level in GZIP_LEVELS]
+    if brotli is not None:
+        levels += [("br", quality) for quality in BROTLI_QUALITIES]
+    result = {"rows": rows, "link_mbps": link_mbps, "brotli_available": brotli is not None, "payloads": {}}
+    for name, chunks in payloads.items():
+        raw = sum(len(chunk) for chunk in chunks)
+        result["payloads"][name] = {
+            "raw_bytes": raw,
+            "identity_delivery_ms": round(raw * 8 / (link_mbps * 1e6) * 1000, 1),
+            "levels": [measure(chunks, encoding, level, link_mbps) for encoding, level in levels],
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Taxa, vazão e CPU da compressão por nível")
+    parser.add_argument("--rows", type=int, default=20000, help="linhas da exportação")
+    parser.add_argument("--page-rows", type=int, default=1000, help="linhas da página de listagem")
+    parser.add_argument("--link-mbps", type=float, default=100, help="banda do enlace para o tempo de entrega")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    result = run(args.rows, args.page_rows, args.link_mbps, args.seed)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    if not result["brotli_available"]:
+        print("\nbrotli não instalado: só gzip medido")
+    for name, label in (("list_page", f"página de {args.page_rows} transações (corpo inteiro)"),
+                        ("export_stream", f"exportação NDJSON de {args.rows:,} linhas (em fluxo)")):
+        data = result["payloads"][name]
+        print(f"\n{label}: {data['raw_bytes']:,} bytes, "
+              f"{data['identity_delivery_ms']:.1f}ms sem compressão a {args.link_mbps:g} Mbit/s\n")
+        print(f"{'nível':<10}{'bytes':>12}{'taxa':>8}{'vazão':>14}{'CPU/MiB':>12}{'entrega':>12}")
+        print("-" * 68)
+        for level in data["levels"]:
+            print(f"{level['encoding'] + ' ' + str(level['level']):<10}{level['bytes']:>12,}{level['ratio']:>7.1f}x"
+                  f"{level['mib_per_second']:>9.1f}MiB/s{level['cpu_ms_per_mib']:>10.2f}ms{level['delivery_ms']:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
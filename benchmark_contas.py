@@ -0,0 +1,120 @@
+"""
+Benchmark do razão por conta.
+Grava N transações concluídas entre um conjunto de contas no repositório em
+memória e compara o saldo de uma conta calculado percorrendo as transações
+concluídas (a única forma antes do razão) com a consulta ao razão
+materializado, além do tempo de reconstrução do razão sem pool e com o
+pool de processos.
+
+Uso:
+    python benchmark_contas.py
+    python benchmark_contas.py --rows 1000000 --accounts 50000 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from contas import AccountLedger
+from repositorios import TRANSACTIONS, MemoryRepository
+
+
+async def balance_by_scan(repository, account):
+    """Referência: soma as transações concluídas em que a conta aparece."""
+    balances, after = {}, None
+    while True:
+        page = await repository.find(TRANSACTIONS, {"status": "completed"}, limit=5000, after=after)
+        for row in page.rows:
+            if account in (row["origin_account"], row["destination_account"]):
+                value = Decimal(repr(row["amount"]))
+                sign = -1 if row["origin_account"] == account else 1
+                balances[row["currency"]] = balances.get(row["currency"], Decimal(0)) + sign * value
+        if page.next_key is None:
+            return {currency: float(value) for currency, value in balances.items()}
+        after = page.next_key
+
+
+async def run(rows, accounts, workers, seed):
+    rng = random.Random(seed)
+    repository = MemoryRepository()
+    names = [f"{i:06d}-1" for i in range(accounts)]
+    start = datetime(2024, 1, 1)
+    for i in range(rows):
+        origin, destination = rng.sample(names, 2)
+        await repository.insert(TRANSACTIONS, {
+            "origin_account": origin, "destination_account": destination,
+            "amount": round(rng.uniform(1, 5000), 2), "currency": rng.choice(("BRL", "USD")),
+            "transaction_type": "pix", "description": None, "reference_id": None, "status": "completed",
+            "routing_info": {"route": "instant"}, "created_at": start, "updated_at": start + timedelta(seconds=i),
+        })
+    account = names[0]
+
+    started = time.perf_counter()
+    expected = await balance_by_scan(repository, account)
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    ledger = AccountLedger()
+    inline = await ledger.rebuild(repository, TRANSACTIONS)
+
+    pool = ProcessPoolExecutor(workers)
+    try:
+        loop = asyncio.get_running_loop()
+        pooled = await ledger.rebuild(repository, TRANSACTIONS,
+                                      lambda function, *args: loop.run_in_executor(pool, function, *args), workers)
+    finally:
+        pool.shutdown()
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        balance = ledger.balance(account)
+    read_us = (time.perf_counter() - started) * 1e6 / 1000
+    if balance["balances"] != expected:
+        raise AssertionError(f"Saldo do razão {balance['balances']} diferente da referência {expected}")
+
+    _, cursor = ledger.movements(account, 1)
+    started = time.perf_counter()
+    for _ in range(1000):
+        ledger.movements(account, 100, cursor)
+    page_us = (time.perf_counter() - started) * 1e6 / 1000
+
+    return {
+        "rows": rows,
+        "accounts": accounts,
+        "scan_balance_ms": round(scan_ms, 1),
+        "ledger_balance_us": round(read_us, 2),
+        "ledger_page_us": round(page_us, 1),
+        "rebuild_inline_s": inline["elapsed_seconds"],
+        "rebuild_pool_s": pooled["elapsed_seconds"],
+        "workers": workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Saldo por conta: varredura das transações x razão materializado")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    results = [asyncio.run(run(rows, args.accounts, args.workers, args.seed)) for rows in args.rows]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\nSaldo e extrato de uma conta entre {args.accounts:,} contas (reconstrução com {args.workers} processo(s))\n")
+    print(f"{'transações':>12}{'varredura':>12}{'saldo':>10}{'extrato 100':>14}{'reconstrução':>15}{'com pool':>11}")
+    print("-" * 74)
+    for result in results:
+        print(f"{result['rows']:>12,}{result['scan_balance_ms']:>10.1f}ms{result['ledger_balance_us']:>8.2f}µs"
+              f"{result['ledger_page_us']:>12.1f}µs{result['rebuild_inline_s']:>14.3f}s{result['rebuild_pool_s']:>10.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark dos agregados de transações.
+Para cada tamanho grava N transações no repositório em memória e compara
+o tempo de calcular os totais por moeda, tipo, status e rota percorrendo
+todas as páginas da listagem (o que os painéis faziam) com o de montar o
+cubo de agregados uma vez e o de cada leitura seguinte, que não depende
+do número de transações. Também mede o custo que os agregados somam a
+cada mudança de status.
+
+Uso:
+    python benchmark_estatisticas.py
+    python benchmark_estatisticas.py --rows 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from estatisticas import TransactionStats
+from repositorios import TRANSACTIONS, MemoryRepository
+
+CURRENCIES = ("BRL", "USD", "EUR")
+TYPES = ("pix", "ted", "transfer", "payment")
+STATUSES = ("pending", "processing", "completed", "failed", "cancelled")
+ROUTES = ("standard", "high_value", "instant", "international")
+
+
+def transaction_row(i, rng, start):
+    return {
+        "origin_account": f"{i:06d}-1",
+        "destination_account": f"{i * 7 % 100000:06d}-2",
+        "amount": round(rng.uniform(1, 50000), 2),
+        "currency": rng.choice(CURRENCIES),
+        "transaction_type": rng.choice(TYPES),
+        "description": None,
+        "reference_id": None,
+        "status": rng.choice(STATUSES),
+        "routing_info": {"route": rng.choice(ROUTES), "priority": "normal"},
+        "created_at": start + timedelta(seconds=i % 86400),
+        "updated_at": start,
+    }
+
+
+async def totals_by_listing(repository):
+    """Referência: percorre todas as páginas e soma na hora."""
+    groups = defaultdict(lambda: [0, 0.0, None, None])
+    after = None
+    while True:
+        page = await repository.find(TRANSACTIONS, {}, limit=1000, after=after)
+        for row in page.rows:
+            for key in (("currency", row["currency"]), ("transaction_type", row["transaction_type"]),
+                        ("status", row["status"]), ("route", row["routing_info"]["route"])):
+                group = groups[key]
+                group[0] += 1
+                group[1] += row["amount"]
+                group[2] = row["amount"] if group[2] is None else min(group[2], row["amount"])
+                group[3] = row["amount"] if group[3] is None else max(group[3], row["amount"])
+        if page.next_key is None:
+            return groups
+        after = page.next_key
+
+
+async def run(rows, seed):
+    rng = random.Random(seed)
+    repository = MemoryRepository()
+    start = datetime(2024, 1, 1)
+    created = [await repository.insert(TRANSACTIONS, transaction_row(i, rng, start)) for i in range(rows)]
+
+    started = time.perf_counter()
+    await totals_by_listing(repository)
+    listing_ms = (time.perf_counter() - started) * 1000
+
+    stats = TransactionStats()
+    started = time.perf_counter()
+    await stats.ensure_ready(repository, TRANSACTIONS)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for _ in range(100):
+        stats.summary("hour", 24)
+    read_ms = (time.perf_counter() - started) * 1000 / 100
+
+    updates = min(rows, 10000)
+    started = time.perf_counter()
+    for row in rng.sample(created, updates):
+        stats.status_changed(row["status"], {**row, "status": "completed"}, repository.sort_key(TRANSACTIONS, row))
+    update_us = (time.perf_counter() - started) * 1e6 / updates
+
+    return {
+        "rows": rows,
+        "listing_ms": round(listing_ms, 1),
+        "build_ms": round(build_ms, 1),
+        "read_ms": round(read_ms, 3),
+        "status_change_us": round(update_us, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leitura dos agregados de transações por tamanho da base")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    results = [asyncio.run(run(rows, args.seed)) for rows in args.rows]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("\nTotais por moeda, tipo, status e rota (com janelas de 1 hora nas leituras)\n")
+    print(f"{'transações':>12}{'listagem completa':>20}{'montagem':>12}{'leitura':>12}{'mudança de status':>20}")
+    print("-" * 76)
+    for result in results:
+        print(f"{result['rows']:>12,}{result['listing_ms']:>18.1f}ms{result['build_ms']:>10.1f}ms"
+              f"{result['read_ms']:>10.3f}ms{result['status_change_us']:>18.2f}µs")
+
+
+if __name__ == "__main__":
+    main()
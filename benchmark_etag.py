@@ -0,0 +1,122 @@
+"""
+Benchmark das leituras condicionais (ETag / If-None-Match).
+Simula clientes de conciliação que consultam o mesmo conjunto de
+transações em rodadas; a cada rodada uma fração delas muda de status. Com
+os mesmos dados, compara a consulta sem validadores (corpo completo a cada
+vez) com a consulta que reenvia o último ETag e recebe 304 enquanto nada
+mudou, medindo bytes de corpo transferidos e CPU por requisição. As
+requisições vão direto para a aplicação ASGI, sem rede, para que a CPU
+medida seja a da API.
+
+Uso:
+    python benchmark_etag.py
+    python benchmark_etag.py --transactions 2000 --rounds 20 --change-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("DATABRIDGE_DB_MODE", "memory")
+
+import api_teste  # noqa: E402
+
+
+async def call(app, method, path, headers=(), query=b""):
+    """Executa uma requisição ASGI e devolve (status, cabeçalhos, corpo)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query,
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+        "client": ("127.0.0.1", 1), "server": ("test", 80), "root_path": "",
+    }
+    received = {"status": 0, "headers": {}, "body": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            received["status"] = message["status"]
+            received["headers"] = {name.decode(): value.decode() for name, value in message["headers"]}
+        elif message["type"] == "http.response.body":
+            received["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return received["status"], received["headers"], received["body"]
+
+
+async def poll(app, ids, rounds, changes, conditional):
+    etags = {}
+    body_bytes = requests = not_modified = 0
+    cpu = 0.0
+    for round_changes in changes:
+        for transaction_id in round_changes:
+            await api_teste.set_transaction_status(transaction_id, random.choice(("processing", "completed")))
+        started = time.process_time()
+        for transaction_id in ids:
+            headers = [("If-None-Match", etags[transaction_id])] if conditional and transaction_id in etags else []
+            status, response_headers, body = await call(app, "GET", f"/api/v1/transactions/{transaction_id}", headers)
+            if "etag" in response_headers:
+                etags[transaction_id] = response_headers["etag"]
+            not_modified += status == 304
+            body_bytes += len(body)
+            requests += 1
+        cpu += time.process_time() - started
+    return {"requests": requests, "not_modified": not_modified, "body_bytes": body_bytes,
+            "cpu_us_per_request": round(cpu * 1e6 / requests, 1)}
+
+
+async def run(transactions, rounds, change_rate, seed):
+    rng = random.Random(seed)
+    async with api_teste.lifespan(api_teste.app):
+        ids = []
+        for i in range(transactions):
+            row = await api_teste.insert_transaction({
+                "origin_account": f"{i:06d}-1", "destination_account": f"{i:06d}-2",
+                "amount": round(rng.uniform(1, 5000), 2), "currency": "BRL", "transaction_type": "pix",
+                "description": "Conciliação " + "x" * 40, "reference_id": f"ref-{i}", "status": "pending",
+                "routing_info": {"route": "instant", "priority": "normal", "processor": "spi"},
+                "created_at": api_teste.datetime.now(), "updated_at": api_teste.datetime.now(),
+            })
+            ids.append(row["id"])
+        changes = [rng.sample(ids, int(transactions * change_rate)) for _ in range(rounds)]
+        random.seed(seed)
+        plain = await poll(api_teste.app, ids, rounds, changes, conditional=False)
+        random.seed(seed)
+        conditional = await poll(api_teste.app, ids, rounds, changes, conditional=True)
+    return {"transactions": transactions, "rounds": rounds, "change_rate": change_rate,
+            "plain": plain, "conditional": conditional}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas repetidas com e sem ETag")
+    parser.add_argument("--transactions", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--change-rate", type=float, default=0.02, help="fração das transações alterada por rodada")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.transactions, args.rounds, args.change_rate, args.seed))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"\n{args.transactions:,} transações consultadas em {args.rounds} rodadas, "
+          f"{args.change_rate:.0%} alteradas por rodada\n")
+    print(f"{'modo':<16}{'requisições':>13}{'304':>8}{'bytes de corpo':>16}{'CPU/requisição':>17}")
+    print("-" * 70)
+    for name, label in (("plain", "sem validadores"), ("conditional", "If-None-Match")):
+        data = result[name]
+        print(f"{label:<16}{data['requests']:>13,}{data['not_modified']:>8,}{data['body_bytes']:>16,}"
+              f"{data['cpu_us_per_request']:>15.1f}µs")
+    saved = 1 - result["conditional"]["body_bytes"] / result["plain"]["body_bytes"]
+    cpu = 1 - result["conditional"]["cpu_us_per_request"] / result["plain"]["cpu_us_per_request"]
+    print(f"\nEconomia: {saved:.1%} dos bytes de corpo e {cpu:.1%} da CPU por requisição")
+
+
+if __name__ == "__main__":
+    main()
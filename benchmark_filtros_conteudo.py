@@ -0,0 +1,114 @@
+"""
+Benchmark das consultas where sobre o conteúdo dos registros.
+Grava N registros JSON sintéticos no repositório escolhido e compara, para
+uma condição seletiva e outra abrangente, o custo de uma página de 100
+linhas reinterpretando o JSON de todos os registros a cada consulta (o que
+um filtro exigiria sem índice) com o da primeira consulta (que monta o
+índice do campo) e o das consultas seguintes, que o reaproveitam.
+
+Uso:
+    python benchmark_filtros_conteudo.py
+    python benchmark_filtros_conteudo.py --rows 1000000 --db-mode sqlite
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from filtros_conteudo import matches, parse_where
+from repositorios import FILES, RECORDS, create_repository
+
+
+def record(i, file_id, now):
+    content = {"n": i, "amount": i * 7919 % 100000 / 10, "kind": "credit" if i % 3 else "debit"}
+    return {"file_id": file_id, "record_type": "json_object", "content": json.dumps(content),
+            "status": "processed", "created_at": now}
+
+
+async def page_by_parsing(repository, condition, limit):
+    """Referência sem índice: lê os registros em ordem e interpreta o JSON de cada um."""
+    rows, after = [], None
+    while len(rows) < limit:
+        page = await repository.find(RECORDS, {}, limit=1000, after=after)
+        for row in page.rows:
+            if matches(json.loads(row["content"]).get(condition.field), condition):
+                rows.append(row)
+                if len(rows) == limit:
+                    break
+        if page.next_key is None:
+            break
+        after = page.next_key
+    return rows
+
+
+async def timed(coroutine_function, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = await coroutine_function()
+    return (time.perf_counter() - started) * 1000 / repeat, result
+
+
+async def run(rows, db_mode, limit):
+    repository = create_repository(db_mode)
+    await repository.connect()
+    try:
+        now = datetime.now()
+        file_data = await repository.insert(FILES, {"filename": "carga.json", "file_type": "json", "status": "processed",
+                                                    "created_at": now, "processed_at": now})
+        for start in range(0, rows, 5000):
+            await repository.insert_many(RECORDS, [record(i, file_data["id"], now)
+                                                   for i in range(start, min(rows, start + 5000))])
+
+        results = []
+        for expression in ("amount>9990", "amount>100"):
+            where = parse_where([expression])
+            parse_ms, expected = await timed(lambda: page_by_parsing(repository, where[0], limit))
+            first_ms, page = await timed(lambda: repository.find(RECORDS, {}, limit=limit, where=where))
+            next_ms, page = await timed(lambda: repository.find(RECORDS, {}, limit=limit, where=where), repeat=20)
+            if [row["id"] for row in page.rows] != [row["id"] for row in expected]:
+                raise AssertionError(f"Resultado diferente da referência para {expression}")
+            results.append({
+                "where": expression,
+                "parse_every_query_ms": round(parse_ms, 2),
+                "first_query_ms": round(first_ms, 2),
+                "next_queries_ms": round(next_ms, 3),
+            })
+        return results
+    finally:
+        await repository.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas where com índices de conteúdo sob demanda")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=100, help="linhas por página")
+    parser.add_argument("--db-mode", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp(prefix="databridge-where-"))
+    os.environ["DATABRIDGE_SQLITE_PATH"] = str(directory / "databridge.db")
+    try:
+        results = asyncio.run(run(args.rows, args.db_mode, args.limit))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\nPágina de {args.limit} registros filtrada por conteúdo, {args.rows:,} registros em {args.db_mode}\n")
+    print(f"{'where':<14}{'JSON a cada consulta':>22}{'1ª consulta':>14}{'seguintes':>12}")
+    print("-" * 62)
+    for result in results:
+        print(f"{result['where']:<14}{result['parse_every_query_ms']:>20.2f}ms{result['first_query_ms']:>12.2f}ms"
+              f"{result['next_queries_ms']:>10.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark de memória: linhas em dicionários (layout antigo) contra linhas compactas.
+Mede, com tracemalloc, quantos bytes cada entidade ocupa por linha nos dois
+layouts usados pelo modo memória da API.
+
+Uso:
+    python benchmark_linhas_compactas.py                 # 1.000.000 linhas por entidade
+    python benchmark_linhas_compactas.py --rows 100000 --entities transactions
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from armazenamento_memoria import MemoryTable, ClientRow, TransactionRow, FileRow, RecordRow
+
+CURRENCIES = ["BRL", "USD", "EUR"]
+TRANSACTION_TYPES = ["transfer", "pix", "ted", "boleto"]
+STATUSES = ["pending", "processing", "completed", "failed", "cancelled"]
+FILE_TYPES = ["csv", "json", "xml"]
+
+
+def fresh(value):
+    """Cria uma nova string igual a ``value``, como acontece ao decodificar um JSON."""
+    return value.encode().decode()
+
+
+def make_client(i):
+    now = datetime.now()
+    return {
+        "id": str(uuid.uuid4()),
+        "name": f"Cliente {i}",
+        "email": f"cliente{i}@databridge.com",
+        "phone": f"+55 11 9{i:08d}",
+        "tax_id": f"{i:011d}",
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+def make_transaction(i):
+    now = datetime.now()
+    amount = round(random.uniform(1, 20000), 2)
+    if amount > 10000:
+        routing = {"route": fresh("high_value"), "priority": fresh("high")}
+    else:
+        routing = {"route": fresh("standard"), "priority": fresh("normal")}
+    return {
+        "id": str(uuid.uuid4()),
+        "origin_account": f"{i % 50000:06d}-1",
+        "destination_account": f"{(i * 7) % 50000:06d}-2",
+        "amount": amount,
+        "currency": fresh(random.choice(CURRENCIES)),
+        "transaction_type": fresh(random.choice(TRANSACTION_TYPES)),
+        "description": None,
+        "reference_id": None,
+        "status": fresh(random.choice(STATUSES)),
+        "routing_info": routing,
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+def make_file(i):
+    return {
+        "id": str(uuid.uuid4()),
+        "filename": f"lote_{i}.csv",
+        "file_type": fresh(random.choice(FILE_TYPES)),
+        "status": fresh("processed"),
+        "created_at": datetime.now(),
+        "processed_at": datetime.now()
+    }
+
+
+def make_record_factory():
+    file_id = str(uuid.uuid4())
+
+    def make_record(i):
+        nonlocal file_id
+        if i % 1000 == 0:
+            file_id = str(uuid.uuid4())
+        return {
+            "id": str(uuid.uuid4()),
+            "file_id": fresh(file_id),
+            "record_type": fresh(f"record_type_{i % 3 + 1}"),
+            "content": f'{{"field1": "value{i}", "field2": {i % 100}, "amount": {i % 10000}}}',
+            "status": fresh("processed"),
+            "created_at": datetime.now()
+        }
+    return make_record
+
+
+ENTITIES = {
+    "clients": (make_client, ClientRow, ()),
+    "transactions": (make_transaction, TransactionRow, ("status", "transaction_type")),
+    "files": (make_file, FileRow, ("status", "file_type")),
+    "records": (make_record_factory(), RecordRow, ("file_id", "record_type")),
+}
+
+
+def measure(build, rows):
+    """Executa ``build`` e devolve (bytes por linha, segundos)."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    store = build(rows)
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    gc.collect()
+    return current / rows, elapsed
+
+
+def benchmark_entity(name, rows, seed):
+    factory, row_type, indexed_fields = ENTITIES[name]
+
+    def build_dicts(count):
+        random.seed(seed)
+        store = {}
+        for i in range(count):
+            data = factory(i)
+            store[data["id"]] = data
+        return store
+
+    def build_compact(count):
+        random.seed(seed)
+        table = MemoryTable(row_type, indexed_fields=indexed_fields)
+        for i in range(count):
+            table.insert(factory(i))
+        return table
+
+    dict_bytes, dict_seconds = measure(build_dicts, rows)
+    compact_bytes, compact_seconds = measure(build_compact, rows)
+    return {
+        "entity": name,
+        "rows": rows,
+        "dict_bytes_per_row": round(dict_bytes, 1),
+        "compact_bytes_per_row": round(compact_bytes, 1),
+        "reduction_pct": round(100 * (1 - compact_bytes / dict_bytes), 1),
+        "dict_build_seconds": round(dict_seconds, 2),
+        "compact_build_seconds": round(compact_seconds, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o consumo de memória dos layouts de linha")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="linhas por entidade")
+    parser.add_argument("--entities", nargs="+", choices=sorted(ENTITIES), default=list(ENTITIES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    results = [benchmark_entity(name, args.rows, args.seed) for name in args.entities]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\nMemória por linha ({args.rows:,} linhas por entidade, tabela compacta inclui índices)\n")
+    print(f"{'entidade':<14}{'dict (B/linha)':>16}{'compacta (B/linha)':>20}{'redução':>10}")
+    print("-" * 60)
+    for result in results:
+        print(f"{result['entity']:<14}{result['dict_bytes_per_row']:>16,.1f}"
+              f"{result['compact_bytes_per_row']:>20,.1f}{result['reduction_pct']:>9.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark do custo das métricas por requisição.
+Chama a aplicação ASGI diretamente (sem rede) em rodadas alternadas com a
+coleta ligada e desligada, num endpoint barato (/api/v1/health) e numa
+leitura de transação, e mostra a diferença de tempo por requisição, que é
+o que o middleware soma ao caminho da requisição. Como essa diferença
+fica perto do ruído de uma requisição inteira, mede também o middleware
+em volta de uma aplicação ASGI vazia, o registro de uma observação
+isolada e o tempo de gerar a página /metrics.
+
+Uso:
+    python benchmark_metricas.py
+    python benchmark_metricas.py --requests 20000 --rounds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABRIDGE_DB_MODE", "memory")
+
+import api_teste  # noqa: E402
+from benchmark_etag import call  # noqa: E402
+from metricas import MetricsMiddleware, MetricsRegistry  # noqa: E402
+
+
+async def timed(path, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        await call(api_teste.app, "GET", path)
+    return (time.perf_counter() - started) * 1e6 / requests
+
+
+async def overhead(path, requests, rounds):
+    """Mediana, entre rodadas alternadas, do tempo por requisição com e sem a coleta."""
+    times = {True: [], False: []}
+    await timed(path, requests // 10)
+    for _ in range(rounds):
+        for enabled in (False, True):
+            api_teste.metrics.enabled = enabled
+            times[enabled].append(await timed(path, requests))
+    api_teste.metrics.enabled = True
+    without, with_metrics = statistics.median(times[False]), statistics.median(times[True])
+    return {"path": path, "without_us": round(without, 1), "with_us": round(with_metrics, 1),
+            "overhead_us": round(with_metrics - without, 1)}
+
+
+async def empty_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def middleware_cost(requests, rounds):
+    """Tempo por requisição de uma aplicação vazia, com e sem o middleware em volta (mediana das rodadas)."""
+    wrapped = MetricsMiddleware(empty_app, MetricsRegistry())
+    times = {empty_app: [], wrapped: []}
+    for _ in range(rounds):
+        for app in times:
+            started = time.perf_counter()
+            for _ in range(requests):
+                await call(app, "GET", "/api/v1/health")
+            times[app].append((time.perf_counter() - started) * 1e6 / requests)
+    return round(statistics.median(times[wrapped]) - statistics.median(times[empty_app]), 2)
+
+
+def observe_cost(samples):
+    registry = MetricsRegistry()
+    started = time.perf_counter()
+    for i in range(samples):
+        registry.observe("GET", "/api/v1/transactions/{transaction_id}", 200, i * 1e-6, 0, 300)
+    return (time.perf_counter() - started) * 1e9 / samples
+
+
+async def run(requests, rounds):
+    async with api_teste.lifespan(api_teste.app):
+        row = await api_teste.insert_transaction({
+            "origin_account": "000001-1", "destination_account": "000002-2", "amount": 100.0, "currency": "BRL",
+            "transaction_type": "pix", "description": None, "reference_id": "ref-1", "status": "pending",
+            "routing_info": {"route": "instant"}, "created_at": api_teste.datetime.now(),
+            "updated_at": api_teste.datetime.now(),
+        })
+        endpoints = [await overhead(path, requests, rounds)
+                     for path in ("/api/v1/health", f"/api/v1/transactions/{row['id']}")]
+        endpoints[1]["path"] = "/api/v1/transactions/{transaction_id}"
+        started = time.perf_counter()
+        page = await api_teste.metrics.render()
+        render_ms = (time.perf_counter() - started) * 1000
+    return {"requests": requests, "rounds": rounds, "endpoints": endpoints,
+            "middleware_us": await middleware_cost(requests * 4, rounds),
+            "observe_ns": round(observe_cost(200000), 1), "render_ms": round(render_ms, 3),
+            "render_bytes": len(page)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo do middleware de métricas por requisição")
+    parser.add_argument("--requests", type=int, default=5000, help="requisições por rodada")
+    parser.add_argument("--rounds", type=int, default=6)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.requests, args.rounds))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"\n{args.rounds} rodadas de {args.requests:,} requisições com e sem a coleta (mediana)\n")
+    print(f"{'endpoint':<44}{'sem':>10}{'com':>10}{'custo':>10}")
+    print("-" * 74)
+    for endpoint in result["endpoints"]:
+        print(f"{endpoint['path']:<44}{endpoint['without_us']:>8.1f}µs{endpoint['with_us']:>8.1f}µs"
+              f"{endpoint['overhead_us']:>8.1f}µs")
+    print(f"\nMiddleware em volta de uma aplicação vazia: {result['middleware_us']:.2f}µs por requisição")
+    print(f"Registro de uma observação: {result['observe_ns']:.0f}ns")
+    print(f"Página /metrics: {result['render_bytes']:,} bytes em {result['render_ms']:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
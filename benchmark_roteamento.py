@@ -0,0 +1,99 @@
+"""
+Microbenchmark do motor de regras de roteamento.
+Gera tabelas aleatórias com número crescente de regras (moeda, tipo, prefixo
+de conta e faixas de valor), confere que a tabela compilada decide igual à
+avaliação regra a regra e mede decisões por segundo das duas formas.
+
+Uso:
+    python benchmark_roteamento.py
+    python benchmark_roteamento.py --rules 10 100 1000 --decisions 200000
+"""
+import argparse
+import json
+import random
+import time
+
+from regras_roteamento import CompiledRoutingTable, decide_linear, parse_rules
+
+CURRENCIES = ["BRL", "USD", "EUR", "GBP", "JPY"]
+TRANSACTION_TYPES = ["transfer", "pix", "ted", "doc", "boleto", "card"]
+PREFIXES = ["0001", "0002", "0033", "0104", "0237", "0341", "7", "9"]
+
+
+def random_rule(rng, position):
+    rule = {"name": f"regra_{position}", "routing": {"route": f"rota_{position % 17}", "priority": "normal"}}
+    if rng.random() < 0.7:
+        rule["currency"] = rng.sample(CURRENCIES, rng.randint(1, 2))
+    if rng.random() < 0.7:
+        rule["transaction_type"] = rng.sample(TRANSACTION_TYPES, rng.randint(1, 3))
+    if rng.random() < 0.4:
+        rule["account_prefix"] = rng.choice(PREFIXES)
+    if rng.random() < 0.8:
+        low = rng.choice([0, 100, 500, 1000, 5000, 10000, 50000]) + rng.randint(0, 99)
+        rule["amount_gte" if rng.random() < 0.5 else "amount_gt"] = low
+        if rng.random() < 0.6:
+            rule["amount_lt" if rng.random() < 0.5 else "amount_lte"] = low + rng.randint(1, 20000)
+    return rule
+
+
+def random_transaction(rng):
+    return (
+        rng.choice(CURRENCIES + ["ARS"]),
+        rng.choice(TRANSACTION_TYPES + ["wire"]),
+        rng.choice(PREFIXES + ["5555"]) + f"{rng.randint(0, 999999):06d}",
+        float(rng.choice([rng.randint(1, 60000), 100, 1000, 5000, 10000])),
+    )
+
+
+def rate(function, transactions):
+    started = time.perf_counter()
+    for currency, transaction_type, account, amount in transactions:
+        function(currency, transaction_type, account, amount)
+    return len(transactions) / (time.perf_counter() - started)
+
+
+def benchmark(rule_count, decisions, seed):
+    rng = random.Random(seed)
+    rules, default = parse_rules({"rules": [random_rule(rng, i) for i in range(rule_count)]})
+
+    started = time.perf_counter()
+    table = CompiledRoutingTable(rules, default)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    transactions = [random_transaction(rng) for _ in range(decisions)]
+    for transaction in transactions[:5000]:
+        if table.decide(*transaction) is not decide_linear(rules, default, *transaction):
+            raise AssertionError(f"Decisão divergente para {transaction}")
+
+    return {
+        "rules": rule_count,
+        "compile_ms": round(compile_ms, 1),
+        "compiled_decisions_per_second": round(rate(table.decide, transactions)),
+        "linear_decisions_per_second": round(rate(lambda *t: decide_linear(rules, default, *t), transactions)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decisões de roteamento por segundo conforme o número de regras")
+    parser.add_argument("--rules", nargs="+", type=int, default=[1, 10, 50, 100, 250, 500])
+    parser.add_argument("--decisions", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    results = [benchmark(count, args.decisions, args.seed) for count in args.rules]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\nDecisões de roteamento por segundo ({args.decisions:,} transações aleatórias)\n")
+    print(f"{'regras':>7}{'compilação':>13}{'compilada/s':>15}{'linear/s':>13}{'ganho':>8}")
+    print("-" * 56)
+    for result in results:
+        speedup = result["compiled_decisions_per_second"] / result["linear_decisions_per_second"]
+        print(f"{result['rules']:>7}{result['compile_ms']:>11.1f}ms{result['compiled_decisions_per_second']:>15,}"
+              f"{result['linear_decisions_per_second']:>13,}{speedup:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
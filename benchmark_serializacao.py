@@ -0,0 +1,97 @@
+"""
+Benchmark do caminho rápido de serialização das listagens.
+Popula o repositório em memória com transações e mede, em processo (via
+transporte ASGI do httpx), a latência de GET /api/v1/transactions para
+páginas de 100, 1.000 e 10.000 linhas com e sem o caminho rápido.
+
+Uso:
+    python benchmark_serializacao.py
+    python benchmark_serializacao.py --sizes 100 1000 10000 --repeat 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABRIDGE_DB_MODE", "memory")
+
+import httpx
+
+import api_teste
+import serializacao
+
+
+def transaction_payload(i):
+    return {
+        "origin_account": f"{i:06d}-1",
+        "destination_account": f"{i * 7 % 100000:06d}-2",
+        "amount": 50 + (i % 20000),
+        "currency": "BRL",
+        "transaction_type": "pix" if i % 2 else "transfer",
+        "description": f"Pagamento {i}"
+    }
+
+
+async def populate(client, rows):
+    body = "".join(json.dumps(transaction_payload(i)) + "\n" for i in range(rows))
+    response = await client.post("/api/v1/transactions/batch", content=body.encode())
+    response.raise_for_status()
+
+
+async def measure(client, size, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get("/api/v1/transactions", params={"limit": size})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies), statistics.quantiles(latencies, n=20)[-1]
+
+
+async def run(sizes, repeat):
+    transport = httpx.ASGITransport(app=api_teste.app)
+    results = []
+    async with api_teste.lifespan(api_teste.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await populate(client, max(sizes))
+            for size in sizes:
+                serializacao.FAST_PATH_ENDPOINTS.discard("list_transactions")
+                before = await measure(client, size, repeat)
+                serializacao.FAST_PATH_ENDPOINTS.add("list_transactions")
+                after = await measure(client, size, repeat)
+                results.append({
+                    "rows": size,
+                    "validated_p50_ms": round(before[0], 2),
+                    "validated_p95_ms": round(before[1], 2),
+                    "fast_p50_ms": round(after[0], 2),
+                    "fast_p95_ms": round(after[1], 2),
+                    "speedup": round(before[0] / after[0], 2),
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência das listagens com e sem o caminho rápido")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.sizes, args.repeat))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    encoder = "orjson" if serializacao.orjson is not None else "json"
+    print(f"\nGET /api/v1/transactions, {args.repeat} repetições por tamanho (codificador: {encoder})\n")
+    print(f"{'linhas':>8}{'validado p50':>15}{'rápido p50':>13}{'validado p95':>15}{'rápido p95':>13}{'ganho':>8}")
+    print("-" * 72)
+    for result in results:
+        print(f"{result['rows']:>8}{result['validated_p50_ms']:>13.2f}ms{result['fast_p50_ms']:>11.2f}ms"
+              f"{result['validated_p95_ms']:>13.2f}ms{result['fast_p95_ms']:>11.2f}ms{result['speedup']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark da partida a partir do snapshot mapeado.
+Gera direto no formato colunar um snapshot com N transações sintéticas
+(sem passar pela API, para não precisar de todas as linhas em memória),
+e mede o tempo até o repositório estar pronto para atender, o consumo de
+memória depois da partida e a latência das primeiras leituras e escritas
+servidas a partir do arquivo mapeado.
+
+Uso:
+    python benchmark_snapshot_mapeado.py
+    python benchmark_snapshot_mapeado.py --rows 10000000 --keep /tmp/snapshot-10m
+"""
+import argparse
+import asyncio
+import json
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from armazenamento_memoria import TransactionRow, encode_datetime, encode_nested
+from persistencia import MemoryPersistence, _snapshot_name
+from repositorios import TRANSACTIONS, MemoryRepository
+from snapshot_mapeado import MappedSnapshotWriter
+
+try:
+    import resource
+except ImportError:  # indisponível no Windows
+    resource = None
+
+STATUSES = ("pending", "processing", "completed", "failed", "cancelled")
+
+
+def synthetic_id(i):
+    return f"00000000-0000-4000-8000-{i:012d}"
+
+
+def synthetic_rows(rows):
+    """Linhas (sequência, valores internos) de TransactionRow, sem criar objetos de linha."""
+    created = encode_datetime(datetime(2024, 1, 1))
+    routing = (encode_nested({"route": "standard", "priority": "normal"}),
+               encode_nested({"route": "high_value", "priority": "high"}))
+    for i in range(rows):
+        amount = float(50 + i * 7919 % 20000)
+        yield i, (
+            synthetic_id(i), f"{i % 1000000:06d}-1", f"{i * 7 % 1000000:06d}-2", amount, "BRL",
+            "pix" if i % 2 else "transfer", f"Pagamento {i}", None, STATUSES[i % 5],
+            routing[amount > 10000], created + i * 1000000, None,
+        )
+
+
+def write_snapshot(directory, rows):
+    started = time.perf_counter()
+    path = directory / _snapshot_name(0)
+    writer = MappedSnapshotWriter(path, 0)
+    writer.add_rows(TRANSACTIONS, TransactionRow, ("status", "transaction_type"), synthetic_rows(rows))
+    size = writer.close()
+    return time.perf_counter() - started, size
+
+
+def timed(function, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - started) * 1000 / repeat, result
+
+
+def rss_mb():
+    """Memória residente atual (Linux); nos demais sistemas, o pico informado por getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except (OSError, AttributeError):
+        pass
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    return usage / 2 ** 20 if sys.platform == "darwin" else usage / 1024
+
+
+async def run(rows, directory):
+    repository = MemoryRepository(MemoryPersistence(directory, snapshot_interval=0))
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    await repository.connect()
+    ready_seconds = time.perf_counter() - started
+    rss_after = rss_mb()
+
+    table = repository.tables[TRANSACTIONS]
+    middle = synthetic_id(rows // 2)
+    get_ms, row = timed(lambda: table.get(middle), repeat=1000)
+    assert row["id"] == middle
+    page_ms, page = timed(lambda: table.find({}, limit=100), repeat=100)
+    filtered_ms, _ = timed(lambda: table.find({"status": "completed", "transaction_type": "pix"}, limit=100,
+                                              after=rows // 2), repeat=100)
+    # A primeira alteração de um status copia a lista de sequências daquele valor para a memória
+    first_update_ms, _ = timed(lambda: table.update(middle, status="completed"))
+    update_ms, _ = timed(lambda: table.update(synthetic_id(rows // 3), amount=1.0), repeat=1)
+    count_ms, completed = timed(lambda: table.count("status", "completed"))
+
+    result = {
+        "rows": len(table),
+        "ready_seconds": round(ready_seconds, 3),
+        "rss_growth_mb": round(rss_after - rss_before, 1),
+        "get_by_id_ms": round(get_ms, 4),
+        "list_page_100_ms": round(page_ms, 3),
+        "filtered_page_100_ms": round(filtered_ms, 3),
+        "first_update_ms": round(first_update_ms, 2),
+        "update_ms": round(update_ms, 3),
+        "count_ms": round(count_ms, 4),
+        "completed": completed,
+    }
+    await repository.persistence.close(snapshot=False)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de partida a partir do snapshot mapeado")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--keep", type=Path, help="diretório para guardar (e reaproveitar) o snapshot gerado")
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    directory = args.keep or Path(tempfile.mkdtemp(prefix="databridge-map-"))
+    directory.mkdir(parents=True, exist_ok=True)
+    try:
+        write_seconds = size = None
+        if not (directory / _snapshot_name(0)).exists():
+            write_seconds, size = write_snapshot(directory, args.rows)
+        result = asyncio.run(run(args.rows, directory))
+        result["snapshot_write_seconds"] = None if write_seconds is None else round(write_seconds, 1)
+        result["snapshot_bytes"] = (directory / _snapshot_name(0)).stat().st_size
+    finally:
+        if args.keep is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"\nPartida a partir do snapshot mapeado: {result['rows']:,} transações "
+          f"({result['snapshot_bytes'] / 2 ** 20:,.0f} MiB)\n")
+    if result["snapshot_write_seconds"] is not None:
+        print(f"{'geração do snapshot':<36}{result['snapshot_write_seconds']:>12.1f}s")
+    print(f"{'pronto para atender':<36}{result['ready_seconds']:>12.3f}s")
+    print(f"{'memória adicional na partida':<36}{result['rss_growth_mb']:>10.1f}MiB")
+    print(f"{'busca por id':<36}{result['get_by_id_ms']:>11.4f}ms")
+    print(f"{'página de 100 sem filtro':<36}{result['list_page_100_ms']:>11.3f}ms")
+    print(f"{'página de 100 com filtros e cursor':<36}{result['filtered_page_100_ms']:>11.3f}ms")
+    print(f"{'primeira alteração de status':<36}{result['first_update_ms']:>11.2f}ms")
+    print(f"{'alteração seguinte':<36}{result['update_ms']:>11.3f}ms")
+    print(f"{'contagem por status (índice)':<36}{result['count_ms']:>11.4f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark do upload de arquivos em fluxo.
+Gera um arquivo CSV, JSON ou XML sintético do tamanho pedido, bloco a bloco
+(sem montá-lo em memória), e envia como multipart/form-data para a API no
+mesmo processo. Mede a taxa de leitura informada pela própria API, quantos
+registros foram gravados e o crescimento da memória residente durante o
+upload. Por padrão os registros vão para um SQLite temporário, para que a
+memória medida seja só a do caminho de ingestão.
+
+Uso:
+    python benchmark_upload.py
+    python benchmark_upload.py --format xml --megabytes 2048 --chunk-size 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BOUNDARY = "databridge-benchmark-boundary"
+BLOCK_BYTES = 64 * 1024
+
+
+def csv_rows():
+    yield "id,origin_account,destination_account,amount,currency,description\r\n"
+    i = 0
+    while True:
+        yield f'{i},{i:06d}-1,{i * 7 % 100000:06d}-2,{50 + i % 20000}.00,BRL,"Pagamento {i}, lote {i // 1000}"\r\n'
+        i += 1
+
+
+def json_rows():
+    yield "["
+    i = 0
+    while True:
+        item = json.dumps({"id": i, "origin_account": f"{i:06d}-1", "amount": 50 + i % 20000,
+                           "currency": "BRL", "tags": ["pix", f"lote-{i // 1000}"]})
+        yield item if i == 0 else "," + item
+        i += 1
+
+
+def xml_rows():
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<transactions>\n'
+    i = 0
+    while True:
+        yield (f'  <transaction id="{i}"><origin>{i:06d}-1</origin><amount currency="BRL">'
+               f'{50 + i % 20000}</amount><description>Pagamento {i}</description></transaction>\n')
+        i += 1
+
+
+# Gerador de linhas e o fechamento do documento para cada formato
+GENERATORS = {"csv": (csv_rows, ""), "json": (json_rows, "]"), "xml": (xml_rows, "</transactions>\n")}
+
+
+async def multipart_body(file_format, total_bytes):
+    """Corpo multipart com um único arquivo de ~``total_bytes``, em blocos de 64 KiB."""
+    rows, closing = GENERATORS[file_format]
+    yield (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"files\"; "
+           f"filename=\"carga.{file_format}\"\r\n\r\n").encode()
+    block, sent = [], 0
+    block_size = 0
+    for row in rows():
+        data = row.encode()
+        block.append(data)
+        block_size += len(data)
+        if block_size >= BLOCK_BYTES:
+            yield b"".join(block)
+            sent += block_size
+            block, block_size = [], 0
+            if sent >= total_bytes:
+                break
+    yield b"".join(block) + closing.encode() + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, AttributeError, ValueError):
+        return 0.0
+
+
+async def run(file_format, megabytes, chunk_size):
+    import api_teste
+
+    peak = 0.0
+    sampling = True
+
+    async def sample():
+        nonlocal peak
+        while sampling:
+            peak = max(peak, rss_mb())
+            await asyncio.sleep(0.05)
+
+    async with api_teste.lifespan(api_teste.app):
+        transport = httpx.ASGITransport(app=api_teste.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://databridge", timeout=None) as client:
+            rss_before = peak = rss_mb()
+            sampler = asyncio.create_task(sample())
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/v1/files/upload",
+                params={"chunk_size": chunk_size},
+                content=multipart_body(file_format, megabytes * 2 ** 20),
+                headers={"content-type": f"multipart/form-data; boundary={BOUNDARY}"},
+            )
+            elapsed = time.perf_counter() - started
+            sampling = False
+            await sampler
+            peak = max(peak, rss_mb())
+            response.raise_for_status()
+            result = response.json()[0]
+
+    return {
+        "format": file_format,
+        "megabytes": round(result["bytes"] / 2 ** 20, 1),
+        "status": result["status"],
+        "records": result["records"],
+        "rejected": result["rejected"],
+        "seconds": round(elapsed, 2),
+        "records_per_second": result["records_per_second"],
+        "megabytes_per_second": result["megabytes_per_second"],
+        "rss_growth_mb": round(peak - rss_before, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Taxa e memória do upload de arquivos em fluxo")
+    parser.add_argument("--format", choices=sorted(GENERATORS), nargs="+", default=["csv", "json", "xml"])
+    parser.add_argument("--megabytes", type=int, default=100, help="tamanho aproximado de cada arquivo")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="registros por gravação")
+    parser.add_argument("--db-mode", choices=["sqlite", "memory"], default="sqlite")
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp(prefix="databridge-upload-"))
+    os.environ["DATABRIDGE_DB_MODE"] = args.db_mode
+    os.environ["DATABRIDGE_SQLITE_PATH"] = str(directory / "databridge.db")
+    try:
+        results = [asyncio.run(run(file_format, args.megabytes, args.chunk_size)) for file_format in args.format]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\nUpload em fluxo de ~{args.megabytes} MiB por arquivo, lotes de {args.chunk_size}, "
+          f"registros em {args.db_mode}\n")
+    print(f"{'formato':<9}{'MiB':>8}{'registros':>12}{'segundos':>10}{'registros/s':>13}{'MiB/s':>8}"
+          f"{'memória':>12}{'status':>11}")
+    print("-" * 83)
+    for result in results:
+        print(f"{result['format']:<9}{result['megabytes']:>8,.1f}{result['records']:>12,}{result['seconds']:>10.2f}"
+              f"{result['records_per_second']:>13,.0f}{result['megabytes_per_second']:>8.2f}"
+              f"{result['rss_growth_mb']:>9.1f}MiB{result['status']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark de requisições por segundo com 1 a N workers do uvicorn.
+Para cada quantidade de workers sobe a API num processo à parte com o
+estado no SQLite compartilhado (modo WAL), popula transações e dispara uma
+carga mista de leituras por id, listagens e criações a partir de vários
+processos geradores de carga, por HTTP de verdade. Ao final confere a
+consistência entre os workers: toda transação criada precisa ser lida de
+volta e a contagem total precisa bater.
+
+Uso:
+    python benchmark_workers.py
+    python benchmark_workers.py --workers 1 2 4 8 --duration 15 --connections 64
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).parent
+
+
+def transaction_payload(i):
+    return {
+        "origin_account": f"{i:06d}-1",
+        "destination_account": f"{i * 7 % 100000:06d}-2",
+        "amount": 50 + (i % 20000),
+        "currency": "BRL",
+        "transaction_type": "pix" if i % 2 else "transfer",
+        "description": f"Pagamento {i}"
+    }
+
+
+def start_server(workers, port, database):
+    env = dict(os.environ, DATABRIDGE_DB_MODE="sqlite", DATABRIDGE_SQLITE_PATH=str(database),
+               DATABRIDGE_WORKERS=str(workers))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_teste:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"A API não respondeu na porta {port}")
+
+
+def seed(base_url, rows):
+    body = "".join(json.dumps(transaction_payload(i)) + "\n" for i in range(rows))
+    response = httpx.post(f"{base_url}/api/v1/transactions/batch", content=body.encode(), timeout=120)
+    response.raise_for_status()
+    return rows
+
+
+async def _load(base_url, connections, duration, seeded, write_ratio, list_ratio, seed_value):
+    rng = random.Random(seed_value)
+    latencies, created, errors = [], [], 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def user():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                choice = rng.random()
+                started = time.perf_counter()
+                try:
+                    if choice < write_ratio:
+                        response = await client.post("/api/v1/transactions",
+                                                     json=transaction_payload(rng.randrange(10 ** 6)))
+                        if response.is_success:
+                            created.append(response.json()["id"])
+                    elif choice < write_ratio + list_ratio:
+                        response = await client.get("/api/v1/transactions", params={"limit": 20})
+                    else:
+                        response = await client.get(f"/api/v1/transactions/{rng.randint(1, seeded)}")
+                    if not response.is_success:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(user() for _ in range(connections)))
+    return latencies, created, errors
+
+
+def load_process(args):
+    return asyncio.run(_load(*args))
+
+
+def check_consistency(base_url, expected_total, created, sample=200):
+    """Lê de volta (por conexões novas, em qualquer worker) as transações criadas e conta o total."""
+    missing = 0
+    for transaction_id in random.sample(created, min(sample, len(created))):
+        with httpx.Client(base_url=base_url) as client:
+            if not client.get(f"/api/v1/transactions/{transaction_id}").is_success:
+                missing += 1
+    response = httpx.get(f"{base_url}/api/v1/transactions/export", params={"format": "ndjson"}, timeout=120)
+    total = sum(1 for line in response.text.splitlines() if line)
+    return missing == 0 and total == expected_total, total
+
+
+def benchmark(workers, args):
+    with tempfile.TemporaryDirectory(prefix="databridge-workers-") as directory:
+        database = Path(directory) / "databridge.db"
+        server = start_server(workers, args.port, database)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            seeded = seed(base_url, args.seed_rows)
+            per_process = max(1, args.connections // args.load_processes)
+            jobs = [(base_url, per_process, args.duration, seeded, args.write_ratio, args.list_ratio, i)
+                    for i in range(args.load_processes)]
+            started = time.perf_counter()
+            with multiprocessing.Pool(args.load_processes) as pool:
+                results = pool.map(load_process, jobs)
+            elapsed = time.perf_counter() - started
+
+            latencies = sorted(latency for result in results for latency in result[0])
+            created = [transaction_id for result in results for transaction_id in result[1]]
+            errors = sum(result[2] for result in results)
+            consistent, total = check_consistency(base_url, seeded + len(created), created)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed),
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+        "errors": errors,
+        "created": len(created),
+        "total_transactions": total,
+        "consistent": consistent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Requisições por segundo com 1 a N workers sobre SQLite compartilhado")
+    cpus = os.cpu_count() or 1
+    parser.add_argument("--workers", nargs="+", type=int,
+                        default=sorted({1, 2, 4, cpus} & set(range(1, cpus + 1))) or [1])
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos de carga por rodada")
+    parser.add_argument("--connections", type=int, default=32, help="conexões simultâneas no total")
+    parser.add_argument("--load-processes", type=int, default=max(1, cpus // 2), help="processos geradores de carga")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="fração de criações de transação")
+    parser.add_argument("--list-ratio", type=float, default=0.2, help="fração de listagens")
+    parser.add_argument("--seed-rows", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    results = [benchmark(workers, args) for workers in args.workers]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\nCarga mista ({args.write_ratio:.0%} criações, {args.list_ratio:.0%} listagens, restante leituras "
+          f"por id), {args.connections} conexões, {args.duration:.0f}s por rodada, {cpus} CPUs\n")
+    print(f"{'workers':>8}{'req/s':>10}{'p50':>10}{'p99':>10}{'erros':>8}{'criadas':>9}{'consistente':>13}")
+    print("-" * 68)
+    for result in results:
+        print(f"{result['workers']:>8}{result['requests_per_second']:>10,}{result['p50_ms']:>8.2f}ms"
+              f"{result['p99_ms']:>8.2f}ms{result['errors']:>8}{result['created']:>9}"
+              f"{'sim' if result['consistent'] else 'NÃO':>13}")
+
+
+if __name__ == "__main__":
+    main()
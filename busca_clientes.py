@@ -0,0 +1,263 @@
+"""
+Busca de clientes do DataBridge Bank por nome, e-mail, CPF/CNPJ e telefone.
+Nomes e e-mails viram termos normalizados (minúsculas, sem acentos) num
+índice invertido termo -> clientes, e o vocabulário fica ordenado para que
+o último termo da busca seja tratado como prefixo enquanto a pessoa digita.
+CPF/CNPJ e telefone, só com os dígitos, têm busca exata por hash. O índice
+é montado na primeira busca e mantido a cada criação, alteração e remoção
+de cliente.
+"""
+import asyncio
+import re
+import sys
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+_TOKEN = re.compile(r"\w+")
+_NON_DIGIT = re.compile(r"\D")
+# Busca só com dígitos (e pontuação) a partir deste tamanho também consulta CPF/CNPJ e telefone
+MIN_EXACT_DIGITS = 8
+
+
+def normalize(text: Optional[str]) -> str:
+    """Minúsculas e sem acentos, para "João" e "joao" caírem no mesmo termo."""
+    if not text:
+        return ""
+    text = text.casefold()
+    if text.isascii():
+        return text
+    return "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(normalize(text))
+
+
+def digits(text: Optional[str]) -> str:
+    return _NON_DIGIT.sub("", text) if text else ""
+
+
+class SortedTokens:
+    """Vocabulário ordenado em blocos, com inserção barata e varredura por prefixo.
+
+    Faz o papel da árvore de prefixos com muito menos memória: os termos
+    que começam com um prefixo são um intervalo contíguo da ordem
+    alfabética, achado por busca binária.
+    """
+
+    LOAD = 1024
+
+    def __init__(self):
+        self._blocks: List[List[str]] = []
+        self._maxes: List[str] = []
+
+    def add(self, token: str) -> None:
+        if not self._blocks:
+            self._blocks.append([token])
+            self._maxes.append(token)
+            return
+        position = min(bisect_left(self._maxes, token), len(self._blocks) - 1)
+        block = self._blocks[position]
+        insort(block, token)
+        self._maxes[position] = block[-1]
+        if len(block) > 2 * self.LOAD:
+            self._blocks.insert(position + 1, block[self.LOAD:])
+            del block[self.LOAD:]
+            self._maxes.insert(position, block[-1])
+
+    def remove(self, token: str) -> None:
+        position = bisect_left(self._maxes, token)
+        if position == len(self._blocks):
+            return
+        block = self._blocks[position]
+        index = bisect_left(block, token)
+        if index < len(block) and block[index] == token:
+            del block[index]
+            if block:
+                self._maxes[position] = block[-1]
+            else:
+                del self._blocks[position]
+                del self._maxes[position]
+
+    def with_prefix(self, prefix: str) -> Iterator[str]:
+        """Termos que começam com ``prefix``, em ordem alfabética."""
+        position = bisect_left(self._maxes, prefix)
+        if position == len(self._blocks):
+            return
+        index = bisect_left(self._blocks[position], prefix)
+        for block in self._blocks[position:]:
+            for token in block[index:]:
+                if not token.startswith(prefix):
+                    return
+                yield token
+            index = 0
+
+
+class ClientSearchIndex:
+    """Índice de busca de clientes, montado sob demanda e mantido pelas escritas.
+
+    Cada cliente ganha um número interno crescente; as listas de clientes
+    por termo ficam ordenadas por ele, então as interseções percorrem a
+    menor lista em ordem e param ao completar o limite. Como nos agregados
+    de transações, durante a montagem só entram as escritas em clientes
+    que a varredura do repositório já passou.
+    """
+
+    def __init__(self, page_size: int = 5000):
+        self.page_size = page_size
+        self.ready = False
+        self._scan_key: Optional[Any] = None
+        self._lock = asyncio.Lock()
+        self._next_doc = 0
+        self._docs: Dict[str, Tuple[int, Tuple[str, ...], str, str]] = {}
+        self._client_ids: Dict[int, str] = {}
+        self._postings: Dict[str, List[int]] = {}
+        self._vocabulary = SortedTokens()
+        # Quase sempre um cliente por CPF/CNPJ ou telefone: guarda o número e só vira lista se repetir
+        self._exact: Dict[str, Dict[str, Union[int, List[int]]]] = {"tax_id": {}, "phone": {}}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _applies(self, key: Any) -> bool:
+        return self.ready or (self._scan_key is not None and key <= self._scan_key)
+
+    def _index(self, row: Dict[str, Any], doc: Optional[int] = None) -> None:
+        if doc is None:
+            doc = self._next_doc
+            self._next_doc += 1
+        # Termos compartilhados entre os clientes (sys.intern), em vez de uma cópia por cliente
+        terms = dict.fromkeys(tokenize(row.get("name")) + tokenize(row.get("email")))
+        tokens = tuple(sys.intern(token) for token in terms)
+        tax_id, phone = digits(row.get("tax_id")), digits(row.get("phone"))
+        self._docs[row["id"]] = (doc, tokens, tax_id, phone)
+        self._client_ids[doc] = row["id"]
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                self._postings[token] = [doc]
+                self._vocabulary.add(token)
+            elif posting[-1] < doc:
+                posting.append(doc)
+            else:
+                insort(posting, doc)
+        for field, value in (("tax_id", tax_id), ("phone", phone)):
+            if value:
+                current = self._exact[field].get(value)
+                if current is None:
+                    self._exact[field][value] = doc
+                elif isinstance(current, int):
+                    self._exact[field][value] = sorted((current, doc))
+                else:
+                    insort(current, doc)
+
+    def _unindex(self, client_id: str) -> Optional[int]:
+        entry = self._docs.pop(client_id, None)
+        if entry is None:
+            return None
+        doc, tokens, tax_id, phone = entry
+        del self._client_ids[doc]
+        for token in tokens:
+            posting = self._postings[token]
+            del posting[bisect_left(posting, doc)]
+            if not posting:
+                del self._postings[token]
+                self._vocabulary.remove(token)
+        for field, value in (("tax_id", tax_id), ("phone", phone)):
+            if value:
+                current = self._exact[field][value]
+                if isinstance(current, int):
+                    del self._exact[field][value]
+                else:
+                    current.remove(doc)
+                    if len(current) == 1:
+                        self._exact[field][value] = current[0]
+        return doc
+
+    def created(self, row: Dict[str, Any], key: Any) -> None:
+        if self._applies(key):
+            self._index(row)
+
+    def updated(self, row: Dict[str, Any], key: Any) -> None:
+        if self._applies(key):
+            self._index(row, self._unindex(row["id"]))
+
+    def deleted(self, client_id: str) -> None:
+        self._unindex(client_id)
+
+    def _exact_docs(self, field: str, number: str) -> List[int]:
+        current = self._exact[field].get(number)
+        if current is None:
+            return []
+        return [current] if isinstance(current, int) else list(current)
+
+    async def ensure_ready(self, repository, entity: str) -> None:
+        """Monta o índice na primeira chamada, em páginas, cedendo o event loop entre elas."""
+        if self.ready:
+            return
+        async with self._lock:
+            if self.ready:
+                return
+            after = None
+            while True:
+                page = await repository.find(entity, {}, limit=self.page_size, after=after)
+                for row in page.rows:
+                    if row["id"] not in self._docs:
+                        self._index(row)
+                if page.next_key is None:
+                    break
+                after = self._scan_key = page.next_key
+                await asyncio.sleep(0)
+            self.ready = True
+
+    def _matching_docs(self, exact: List[str], prefix: Optional[str], limit: int) -> List[int]:
+        if exact:
+            postings = [self._postings.get(token) for token in exact]
+            if not all(postings):
+                return []
+            postings.sort(key=len)
+            smallest, others = postings[0], postings[1:]
+            found = []
+            for doc in smallest:
+                if all(_contains(posting, doc) for posting in others) and (
+                        prefix is None or any(token.startswith(prefix)
+                                              for token in self._docs[self._client_ids[doc]][1])):
+                    found.append(doc)
+                    if len(found) == limit:
+                        break
+            return found
+        found, seen = [], set()
+        for token in self._vocabulary.with_prefix(prefix):
+            for doc in self._postings[token]:
+                if doc not in seen:
+                    seen.add(doc)
+                    found.append(doc)
+                    if len(found) == limit:
+                        return found
+        return found
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """Ids dos clientes que atendem a busca, até ``limit``.
+
+        Todos os termos precisam aparecer no nome ou e-mail, sendo o último
+        aceito como prefixo. Uma busca que é só um número (com pontuação)
+        também encontra o CPF/CNPJ ou o telefone exato, e esses vêm primeiro.
+        """
+        docs: List[int] = []
+        number = digits(query)
+        if len(number) >= MIN_EXACT_DIGITS and not any(char.isalpha() for char in query):
+            for field in ("tax_id", "phone"):
+                docs.extend(doc for doc in self._exact_docs(field, number) if doc not in docs)
+        tokens = tokenize(query)
+        if tokens and len(docs) < limit:
+            seen = set(docs)
+            for doc in self._matching_docs(tokens[:-1], tokens[-1], limit + len(docs)):
+                if doc not in seen:
+                    docs.append(doc)
+        return [self._client_ids[doc] for doc in docs[:limit]]
+
+
+def _contains(posting: List[int], doc: int) -> bool:
+    position = bisect_left(posting, doc)
+    return position < len(posting) and posting[position] == doc
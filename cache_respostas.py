@@ -0,0 +1,176 @@
+"""
+Cache de respostas das listagens da API do DataBridge Bank.
+Guarda os bytes já codificados de cada página, pela chave endpoint +
+parâmetros normalizados (filtros ativos, skip, limit, cursor e where). As
+entradas ficam agrupadas pela combinação de filtros da entidade, e cada
+escrita informa as versões das linhas que tocou: só os grupos cujos
+filtros essas linhas atendem são descartados (mudar o status de uma
+transação de pending para completed não apaga as páginas de failed). O
+tamanho total é limitado e, cheio, o cache descarta as entradas usadas há
+mais tempo.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Mapping, Optional, Set, Tuple
+
+from fastapi.responses import Response
+
+Filters = Tuple[Tuple[str, Any], ...]
+
+# Cabeçalhos que o Response recalcula a partir do corpo
+_COMPUTED_HEADERS = ("content-length", "content-type")
+
+
+class CachedPage:
+    """Corpo codificado de uma página, os cabeçalhos dela e o grupo de invalidação."""
+
+    __slots__ = ("body", "headers", "entity", "filters", "expires", "size")
+
+    def __init__(self, body: bytes, headers: Dict[str, str], entity: str, filters: Filters,
+                 expires: Optional[float]):
+        self.body = body
+        self.headers = headers
+        self.entity = entity
+        self.filters = filters
+        self.expires = expires
+        # Corpo mais uma estimativa fixa para a chave e o próprio objeto
+        self.size = len(body) + 256
+
+
+def _matches(filters: Filters, row: Mapping[str, Any]) -> bool:
+    # Campo ausente na linha informada conta como possível: a invalidação erra para o lado seguro
+    return all(field not in row or row[field] == value for field, value in filters)
+
+
+class ResponseCache:
+    """Cache LRU de páginas codificadas, limitado por ``max_bytes``.
+
+    ``ttl_seconds`` limita a idade das entradas; é o que cobre escritas que
+    este processo não vê (outros programas gravando no mesmo banco). Uma
+    leitura que cruzou com uma escrita na mesma entidade não é guardada:
+    ``version`` é lido antes da consulta e conferido em ``put``.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 2 ** 20, ttl_seconds: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, CachedPage]" = OrderedDict()
+        self._groups: Dict[str, Dict[Filters, Set[tuple]]] = {}
+        self._versions: Dict[str, int] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def normalize_filters(filters: Mapping[str, Any]) -> Filters:
+        return tuple(sorted((field, value) for field, value in filters.items() if value is not None))
+
+    def key(self, endpoint: str, filters: Mapping[str, Any], **params: Any) -> tuple:
+        """Chave da página: parâmetros vazios e a ordem em que vieram não mudam a chave."""
+        return (endpoint, self.normalize_filters(filters), tuple(sorted(params.items())))
+
+    def version(self, entity: str) -> int:
+        return self._versions.get(entity, 0)
+
+    def get(self, key: tuple) -> Optional[Response]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires is not None and entry.expires <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return Response(entry.body, media_type="application/json", headers=entry.headers)
+
+    def put(self, key: tuple, entity: str, filters: Mapping[str, Any], response: Any, version: int) -> None:
+        """Guarda a resposta codificada, se ela for bytes e nenhuma escrita na entidade cruzou a leitura."""
+        if not isinstance(response, Response) or self.version(entity) != version:
+            return
+        body = bytes(response.body)
+        if len(body) + 256 > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        headers = {name: value for name, value in response.headers.items() if name not in _COMPUTED_HEADERS}
+        expires = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        entry = CachedPage(body, headers, entity, self.normalize_filters(filters), expires)
+        self._entries[key] = entry
+        self._groups.setdefault(entity, {}).setdefault(entry.filters, set()).add(key)
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: tuple) -> None:
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        groups = self._groups[entry.entity]
+        keys = groups[entry.filters]
+        keys.discard(key)
+        if not keys:
+            del groups[entry.filters]
+
+    def invalidate(self, entity: str, *rows: Mapping[str, Any]) -> None:
+        """Descarta as páginas da entidade que as linhas (antes e depois da escrita) podem alterar.
+
+        As linhas podem ser parciais, com só os campos conhecidos. Sem
+        linhas, descarta todas as páginas da entidade.
+        """
+        self._versions[entity] = self.version(entity) + 1
+        groups = self._groups.get(entity)
+        if not groups:
+            return
+        affected = [filters for filters in groups
+                    if not rows or any(_matches(filters, row) for row in rows)]
+        for filters in affected:
+            for key in list(groups.get(filters, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_rows(self, entity: str, rows: Iterable[Mapping[str, Any]]) -> None:
+        """Invalidação de um lote de linhas novas, conferindo cada grupo uma vez por valor distinto."""
+        distinct = {tuple(sorted(row.items())) for row in rows}
+        self.invalidate(entity, *(dict(items) for items in distinct))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "expirations": self.expirations,
+        }
+
+
+def create_response_cache(db_mode: str) -> ResponseCache:
+    """Cache pelas variáveis DATABRIDGE_RESPONSE_CACHE_MB (0 desativa) e DATABRIDGE_RESPONSE_CACHE_TTL.
+
+    No modo memória este processo vê todas as escritas, então as entradas
+    não expiram por padrão; nos bancos compartilhados, o padrão é 1
+    segundo. Com vários workers a API não consulta o cache, porque a
+    invalidação só alcança o processo que fez a escrita.
+    """
+    ttl = os.environ.get("DATABRIDGE_RESPONSE_CACHE_TTL")
+    return ResponseCache(
+        max_bytes=int(float(os.environ.get("DATABRIDGE_RESPONSE_CACHE_MB", "32")) * 2 ** 20),
+        ttl_seconds=float(ttl) if ttl else (None if db_mode == "memory" else 1.0),
+    )
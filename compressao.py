@@ -0,0 +1,187 @@
+"""
+Compressão negociada das respostas do DataBridge Bank.
+Escolhe gzip ou brotli pelo Accept-Encoding do cliente (com os pesos q) e
+comprime as respostas de texto a partir de um tamanho mínimo. Respostas em
+fluxo, como as exportações, são comprimidas bloco a bloco: cada bloco sai
+com um flush de sincronização, então o cliente descomprime os dados à
+medida que chegam, sem esperar o fim. Brotli é opcional; sem o pacote
+brotli só gzip é oferecido.
+"""
+import os
+import zlib
+from typing import Dict, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional
+    brotli = None
+
+# Tipos de conteúdo que valem a compressão (imagens, zips e afins já vêm comprimidos)
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "image/svg+xml",
+)
+
+
+def supported_encodings(preference: Sequence[str] = ("br", "gzip")) -> Tuple[str, ...]:
+    """Codificações disponíveis neste ambiente, na ordem de preferência do servidor."""
+    return tuple(name for name in preference if name == "gzip" or (name == "br" and brotli is not None))
+
+
+def negotiate(accept_encoding: str, encodings: Sequence[str]) -> Optional[str]:
+    """Codificação de maior peso q no Accept-Encoding; no empate vale a ordem de ``encodings``."""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class Compressor:
+    """Compressor incremental de uma resposta em gzip ou brotli."""
+
+    def __init__(self, encoding: str, gzip_level: int = 6, brotli_quality: int = 4):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._brotli = None
+            # wbits 31: fluxo deflate com cabeçalho e rodapé gzip
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Comprime um bloco e descarrega a saída, para o cliente ler sem esperar o próximo."""
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        """Comprime o último bloco e fecha o fluxo."""
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    """Comprime um corpo inteiro de uma vez."""
+    return Compressor(encoding, gzip_level, brotli_quality).finish(data)
+
+
+def compression_settings() -> Dict[str, object]:
+    """Parâmetros pelas variáveis DATABRIDGE_COMPRESSION (codificações em ordem de preferência ou
+    "none"), DATABRIDGE_COMPRESSION_MIN_BYTES, DATABRIDGE_GZIP_LEVEL e DATABRIDGE_BROTLI_QUALITY."""
+    setting = os.environ.get("DATABRIDGE_COMPRESSION", "br,gzip").strip().lower()
+    preference = () if setting in ("none", "") else tuple(name.strip() for name in setting.split(","))
+    return {
+        "encodings": supported_encodings(preference),
+        "minimum_size": int(os.environ.get("DATABRIDGE_COMPRESSION_MIN_BYTES", "1024")),
+        "gzip_level": int(os.environ.get("DATABRIDGE_GZIP_LEVEL", "6")),
+        "brotli_quality": int(os.environ.get("DATABRIDGE_BROTLI_QUALITY", "4")),
+    }
+
+
+class CompressionMiddleware:
+    """Middleware ASGI que comprime as respostas conforme o Accept-Encoding.
+
+    Corpos inteiros menores que ``minimum_size`` seguem sem compressão;
+    respostas em fluxo são sempre comprimidas, bloco a bloco. O ETag vira
+    fraco, porque os bytes deixam de ser os da representação original; isso
+    vale para toda resposta que este Accept-Encoding poderia comprimir,
+    inclusive as pequenas que seguem inteiras e os 304, que assim repetem o
+    validador do 200 que substituem.
+    """
+
+    def __init__(self, app, encodings: Sequence[str] = ("br", "gzip"), minimum_size: int = 1024,
+                 gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.encodings = supported_encodings(encodings)
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, self._vary(send))
+            return
+
+        start = None
+        compressor: Optional[Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(scope=start)
+                eligible = ("content-encoding" not in headers and start["status"] not in (204, 304)
+                            and is_compressible(headers.get("content-type", "")))
+                if eligible or start["status"] == 304:
+                    headers.add_vary_header("Accept-Encoding")
+                    etag = headers.get("etag")
+                    if etag is not None and not etag.startswith("W/"):
+                        headers["ETag"] = "W/" + etag
+                if not eligible or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                if more_body:
+                    del headers["content-length"]
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressor.chunk(body), "more_body": True})
+                    return
+                body = compressor.finish(body)
+                headers["Content-Length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+            body = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _vary(send):
+        """Repassa a resposta sem comprimir, avisando os caches de que ela depende do Accept-Encoding."""
+        async def send_vary(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "content-encoding" not in headers and is_compressible(headers.get("content-type", "")):
+                    headers.add_vary_header("Accept-Encoding")
+            await send(message)
+        return send_vary
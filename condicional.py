@@ -0,0 +1,46 @@
+"""
+Validadores HTTP das leituras de um único recurso do DataBridge Bank.
+O ETag e o Last-Modified saem do updated_at da linha (a versão dela), então
+um cliente que consulta o mesmo recurso repetidamente pode mandar
+If-None-Match ou If-Modified-Since e receber 304, sem corpo, enquanto nada
+mudou. A comparação usa só a versão, sem montar nem serializar a linha.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+
+from armazenamento_memoria import encode_datetime
+
+
+def validators(updated_at: datetime) -> Dict[str, str]:
+    """Cabeçalhos ETag (microssegundos do updated_at em hexadecimal) e Last-Modified."""
+    modified = updated_at if updated_at.tzinfo is not None else updated_at.astimezone()
+    return {
+        "ETag": f'"{encode_datetime(updated_at.replace(tzinfo=None)):x}"',
+        "Last-Modified": format_datetime(modified.astimezone(timezone.utc), usegmt=True),
+    }
+
+
+def _since(value: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def not_modified(request_headers: Mapping[str, str], headers: Dict[str, str]) -> bool:
+    """Confere If-None-Match (que tem precedência) ou If-Modified-Since contra os validadores atuais."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Comparação fraca, como pede a RFC 9110 para GET: ignora o prefixo W/
+        tags = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+        return headers["ETag"] in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is not None:
+        since = _since(if_modified_since)
+        # Last-Modified tem resolução de segundos; alterações no mesmo segundo ficam para o ETag
+        return since is not None and parsedate_to_datetime(headers["Last-Modified"]) <= since
+    return False
@@ -0,0 +1,313 @@
+"""
+Saldos e extratos por conta do DataBridge Bank.
+Cada transação que chega a ``completed`` lança um débito na conta de origem
+e um crédito na de destino (e o estorno dos dois se ela deixar de estar
+concluída). O saldo de cada conta fica materializado por moeda, então a
+consulta é uma busca num dicionário, e os lançamentos ficam numa lista por
+conta, que serve de índice para o extrato paginado. O razão é montado na
+primeira consulta ou reconstruído sob demanda a partir das transações
+concluídas do repositório, com as contas repartidas entre os processos do
+pool.
+
+Uso (reconstrução a partir do banco configurado, fora da API):
+    python contas.py --db-mode sqlite
+    python contas.py --db-mode postgres --workers 4 --account 000123-1
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from repositorios import TRANSACTIONS, create_repository
+
+COMPLETED = "completed"
+DEBIT = "debit"
+CREDIT = "credit"
+
+
+# Campos de cada lançamento, guardado como tupla simples (mais leve e rápida de copiar entre processos)
+MOVEMENT_FIELDS = ("transaction_id", "direction", "amount", "currency", "counterpart_account",
+                   "reversal", "balance_after", "posted_at")
+
+
+class Account:
+    """Saldo por moeda (Decimal, exato) e lançamentos de uma conta em ordem de lançamento."""
+
+    __slots__ = ("balances", "movements")
+
+    def __init__(self, balances: Optional[Dict[str, Decimal]] = None, movements: Optional[List[tuple]] = None):
+        self.balances: Dict[str, Decimal] = balances if balances is not None else {}
+        self.movements: List[tuple] = movements if movements is not None else []
+
+    def post(self, transaction_id: str, direction: str, amount: float, currency: str,
+             counterpart: str, reversal: bool, posted_at: Optional[datetime]) -> None:
+        value = Decimal(repr(amount))
+        balance = self.balances.get(currency, Decimal(0))
+        balance = balance - value if direction == DEBIT else balance + value
+        self.balances[currency] = balance
+        self.movements.append(
+            (transaction_id, direction, amount, currency, counterpart, reversal, float(balance), posted_at)
+        )
+
+
+def _entry_order(entry: tuple) -> tuple:
+    return (entry[0] or datetime.min, entry[1], entry[2])
+
+
+def _movement_order(movement: tuple) -> tuple:
+    """Mesma ordem de _entry_order, sobre um lançamento no formato de MOVEMENT_FIELDS."""
+    return (movement[7] or datetime.min, movement[0], movement[1])
+
+
+def movement_cursor(movement: tuple) -> List[Optional[str]]:
+    """Chave de um lançamento no extrato, como (posted_at em ISO 8601, transaction_id, direção)."""
+    posted_at = movement[7]
+    return [posted_at.isoformat() if posted_at is not None else None, movement[0], movement[1]]
+
+
+def settle_accounts(entries: Dict[str, List[tuple]]) -> Dict[str, Tuple[Dict[str, Decimal], List[tuple]]]:
+    """Ordena os lançamentos de um grupo de contas e calcula os saldos (roda no pool de processos).
+
+    Cada lançamento chega como (posted_at, transaction_id, direção, valor,
+    moeda, contraparte) e sai na ordem em que as transações foram concluídas
+    (com transaction_id e direção desempatando), já no formato de
+    MOVEMENT_FIELDS, junto com o saldo final por moeda.
+    """
+    settled = {}
+    zero = Decimal(0)
+    for name, account_entries in entries.items():
+        account_entries.sort(key=_entry_order)
+        balances: Dict[str, Decimal] = {}
+        movements = []
+        append = movements.append
+        for posted_at, transaction_id, direction, amount, currency, counterpart in account_entries:
+            value = Decimal(repr(amount))
+            balance = balances.get(currency, zero)
+            balance = balance - value if direction == DEBIT else balance + value
+            balances[currency] = balance
+            append((transaction_id, direction, amount, currency, counterpart, False, float(balance), posted_at))
+        settled[name] = (balances, movements)
+    return settled
+
+
+class AccountLedger:
+    """Razão por conta, montado sob demanda e mantido pelas mudanças de status.
+
+    ``status_changed`` recebe a linha gravada e a chave de ordenação dela no
+    repositório, como nos agregados de transações. Durante uma reconstrução
+    o razão em uso continua recebendo as mudanças, e as que atingem linhas
+    já lidas pela varredura são guardadas e aplicadas também ao razão novo
+    antes da troca. A reconstrução parte do estado atual das transações,
+    então estornos de transações que voltaram a não estar concluídas somem
+    do extrato (o saldo é o mesmo).
+    """
+
+    def __init__(self, page_size: int = 5000):
+        self.page_size = page_size
+        self.ready = False
+        self.rebuilds = 0
+        self.last_rebuild: Optional[Dict[str, Any]] = None
+        self._accounts: Dict[str, Account] = {}
+        self._lock = asyncio.Lock()
+        self._rebuilding = False
+        self._scan_key: Optional[Any] = None
+        self._scanned = False
+        self._pending: List[Tuple[Dict[str, Any], bool]] = []
+
+    @staticmethod
+    def _post(accounts: Dict[str, Account], row: Dict[str, Any], reversal: bool) -> None:
+        origin, destination = row["origin_account"], row["destination_account"]
+        debit, credit = (CREDIT, DEBIT) if reversal else (DEBIT, CREDIT)
+        # Crédito antes do débito, como na ordem da reconstrução (importa quando origem e destino coincidem)
+        for name, counterpart, direction in sorted(((origin, destination, debit), (destination, origin, credit)),
+                                                   key=lambda posting: posting[2]):
+            account = accounts.get(name)
+            if account is None:
+                account = accounts[name] = Account()
+            account.post(row["id"], direction, row["amount"], row["currency"], counterpart, reversal,
+                         row.get("updated_at"))
+
+    def status_changed(self, previous_status: str, row: Dict[str, Any], key: Any) -> None:
+        """Lança a transação que acabou de ser concluída ou estorna a que deixou de estar."""
+        if (previous_status == COMPLETED) == (row["status"] == COMPLETED):
+            return
+        reversal = previous_status == COMPLETED
+        if self.ready:
+            self._post(self._accounts, row, reversal)
+        if self._rebuilding and (self._scanned or (self._scan_key is not None and key <= self._scan_key)):
+            self._pending.append((row, reversal))
+
+    async def ensure_ready(self, repository, entity: str, run_in_pool: Optional[Callable] = None,
+                           workers: int = 1) -> None:
+        """Monta o razão na primeira chamada."""
+        if not self.ready:
+            await self.rebuild(repository, entity, run_in_pool, workers, only_if_missing=True)
+
+    async def rebuild(self, repository, entity: str, run_in_pool: Optional[Callable] = None,
+                      workers: int = 1, progress: Optional[Callable[[int], None]] = None,
+                      only_if_missing: bool = False, account: Optional[str] = None) -> Dict[str, Any]:
+        """Reconstrói o razão a partir das transações concluídas e troca o razão em uso.
+
+        As páginas são lidas em ordem, cedendo o event loop entre elas, e os
+        lançamentos são repartidos por conta em ``workers`` grupos, ordenados
+        e somados em paralelo por ``run_in_pool`` (ou aqui mesmo, sem pool).
+        Com ``account`` só as transações dessa conta são lidas (como origem e
+        depois como destino); o saldo e o extrato das contrapartes ficam
+        incompletos, então só os dela devem ser consultados.
+        """
+        async with self._lock:
+            if only_if_missing and self.ready:
+                return self.last_rebuild
+            started = time.perf_counter()
+            self._rebuilding, self._scan_key, self._scanned, self._pending = True, None, False, []
+            try:
+                shards: List[Dict[str, List[tuple]]] = [{} for _ in range(max(1, workers))]
+                scans = [{"status": COMPLETED}] if account is None else [
+                    {"status": COMPLETED, "origin_account": account},
+                    {"status": COMPLETED, "destination_account": account},
+                ]
+                transactions = 0
+                for scan, filters in enumerate(scans):
+                    after = None
+                    while True:
+                        page = await repository.find(entity, filters, limit=self.page_size, after=after)
+                        for row in page.rows:
+                            posted_at, transaction_id = row.get("updated_at"), row["id"]
+                            amount, currency = row["amount"], row["currency"]
+                            origin, destination = row["origin_account"], row["destination_account"]
+                            if scan and origin == account:
+                                continue  # transferência para a própria conta, já lida como origem
+                            shards[hash(origin) % len(shards)].setdefault(origin, []).append(
+                                (posted_at, transaction_id, DEBIT, amount, currency, destination))
+                            shards[hash(destination) % len(shards)].setdefault(destination, []).append(
+                                (posted_at, transaction_id, CREDIT, amount, currency, origin))
+                            transactions += 1
+                        if progress is not None:
+                            progress(transactions)
+                        if page.next_key is None:
+                            break
+                        after = page.next_key
+                        if account is None:
+                            self._scan_key = after
+                        await asyncio.sleep(0)
+                self._scanned = True
+
+                if run_in_pool is not None:
+                    settled = await asyncio.gather(*(run_in_pool(settle_accounts, shard) for shard in shards))
+                else:
+                    settled = []
+                    for shard in shards:
+                        settled.append(settle_accounts(shard))
+                        await asyncio.sleep(0)
+                accounts: Dict[str, Account] = {}
+                for part in settled:
+                    for name, (balances, movements) in part.items():
+                        accounts[name] = Account(balances, movements)
+                for row, reversal in self._pending:
+                    self._post(accounts, row, reversal)
+            finally:
+                self._rebuilding, self._scan_key, self._scanned, self._pending = False, None, False, []
+
+            self._accounts = accounts
+            self.ready = True
+            self.rebuilds += 1
+            self.last_rebuild = {
+                "transactions": transactions,
+                "accounts": len(accounts),
+                "movements": sum(len(account.movements) for account in accounts.values()),
+                "workers": len(shards),
+                "elapsed_seconds": round(time.perf_counter() - started, 3),
+                "finished_at": datetime.now(),
+            }
+            return self.last_rebuild
+
+    def balance(self, name: str) -> Optional[Dict[str, Any]]:
+        """Saldo por moeda de uma conta; None se ela não tem lançamentos."""
+        account = self._accounts.get(name)
+        if account is None:
+            return None
+        return {
+            "account": name,
+            "balances": {currency: float(value) for currency, value in account.balances.items()},
+            "movements": len(account.movements),
+            "last_movement_at": account.movements[-1][-1] if account.movements else None,
+        }
+
+    def movements(self, name: str, limit: int = 100,
+                  after: Optional[List[Optional[str]]] = None) -> Optional[Tuple[List[Dict[str, Any]], Optional[list]]]:
+        """Página do extrato em ordem de lançamento e a chave do último item, quando há mais.
+
+        A chave é a de ``movement_cursor``, não a posição na lista, para
+        continuar válida depois de uma reconstrução, que descarta os
+        estornos e muda as posições. Uma chave malformada levanta ValueError.
+        """
+        account = self._accounts.get(name)
+        if account is None:
+            return None
+        start = 0
+        if after is not None:
+            try:
+                posted_at, transaction_id, direction = after
+                key = (datetime.fromisoformat(posted_at) if posted_at is not None else datetime.min,
+                       str(transaction_id), str(direction))
+            except (TypeError, ValueError):
+                raise ValueError("cursor de extrato inválido")
+            start = bisect_right(account.movements, key, key=_movement_order)
+        rows = account.movements[start:start + limit]
+        next_key = movement_cursor(rows[-1]) if start + limit < len(account.movements) else None
+        return [dict(zip(MOVEMENT_FIELDS, movement)) for movement in rows], next_key
+
+
+async def rebuild_from_store(mode: Optional[str], workers: int) -> Tuple[AccountLedger, Dict[str, Any]]:
+    repository = create_repository(mode)
+    await repository.connect()
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        loop = asyncio.get_running_loop()
+        run_in_pool = (lambda function, *args: loop.run_in_executor(pool, function, *args)) if pool else None
+        ledger = AccountLedger()
+        summary = await ledger.rebuild(repository, TRANSACTIONS, run_in_pool, workers)
+        return ledger, summary
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        await repository.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrói o razão por conta a partir das transações concluídas")
+    parser.add_argument("--db-mode", choices=["sqlite", "postgres", "mongodb"],
+                        default=os.environ.get("DATABRIDGE_DB_MODE") or "sqlite")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processos que ordenam e somam as contas")
+    parser.add_argument("--account", help="mostra o saldo desta conta ao final")
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    ledger, summary = asyncio.run(rebuild_from_store(args.db_mode, args.workers))
+    result = {**summary, "balance": ledger.balance(args.account) if args.account else None}
+    if args.json:
+        print(json.dumps(result, indent=2, default=str))
+        return
+
+    print(f"\nRazão reconstruído a partir de {summary['transactions']:,} transações concluídas ({args.db_mode})")
+    print(f"  contas:       {summary['accounts']:,}")
+    print(f"  lançamentos:  {summary['movements']:,}")
+    print(f"  processos:    {summary['workers']}")
+    print(f"  tempo:        {summary['elapsed_seconds']:.3f}s")
+    if args.account:
+        balance = result["balance"]
+        if balance is None:
+            print(f"\nConta {args.account} sem lançamentos")
+        else:
+            print(f"\nSaldo de {args.account}: " + ", ".join(f"{currency} {value:,.2f}"
+                                                        for currency, value in balance["balances"].items()))
+
+
+if __name__ == "__main__":
+    main()
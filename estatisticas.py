@@ -0,0 +1,261 @@
+"""
+Agregados de transações do DataBridge Bank mantidos a cada escrita.
+Contagem, soma, mínimo e máximo por moeda, tipo, status e rota (e por
+minuto ou hora de criação) ficam num pequeno cubo de células atualizado
+pela criação e pela mudança de status das transações, então a leitura não
+depende de quantas transações existem. O cubo é montado na primeira
+consulta, percorrendo o repositório uma única vez. Somas, mínimos e
+máximos são sempre dados por moeda: valores de moedas diferentes não se
+somam.
+"""
+import asyncio
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Dimensões de agrupamento, na ordem da chave das células
+DIMENSIONS = ("currency", "transaction_type", "status", "route")
+BUCKETS = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1)}
+
+
+class SortedAmounts:
+    """Multiconjunto ordenado de valores em blocos de ``array('d')``.
+
+    Inserir e remover custam uma busca binária mais o deslocamento dentro
+    de um bloco; mínimo e máximo são lidos direto nas pontas. Serve para
+    manter mínimo e máximo exatos mesmo quando valores saem do grupo.
+    """
+
+    LOAD = 512
+
+    def __init__(self):
+        self._blocks: List[array] = []
+        self._maxes: List[float] = []
+
+    def add(self, value: float) -> None:
+        if not self._blocks:
+            self._blocks.append(array("d", [value]))
+            self._maxes.append(value)
+            return
+        position = min(bisect_left(self._maxes, value), len(self._blocks) - 1)
+        block = self._blocks[position]
+        insort(block, value)
+        self._maxes[position] = block[-1]
+        if len(block) > 2 * self.LOAD:
+            self._blocks.insert(position + 1, block[self.LOAD:])
+            del block[self.LOAD:]
+            self._maxes.insert(position, block[-1])
+
+    def remove(self, value: float) -> None:
+        position = bisect_left(self._maxes, value)
+        if position == len(self._blocks):
+            raise ValueError(value)
+        block = self._blocks[position]
+        index = bisect_left(block, value)
+        if index == len(block) or block[index] != value:
+            raise ValueError(value)
+        del block[index]
+        if block:
+            self._maxes[position] = block[-1]
+        else:
+            del self._blocks[position]
+            del self._maxes[position]
+
+    @property
+    def min(self) -> Optional[float]:
+        return self._blocks[0][0] if self._blocks else None
+
+    @property
+    def max(self) -> Optional[float]:
+        return self._maxes[-1] if self._maxes else None
+
+
+class Cell:
+    """Contagem, soma exata (Decimal) e valores ordenados de um grupo de transações."""
+
+    __slots__ = ("count", "total", "amounts")
+
+    def __init__(self):
+        self.count = 0
+        self.total = Decimal(0)
+        self.amounts = SortedAmounts()
+
+    def add(self, amount: float) -> None:
+        self.count += 1
+        self.total += Decimal(repr(amount))
+        self.amounts.add(amount)
+
+    def remove(self, amount: float) -> None:
+        self.amounts.remove(amount)
+        self.count -= 1
+        self.total -= Decimal(repr(amount))
+
+
+def summarize(cells: Iterable[Cell]) -> Dict[str, Any]:
+    """Junta células de uma mesma moeda em {count, sum, min, max}."""
+    count, total, low, high = 0, Decimal(0), None, None
+    for cell in cells:
+        if not cell.count:
+            continue
+        count += cell.count
+        total += cell.total
+        low = cell.amounts.min if low is None else min(low, cell.amounts.min)
+        high = cell.amounts.max if high is None else max(high, cell.amounts.max)
+    return {"count": count, "sum": float(total), "min": low, "max": high}
+
+
+def summarize_by_currency(cells: Iterable[Tuple[str, Cell]]) -> Dict[str, Dict[str, Any]]:
+    """Junta pares (moeda, célula) em {moeda: {count, sum, min, max}}, sem as moedas vazias."""
+    groups: Dict[str, List[Cell]] = {}
+    for currency, cell in cells:
+        groups.setdefault(currency, []).append(cell)
+    summaries = {currency: summarize(group) for currency, group in sorted(groups.items())}
+    return {currency: summary for currency, summary in summaries.items() if summary["count"]}
+
+
+def _route(row: Dict[str, Any]) -> str:
+    routing = row.get("routing_info") or {}
+    return routing.get("route") or "none"
+
+
+def _minute(value: datetime) -> datetime:
+    return value.replace(second=0, microsecond=0)
+
+
+class TransactionStats:
+    """Cubo de agregados de transações, montado sob demanda e mantido pelas escritas.
+
+    ``created`` e ``status_changed`` recebem a linha gravada e a chave de
+    ordenação dela no repositório (a mesma do cursor). Enquanto o cubo é
+    montado, só entram as escritas em linhas que a varredura já passou; as
+    demais serão lidas por ela com o valor novo. Se uma mudança de status
+    não encontra a transação no status anterior (outro processo a mudou
+    depois da montagem), o cubo é descartado e remontado na próxima
+    consulta.
+    """
+
+    def __init__(self, page_size: int = 5000):
+        self.page_size = page_size
+        self.ready = False
+        self._scan_key: Optional[Any] = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._cells: Dict[Tuple[str, str, str, str], Cell] = {}
+        self._minutes: Dict[Tuple[datetime, str], Cell] = {}
+        self._earliest: Optional[datetime] = None
+        self._latest: Optional[datetime] = None
+
+    def discard(self) -> None:
+        """Esvazia o cubo; a próxima consulta o remonta (e uma montagem em curso recomeça)."""
+        self._generation += 1
+        self.ready = False
+        self._scan_key = None
+        self._cells = {}
+        self._minutes = {}
+        self._earliest = self._latest = None
+
+    def _applies(self, key: Any) -> bool:
+        return self.ready or (self._scan_key is not None and key <= self._scan_key)
+
+    def _cell_key(self, row: Dict[str, Any], status: Optional[str] = None) -> Tuple[str, str, str, str]:
+        return (row["currency"], row["transaction_type"], status or row["status"], _route(row))
+
+    def _add(self, row: Dict[str, Any]) -> None:
+        key = self._cell_key(row)
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = self._cells[key] = Cell()
+        cell.add(row["amount"])
+        minute = _minute(row["created_at"])
+        bucket = self._minutes.get((minute, row["currency"]))
+        if bucket is None:
+            bucket = self._minutes[minute, row["currency"]] = Cell()
+            if self._latest is None or minute > self._latest:
+                self._latest = minute
+            if self._earliest is None or minute < self._earliest:
+                self._earliest = minute
+        bucket.add(row["amount"])
+
+    def created(self, row: Dict[str, Any], key: Any) -> None:
+        if self._applies(key):
+            self._add(row)
+
+    def status_changed(self, previous_status: str, row: Dict[str, Any], key: Any) -> None:
+        if previous_status == row["status"] or not self._applies(key):
+            return
+        previous = self._cells.get(self._cell_key(row, previous_status))
+        try:
+            if previous is None:
+                raise ValueError(previous_status)
+            previous.remove(row["amount"])
+        except ValueError:
+            # O cubo não viu uma mudança feita fora deste processo: os agregados não valem mais
+            self.discard()
+            return
+        cell = self._cells.get(self._cell_key(row))
+        if cell is None:
+            cell = self._cells[self._cell_key(row)] = Cell()
+        cell.add(row["amount"])
+
+    async def ensure_ready(self, repository, entity: str) -> None:
+        """Monta o cubo na primeira chamada, em páginas, cedendo o event loop entre elas."""
+        while not self.ready:
+            async with self._lock:
+                if not self.ready:
+                    await self._build(repository, entity)
+
+    async def _build(self, repository, entity: str) -> None:
+        generation = self._generation
+        after = None
+        while True:
+            page = await repository.find(entity, {}, limit=self.page_size, after=after)
+            if generation != self._generation:
+                return
+            for row in page.rows:
+                self._add(row)
+            if page.next_key is None:
+                break
+            after = self._scan_key = page.next_key
+            await asyncio.sleep(0)
+        self.ready = True
+
+    def summary(self, bucket: Optional[str] = None, buckets: int = 60) -> Dict[str, Any]:
+        """Totais por moeda e, dentro de cada valor das demais dimensões, por moeda; com ``bucket``,
+        as ``buckets`` janelas mais recentes."""
+        result: Dict[str, Any] = {
+            "total": {"count": sum(cell.count for cell in self._cells.values())},
+            "by_currency": summarize_by_currency((key[0], cell) for key, cell in self._cells.items()),
+        }
+        for position, dimension in enumerate(DIMENSIONS[1:], start=1):
+            groups: Dict[str, List[Tuple[str, Cell]]] = {}
+            for key, cell in self._cells.items():
+                groups.setdefault(key[position], []).append((key[0], cell))
+            result[f"by_{dimension}"] = {
+                value: summaries for value, summaries in
+                ((value, summarize_by_currency(cells)) for value, cells in groups.items()) if summaries
+            }
+        if bucket is not None:
+            result["bucket"] = bucket
+            result["buckets"] = self._buckets(BUCKETS[bucket], buckets)
+        return result
+
+    def _buckets(self, width: timedelta, limit: int) -> List[Dict[str, Any]]:
+        """As ``limit`` janelas até a mais recente, contíguas (as vazias vêm com count 0)."""
+        if self._latest is None:
+            return []
+        minutes = [timedelta(minutes=offset) for offset in range(width // timedelta(minutes=1))]
+        start = self._latest.replace(minute=0) if width >= timedelta(hours=1) else self._latest
+        series = []
+        currencies = {currency for _, currency in self._minutes}
+        while len(series) < limit and start + width > self._earliest:
+            cells = [(currency, self._minutes[moment, currency])
+                     for moment in (start + offset for offset in minutes) for currency in currencies
+                     if (moment, currency) in self._minutes]
+            by_currency = summarize_by_currency(cells)
+            series.append({"start": start, "count": sum(summary["count"] for summary in by_currency.values()),
+                           "by_currency": by_currency})
+            start -= width
+        series.reverse()
+        return series
@@ -0,0 +1,87 @@
+"""
+Exportação em fluxo das entidades da API do DataBridge Bank.
+Os dados são lidos do repositório página a página (pela chave ordenada do
+cursor) e codificados em blocos de bytes, então a memória usada não depende
+do tamanho da extração.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Sequence
+
+from repositorios import Repository
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+TRANSACTION_EXPORT_COLUMNS = (
+    "id", "origin_account", "destination_account", "amount", "currency", "transaction_type",
+    "description", "reference_id", "status", "routing_info", "created_at", "updated_at",
+)
+RECORD_EXPORT_COLUMNS = ("id", "file_id", "record_type", "content", "status", "created_at")
+
+# Linhas lidas do repositório (e codificadas) por bloco enviado ao cliente
+EXPORT_PAGE_SIZE = 1000
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return value
+
+
+def encode_ndjson(rows: Sequence[Dict[str, Any]], columns: Sequence[str]) -> bytes:
+    return "".join(
+        json.dumps({column: row.get(column) for column in columns}, default=_json_default) + "\n"
+        for row in rows
+    ).encode()
+
+
+def encode_csv(rows: Sequence[Dict[str, Any]], columns: Sequence[str]) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerows([_csv_value(row.get(column)) for column in columns] for row in rows)
+    return output.getvalue().encode()
+
+
+def csv_header(columns: Sequence[str]) -> bytes:
+    output = io.StringIO()
+    csv.writer(output).writerow(columns)
+    return output.getvalue().encode()
+
+
+async def iter_export(
+    repository: Repository,
+    entity: str,
+    filters: Dict[str, Any],
+    export_format: str,
+    columns: Sequence[str],
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> AsyncIterator[bytes]:
+    """Gera a exportação de uma entidade em blocos de bytes no formato pedido."""
+    encode = encode_csv if export_format == "csv" else encode_ndjson
+    if export_format == "csv":
+        # O cabeçalho sai antes da primeira consulta, então o primeiro byte é imediato
+        yield csv_header(columns)
+
+    after = None
+    while True:
+        page = await repository.find(entity, filters, limit=page_size, after=after)
+        if page.rows:
+            yield encode(page.rows, columns)
+        if page.next_key is None:
+            break
+        after = page.next_key
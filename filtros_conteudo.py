@@ -0,0 +1,401 @@
+"""
+Filtros sobre o conteúdo dos registros de dados do DataBridge Bank.
+O parâmetro ``where`` da listagem de registros (por exemplo
+``where=amount>1000``) é interpretado aqui em condições sobre campos do
+conteúdo JSON. No modo memória cada campo consultado ganha, na primeira
+consulta, um índice ordenado que é mantido a cada escrita e reaproveitado
+pelas requisições seguintes, sem reinterpretar o JSON dos registros.
+Quais campos podem ganhar índice (em qualquer backend) é decidido por
+``ContentIndexPolicy``; os demais são conferidos sem índice.
+"""
+import json
+import math
+import operator
+import os
+import re
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+# Comparações aceitas, das mais longas para as mais curtas (para o ">=" não virar ">")
+OPERATORS = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    "!=": operator.ne,
+    "=": operator.eq,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+
+_FIELD = r"[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*"
+_CONDITION = re.compile(rf"^\s*({_FIELD})\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$")
+# Números na forma do JSON: sem sinal de + nem zeros à esquerda, para "000123" (contas, CPF) seguir como texto
+_NUMBER = re.compile(r"^-?(?:0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?$")
+_MISSING = object()
+
+
+def parse_number(text: str) -> Optional[Union[int, float]]:
+    """Número escrito em ``text``: int exato sem parte decimal nem expoente, senão float; None se não é número."""
+    match = _NUMBER.match(text)
+    if match is None:
+        return None
+    if not (match.group(1) or match.group(2)):
+        return int(text)
+    number = float(text)
+    return number if math.isfinite(number) else None
+
+
+class WhereSyntaxError(ValueError):
+    """Expressão ``where`` que não segue o formato campo<op>valor."""
+
+
+class Condition(NamedTuple):
+    """Comparação de um campo do conteúdo (caminho com pontos) com um número ou texto."""
+    field: str
+    op: str
+    value: Any
+
+    @property
+    def path(self) -> Tuple[str, ...]:
+        return tuple(self.field.split("."))
+
+    @property
+    def numeric(self) -> bool:
+        return not isinstance(self.value, str)
+
+
+def parse_where(expressions: Iterable[str]) -> List[Condition]:
+    """Converte expressões como ``amount>1000`` ou ``status='ok' and amount<=5`` em condições.
+
+    Várias expressões (ou partes unidas por ``and``) precisam ser todas
+    verdadeiras. Valores numéricos viram números (inteiros sem perder
+    precisão); texto pode vir entre aspas simples ou duplas.
+    """
+    conditions = []
+    for expression in expressions:
+        for part in re.split(r"\s+and\s+", expression.strip(), flags=re.IGNORECASE):
+            match = _CONDITION.match(part)
+            if match is None or not match.group(3):
+                raise WhereSyntaxError(f"Condição inválida: {part!r} (use campo<op>valor, por exemplo amount>1000)")
+            field, op, raw = match.groups()
+            if len(raw) >= 2 and raw[0] == raw[-1] and raw[0] in "'\"":
+                value: Any = raw[1:-1]
+            else:
+                number = parse_number(raw)
+                value = raw if number is None else number
+            conditions.append(Condition(field, op, value))
+    return conditions
+
+
+def extract_field(document: Any, path: Sequence[str]) -> Any:
+    """Valor de um caminho com pontos dentro do conteúdo; _MISSING se não existir."""
+    for key in path:
+        if not isinstance(document, dict) or key not in document:
+            return _MISSING
+        document = document[key]
+    return document
+
+
+def _comparable(value: Any) -> Optional[bool]:
+    """True para números, False para texto e None para o que não se compara (objetos, listas, nulos)."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return True
+    if isinstance(value, str):
+        return False
+    return None
+
+
+def matches(value: Any, condition: Condition) -> bool:
+    """Confere uma condição; campos ausentes ou de outro tipo nunca atendem."""
+    if _comparable(value) is not condition.numeric:
+        return False
+    return OPERATORS[condition.op](value, condition.value)
+
+
+class SortedPairs:
+    """Pares (valor, sequência) ordenados em blocos de listas, como ``estatisticas.SortedAmounts``.
+
+    Inserir e remover custam uma busca binária nos máximos dos blocos mais o
+    deslocamento dentro de um bloco de até ``2 * LOAD`` pares, em vez de
+    deslocar a lista inteira, então uma carga em massa fica linear no
+    número de blocos e não quadrática.
+    """
+
+    LOAD = 512
+
+    def __init__(self, pairs: Sequence[Tuple[Any, int]] = ()):
+        self._blocks: List[List[Tuple[Any, int]]] = [list(pairs[start:start + self.LOAD])
+                                                     for start in range(0, len(pairs), self.LOAD)]
+        self._maxes: List[Tuple[Any, int]] = [block[-1] for block in self._blocks]
+
+    def add(self, pair: Tuple[Any, int]) -> None:
+        if not self._blocks:
+            self._blocks.append([pair])
+            self._maxes.append(pair)
+            return
+        position = min(bisect_left(self._maxes, pair), len(self._blocks) - 1)
+        block = self._blocks[position]
+        insort(block, pair)
+        self._maxes[position] = block[-1]
+        if len(block) > 2 * self.LOAD:
+            self._blocks.insert(position + 1, block[self.LOAD:])
+            del block[self.LOAD:]
+            self._maxes.insert(position, block[-1])
+
+    def remove(self, pair: Tuple[Any, int]) -> bool:
+        position = bisect_left(self._maxes, pair)
+        if position == len(self._blocks):
+            return False
+        block = self._blocks[position]
+        index = bisect_left(block, pair)
+        if index == len(block) or block[index] != pair:
+            return False
+        del block[index]
+        if block:
+            self._maxes[position] = block[-1]
+        else:
+            del self._blocks[position]
+            del self._maxes[position]
+        return True
+
+    def _locate(self, pair: Optional[Tuple[Any, int]]) -> Tuple[int, int]:
+        """(bloco, posição no bloco) do primeiro par >= ``pair``; None é o fim."""
+        if pair is None:
+            return len(self._blocks), 0
+        position = bisect_left(self._maxes, pair)
+        if position == len(self._blocks):
+            return position, 0
+        return position, bisect_left(self._blocks[position], pair)
+
+    def count(self, low: Optional[Tuple[Any, int]], high: Optional[Tuple[Any, int]]) -> int:
+        """Número de pares em [low, high); None em ``low`` é o início e em ``high`` o fim."""
+        first, first_index = self._locate(low) if low is not None else (0, 0)
+        last, last_index = self._locate(high)
+        if (first, first_index) >= (last, last_index):
+            return 0
+        blocks = self._blocks
+        if first == last:
+            return last_index - first_index
+        return (len(blocks[first]) - first_index + sum(len(block) for block in blocks[first + 1:last])
+                + last_index)
+
+    def seqs(self, low: Optional[Tuple[Any, int]], high: Optional[Tuple[Any, int]]) -> List[int]:
+        """Sequências dos pares em [low, high), na ordem dos pares."""
+        first, first_index = self._locate(low) if low is not None else (0, 0)
+        last, last_index = self._locate(high)
+        seqs: List[int] = []
+        for position in range(first, min(last + 1, len(self._blocks))):
+            block = self._blocks[position]
+            start = first_index if position == first else 0
+            end = last_index if position == last else len(block)
+            seqs.extend(pair[1] for pair in block[start:end])
+        return seqs
+
+
+# Sequências ficam entre estes limites, para montar intervalos só pelo valor
+_BEFORE, _AFTER = -1, float("inf")
+
+
+class FieldIndex:
+    """Índice de um campo do conteúdo: valores ordenados com as sequências das linhas.
+
+    Números e textos ficam em conjuntos separados (não se comparam entre
+    si), cada um com os pares (valor, sequência) em ordem num SortedPairs.
+    ``values`` guarda o valor de cada linha pelo id, para conferir a
+    condição linha a linha quando o intervalo é grande demais.
+    """
+
+    def __init__(self, path: Tuple[str, ...]):
+        self.path = path
+        self.values: Dict[str, Any] = {}
+        self._sorted = {True: SortedPairs(), False: SortedPairs()}
+
+    def build(self, entries: Iterable[Tuple[int, str, Any]]) -> None:
+        """Monta o índice a partir de (sequência, id, valor) de todas as linhas."""
+        pending = {True: [], False: []}
+        for seq, row_id, value in entries:
+            if value is _MISSING:
+                continue
+            self.values[row_id] = value
+            kind = _comparable(value)
+            if kind is not None:
+                pending[kind].append((value, seq))
+        for kind, pairs in pending.items():
+            pairs.sort()
+            self._sorted[kind] = SortedPairs(pairs)
+
+    def add(self, seq: int, row_id: str, value: Any) -> None:
+        if value is _MISSING:
+            return
+        self.values[row_id] = value
+        kind = _comparable(value)
+        if kind is not None:
+            self._sorted[kind].add((value, seq))
+
+    def remove(self, seq: int, row_id: str) -> None:
+        value = self.values.pop(row_id, _MISSING)
+        kind = _comparable(value) if value is not _MISSING else None
+        if kind is not None:
+            self._sorted[kind].remove((value, seq))
+
+    @staticmethod
+    def _bounds(condition: Condition) -> Tuple[Optional[Tuple[Any, int]], Optional[Tuple[Any, int]]]:
+        value = condition.value
+        if condition.op == "=":
+            return (value, _BEFORE), (value, _AFTER)
+        if condition.op == ">":
+            return (value, _AFTER), None
+        if condition.op == ">=":
+            return (value, _BEFORE), None
+        if condition.op == "<":
+            return None, (value, _BEFORE)
+        return None, (value, _AFTER)
+
+    def count(self, condition: Condition) -> int:
+        """Quantas linhas atendem a condição (exceto !=), sem percorrê-las."""
+        return self._sorted[condition.numeric].count(*self._bounds(condition))
+
+    def seqs(self, condition: Condition) -> List[int]:
+        """Sequências das linhas que atendem a condição (exceto !=), em ordem de valor."""
+        return self._sorted[condition.numeric].seqs(*self._bounds(condition))
+
+
+class ContentIndexPolicy:
+    """Campos do conteúdo que podem ganhar índice.
+
+    Como ``where`` aceita qualquer campo, cada caminho novo criaria um
+    índice permanente. Com ``fields`` só esses caminhos são indexados; sem
+    lista, os primeiros ``max_paths`` caminhos consultados. Os demais são
+    filtrados sem índice.
+    """
+
+    def __init__(self, fields: Optional[Iterable[str]] = None, max_paths: int = 8):
+        self.fields: Optional[Set[Tuple[str, ...]]] = None
+        if fields is not None:
+            for field in fields:
+                if re.fullmatch(_FIELD, field) is None:
+                    raise ValueError(f"Campo inválido para índice de conteúdo: {field!r}")
+            self.fields = {tuple(field.split(".")) for field in fields}
+        self.max_paths = max_paths
+        self.paths: Set[Tuple[str, ...]] = set()
+
+    def admit(self, path: Tuple[str, ...]) -> bool:
+        """Diz se o caminho tem (ou pode ganhar) índice e, se puder, o registra."""
+        if path in self.paths:
+            return True
+        allowed = path in self.fields if self.fields is not None else len(self.paths) < self.max_paths
+        if allowed:
+            self.paths.add(path)
+        return allowed
+
+
+def create_content_index_policy() -> ContentIndexPolicy:
+    """Política pelas variáveis DATABRIDGE_CONTENT_INDEX_FIELDS e DATABRIDGE_CONTENT_INDEX_MAX.
+
+    DATABRIDGE_CONTENT_INDEX_FIELDS lista os campos indexáveis, separados
+    por vírgula; sem ela, vale o limite de DATABRIDGE_CONTENT_INDEX_MAX
+    campos (padrão 8).
+    """
+    fields = os.environ.get("DATABRIDGE_CONTENT_INDEX_FIELDS")
+    return ContentIndexPolicy(
+        fields=[field.strip() for field in fields.split(",") if field.strip()] if fields is not None else None,
+        max_paths=int(os.environ.get("DATABRIDGE_CONTENT_INDEX_MAX", "8")),
+    )
+
+
+class ContentIndexes:
+    """Índices por campo do conteúdo de uma tabela de registros, criados sob demanda.
+
+    ``entries`` devolve (sequência, id, conteúdo) de todas as linhas e é
+    usado só quando um campo é consultado pela primeira vez; depois o índice
+    é mantido por ``added``, ``changed`` e ``removed``. ``plan`` escolhe,
+    para uma consulta, entre percorrer as sequências do intervalo mais
+    seletivo (ordenadas e guardadas num pequeno cache até a próxima escrita)
+    ou conferir as linhas em ordem, parando ao completar a página. Campos
+    que a ``policy`` não admite são conferidos lendo o conteúdo da linha.
+    """
+
+    def __init__(self, entries: Callable[[], Iterable[Tuple[int, str, str]]], size: Callable[[], int],
+                 max_cached_ranges: int = 64, policy: Optional[ContentIndexPolicy] = None):
+        self._entries = entries
+        self._size = size
+        self.max_cached_ranges = max_cached_ranges
+        self.policy = policy if policy is not None else ContentIndexPolicy()
+        self.fields: Dict[Tuple[str, ...], FieldIndex] = {}
+        self._ranges: "OrderedDict[Condition, List[int]]" = OrderedDict()
+        self.builds = 0
+
+    @staticmethod
+    def _parse(content: Optional[str]) -> Any:
+        try:
+            return json.loads(content) if content else None
+        except ValueError:
+            return None
+
+    def _index(self, path: Tuple[str, ...]) -> FieldIndex:
+        index = self.fields.get(path)
+        if index is None:
+            index = FieldIndex(path)
+            index.build((seq, row_id, extract_field(self._parse(content), path))
+                        for seq, row_id, content in self._entries())
+            self.fields[path] = index
+            self.builds += 1
+        return index
+
+    def added(self, seq: int, row_id: str, content: Optional[str]) -> None:
+        if self.fields:
+            document = self._parse(content)
+            for path, index in self.fields.items():
+                index.add(seq, row_id, extract_field(document, path))
+        self._ranges.clear()
+
+    def removed(self, seq: int, row_id: str) -> None:
+        for index in self.fields.values():
+            index.remove(seq, row_id)
+        self._ranges.clear()
+
+    def changed(self, seq: int, row_id: str, content: Optional[str]) -> None:
+        self.removed(seq, row_id)
+        self.added(seq, row_id, content)
+
+    def plan(self, conditions: Sequence[Condition]) -> Tuple[Optional[List[int]], Callable[[Any], bool]]:
+        """Devolve (sequências candidatas ordenadas ou None, conferência por linha)."""
+        indexes = [(condition, self._index(condition.path)) for condition in conditions
+                   if self.policy.admit(condition.path)]
+        scanned = [condition for condition in conditions if not self.policy.admit(condition.path)]
+        best = None
+        for condition, index in indexes:
+            if condition.op == "!=":
+                continue
+            count = index.count(condition)
+            if best is None or count < best[1]:
+                best = (condition, count, index)
+
+        candidates = None
+        # Um intervalo grande sai mais barato conferindo as linhas em ordem até encher a página
+        if best is not None and best[1] * 8 <= self._size():
+            condition, _, index = best
+            candidates = self._ranges.get(condition)
+            if candidates is None:
+                candidates = sorted(index.seqs(condition))
+                self._ranges[condition] = candidates
+                if len(self._ranges) > self.max_cached_ranges:
+                    self._ranges.popitem(last=False)
+            else:
+                self._ranges.move_to_end(condition)
+
+        checks = [(index.values, condition) for condition, index in indexes]
+
+        def predicate(row) -> bool:
+            row_id = row.id
+            for values, condition in checks:
+                if not matches(values.get(row_id, _MISSING), condition):
+                    return False
+            if scanned:
+                document = self._parse(row.content)
+                return all(matches(extract_field(document, condition.path), condition) for condition in scanned)
+            return True
+
+        return candidates, predicate
@@ -0,0 +1,117 @@
+"""
+Cache de idempotência para operações de escrita da API do DataBridge Bank.
+Guarda o resultado de cada requisição pela sua chave de idempotência num
+LRU limitado com expiração, de modo que repetições devolvam a resposta
+original em O(1). Requisições concorrentes com a mesma chave aguardam a
+primeira, e só uma escrita acontece.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Tuple
+
+
+class IdempotencyConflictError(Exception):
+    """Chave de idempotência reutilizada com um conteúdo diferente."""
+
+
+class _Entry(NamedTuple):
+    fingerprint: str
+    expires_at: float
+    result: "asyncio.Future[Any]"
+
+
+def _consume_exception(future: "asyncio.Future[Any]") -> None:
+    # Evita o aviso de exceção nunca lida quando ninguém aguardava a entrada
+    if not future.cancelled():
+        future.exception()
+
+
+class IdempotencyCache:
+    """LRU com TTL que associa chaves de idempotência ao resultado da primeira execução."""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 24 * 3600,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_entries < 1:
+            raise ValueError("max_entries deve ser pelo menos 1")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def run(self, key: str, fingerprint: str,
+                  operation: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Executa ``operation`` uma única vez por chave e devolve (resultado, repetido).
+
+        Se a chave já existe com o mesmo ``fingerprint``, devolve o resultado
+        guardado (ou aguarda a execução em andamento). Uma chave igual com
+        fingerprint diferente gera IdempotencyConflictError. Falhas não ficam
+        em cache: a próxima tentativa executa a operação de novo.
+        """
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            del self._entries[key]
+            self.expirations += 1
+            entry = None
+
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyConflictError(key)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if not entry.result.done():
+                self.collapsed += 1
+            return await asyncio.shield(entry.result), True
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+        self._entries[key] = _Entry(fingerprint, now + self.ttl_seconds, future)
+        self._evict(now)
+
+        try:
+            result = await operation()
+        except BaseException as exc:
+            current = self._entries.get(key)
+            if current is not None and current.result is future:
+                del self._entries[key]
+            future.set_exception(exc)
+            raise
+        future.set_result(result)
+        return result, False
+
+    def _evict(self, now: float) -> None:
+        entries = self._entries
+        # Remove do início as entradas já expiradas e, depois, as menos usadas além do limite
+        while entries:
+            oldest = next(iter(entries.values()))
+            if oldest.expires_at > now:
+                break
+            entries.popitem(last=False)
+            self.expirations += 1
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "collapsed": self.collapsed,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
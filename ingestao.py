@@ -0,0 +1,540 @@
+"""
+Leitura incremental de corpos de requisição para ingestão em lote no DataBridge Bank.
+Os dados são consumidos em blocos à medida que chegam, sem nunca montar o
+corpo inteiro em memória: linhas de NDJSON, partes de um multipart e
+registros de arquivos CSV, JSON e XML.
+"""
+import codecs
+import csv
+import json
+import re
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from filtros_conteudo import parse_number
+
+# Linhas maiores que isso são rejeitadas para manter a memória limitada
+MAX_LINE_BYTES = 1024 * 1024
+
+
+class LineTooLongError(ValueError):
+    """Linha do NDJSON maior que o limite permitido."""
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_LINE_BYTES
+) -> AsyncIterator[Tuple[int, Union[bytes, LineTooLongError]]]:
+    """Divide um fluxo de bytes em linhas, devolvendo (número da linha, conteúdo).
+
+    Linhas em branco são puladas, mas contam na numeração. Uma linha acima de
+    ``max_line_bytes`` é devolvida como LineTooLongError no lugar do conteúdo
+    e o restante dela é descartado sem ser acumulado.
+    """
+    buffer = bytearray()
+    line_number = 0
+    discarding = False
+
+    async for chunk in chunks:
+        start = 0
+        while True:
+            newline = chunk.find(b"\n", start)
+            if newline == -1:
+                if not discarding:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        buffer.clear()
+                        discarding = True
+                break
+            line_number += 1
+            if discarding:
+                discarding = False
+                yield line_number, LineTooLongError(f"Linha maior que {max_line_bytes} bytes")
+            else:
+                buffer += chunk[start:newline]
+                if len(buffer) > max_line_bytes:
+                    yield line_number, LineTooLongError(f"Linha maior que {max_line_bytes} bytes")
+                elif buffer.strip():
+                    yield line_number, bytes(buffer)
+            buffer.clear()
+            start = newline + 1
+
+    if discarding:
+        yield line_number + 1, LineTooLongError(f"Linha maior que {max_line_bytes} bytes")
+    elif buffer.strip():
+        yield line_number + 1, bytes(buffer)
+
+
+# ------ Multipart em fluxo ------
+
+# Cabeçalhos de uma parte acima disso indicam um corpo malformado
+MAX_PART_HEADER_BYTES = 16 * 1024
+
+_BOUNDARY = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+_DISPOSITION_PARAM = re.compile(r'(\w+)\*?="([^"]*)"|(\w+)=([^;\s]+)')
+
+
+class MultipartError(ValueError):
+    """Corpo multipart/form-data malformado."""
+
+
+def multipart_boundary(content_type: str) -> bytes:
+    """Extrai o delimitador de um Content-Type multipart/form-data."""
+    if not content_type.lower().startswith("multipart/form-data"):
+        raise MultipartError("Envie os arquivos como multipart/form-data")
+    match = _BOUNDARY.search(content_type)
+    if match is None or len(match.group(1)) > 200:
+        raise MultipartError("Content-Type multipart sem boundary válido")
+    return match.group(1).encode("latin-1")
+
+
+def disposition_params(value: str) -> Dict[str, str]:
+    """Parâmetros de um Content-Disposition (name, filename...)."""
+    params = {}
+    for quoted_name, quoted_value, name, plain_value in _DISPOSITION_PARAM.findall(value):
+        params[(quoted_name or name).lower()] = quoted_value if quoted_name else plain_value
+    return params
+
+
+async def iter_multipart(
+    chunks: AsyncIterator[bytes], boundary: bytes, max_header_bytes: int = MAX_PART_HEADER_BYTES
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Separa um corpo multipart em eventos, à medida que os blocos chegam.
+
+    Para cada parte são devolvidos ("part", cabeçalhos), um ("data", bytes)
+    por trecho do conteúdo e ("end", None) no fim. O conteúdo nunca é
+    acumulado: só fica retido o suficiente para reconhecer um delimitador
+    partido entre dois blocos.
+    """
+    delimiter = b"--" + boundary
+    separator = b"\r\n" + delimiter
+    buffer = bytearray()
+    state = "preamble"
+
+    async for chunk in chunks:
+        buffer += chunk
+        while buffer:
+            if state == "preamble":
+                index = buffer.find(delimiter)
+                if index == -1:
+                    del buffer[:max(0, len(buffer) - len(delimiter))]
+                    break
+                del buffer[:index + len(delimiter)]
+                state = "after_delimiter"
+            elif state == "after_delimiter":
+                if len(buffer) < 2:
+                    break
+                if buffer[:2] == b"--":
+                    return
+                if buffer[:2] != b"\r\n":
+                    raise MultipartError("Delimitador multipart malformado")
+                del buffer[:2]
+                state = "headers"
+            elif state == "headers":
+                end = buffer.find(b"\r\n\r\n")
+                if end == -1:
+                    if len(buffer) > max_header_bytes:
+                        raise MultipartError("Cabeçalhos de parte grandes demais")
+                    break
+                headers = {}
+                for line in bytes(buffer[:end]).decode("utf-8", "replace").split("\r\n"):
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                del buffer[:end + 4]
+                state = "body"
+                yield "part", headers
+            else:
+                index = buffer.find(separator)
+                if index == -1:
+                    # Guarda o bastante para um delimitador que tenha começado neste bloco
+                    keep = len(separator) - 1
+                    if len(buffer) > keep:
+                        data = bytes(buffer[:-keep])
+                        del buffer[:-keep]
+                        yield "data", data
+                    break
+                if index:
+                    yield "data", bytes(buffer[:index])
+                del buffer[:index + len(separator)]
+                state = "after_delimiter"
+                yield "end", None
+
+    raise MultipartError("Corpo multipart terminou antes do delimitador final")
+
+
+# ------ Leitores de registros ------
+
+class RecordParseError(ValueError):
+    """Registro inválido: é rejeitado, mas a leitura do arquivo continua."""
+
+
+class FileParseError(ValueError):
+    """Arquivo que não pode mais ser lido (sintaxe quebrada ou registro grande demais)."""
+
+
+def coerce_numbers(value: Any) -> Any:
+    """Troca os textos que são números (na forma do JSON) pelo número, em qualquer nível do registro.
+
+    Em CSV e XML todo valor chega como texto; convertidos, os campos
+    numéricos se comparam como números nas consultas ``where``, como nos
+    registros JSON. Textos como "000123" seguem como texto.
+    """
+    if isinstance(value, str):
+        number = parse_number(value.strip())
+        return value if number is None else number
+    if isinstance(value, dict):
+        return {key: coerce_numbers(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [coerce_numbers(item) for item in value]
+    return value
+
+
+class CSVRecordParser:
+    """Lê linhas de CSV em blocos; a primeira linha é o cabeçalho.
+
+    Um registro pode ocupar várias linhas quando há quebras dentro de aspas:
+    as linhas são juntadas até o número de aspas ficar par. Células
+    numéricas viram números (``coerce_numbers``).
+    """
+
+    def __init__(self, max_record_bytes: int = MAX_LINE_BYTES):
+        self.max_record_bytes = max_record_bytes
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._partial = ""
+        self._record: List[str] = []
+        self._record_size = 0
+        self._quotes = 0
+        self._header: Optional[List[str]] = None
+        self._line = 0
+
+    def feed(self, data: bytes, final: bool = False) -> List[Union[Tuple[str, Any], RecordParseError]]:
+        lines = (self._partial + self._decoder.decode(data, final)).split("\n")
+        self._partial = "" if final else lines.pop()
+        if len(self._partial) > self.max_record_bytes:
+            raise FileParseError(f"Linha {self._line + 1} maior que {self.max_record_bytes} bytes")
+
+        items = []
+        for line in lines:
+            self._line += 1
+            self._record.append(line)
+            self._record_size += len(line)
+            self._quotes += line.count('"')
+            if self._quotes % 2:
+                if self._record_size > self.max_record_bytes:
+                    raise FileParseError(f"Registro na linha {self._line} maior que {self.max_record_bytes} bytes")
+                continue
+            text = "\n".join(self._record)
+            self._record.clear()
+            self._record_size = self._quotes = 0
+            if not text.strip():
+                continue
+            try:
+                row = next(csv.reader((text,)))
+            except csv.Error as exc:
+                items.append(RecordParseError(f"Linha {self._line}: {exc}"))
+                continue
+            if self._header is None:
+                self._header = [name.strip() for name in row]
+            elif len(row) != len(self._header):
+                items.append(RecordParseError(
+                    f"Linha {self._line}: {len(row)} colunas, o cabeçalho tem {len(self._header)}"
+                ))
+            else:
+                items.append(("csv_row", coerce_numbers(dict(zip(self._header, row)))))
+
+        if final and self._record:
+            raise FileParseError(f"Aspas não fechadas a partir da linha {self._line - len(self._record) + 1}")
+        return items
+
+
+class JSONRecordParser:
+    """Lê os elementos de um array JSON, ou valores em sequência (NDJSON), em blocos."""
+
+    def __init__(self, max_record_bytes: int = MAX_LINE_BYTES):
+        self.max_record_bytes = max_record_bytes
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._mode: Optional[str] = None
+        self._expect_value = True
+        self._count = 0
+
+    def _skip_blank(self, position: int) -> int:
+        buffer = self._buffer
+        while position < len(buffer) and buffer[position] in " \t\r\n":
+            position += 1
+        return position
+
+    def feed(self, data: bytes, final: bool = False) -> List[Union[Tuple[str, Any], RecordParseError]]:
+        self._buffer += self._decoder.decode(data, final)
+        buffer = self._buffer
+        position = 0
+        items = []
+        while True:
+            position = self._skip_blank(position)
+            if position == len(buffer) or self._mode == "done":
+                break
+            if self._mode is None:
+                self._mode = "array" if buffer[position] == "[" else "stream"
+                if self._mode == "array":
+                    position += 1
+                continue
+            if self._mode == "array" and not self._expect_value:
+                if buffer[position] == "]":
+                    self._mode = "done"
+                    position += 1
+                elif buffer[position] == ",":
+                    self._expect_value = True
+                    position += 1
+                else:
+                    raise FileParseError(f"Esperava ',' ou ']' após o elemento {self._count}")
+                continue
+            if self._mode == "array" and buffer[position] == "]" and self._count == 0:
+                self._mode = "done"
+                position += 1
+                continue
+            try:
+                value, end = self._json.raw_decode(buffer, position)
+            except json.JSONDecodeError as exc:
+                if not final and len(buffer) - position <= self.max_record_bytes:
+                    break
+                raise FileParseError(f"JSON inválido no elemento {self._count + 1}: {exc.msg}")
+            if end == len(buffer) and not final:
+                # Um número no fim do bloco pode continuar no próximo
+                break
+            self._count += 1
+            self._expect_value = False
+            position = end
+            items.append(("json_object" if isinstance(value, dict) else "json_value", value))
+
+        self._buffer = buffer[position:]
+        if len(self._buffer) > self.max_record_bytes:
+            raise FileParseError(f"Elemento {self._count + 1} maior que {self.max_record_bytes} bytes")
+        if final and self._mode == "array":
+            raise FileParseError("Array JSON não foi fechado")
+        return items
+
+
+def _element_value(element) -> Any:
+    children = list(element)
+    text = (element.text or "").strip()
+    if not children and not element.attrib:
+        return text
+    value: Dict[str, Any] = dict(element.attrib)
+    for child in children:
+        item = _element_value(child)
+        if child.tag not in value:
+            value[child.tag] = item
+        elif isinstance(value[child.tag], list):
+            value[child.tag].append(item)
+        else:
+            value[child.tag] = [value[child.tag], item]
+    if text:
+        value["#text"] = text
+    return value
+
+
+class XMLRecordParser:
+    """Lê em blocos um documento XML: cada filho do elemento raiz é um registro.
+
+    Os elementos já convertidos são removidos da árvore, então a memória
+    depende do tamanho de um registro e não do arquivo. Textos e atributos
+    numéricos viram números (``coerce_numbers``).
+    """
+
+    def __init__(self):
+        self._parser = ElementTree.XMLPullParser(events=("start", "end"))
+        self._root = None
+        self._depth = 0
+
+    def feed(self, data: bytes, final: bool = False) -> List[Union[Tuple[str, Any], RecordParseError]]:
+        items = []
+        try:
+            self._parser.feed(data)
+            if final:
+                self._parser.close()
+            for event, element in self._parser.read_events():
+                if event == "start":
+                    self._depth += 1
+                    if self._root is None:
+                        self._root = element
+                    continue
+                self._depth -= 1
+                if self._depth == 1:
+                    value = coerce_numbers(_element_value(element))
+                    items.append((element.tag, value if isinstance(value, dict) else {"value": value}))
+                    self._root.clear()
+        except ElementTree.ParseError as exc:
+            raise FileParseError(f"XML inválido: {exc}")
+        return items
+
+
+RECORD_PARSERS = {
+    "csv": CSVRecordParser,
+    "json": JSONRecordParser,
+    "xml": XMLRecordParser,
+}
+
+_EXTENSION_TYPES = {"csv": "csv", "json": "json", "ndjson": "json", "jsonl": "json", "xml": "xml"}
+_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/json": "json",
+    "application/x-ndjson": "json",
+    "application/xml": "xml",
+    "text/xml": "xml",
+}
+
+
+def detect_file_type(filename: str, content_type: Optional[str] = None) -> Optional[str]:
+    """Tipo do arquivo (csv, json ou xml) pela extensão ou, na falta dela, pelo Content-Type."""
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if extension in _EXTENSION_TYPES:
+        return _EXTENSION_TYPES[extension]
+    return _CONTENT_TYPES.get((content_type or "").split(";")[0].strip().lower())
+
+
+def check_record_batch(file_type: str, contents: List[str]) -> List[Tuple[str, Optional[str]]]:
+    """Valida e normaliza um lote de registros de um arquivo.
+
+    Devolve, para cada registro, o status (processed ou failed) e o novo
+    conteúdo quando a normalização o alterou (None se ficou igual). O
+    conteúdo precisa ser JSON; em arquivos CSV e XML precisa ser um objeto
+    e os valores numéricos gravados como texto (por versões anteriores da
+    ingestão) viram números, como na leitura atual. Roda num processo do
+    pool de trabalhos, por isso recebe e devolve só valores simples.
+    """
+    results = []
+    for content in contents:
+        try:
+            value = json.loads(content)
+        except (TypeError, ValueError):
+            results.append(("failed", None))
+            continue
+        if file_type not in ("csv", "xml"):
+            results.append(("processed", None))
+            continue
+        if not isinstance(value, dict):
+            results.append(("failed", None))
+            continue
+        normalized = coerce_numbers(value)
+        changed = normalized != value
+        results.append(("processed", json.dumps(normalized, ensure_ascii=False) if changed else None))
+    return results
+
+
+# ------ Ingestão de um arquivo ------
+
+# Mensagens de rejeição guardadas por arquivo
+MAX_FILE_ERRORS = 100
+
+
+class FileIngestion:
+    """Leva os registros de um arquivo do fluxo até o repositório, em lotes.
+
+    ``insert_batch`` recebe as linhas prontas para a tabela de registros e é
+    chamado a cada ``batch_size`` registros, então só um lote fica em memória.
+    O progresso (bytes lidos, registros gravados e taxas) pode ser consultado
+    a qualquer momento, inclusive enquanto o upload ainda está chegando.
+    """
+
+    def __init__(
+        self,
+        file_id: str,
+        filename: str,
+        file_type: Optional[str],
+        insert_batch: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+        batch_size: int = 1000,
+    ):
+        self.file_id = file_id
+        self.filename = filename
+        self.file_type = file_type
+        self.insert_batch = insert_batch
+        self.batch_size = batch_size
+        self.parser = RECORD_PARSERS[file_type]() if file_type in RECORD_PARSERS else None
+        self.status = "processing" if self.parser else "failed"
+        self.error: Optional[str] = None if self.parser else "Tipo de arquivo não suportado (use CSV, JSON ou XML)"
+        self.bytes = 0
+        self.records = 0
+        self.rejected = 0
+        self.errors: List[str] = []
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self._pending: List[Dict[str, Any]] = []
+
+    async def feed(self, data: bytes) -> None:
+        self.bytes += len(data)
+        if self.parser is not None and self.error is None:
+            await self._consume(data, final=False)
+
+    async def finish(self) -> None:
+        if self.parser is not None and self.error is None:
+            await self._consume(b"", final=True)
+        await self._flush()
+        self.status = "failed" if self.error else "processed"
+        self.finished = time.perf_counter()
+
+    async def _consume(self, data: bytes, final: bool) -> None:
+        try:
+            items = self.parser.feed(data, final)
+        except FileParseError as exc:
+            self.error = str(exc)
+            items = []
+        now = datetime.now()
+        for item in items:
+            if isinstance(item, RecordParseError):
+                self.rejected += 1
+                if len(self.errors) < MAX_FILE_ERRORS:
+                    self.errors.append(str(item))
+                continue
+            record_type, value = item
+            self._pending.append({
+                "file_id": self.file_id,
+                "record_type": record_type,
+                "content": json.dumps(value, ensure_ascii=False),
+                "status": "processed",
+                "created_at": now,
+            })
+            if len(self._pending) >= self.batch_size:
+                await self._flush()
+
+    async def _flush(self) -> None:
+        if self._pending:
+            batch, self._pending = self._pending, []
+            await self.insert_batch(batch)
+            self.records += len(batch)
+
+    def progress(self) -> Dict[str, Any]:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        return {
+            "file_id": self.file_id,
+            "filename": self.filename,
+            "file_type": self.file_type,
+            "status": self.status,
+            "bytes": self.bytes,
+            "records": self.records,
+            "rejected": self.rejected,
+            "errors": list(self.errors),
+            "error": self.error,
+            "elapsed_seconds": round(elapsed, 3),
+            "records_per_second": round(self.records / elapsed, 1) if elapsed else 0.0,
+            "megabytes_per_second": round(self.bytes / elapsed / 2 ** 20, 2) if elapsed else 0.0,
+        }
+
+
+class IngestionTracker:
+    """Progresso das ingestões mais recentes, por id de arquivo (as mais antigas são descartadas)."""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, FileIngestion]" = OrderedDict()
+
+    def track(self, ingestion: FileIngestion) -> None:
+        self._entries[ingestion.file_id] = ingestion
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, file_id: str) -> Optional[FileIngestion]:
+        return self._entries.get(file_id)
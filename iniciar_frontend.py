@@ -1,12 +1,18 @@
 """
 Script para iniciar o servidor frontend da aplicação DataBridge
 """
+import io
 import os
 import http.server
 import socketserver
+import urllib.parse
 import webbrowser
+from datetime import timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
 
+from compressao import compress, compression_settings, is_compressible, negotiate
+
 # Encontrar o diretório frontend
 script_dir = Path(__file__).parent
 frontend_dir = script_dir / "databridge" / "frontend"
@@ -14,6 +20,12 @@ frontend_dir = script_dir / "databridge" / "frontend"
 # Porta para o servidor web
 PORT = 3000
 
+# Compressão gzip/brotli negociada pelo Accept-Encoding (mesmas variáveis DATABRIDGE_COMPRESSION* da API)
+COMPRESSION = compression_settings()
+
+# Arquivos já comprimidos, por caminho e codificação, com o mtime de quando foram lidos
+compressed_files = {}
+
 class Handler(http.server.SimpleHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
         # Definir o diretório raiz para servir os arquivos
@@ -26,6 +38,48 @@ class Handler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', '*')
         super().end_headers()
 
+    def send_head(self):
+        # Arquivos de texto a partir do tamanho mínimo saem comprimidos; o resto segue o servidor padrão
+        encoding = negotiate(self.headers.get('Accept-Encoding', ''), COMPRESSION['encodings'])
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and urllib.parse.urlsplit(self.path).path.endswith('/'):
+            path = os.path.join(path, 'index.html')
+        if encoding is None or not os.path.isfile(path):
+            return super().send_head()
+        content_type = self.guess_type(path)
+        stat = os.stat(path)
+        if (not is_compressible(content_type) or stat.st_size < COMPRESSION['minimum_size']
+                or self.not_modified(stat.st_mtime)):
+            return super().send_head()
+
+        cached = compressed_files.get((path, encoding))
+        if cached is None or cached[0] != stat.st_mtime_ns:
+            with open(path, 'rb') as source:
+                body = compress(source.read(), encoding, COMPRESSION['gzip_level'], COMPRESSION['brotli_quality'])
+            cached = compressed_files[(path, encoding)] = (stat.st_mtime_ns, body)
+        body = cached[1]
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Last-Modified', self.date_time_string(stat.st_mtime))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def not_modified(self, mtime):
+        # Mesma regra do servidor padrão, que responde o 304
+        since = self.headers.get('If-Modified-Since')
+        if since is None or 'If-None-Match' in self.headers:
+            return False
+        try:
+            parsed = parsedate_to_datetime(since)
+        except (TypeError, ValueError):
+            return False
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return int(mtime) <= parsed.timestamp()
+
 print(f"Iniciando servidor frontend DataBridge na porta {PORT}...")
 print(f"Servindo arquivos do diretório: {frontend_dir}")
 
@@ -0,0 +1,194 @@
+"""
+Métricas da API do DataBridge Bank no formato de exposição do Prometheus.
+Um middleware ASGI mede cada requisição (latência até o último byte,
+bytes recebidos e bytes enviados) em histogramas por método, rota e status,
+e mantém o número de requisições em andamento. A rota é o modelo do
+caminho (/api/v1/transactions/{transaction_id}), não o caminho recebido,
+para o número de séries não crescer com os ids.
+
+As observações acontecem no laço de eventos, uma de cada vez, então os
+coletores não usam travas: cada requisição custa uma busca em dicionário e
+três buscas binárias nos limites dos histogramas. Com vários workers cada
+processo expõe os próprios números, como de costume no Prometheus.
+"""
+import inspect
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Limites dos histogramas: segundos de latência e bytes de corpo
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+# Rótulo das requisições que não casaram com nenhuma rota (404), para não criar uma série por caminho
+UNMATCHED_ROUTE = "unmatched"
+
+
+class Histogram:
+    """Histograma de limites fixos; ``counts`` guarda cada faixa e é acumulado só na exposição."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteMetrics:
+    """Histogramas de uma combinação de método, rota e status."""
+
+    __slots__ = ("latency", "request_size", "response_size")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.request_size = Histogram(SIZE_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs)
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Coletores das requisições HTTP e medidores avaliados na hora da coleta.
+
+    ``gauge`` recebe funções sem argumentos (síncronas ou assíncronas) que
+    devolvem pares (rótulos, valor); elas rodam só quando /metrics é
+    consultado.
+    """
+
+    def __init__(self, namespace: str = "databridge", enabled: bool = True):
+        self.namespace = namespace
+        self.enabled = enabled
+        self.routes: Dict[Tuple[str, str, int], RouteMetrics] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.started = time.time()
+        self._gauges: List[Tuple[str, str, str, Callable]] = []
+
+    def gauge(self, name: str, help_text: str, collect: Callable, kind: str = "gauge") -> None:
+        """Registra um medidor (ou contador, com ``kind="counter"``) lido na coleta."""
+        self._gauges.append((name, help_text, kind, collect))
+
+    def observe(self, method: str, route: str, status: int, seconds: float,
+                request_bytes: int, response_bytes: int) -> None:
+        key = (method, route, status)
+        metrics = self.routes.get(key)
+        if metrics is None:
+            metrics = self.routes[key] = RouteMetrics()
+        metrics.latency.observe(seconds)
+        metrics.request_size.observe(request_bytes)
+        metrics.response_size.observe(response_bytes)
+
+    def _histogram_lines(self, name: str, help_text: str, unit: str, attribute: str) -> List[str]:
+        full_name = f"{self.namespace}_{name}_{unit}"
+        lines = [f"# HELP {full_name} {help_text}", f"# TYPE {full_name} histogram"]
+        for (method, route, status), metrics in sorted(self.routes.items()):
+            histogram = getattr(metrics, attribute)
+            labels = _labels((("method", method), ("route", route), ("status", status)))
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                cumulative += count
+                lines.append(f'{full_name}_bucket{{{labels},le="{_format_number(float(bound))}"}} {cumulative}')
+            lines.append(f"{full_name}_sum{{{labels}}} {_format_number(histogram.sum)}")
+            lines.append(f"{full_name}_count{{{labels}}} {histogram.count}")
+        return lines
+
+    async def render(self) -> str:
+        """Texto no formato de exposição 0.0.4 do Prometheus."""
+        namespace = self.namespace
+        lines = self._histogram_lines("http_request_duration", "Latência das requisições até o último byte da resposta.",
+                                      "seconds", "latency")
+        lines += self._histogram_lines("http_request_size", "Bytes do corpo das requisições.", "bytes", "request_size")
+        lines += self._histogram_lines("http_response_size", "Bytes do corpo das respostas, como enviados.",
+                                       "bytes", "response_size")
+        lines += [f"# HELP {namespace}_http_requests_in_flight Requisições em andamento.",
+                  f"# TYPE {namespace}_http_requests_in_flight gauge"]
+        for method, count in sorted(self.in_flight.items()):
+            lines.append(f'{namespace}_http_requests_in_flight{{method="{_escape(method)}"}} {count}')
+        lines += [f"# HELP {namespace}_process_start_time_seconds Início do processo em segundos desde a época.",
+                  f"# TYPE {namespace}_process_start_time_seconds gauge",
+                  f"{namespace}_process_start_time_seconds {_format_number(self.started)}"]
+        for name, help_text, kind, collect in self._gauges:
+            full_name = f"{namespace}_{name}"
+            lines += [f"# HELP {full_name} {help_text}", f"# TYPE {full_name} {kind}"]
+            values = collect()
+            if inspect.isawaitable(values):
+                values = await values
+            for labels, value in values:
+                label_text = f"{{{_labels(labels.items())}}}" if labels else ""
+                lines.append(f"{full_name}{label_text} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def route_label(scope) -> str:
+    """Modelo do caminho da rota que atendeu a requisição, com o prefixo da sub-aplicação montada."""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return UNMATCHED_ROUTE
+    return scope.get("root_path", "") + path
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que alimenta o registro com cada requisição HTTP."""
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        registry = self.registry
+        if scope["type"] != "http" or not registry.enabled:
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        in_flight = registry.in_flight
+        in_flight[method] = in_flight.get(method, 0) + 1
+        status = 500
+        request_bytes = response_bytes = 0
+
+        async def receive_counted():
+            nonlocal request_bytes
+            message = await receive()
+            request_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            in_flight[method] -= 1
+            registry.observe(method, route_label(scope), status, time.perf_counter() - started,
+                             request_bytes, response_bytes)
+
+
+def create_metrics_registry() -> MetricsRegistry:
+    """Registro ligado por padrão; DATABRIDGE_METRICS=false desliga a coleta das requisições."""
+    enabled = os.environ.get("DATABRIDGE_METRICS", "true").strip().lower() not in ("0", "false", "no", "off")
+    return MetricsRegistry(enabled=enabled)
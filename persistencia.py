@@ -0,0 +1,420 @@
+"""
+Persistência do modo memória do DataBridge Bank: log de escrita antecipada
+(WAL) e snapshots compactados.
+Cada alteração das tabelas vira uma linha JSON no log, gravada por uma
+thread própria que junta as alterações de várias requisições num único
+fsync (group commit), fora do caminho da requisição. De tempos em tempos as
+linhas vivas são gravadas num snapshot colunar (snapshot_mapeado) e os
+segmentos de log cobertos por ele são apagados. Na partida, o snapshot mais
+recente é mapeado em memória, sem carregar as linhas, e reaplica-se só a
+cauda do log, em vez de recarregar tudo da origem.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from armazenamento_memoria import MemoryTable
+from snapshot_mapeado import MappedSnapshot, MappedSnapshotError, MappedSnapshotWriter
+
+logger = logging.getLogger("databridge.persistence")
+
+# "async": a requisição não espera o fsync; "commit": espera o fsync do grupo em que entrou
+SYNC_MODES = ("async", "commit")
+
+# Operações registradas no log
+INSERT = "i"
+UPDATE = "u"
+DELETE = "d"
+
+Waiter = Callable[[Optional[BaseException]], None]
+
+
+class PersistenceError(RuntimeError):
+    """Falha ao gravar ou recuperar o estado persistido."""
+
+
+def _segment_name(first_lsn: int) -> str:
+    return f"wal-{first_lsn:020d}.log"
+
+
+def _snapshot_name(start_lsn: int) -> str:
+    return f"snapshot-{start_lsn:020d}.map"
+
+
+def _lsn_of(path: Path) -> int:
+    return int(path.stem.split("-", 1)[1])
+
+
+def _fsync_directory(directory: Path) -> None:
+    # Garante que a renomeação do snapshot sobreviva a uma queda (não se aplica no Windows)
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _future_waiter(loop: asyncio.AbstractEventLoop, future: "asyncio.Future[None]") -> Waiter:
+    """Callback chamado pela thread de escrita para liberar uma corrotina no event loop."""
+    def resolve(error: Optional[BaseException]) -> None:
+        if future.done():
+            return
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(PersistenceError(f"Falha ao gravar o log: {error}"))
+
+    return lambda error: loop.call_soon_threadsafe(resolve, error)
+
+
+class WriteAheadLog:
+    """Log em segmentos gravado por uma thread com group commit.
+
+    ``append`` só enfileira a linha; a thread grava tudo o que acumulou
+    desde o último fsync e faz um único fsync para o lote. Um marcador de
+    rotação na mesma fila fecha o segmento atual e abre o próximo, de modo
+    que a fronteira entre segmentos cai exatamente no LSN pedido.
+    """
+
+    def __init__(self, directory: Path, group_commit_seconds: float = 0.002):
+        self.directory = directory
+        self.group_commit_seconds = group_commit_seconds
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[Any, Optional[Waiter]]] = []
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self.records = 0
+        self.bytes_written = 0
+        self.fsyncs = 0
+        self.fsync_seconds = 0.0
+        self.errors = 0
+
+    def open(self, first_lsn: int) -> None:
+        self._file = open(self.directory / _segment_name(first_lsn), "ab")
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="databridge-wal", daemon=True)
+        self._thread.start()
+
+    def append(self, line: bytes, waiter: Optional[Waiter] = None) -> None:
+        with self._cond:
+            self._pending.append((line, waiter))
+            self._cond.notify()
+
+    def rotate(self, first_lsn: int, waiter: Optional[Waiter] = None) -> None:
+        """Passa a gravar num novo segmento a partir do LSN informado."""
+        with self._cond:
+            self._pending.append((first_lsn, waiter))
+            self._cond.notify()
+
+    def close(self) -> None:
+        """Grava o que estiver pendente e encerra a thread."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                stopping = self._stopping
+            if self.group_commit_seconds > 0 and not stopping:
+                # Espera um pouco para que mais alterações entrem no mesmo fsync
+                time.sleep(self.group_commit_seconds)
+            with self._cond:
+                batch, self._pending = self._pending, []
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Tuple[Any, Optional[Waiter]]]) -> None:
+        waiters = []
+        error: Optional[BaseException] = None
+        try:
+            for item, waiter in batch:
+                if isinstance(item, bytes):
+                    self._file.write(item)
+                    self.records += 1
+                    self.bytes_written += len(item)
+                else:
+                    self._sync()
+                    self._file.close()
+                    self._file = open(self.directory / _segment_name(item), "ab")
+                if waiter is not None:
+                    waiters.append(waiter)
+            self._sync()
+        except OSError as exc:
+            self.errors += 1
+            error = exc
+            logger.exception("Falha ao gravar o log de escrita")
+        for waiter in waiters:
+            waiter(error)
+
+    def _sync(self) -> None:
+        started = time.perf_counter()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+        self.fsync_seconds += time.perf_counter() - started
+
+
+class MemoryPersistence:
+    """Log de escrita e snapshots periódicos das tabelas do modo memória.
+
+    As linhas vão para o log e para o snapshot no formato interno das
+    tabelas compactas (datas como inteiros, valores aninhados como pares),
+    então gravar e recarregar não passa pelos modelos da API. O snapshot é
+    escrito numa thread enquanto a API continua atendendo: ele registra o
+    LSN em que começou e a recuperação reaplica o log a partir dali, o que
+    corrige qualquer linha que tenha mudado durante a cópia. Na partida, as
+    tabelas passam a ler direto do snapshot mapeado.
+    """
+
+    def __init__(self, directory: Path, sync_mode: str = "async", group_commit_ms: float = 2.0,
+                 snapshot_interval: float = 300.0, snapshot_min_records: int = 10000):
+        if sync_mode not in SYNC_MODES:
+            raise ValueError(f"Modo de sincronização desconhecido: {sync_mode}")
+        self.directory = Path(directory)
+        self.sync_mode = sync_mode
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_min_records = snapshot_min_records
+        self.wal = WriteAheadLog(self.directory, group_commit_ms / 1000)
+        self.tables: Dict[str, MemoryTable] = {}
+        self.next_lsn = 0
+        self.records_since_snapshot = 0
+        self.logical_bytes = 0
+        self.snapshots = 0
+        self.snapshot_bytes = 0
+        self.last_snapshot: Optional[Dict[str, Any]] = None
+        self.recovery: Dict[str, Any] = {}
+        self.mapped: Optional[MappedSnapshot] = None
+        self._snapshot_lock: Optional[asyncio.Lock] = None
+        self._snapshot_task: Optional[asyncio.Task] = None
+
+    # ------ Partida e encerramento ------
+    async def start(self, tables: Dict[str, MemoryTable]) -> Dict[str, Any]:
+        """Recupera o estado gravado nas tabelas e começa a registrar alterações."""
+        self.recover(tables)
+        self.wal.open(self.next_lsn)
+        self._snapshot_lock = asyncio.Lock()
+        if self.snapshot_interval > 0:
+            self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+        return self.recovery
+
+    async def close(self, snapshot: bool = True) -> None:
+        """Para os snapshots periódicos, grava um último snapshot e esvazia o log."""
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+        if snapshot and self.records_since_snapshot:
+            await self.snapshot()
+        await asyncio.to_thread(self.wal.close)
+
+    def recover(self, tables: Dict[str, MemoryTable]) -> Dict[str, Any]:
+        """Carrega o snapshot mais recente e reaplica a cauda do log."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.tables = tables
+        started = time.perf_counter()
+        start_lsn, snapshot_rows = 0, 0
+        snapshots = sorted(self.directory.glob("snapshot-*.map"))
+        if snapshots:
+            start_lsn, snapshot_rows = self._open_snapshot(snapshots[-1])
+        snapshot_seconds = time.perf_counter() - started
+        self.next_lsn, replayed = self._replay(start_lsn)
+        self.recovery = {
+            "snapshot": snapshots[-1].name if snapshots else None,
+            "snapshot_rows": snapshot_rows,
+            "replayed_records": replayed,
+            "snapshot_seconds": round(snapshot_seconds, 3),
+            "replay_seconds": round(time.perf_counter() - started - snapshot_seconds, 3),
+            "total_seconds": round(time.perf_counter() - started, 3),
+        }
+        logger.info("Estado recuperado de %s: %d linhas do snapshot e %d registros do log em %.2fs",
+                    self.directory, snapshot_rows, replayed, self.recovery["total_seconds"])
+        return self.recovery
+
+    def _open_snapshot(self, path: Path) -> Tuple[int, int]:
+        try:
+            self.mapped = MappedSnapshot(path, {entity: table.row_type for entity, table in self.tables.items()})
+        except MappedSnapshotError as exc:
+            # Snapshots só aparecem depois de completos; um arquivo inválido não pode ser ignorado
+            raise PersistenceError(f"Snapshot {path.name} corrompido: {exc}")
+        for entity, base in self.mapped.tables.items():
+            self.tables[entity].attach_base(base)
+        return self.mapped.start_lsn, self.mapped.rows
+
+    def _replay(self, start_lsn: int) -> Tuple[int, int]:
+        next_lsn, replayed = start_lsn, 0
+        for segment in sorted(self.directory.glob("wal-*.log")):
+            with open(segment, "rb") as f:
+                for line in f:
+                    try:
+                        lsn, op, entity, row_id, payload = json.loads(line)
+                    except ValueError:
+                        # Linha truncada por uma queda durante a escrita: o resto do segmento é descartado
+                        logger.warning("Registro incompleto no fim de %s descartado", segment.name)
+                        break
+                    if lsn < start_lsn:
+                        continue
+                    self._apply(self.tables[entity], op, row_id, payload)
+                    next_lsn = lsn + 1
+                    replayed += 1
+        return next_lsn, replayed
+
+    @staticmethod
+    def _apply(table: MemoryTable, op: str, row_id: str, payload: Any) -> None:
+        if op == INSERT:
+            table.restore(payload[0], payload[1])
+        elif op == UPDATE:
+            if row_id in table:
+                restore = table.row_type.restore_value
+                table.update_encoded(row_id, {field: restore(field, value) for field, value in payload.items()})
+        elif op == DELETE:
+            if row_id in table:
+                table.delete(row_id)
+        else:
+            raise PersistenceError(f"Operação desconhecida no log: {op}")
+
+    # ------ Registro de alterações ------
+    async def append(self, op: str, entity: str, row_id: str, payload: Any) -> None:
+        """Registra uma alteração já aplicada na tabela.
+
+        No modo "async" só enfileira a linha; no modo "commit" espera o fsync
+        do lote em que ela entrou.
+        """
+        lsn = self.next_lsn
+        self.next_lsn += 1
+        body = json.dumps(payload, separators=(",", ":"))
+        line = f'[{lsn},"{op}","{entity}",{json.dumps(row_id)},{body}]\n'.encode()
+        self.logical_bytes += len(body)
+        self.records_since_snapshot += 1
+        if self.sync_mode == "commit":
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self.wal.append(line, _future_waiter(loop, future))
+            await future
+        else:
+            self.wal.append(line)
+
+    async def log_insert(self, entity: str, row_id: str) -> None:
+        seq, values = self.tables[entity].encoded_row(row_id)
+        await self.append(INSERT, entity, row_id, [seq, values])
+
+    async def log_update(self, entity: str, row_id: str, fields) -> None:
+        await self.append(UPDATE, entity, row_id, self.tables[entity].encoded_fields(row_id, fields))
+
+    async def log_delete(self, entity: str, row_id: str) -> None:
+        await self.append(DELETE, entity, row_id, None)
+
+    # ------ Snapshots ------
+    async def snapshot(self) -> Dict[str, Any]:
+        """Grava um snapshot das linhas vivas e apaga o log que ele torna desnecessário."""
+        async with self._snapshot_lock:
+            start_lsn = self.next_lsn
+            if (self.directory / _snapshot_name(start_lsn)).exists():
+                # Nada mudou desde o último snapshot (que pode estar mapeado pelas tabelas)
+                return self.last_snapshot or {"file": _snapshot_name(start_lsn), "start_lsn": start_lsn}
+            loop = asyncio.get_running_loop()
+            rotated = loop.create_future()
+            # Alterações a partir de start_lsn vão para um segmento novo, que sobrevive ao snapshot
+            self.wal.rotate(start_lsn, _future_waiter(loop, rotated))
+            self.records_since_snapshot = 0
+            result = await asyncio.to_thread(self._write_snapshot, start_lsn)
+            await rotated
+            self._remove_obsolete(start_lsn)
+            return result
+
+    def _write_snapshot(self, start_lsn: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        path = self.directory / _snapshot_name(start_lsn)
+        temporary = path.with_suffix(".tmp")
+        writer = MappedSnapshotWriter(temporary, start_lsn)
+        try:
+            for entity, table in self.tables.items():
+                writer.add_table(entity, table)
+            size = writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        os.replace(temporary, path)
+        _fsync_directory(self.directory)
+
+        self.snapshots += 1
+        self.snapshot_bytes += size
+        self.last_snapshot = {
+            "file": path.name,
+            "start_lsn": start_lsn,
+            "rows": writer.rows,
+            "bytes": size,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        logger.info("Snapshot %s gravado: %d linhas, %d bytes", path.name, writer.rows, size)
+        return self.last_snapshot
+
+    def _remove_obsolete(self, start_lsn: int) -> None:
+        for path in [*self.directory.glob("snapshot-*.map"), *self.directory.glob("wal-*.log")]:
+            if _lsn_of(path) < start_lsn:
+                try:
+                    path.unlink()
+                except PermissionError:
+                    # No Windows o snapshot mapeado em uso não pode ser apagado; fica para o próximo
+                    logger.debug("%s ainda em uso; será removido depois", path.name)
+
+    async def _snapshot_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            if self.records_since_snapshot >= self.snapshot_min_records:
+                try:
+                    await self.snapshot()
+                except (OSError, PersistenceError, MappedSnapshotError):
+                    logger.exception("Falha ao gravar snapshot")
+
+    def stats(self) -> Dict[str, Any]:
+        wal = self.wal
+        written = wal.bytes_written + self.snapshot_bytes
+        return {
+            "directory": str(self.directory),
+            "sync_mode": self.sync_mode,
+            "next_lsn": self.next_lsn,
+            "records_since_snapshot": self.records_since_snapshot,
+            "wal": {
+                "records": wal.records,
+                "bytes": wal.bytes_written,
+                "fsyncs": wal.fsyncs,
+                "records_per_fsync": round(wal.records / wal.fsyncs, 2) if wal.fsyncs else 0.0,
+                "avg_fsync_ms": round(wal.fsync_seconds / wal.fsyncs * 1000, 3) if wal.fsyncs else 0.0,
+                "errors": wal.errors,
+            },
+            "snapshots": {"count": self.snapshots, "bytes": self.snapshot_bytes, "last": self.last_snapshot},
+            # Bytes gravados em disco por byte de conteúdo alterado
+            "logical_bytes": self.logical_bytes,
+            "write_amplification": round(written / self.logical_bytes, 2) if self.logical_bytes else 0.0,
+            "recovery": self.recovery,
+        }
+
+
+def create_persistence() -> Optional[MemoryPersistence]:
+    """Cria a persistência do modo memória se DATABRIDGE_PERSISTENCE_DIR estiver definida."""
+    directory = os.environ.get("DATABRIDGE_PERSISTENCE_DIR")
+    if not directory:
+        return None
+    return MemoryPersistence(
+        Path(directory),
+        sync_mode=os.environ.get("DATABRIDGE_WAL_SYNC", "async").lower(),
+        group_commit_ms=float(os.environ.get("DATABRIDGE_WAL_GROUP_COMMIT_MS", "2")),
+        snapshot_interval=float(os.environ.get("DATABRIDGE_SNAPSHOT_INTERVAL", "300")),
+        snapshot_min_records=int(os.environ.get("DATABRIDGE_SNAPSHOT_MIN_RECORDS", "10000")),
+    )
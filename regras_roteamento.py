@@ -0,0 +1,290 @@
+"""
+Motor de regras de roteamento de transações do DataBridge Bank.
+As regras ficam numa tabela declarativa (JSON) avaliada na ordem em que
+aparecem: vale a primeira que combinar, como numa cadeia de ifs. Na carga,
+a tabela é compilada numa estrutura de decisão com despacho por dicionário
+(moeda, tipo e prefixo da conta de origem) e busca binária nas faixas de
+valor, de modo que o custo por transação quase não cresce com o número de
+regras. O arquivo pode ser recarregado sem reiniciar a API.
+"""
+import asyncio
+import json
+import logging
+import os
+from bisect import bisect_left
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger("databridge.routing")
+
+DEFAULT_RULES_FILE = Path(__file__).parent / "regras_roteamento.json"
+
+# Tabela usada quando o arquivo de regras não existe (mesmo comportamento do arquivo padrão)
+BUILTIN_RULES = {
+    "default": {"route": "standard", "priority": "normal"},
+    "rules": [
+        {"name": "alto_valor", "amount_gt": 10000, "routing": {"route": "high_value", "priority": "high"}}
+    ]
+}
+
+_AMOUNT_KEYS = ("amount_gt", "amount_gte", "amount_lt", "amount_lte")
+_RULE_KEYS = {"name", "currency", "transaction_type", "account_prefix", "routing", *_AMOUNT_KEYS}
+
+
+class RoutingRulesError(ValueError):
+    """Tabela de regras de roteamento inválida."""
+
+
+class RoutingRule(NamedTuple):
+    name: str
+    currencies: Optional[frozenset]
+    transaction_types: Optional[frozenset]
+    account_prefix: Optional[str]
+    lower: Optional[float]
+    lower_inclusive: bool
+    upper: Optional[float]
+    upper_inclusive: bool
+    routing: Dict[str, Any]
+
+    def amount_matches(self, amount: float) -> bool:
+        if self.lower is not None and (amount < self.lower or (amount == self.lower and not self.lower_inclusive)):
+            return False
+        if self.upper is not None and (amount > self.upper or (amount == self.upper and not self.upper_inclusive)):
+            return False
+        return True
+
+    def matches(self, currency: str, transaction_type: str, account: str, amount: float) -> bool:
+        return ((self.currencies is None or currency in self.currencies)
+                and (self.transaction_types is None or transaction_type in self.transaction_types)
+                and (self.account_prefix is None or account.startswith(self.account_prefix))
+                and self.amount_matches(amount))
+
+
+def _value_set(rule: Dict[str, Any], key: str) -> Optional[frozenset]:
+    value = rule.get(key)
+    if value is None:
+        return None
+    values = [value] if isinstance(value, str) else value
+    if not isinstance(values, list) or not values or not all(isinstance(item, str) for item in values):
+        raise RoutingRulesError(f"'{key}' deve ser um texto ou uma lista de textos")
+    return frozenset(values)
+
+
+def parse_rules(data: Dict[str, Any]) -> Tuple[List[RoutingRule], Dict[str, Any]]:
+    """Valida a tabela declarativa e devolve (regras, roteamento padrão)."""
+    if not isinstance(data, dict) or not isinstance(data.get("rules", []), list):
+        raise RoutingRulesError("A tabela deve ser um objeto com a lista 'rules'")
+    default = data.get("default", BUILTIN_RULES["default"])
+    if not isinstance(default, dict):
+        raise RoutingRulesError("'default' deve ser um objeto")
+
+    rules = []
+    for position, rule in enumerate(data.get("rules", []), start=1):
+        if not isinstance(rule, dict):
+            raise RoutingRulesError(f"Regra {position}: deve ser um objeto")
+        unknown = set(rule) - _RULE_KEYS
+        if unknown:
+            raise RoutingRulesError(f"Regra {position}: campos desconhecidos {', '.join(sorted(unknown))}")
+        if not isinstance(rule.get("routing"), dict):
+            raise RoutingRulesError(f"Regra {position}: 'routing' é obrigatório e deve ser um objeto")
+        if ("amount_gt" in rule and "amount_gte" in rule) or ("amount_lt" in rule and "amount_lte" in rule):
+            raise RoutingRulesError(f"Regra {position}: use só um limite inferior e um superior")
+        for key in _AMOUNT_KEYS:
+            if key in rule and not isinstance(rule[key], (int, float)):
+                raise RoutingRulesError(f"Regra {position}: '{key}' deve ser numérico")
+        prefix = rule.get("account_prefix")
+        if prefix is not None and (not isinstance(prefix, str) or not prefix):
+            raise RoutingRulesError(f"Regra {position}: 'account_prefix' deve ser um texto não vazio")
+        try:
+            currencies = _value_set(rule, "currency")
+            transaction_types = _value_set(rule, "transaction_type")
+        except RoutingRulesError as exc:
+            raise RoutingRulesError(f"Regra {position}: {exc}")
+
+        lower = rule.get("amount_gte", rule.get("amount_gt"))
+        upper = rule.get("amount_lte", rule.get("amount_lt"))
+        rules.append(RoutingRule(
+            name=str(rule.get("name", f"regra_{position}")),
+            currencies=currencies,
+            transaction_types=transaction_types,
+            account_prefix=prefix,
+            lower=None if lower is None else float(lower),
+            lower_inclusive="amount_gte" in rule,
+            upper=None if upper is None else float(upper),
+            upper_inclusive="amount_lte" in rule,
+            routing=rule["routing"],
+        ))
+    return rules, default
+
+
+def decide_linear(rules: Sequence[RoutingRule], default: Dict[str, Any], currency: str,
+                  transaction_type: str, account: str, amount: float) -> Dict[str, Any]:
+    """Avaliação de referência, regra por regra (usada para conferir a versão compilada)."""
+    for rule in rules:
+        if rule.matches(currency, transaction_type, account, amount):
+            return rule.routing
+    return default
+
+
+class _AmountLookup:
+    """Primeira regra aplicável por faixa elementar de valor, localizada por bisect.
+
+    Os limites das regras dividem a reta em pontos e intervalos abertos
+    alternados: para k pontos há 2k + 1 segmentos, e o segmento de um valor
+    sai de uma única busca binária.
+    """
+
+    __slots__ = ("points", "decisions")
+
+    def __init__(self, rules: Sequence[RoutingRule], default: Dict[str, Any]):
+        self.points = sorted({bound for rule in rules for bound in (rule.lower, rule.upper) if bound is not None})
+        self.decisions = [self._first_match(rules, default, probe) for probe in self._probes()]
+
+    def _probes(self) -> List[float]:
+        points = self.points
+        if not points:
+            return [0.0]
+        probes = [points[0] - 1.0]
+        for position, point in enumerate(points):
+            probes.append(point)
+            following = points[position + 1] if position + 1 < len(points) else point + 2.0
+            probes.append((point + following) / 2)
+        return probes
+
+    @staticmethod
+    def _first_match(rules: Sequence[RoutingRule], default: Dict[str, Any], amount: float) -> Dict[str, Any]:
+        for rule in rules:
+            if rule.amount_matches(amount):
+                return rule.routing
+        return default
+
+    def decide(self, amount: float) -> Dict[str, Any]:
+        points = self.points
+        position = bisect_left(points, amount)
+        if position < len(points) and points[position] == amount:
+            return self.decisions[2 * position + 1]
+        return self.decisions[2 * position]
+
+
+class _Bucket:
+    """Regras de uma combinação (moeda, tipo), separadas por classe de prefixo da conta."""
+
+    __slots__ = ("prefix_lengths", "lookups")
+
+    def __init__(self, rules: Sequence[RoutingRule], default: Dict[str, Any]):
+        prefixes = {rule.account_prefix for rule in rules if rule.account_prefix is not None}
+        self.prefix_lengths = sorted({len(prefix) for prefix in prefixes}, reverse=True)
+        # A classe de uma conta é o maior prefixo conhecido que ela tem ("" se nenhum)
+        self.lookups: Dict[str, _AmountLookup] = {}
+        for account_class in prefixes | {""}:
+            applicable = [rule for rule in rules
+                          if rule.account_prefix is None or account_class.startswith(rule.account_prefix)]
+            self.lookups[account_class] = _AmountLookup(applicable, default)
+
+    def decide(self, account: str, amount: float) -> Dict[str, Any]:
+        lookups = self.lookups
+        for length in self.prefix_lengths:
+            if len(account) >= length:
+                lookup = lookups.get(account[:length])
+                if lookup is not None:
+                    return lookup.decide(amount)
+        return lookups[""].decide(amount)
+
+
+class CompiledRoutingTable:
+    """Estrutura de decisão gerada a partir da tabela declarativa."""
+
+    def __init__(self, rules: Sequence[RoutingRule], default: Dict[str, Any]):
+        self.rules = list(rules)
+        self.default = default
+        currencies = sorted({value for rule in rules if rule.currencies for value in rule.currencies})
+        transaction_types = sorted({value for rule in rules if rule.transaction_types for value in rule.transaction_types})
+        self._currencies = frozenset(currencies)
+        self._transaction_types = frozenset(transaction_types)
+        # None representa qualquer valor que nenhuma regra cita explicitamente
+        self._buckets: Dict[Tuple[Optional[str], Optional[str]], _Bucket] = {}
+        for currency in [*currencies, None]:
+            for transaction_type in [*transaction_types, None]:
+                bucket_rules = [
+                    rule for rule in rules
+                    if (rule.currencies is None or currency in rule.currencies)
+                    and (rule.transaction_types is None or transaction_type in rule.transaction_types)
+                ]
+                self._buckets[(currency, transaction_type)] = _Bucket(bucket_rules, default)
+
+    def decide(self, currency: str, transaction_type: str, account: str, amount: float) -> Dict[str, Any]:
+        bucket = self._buckets[(
+            currency if currency in self._currencies else None,
+            transaction_type if transaction_type in self._transaction_types else None,
+        )]
+        return bucket.decide(account, amount)
+
+
+class RoutingEngine:
+    """Mantém a tabela compilada em uso e a recarrega quando o arquivo muda."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else DEFAULT_RULES_FILE
+        self.loaded_at: Optional[datetime] = None
+        self._mtime: Optional[float] = None
+        self.table = CompiledRoutingTable(*parse_rules(BUILTIN_RULES))
+        if self.path.exists():
+            self.reload()
+        else:
+            logger.warning("Arquivo de regras %s não encontrado; usando a regra padrão embutida", self.path)
+
+    def reload(self) -> int:
+        """Lê e compila o arquivo de regras; em caso de erro a tabela anterior continua valendo."""
+        mtime = self.path.stat().st_mtime
+        with open(self.path, "r", encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as exc:
+                raise RoutingRulesError(f"JSON inválido: {exc}")
+        table = CompiledRoutingTable(*parse_rules(data))
+        # A troca é uma única atribuição: requisições em andamento usam a tabela antiga ou a nova
+        self.table = table
+        self._mtime = mtime
+        self.loaded_at = datetime.now()
+        logger.info("Regras de roteamento carregadas de %s (%d regras)", self.path, len(table.rules))
+        return len(table.rules)
+
+    def reload_if_changed(self) -> bool:
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            self.reload()
+        except (RoutingRulesError, OSError) as exc:
+            # Evita tentar de novo até o arquivo mudar outra vez
+            self._mtime = mtime
+            logger.error("Falha ao recarregar regras de roteamento: %s", exc)
+            return False
+        return True
+
+    async def watch(self, interval: float) -> None:
+        """Verifica periodicamente se o arquivo de regras mudou."""
+        while True:
+            await asyncio.sleep(interval)
+            self.reload_if_changed()
+
+    def decide(self, currency: str, transaction_type: str, account: str, amount: float) -> Dict[str, Any]:
+        return dict(self.table.decide(currency, transaction_type, account, amount))
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "rules": len(self.table.rules),
+            "loaded_at": self.loaded_at,
+            "default": self.table.default,
+        }
+
+
+def create_routing_engine() -> RoutingEngine:
+    """Cria o motor a partir de DATABRIDGE_ROUTING_RULES (ou do arquivo padrão)."""
+    path = os.environ.get("DATABRIDGE_ROUTING_RULES")
+    return RoutingEngine(Path(path) if path else None)
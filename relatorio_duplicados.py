@@ -0,0 +1,82 @@
+"""
+Relatório de clientes duplicados do DataBridge Bank.
+Percorre os clientes do banco configurado e lista os grupos que repetem o
+tax_id ou o e-mail (comparados como nas restrições de unicidade: sem
+espaços nas pontas e, no e-mail, sem diferença de maiúsculas). Esses
+grupos foram gravados antes da restrição e impedem a criação do índice
+único até serem resolvidos.
+
+Uso:
+    python relatorio_duplicados.py --db-mode sqlite
+    python relatorio_duplicados.py --db-mode postgres --json
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+from repositorios import CLIENTS, UNIQUE_FIELDS, create_repository, unique_key
+
+
+async def find_duplicates(repository, page_size: int = 5000) -> Dict[str, Any]:
+    """Grupos de ids por valor repetido de cada campo único, numa única passada."""
+    first: Dict[str, Dict[str, str]] = {field: {} for field in UNIQUE_FIELDS[CLIENTS]}
+    groups: Dict[str, Dict[str, List[str]]] = {field: {} for field in UNIQUE_FIELDS[CLIENTS]}
+    scanned, after = 0, None
+    while True:
+        page = await repository.find(CLIENTS, {}, limit=page_size, after=after)
+        for row in page.rows:
+            for field, seen in first.items():
+                key = unique_key(field, row.get(field))
+                if key is None:
+                    continue
+                owner = seen.setdefault(key, row["id"])
+                if owner != row["id"]:
+                    groups[field].setdefault(key, [owner]).append(row["id"])
+        scanned += len(page.rows)
+        if page.next_key is None:
+            break
+        after = page.next_key
+    return {
+        "clients": scanned,
+        "duplicates": {
+            field: [{"value": key, "ids": ids} for key, ids in sorted(found.items())]
+            for field, found in groups.items()
+        },
+    }
+
+
+async def run(mode: str) -> Dict[str, Any]:
+    repository = create_repository(mode)
+    await repository.connect()
+    try:
+        return await find_duplicates(repository)
+    finally:
+        await repository.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lista os clientes que repetem tax_id ou e-mail")
+    parser.add_argument("--db-mode", choices=["memory", "sqlite", "postgres", "mongodb"],
+                        default=os.environ.get("DATABRIDGE_DB_MODE") or "sqlite")
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    report = asyncio.run(run(args.db_mode))
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"\n{report['clients']:,} clientes verificados em {report['elapsed_seconds']:.2f}s ({args.db_mode})")
+    for field, groups in report["duplicates"].items():
+        print(f"\n{field}: {len(groups)} valor(es) repetido(s)")
+        for group in groups:
+            print(f"  {group['value']:<40} {len(group['ids'])} clientes: {', '.join(group['ids'])}")
+
+
+if __name__ == "__main__":
+    main()
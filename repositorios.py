@@ -0,0 +1,1111 @@
+"""
+Camada de repositórios da API do DataBridge Bank.
+Os endpoints falam apenas com a interface Repository; a implementação
+(memória, PostgreSQL ou MongoDB) é escolhida na inicialização a partir da
+variável DATABRIDGE_DB_MODE, a mesma definida pelos scripts de inicialização.
+Os drivers de banco são assíncronos (asyncpg e motor) para que nenhuma
+consulta bloqueie o event loop; o SQLite, que é síncrono, roda numa thread
+própria.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import re
+import sqlite3
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from armazenamento_memoria import MemoryTable, ClientRow, TransactionRow, FileRow, RecordRow, decode_datetime
+from filtros_conteudo import Condition, ContentIndexes, create_content_index_policy
+from persistencia import MemoryPersistence, create_persistence
+
+# Entidades expostas pela API
+CLIENTS = "clients"
+TRANSACTIONS = "transactions"
+FILES = "files"
+RECORDS = "records"
+
+# Campos com restrição de unicidade, comparados pela forma de unique_key
+UNIQUE_FIELDS = {CLIENTS: ("tax_id", "email")}
+_UNIQUE_INDEX = re.compile(r"idx_(\w+?)_(\w+)_unique")
+
+logger = logging.getLogger("databridge.repository")
+
+
+class InvalidCursorError(ValueError):
+    """Cursor de paginação que não pertence ao backend em uso."""
+
+
+class DuplicateKeyError(ValueError):
+    """Valor de um campo único (como o tax_id de um cliente) já usado por outra linha."""
+
+    def __init__(self, entity: str, field: str):
+        super().__init__(f"{entity}.{field} duplicado")
+        self.entity = entity
+        self.field = field
+
+
+def unique_key(field: str, value: Any) -> Optional[str]:
+    """Forma comparada na unicidade: sem espaços nas pontas e, no e-mail, em minúsculas.
+
+    Vazio ou ausente não participa da restrição.
+    """
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    if field == "email":
+        value = value.lower()
+    return value or None
+
+
+def _unique_index_name(table: str, field: str) -> str:
+    return f"idx_{table}_{field}_unique"
+
+
+def _raise_duplicate(entity: str, exc: Exception) -> None:
+    """Converte a violação de um índice único criado aqui em DuplicateKeyError."""
+    match = _UNIQUE_INDEX.search(getattr(exc, "constraint_name", None) or str(exc))
+    if match is not None and match.group(2) in UNIQUE_FIELDS.get(entity, ()):
+        raise DuplicateKeyError(entity, match.group(2)) from exc
+
+
+class Page(NamedTuple):
+    """Página de resultados e a chave de ordenação da última linha, quando há mais."""
+    rows: List[Dict[str, Any]]
+    next_key: Optional[Any] = None
+
+
+class Repository(ABC):
+    """Interface de armazenamento usada pelos endpoints.
+
+    Todas as linhas trafegam como dicionários com os campos dos modelos da
+    API; o id é atribuído pelo repositório na inserção e sempre exposto como
+    string. ``find`` pagina por ``skip`` ou pela chave ordenada ``after``
+    e, nos registros de dados, aceita condições ``where`` sobre campos do
+    conteúdo JSON, atendidas por índices criados na primeira consulta.
+    ``insert`` e ``update`` levantam DuplicateKeyError quando um campo de
+    UNIQUE_FIELDS repetiria o valor de outra linha. ``update`` com
+    ``expected`` só grava se a linha ainda tiver aqueles valores, numa única
+    operação no banco, o que permite mudanças de estado sem corrida.
+    """
+
+    mode = ""
+
+    async def connect(self) -> None:
+        """Abre as conexões com o banco, quando houver."""
+
+    async def close(self) -> None:
+        """Libera as conexões abertas em connect."""
+
+    @abstractmethod
+    async def insert(self, entity: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Grava uma nova linha e devolve a versão armazenada, já com id."""
+
+    async def insert_many(self, entity: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Grava várias linhas da mesma entidade."""
+        return [await self.insert(entity, data) for data in rows]
+
+    @abstractmethod
+    async def get(self, entity: str, row_id: str) -> Optional[Dict[str, Any]]:
+        """Busca uma linha pelo id."""
+
+    @abstractmethod
+    async def find(self, entity: str, filters: Dict[str, Any], skip: int = 0,
+                   limit: int = 100, after: Optional[Any] = None, where: Sequence[Condition] = ()) -> Page:
+        """Lista linhas que atendem aos filtros de igualdade (valores None são ignorados).
+
+        ``limit`` menor que 1 devolve uma página vazia e ``skip`` negativo vale como 0.
+        """
+
+    def sort_key(self, entity: str, row: Dict[str, Any]) -> Any:
+        """Chave de ordenação de uma linha gravada, comparável às chaves das páginas de ``find``."""
+        return int(row["id"])
+
+    async def version(self, entity: str, row_id: str) -> Optional[datetime]:
+        """updated_at de uma linha, sem montar a linha inteira; None se ela não existe ou não tem a data."""
+        row = await self.get(entity, row_id)
+        return row.get("updated_at") if row is not None else None
+
+    @abstractmethod
+    async def count(self, entity: str) -> int:
+        """Número de linhas da entidade; no PostgreSQL e no MongoDB é a estimativa mantida pelo banco."""
+
+    @abstractmethod
+    async def update(self, entity: str, row_id: str, changes: Dict[str, Any],
+                     expected: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Altera campos de uma linha; devolve None se ela não existir ou não tiver os valores de ``expected``."""
+
+    @abstractmethod
+    async def delete(self, entity: str, row_id: str) -> bool:
+        """Remove uma linha; devolve False se ela não existir."""
+
+
+def _active_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: value for field, value in filters.items() if value is not None}
+
+
+def _check_where(entity: str, where: Sequence[Condition]) -> None:
+    if where and entity != RECORDS:
+        raise ValueError(f"Condições where só se aplicam ao conteúdo dos registros, não a {entity}")
+
+
+def _content_index_name(path: Tuple[str, ...]) -> str:
+    return '"idx_data_records_content_' + "__".join(path) + '"'
+
+
+class MemoryRepository(Repository):
+    """Repositório em memória baseado nas tabelas compactas e indexadas.
+
+    Com ``persistence`` as alterações também vão para o log de escrita e o
+    estado é recuperado de disco em ``connect``.
+    """
+
+    mode = "memory"
+
+    def __init__(self, persistence: Optional[MemoryPersistence] = None):
+        self.persistence = persistence
+        self.tables: Dict[str, MemoryTable] = {
+            CLIENTS: MemoryTable(ClientRow),
+            TRANSACTIONS: MemoryTable(TransactionRow, indexed_fields=("status", "transaction_type")),
+            FILES: MemoryTable(FileRow, indexed_fields=("status", "file_type")),
+            # O índice por file_id localiza os registros de um upload sem varrer os demais
+            RECORDS: MemoryTable(RecordRow, indexed_fields=("file_id", "record_type")),
+        }
+        records = self.tables[RECORDS]
+        # Índices sobre campos do conteúdo dos registros, criados na primeira consulta com where
+        self.content_indexes = ContentIndexes(self._record_contents, lambda: len(records),
+                                              policy=create_content_index_policy())
+        # Índices hash dos campos únicos (entidade -> campo -> valor normalizado -> id), montados na primeira escrita
+        self._unique: Dict[str, Dict[str, Dict[str, str]]] = {}
+
+    def _record_contents(self):
+        id_position, content_position = RecordRow.fields.index("id"), RecordRow.fields.index("content")
+        for seq, values in self.tables[RECORDS].iter_encoded():
+            yield seq, values[id_position], values[content_position]
+
+    def _unique_keys(self, entity: str) -> Dict[str, Dict[str, str]]:
+        keys = self._unique.get(entity)
+        if keys is None:
+            keys = self._unique[entity] = {field: {} for field in UNIQUE_FIELDS[entity]}
+            # Duplicatas gravadas antes da restrição: vale a primeira (as demais saem no relatorio_duplicados.py)
+            for row in self.tables[entity].values():
+                for field, index in keys.items():
+                    key = unique_key(field, row[field])
+                    if key is not None:
+                        index.setdefault(key, row["id"])
+        return keys
+
+    def _check_unique(self, entity: str, data: Dict[str, Any], row_id: Optional[str] = None) -> None:
+        for field, index in self._unique_keys(entity).items():
+            if field in data:
+                key = unique_key(field, data[field])
+                if key is not None and index.get(key, row_id) != row_id:
+                    raise DuplicateKeyError(entity, field)
+
+    def _index_unique(self, entity: str, row_id: str, old: Optional[Dict[str, Any]],
+                      new: Optional[Dict[str, Any]]) -> None:
+        for field, index in self._unique_keys(entity).items():
+            if old is not None and (new is None or field in new):
+                key = unique_key(field, old[field])
+                if key is not None and index.get(key) == row_id:
+                    del index[key]
+            if new is not None and field in new:
+                key = unique_key(field, new[field])
+                if key is not None:
+                    index[key] = row_id
+
+    async def connect(self):
+        if self.persistence is not None:
+            await self.persistence.start(self.tables)
+
+    async def close(self):
+        if self.persistence is not None:
+            await self.persistence.close()
+
+    async def insert(self, entity, data):
+        table = self.tables[entity]
+        if entity in UNIQUE_FIELDS:
+            self._check_unique(entity, data)
+        row = table.insert({**data, "id": str(uuid.uuid4())})
+        if entity in UNIQUE_FIELDS:
+            self._index_unique(entity, row["id"], None, row)
+        if entity == RECORDS:
+            self.content_indexes.added(table.seq_of(row["id"]), row["id"], row["content"])
+        if self.persistence is not None:
+            await self.persistence.log_insert(entity, row["id"])
+        return row
+
+    async def get(self, entity, row_id):
+        return self.tables[entity].get(row_id)
+
+    async def find(self, entity, filters, skip=0, limit=100, after=None, where=()):
+        if after is not None and not isinstance(after, int):
+            raise InvalidCursorError(after)
+        _check_where(entity, where)
+        if limit <= 0:
+            return Page([])
+        table = self.tables[entity]
+        if after is not None:
+            skip = 0
+        seqs = predicate = None
+        if where:
+            seqs, predicate = self.content_indexes.plan(where)
+        rows = table.find(filters, skip=skip, limit=limit + 1, after=after, seqs=seqs, predicate=predicate)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return Page(rows, table.seq_of(rows[-1]["id"]))
+        return Page(rows)
+
+    def sort_key(self, entity, row):
+        return self.tables[entity].seq_of(row["id"])
+
+    async def count(self, entity):
+        return len(self.tables[entity])
+
+    async def version(self, entity, row_id):
+        table = self.tables[entity]
+        if row_id not in table or "updated_at" not in table.row_type.fields:
+            return None
+        return decode_datetime(table.encoded_fields(row_id, ("updated_at",))["updated_at"])
+
+    async def update(self, entity, row_id, changes, expected=None):
+        table = self.tables[entity]
+        if row_id not in table:
+            return None
+        if expected:
+            current = table.encoded_fields(row_id, tuple(expected))
+            encode = table.row_type.encode
+            if any(current[field] != encode(field, value) for field, value in expected.items()):
+                return None
+        if entity in UNIQUE_FIELDS:
+            self._check_unique(entity, changes, row_id)
+            self._index_unique(entity, row_id, table.get(row_id), changes)
+        row = table.update(row_id, **changes)
+        if entity == RECORDS and "content" in changes:
+            self.content_indexes.changed(table.seq_of(row_id), row_id, row["content"])
+        if self.persistence is not None:
+            await self.persistence.log_update(entity, row_id, changes)
+        return row
+
+    async def delete(self, entity, row_id):
+        table = self.tables[entity]
+        if row_id not in table:
+            return False
+        if entity == RECORDS:
+            self.content_indexes.removed(table.seq_of(row_id), row_id)
+        if entity in self._unique:
+            self._index_unique(entity, row_id, table.get(row_id), None)
+        table.delete(row_id)
+        if self.persistence is not None:
+            await self.persistence.log_delete(entity, row_id)
+        return True
+
+
+class PostgresRepository(Repository):
+    """Repositório PostgreSQL com pool de conexões asyncpg.
+
+    Usa as tabelas criadas por testar_pg_cloud.criar_tabelas_basicas. As
+    chaves primárias SERIAL servem de chave ordenada para o cursor. Os
+    campos únicos têm índices UNIQUE de expressão, criados em ``connect``.
+    """
+
+    mode = "postgres"
+
+    TABLES = {
+        CLIENTS: "clients",
+        TRANSACTIONS: "transactions",
+        FILES: "file_uploads",
+        RECORDS: "data_records",
+    }
+    COLUMNS = {
+        CLIENTS: ("name", "email", "phone", "tax_id", "created_at", "updated_at"),
+        TRANSACTIONS: ("origin_account", "destination_account", "amount", "currency", "transaction_type",
+                       "description", "reference_id", "status", "routing_info", "created_at", "updated_at"),
+        FILES: ("filename", "file_type", "status", "created_at", "processed_at"),
+        RECORDS: ("file_id", "record_type", "content", "status", "created_at"),
+    }
+    # Expressões com a mesma forma de unique_key; vazio fica fora do índice
+    UNIQUE_EXPRESSIONS = {"tax_id": "btrim({column})", "email": "lower(btrim({column}))"}
+    # Linhas por INSERT de várias linhas em insert_many, respeitando o limite de 32767 parâmetros
+    INSERT_CHUNK_ROWS = 1000
+    MAX_PARAMETERS = 32767
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = None
+        self._content_indexes = set()
+        self._content_index_policy = create_content_index_policy()
+        self._index_tasks = set()
+        self._unique_violation = None
+        self._postgres_error = None
+
+    async def connect(self):
+        try:
+            import asyncpg
+        except ImportError:
+            raise RuntimeError("O modo postgres requer o pacote asyncpg (pip install asyncpg)")
+        self._unique_violation = asyncpg.UniqueViolationError
+        self._postgres_error = asyncpg.PostgresError
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+        for entity, fields in UNIQUE_FIELDS.items():
+            table = self.TABLES[entity]
+            for field in fields:
+                expression = self.UNIQUE_EXPRESSIONS[field].format(column=field)
+                try:
+                    await self._pool.execute(
+                        f"CREATE UNIQUE INDEX IF NOT EXISTS {_unique_index_name(table, field)} "
+                        f"ON {table} (({expression})) WHERE btrim({field}) <> ''")
+                except asyncpg.UniqueViolationError:
+                    logger.warning("%s com %s repetido: a unicidade fica inativa até a limpeza "
+                                   "(veja relatorio_duplicados.py)", table, field)
+        self._schedule_content_indexes(self._content_index_policy.fields or ())
+
+    async def close(self):
+        for task in self._index_tasks:
+            task.cancel()
+        await asyncio.gather(*self._index_tasks, return_exceptions=True)
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    @staticmethod
+    def _parse_id(row_id: Any) -> Optional[int]:
+        try:
+            return int(row_id)
+        except (TypeError, ValueError):
+            return None
+
+    def _to_db(self, field: str, value: Any) -> Any:
+        if field == "file_id":
+            return self._parse_id(value)
+        if field == "routing_info" and value is not None:
+            return json.dumps(value)
+        return value
+
+    @staticmethod
+    def _to_api(record) -> Optional[Dict[str, Any]]:
+        if record is None:
+            return None
+        row = dict(record)
+        row["id"] = str(row["id"])
+        if row.get("file_id") is not None:
+            row["file_id"] = str(row["file_id"])
+        if isinstance(row.get("routing_info"), str):
+            row["routing_info"] = json.loads(row["routing_info"])
+        if row.get("amount") is not None:
+            row["amount"] = float(row["amount"])
+        return row
+
+    def _checked_columns(self, entity: str, fields) -> List[str]:
+        allowed = self.COLUMNS[entity]
+        unknown = [field for field in fields if field not in allowed]
+        if unknown:
+            raise ValueError(f"Colunas desconhecidas para {entity}: {', '.join(unknown)}")
+        return list(fields)
+
+    async def insert(self, entity, data):
+        columns = [field for field in self.COLUMNS[entity] if field in data]
+        placeholders = ", ".join(f"${position}" for position in range(1, len(columns) + 1))
+        query = (f"INSERT INTO {self.TABLES[entity]} ({', '.join(columns)}) "
+                 f"VALUES ({placeholders}) RETURNING *")
+        try:
+            record = await self._pool.fetchrow(query, *(self._to_db(field, data[field]) for field in columns))
+        except self._unique_violation as exc:
+            _raise_duplicate(entity, exc)
+            raise
+        return self._to_api(record)
+
+    def _insert_many_query(self, entity: str, columns: Sequence[str], count: int) -> str:
+        width = len(columns)
+        values = ", ".join(
+            "(" + ", ".join(f"${row * width + position}" for position in range(1, width + 1)) + ")"
+            for row in range(count)
+        )
+        return f"INSERT INTO {self.TABLES[entity]} ({', '.join(columns)}) VALUES {values} RETURNING *"
+
+    async def insert_many(self, entity, rows):
+        """Insere em lotes: um INSERT de várias linhas por lote, todos na mesma transação."""
+        if not rows:
+            return []
+        columns = [field for field in self.COLUMNS[entity] if field in rows[0]]
+        chunk = max(1, min(self.INSERT_CHUNK_ROWS, self.MAX_PARAMETERS // max(1, len(columns))))
+        inserted = []
+        try:
+            async with self._pool.acquire() as connection:
+                async with connection.transaction():
+                    for start in range(0, len(rows), chunk):
+                        batch = rows[start:start + chunk]
+                        args = [self._to_db(field, data.get(field)) for data in batch for field in columns]
+                        records = await connection.fetch(self._insert_many_query(entity, columns, len(batch)),
+                                                         *args)
+                        # Os ids SERIAL seguem a ordem do VALUES; RETURNING não garante a ordem
+                        inserted += sorted((self._to_api(record) for record in records),
+                                           key=lambda row: int(row["id"]))
+        except self._unique_violation as exc:
+            _raise_duplicate(entity, exc)
+            raise
+        return inserted
+
+    async def get(self, entity, row_id):
+        key = self._parse_id(row_id)
+        if key is None:
+            return None
+        record = await self._pool.fetchrow(f"SELECT * FROM {self.TABLES[entity]} WHERE id = $1", key)
+        return self._to_api(record)
+
+    async def version(self, entity, row_id):
+        key = self._parse_id(row_id)
+        if key is None or "updated_at" not in self.COLUMNS[entity]:
+            return None
+        return await self._pool.fetchval(f"SELECT updated_at FROM {self.TABLES[entity]} WHERE id = $1", key)
+
+    async def count(self, entity):
+        # reltuples vem das estatísticas do planejador; -1 enquanto a tabela nunca foi analisada
+        estimate = await self._pool.fetchval("SELECT reltuples::bigint FROM pg_class WHERE oid = $1::regclass",
+                                             self.TABLES[entity])
+        if estimate is not None and estimate >= 0:
+            return estimate
+        return await self._pool.fetchval(f"SELECT count(*) FROM {self.TABLES[entity]}")
+
+    @staticmethod
+    def _content_expression(path: Tuple[str, ...]) -> str:
+        # content é JSONB: o caminho é lido direto, sem reinterpretar o texto
+        return f"(content #> '{{{','.join(path)}}}')"
+
+    def _schedule_content_indexes(self, paths: Iterable[Tuple[str, ...]]) -> None:
+        """Agenda o índice de expressão dos campos que a política admite, sem segurar a requisição."""
+        for path in paths:
+            if path not in self._content_indexes and self._content_index_policy.admit(path):
+                self._content_indexes.add(path)
+                task = asyncio.create_task(self._create_content_index(path))
+                self._index_tasks.add(task)
+                task.add_done_callback(self._index_tasks.discard)
+
+    async def _create_content_index(self, path: Tuple[str, ...]) -> None:
+        # CONCURRENTLY monta o índice sem bloquear as escritas em data_records
+        name = _content_index_name(path)
+        try:
+            await self._pool.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                                     f"ON data_records ({self._content_expression(path)})")
+        except self._postgres_error:
+            logger.exception("Falha ao criar o índice de conteúdo %s", name)
+            # Um build interrompido deixa o índice inválido, que o IF NOT EXISTS não refaria
+            self._content_indexes.discard(path)
+            try:
+                await self._pool.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            except self._postgres_error:
+                logger.exception("Falha ao remover o índice inválido %s", name)
+
+    async def find(self, entity, filters, skip=0, limit=100, after=None, where=()):
+        _check_where(entity, where)
+        if limit <= 0:
+            return Page([])
+        skip = max(skip, 0)
+        filters = _active_filters(filters)
+        clauses, args = [], []
+        for field in self._checked_columns(entity, filters):
+            value = self._to_db(field, filters[field])
+            if value is None:
+                return Page([])
+            args.append(value)
+            clauses.append(f"{field} = ${len(args)}")
+        self._schedule_content_indexes(condition.path for condition in where)
+        for condition in where:
+            expression = self._content_expression(condition.path)
+            json_type, cast = ("number", "numeric") if condition.numeric else ("string", "text")
+            args.append(condition.value)
+            clauses.append(f"jsonb_typeof({expression}) = '{json_type}' AND "
+                           f"{expression} {condition.op} to_jsonb(${len(args)}::{cast})")
+        if after is not None:
+            if not isinstance(after, int):
+                raise InvalidCursorError(after)
+            args.append(after)
+            clauses.append(f"id > ${len(args)}")
+            skip = 0
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        args.extend([skip, limit + 1])
+        query = (f"SELECT * FROM {self.TABLES[entity]}{where} ORDER BY id "
+                 f"OFFSET ${len(args) - 1} LIMIT ${len(args)}")
+        records = await self._pool.fetch(query, *args)
+        rows = [self._to_api(record) for record in records[:limit]]
+        if len(records) > limit:
+            return Page(rows, records[limit - 1]["id"])
+        return Page(rows)
+
+    async def update(self, entity, row_id, changes, expected=None):
+        key = self._parse_id(row_id)
+        if key is None:
+            return None
+        columns = self._checked_columns(entity, changes)
+        conditions = self._checked_columns(entity, expected or {})
+        assignments = ", ".join(f"{field} = ${position}" for position, field in enumerate(columns, start=1))
+        checks = "".join(f" AND {field} = ${position}"
+                         for position, field in enumerate(conditions, start=len(columns) + 2))
+        query = (f"UPDATE {self.TABLES[entity]} SET {assignments} "
+                 f"WHERE id = ${len(columns) + 1}{checks} RETURNING *")
+        try:
+            record = await self._pool.fetchrow(query, *(self._to_db(field, changes[field]) for field in columns), key,
+                                               *(self._to_db(field, expected[field]) for field in conditions))
+        except self._unique_violation as exc:
+            _raise_duplicate(entity, exc)
+            raise
+        return self._to_api(record)
+
+    async def delete(self, entity, row_id):
+        key = self._parse_id(row_id)
+        if key is None:
+            return False
+        result = await self._pool.execute(f"DELETE FROM {self.TABLES[entity]} WHERE id = $1", key)
+        return result.endswith(" 1")
+
+
+class SQLiteRepository(Repository):
+    """Repositório SQLite em modo WAL, compartilhado entre os workers do uvicorn.
+
+    Cada processo abre a sua conexão com o mesmo arquivo: no modo WAL os
+    leitores não bloqueiam o escritor, e as escritas de todos os workers são
+    serializadas pelo próprio SQLite, então qualquer worker enxerga o que os
+    outros já gravaram. As consultas rodam numa thread dedicada para não
+    bloquear o event loop. As tabelas e colunas são as mesmas do PostgreSQL,
+    e o id INTEGER AUTOINCREMENT serve de chave para o cursor. Os campos
+    únicos têm índices UNIQUE de expressão, como no PostgreSQL.
+    """
+
+    mode = "sqlite"
+
+    # Acima disso um intervalo do conteúdo é percorrido em ordem de id, não pelo índice
+    CONTENT_PROBE_LIMIT = 2000
+
+    TABLES = PostgresRepository.TABLES
+    COLUMNS = PostgresRepository.COLUMNS
+    DATETIME_FIELDS = ("created_at", "updated_at", "processed_at")
+    # lower() do SQLite só converte ASCII, o que cobre os e-mails usuais
+    UNIQUE_EXPRESSIONS = {"tax_id": "trim({column})", "email": "lower(trim({column}))"}
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT,
+            phone TEXT,
+            tax_id TEXT,
+            created_at TEXT,
+            updated_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin_account TEXT NOT NULL,
+            destination_account TEXT NOT NULL,
+            amount REAL NOT NULL,
+            currency TEXT NOT NULL,
+            transaction_type TEXT NOT NULL,
+            description TEXT,
+            reference_id TEXT,
+            status TEXT NOT NULL,
+            routing_info TEXT,
+            created_at TEXT,
+            updated_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS file_uploads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            file_type TEXT,
+            status TEXT,
+            created_at TEXT,
+            processed_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS data_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_id INTEGER REFERENCES file_uploads (id),
+            record_type TEXT,
+            content TEXT,
+            status TEXT,
+            created_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_transactions_status ON transactions (status, id);
+        CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions (transaction_type, id);
+        CREATE INDEX IF NOT EXISTS idx_file_uploads_status ON file_uploads (status, id);
+        CREATE INDEX IF NOT EXISTS idx_file_uploads_type ON file_uploads (file_type, id);
+        CREATE INDEX IF NOT EXISTS idx_data_records_file ON data_records (file_id, id);
+        CREATE INDEX IF NOT EXISTS idx_data_records_type ON data_records (record_type, id);
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 10.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._connection: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._content_indexes = set()
+        self._content_index_policy = create_content_index_policy()
+
+    async def connect(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="databridge-sqlite")
+        await self._run(self._open)
+
+    def _open(self) -> None:
+        # Autocommit: cada comando é uma transação, exceto onde há BEGIN explícito
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                     check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA foreign_keys=ON")
+        connection.executescript(self.SCHEMA)
+        for entity, fields in UNIQUE_FIELDS.items():
+            table = self.TABLES[entity]
+            for field in fields:
+                expression = self.UNIQUE_EXPRESSIONS[field].format(column=field)
+                try:
+                    connection.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {_unique_index_name(table, field)} "
+                                       f"ON {table} ({expression}) WHERE trim({field}) <> ''")
+                except sqlite3.IntegrityError:
+                    logger.warning("%s com %s repetido: a unicidade fica inativa até a limpeza "
+                                   "(veja relatorio_duplicados.py)", table, field)
+        self._connection = connection
+
+    async def close(self):
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def _run(self, function: Callable, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(function, *args))
+
+    _parse_id = staticmethod(PostgresRepository._parse_id)
+    _checked_columns = PostgresRepository._checked_columns
+
+    def _to_db(self, field: str, value: Any) -> Any:
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if field == "file_id":
+            return self._parse_id(value)
+        if field == "routing_info" and value is not None:
+            return json.dumps(value)
+        return value
+
+    def _to_api(self, record: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if record is None:
+            return None
+        row = dict(record)
+        row["id"] = str(row["id"])
+        if row.get("file_id") is not None:
+            row["file_id"] = str(row["file_id"])
+        if isinstance(row.get("routing_info"), str):
+            row["routing_info"] = json.loads(row["routing_info"])
+        for field in self.DATETIME_FIELDS:
+            if isinstance(row.get(field), str):
+                row[field] = datetime.fromisoformat(row[field])
+        return row
+
+    def _insert_query(self, entity: str, columns: List[str]) -> str:
+        return (f"INSERT INTO {self.TABLES[entity]} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)}) RETURNING *")
+
+    def _insert(self, entity: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        columns = [field for field in self.COLUMNS[entity] if field in data]
+        cursor = self._connection.execute(self._insert_query(entity, columns),
+                                          [self._to_db(field, data[field]) for field in columns])
+        return self._to_api(cursor.fetchone())
+
+    def _insert_many(self, entity: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        columns = [field for field in self.COLUMNS[entity] if field in rows[0]]
+        query = self._insert_query(entity, columns)
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            inserted = [self._to_api(connection.execute(query, [self._to_db(field, data.get(field))
+                                                                for field in columns]).fetchone())
+                        for data in rows]
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return inserted
+
+    def _fetchone(self, query: str, args: List[Any]) -> Optional[Dict[str, Any]]:
+        return self._to_api(self._connection.execute(query, args).fetchone())
+
+    def _fetchall(self, query: str, args: List[Any]) -> List[sqlite3.Row]:
+        return self._connection.execute(query, args).fetchall()
+
+    async def insert(self, entity, data):
+        try:
+            return await self._run(self._insert, entity, data)
+        except sqlite3.IntegrityError as exc:
+            _raise_duplicate(entity, exc)
+            raise
+
+    async def insert_many(self, entity, rows):
+        if not rows:
+            return []
+        try:
+            return await self._run(self._insert_many, entity, rows)
+        except sqlite3.IntegrityError as exc:
+            _raise_duplicate(entity, exc)
+            raise
+
+    async def get(self, entity, row_id):
+        key = self._parse_id(row_id)
+        if key is None:
+            return None
+        return await self._run(self._fetchone, f"SELECT * FROM {self.TABLES[entity]} WHERE id = ?", [key])
+
+    async def version(self, entity, row_id):
+        key = self._parse_id(row_id)
+        if key is None or "updated_at" not in self.COLUMNS[entity]:
+            return None
+        rows = await self._run(self._fetchall, f"SELECT updated_at FROM {self.TABLES[entity]} WHERE id = ?", [key])
+        return datetime.fromisoformat(rows[0][0]) if rows and rows[0][0] else None
+
+    async def count(self, entity):
+        rows = await self._run(self._fetchall, f"SELECT count(*) FROM {self.TABLES[entity]}", [])
+        return rows[0][0]
+
+    @staticmethod
+    def _content_expression(path: Tuple[str, ...]) -> str:
+        # Conteúdo que não é JSON válido vira NULL em vez de interromper a consulta
+        return f"(CASE WHEN json_valid(content) THEN json_extract(content, '$.{'.'.join(path)}') END)"
+
+    async def _ensure_content_indexes(self, where: Sequence[Condition]) -> List[Condition]:
+        """Cria os índices de expressão que faltam para os campos admitidos pela política (ficam no arquivo).
+
+        Devolve as condições com índice; as demais são conferidas sem ele.
+        """
+        indexed = []
+        for condition in where:
+            if condition.path not in self._content_indexes:
+                if not self._content_index_policy.admit(condition.path):
+                    continue
+                await self._run(self._connection.execute,
+                                f"CREATE INDEX IF NOT EXISTS {_content_index_name(condition.path)} "
+                                f"ON data_records {self._content_expression(condition.path)}")
+                self._content_indexes.add(condition.path)
+            indexed.append(condition)
+        return indexed
+
+    def _content_clause(self, condition: Condition) -> str:
+        expression = self._content_expression(condition.path)
+        types = "('integer', 'real')" if condition.numeric else "('text')"
+        return f"typeof({expression}) IN {types} AND {expression} {condition.op} ?"
+
+    def _content_candidates(self, where: Sequence[Condition]) -> Optional[List[int]]:
+        """Ids da condição mais seletiva, lidos pelo índice de expressão, se forem poucos.
+
+        Sem estatísticas de intervalo o SQLite prefere percorrer a chave
+        primária por causa do ORDER BY id; esta sondagem limitada decide como
+        o índice do modo memória: intervalo pequeno vira lista de ids,
+        intervalo grande fica com a varredura em ordem, que enche a página
+        logo.
+        """
+        best = None
+        for condition in where:
+            if condition.op == "!=":
+                continue
+            ids = [row[0] for row in self._connection.execute(
+                f"SELECT id FROM data_records INDEXED BY {_content_index_name(condition.path)} "
+                f"WHERE {self._content_clause(condition)} LIMIT ?",
+                [condition.value, self.CONTENT_PROBE_LIMIT + 1])]
+            if len(ids) <= self.CONTENT_PROBE_LIMIT and (best is None or len(ids) < len(best)):
+                best = ids
+        return best
+
+    async def find(self, entity, filters, skip=0, limit=100, after=None, where=()):
+        _check_where(entity, where)
+        if limit <= 0:
+            return Page([])
+        skip = max(skip, 0)
+        filters = _active_filters(filters)
+        clauses, args = [], []
+        for field in self._checked_columns(entity, filters):
+            value = self._to_db(field, filters[field])
+            if value is None:
+                return Page([])
+            args.append(value)
+            clauses.append(f"{field} = ?")
+        if where:
+            indexed = await self._ensure_content_indexes(where)
+            candidates = await self._run(self._content_candidates, indexed)
+            if candidates is not None:
+                args.append(json.dumps(candidates))
+                clauses.append("id IN (SELECT value FROM json_each(?))")
+        for condition in where:
+            args.append(condition.value)
+            clauses.append(self._content_clause(condition))
+        if after is not None:
+            if not isinstance(after, int):
+                raise InvalidCursorError(after)
+            args.append(after)
+            clauses.append("id > ?")
+            skip = 0
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        args.extend([limit + 1, skip])
+        query = f"SELECT * FROM {self.TABLES[entity]}{where} ORDER BY id LIMIT ? OFFSET ?"
+        records = await self._run(self._fetchall, query, args)
+        rows = [self._to_api(record) for record in records[:limit]]
+        if len(records) > limit:
+            return Page(rows, records[limit - 1]["id"])
+        return Page(rows)
+
+    async def update(self, entity, row_id, changes, expected=None):
+        key = self._parse_id(row_id)
+        if key is None:
+            return None
+        columns = self._checked_columns(entity, changes)
+        conditions = self._checked_columns(entity, expected or {})
+        assignments = ", ".join(f"{field} = ?" for field in columns)
+        checks = "".join(f" AND {field} = ?" for field in conditions)
+        query = f"UPDATE {self.TABLES[entity]} SET {assignments} WHERE id = ?{checks} RETURNING *"
+        try:
+            return await self._run(self._fetchone, query,
+                                   [*(self._to_db(field, changes[field]) for field in columns), key,
+                                    *(self._to_db(field, expected[field]) for field in conditions)])
+        except sqlite3.IntegrityError as exc:
+            _raise_duplicate(entity, exc)
+            raise
+
+    async def delete(self, entity, row_id):
+        key = self._parse_id(row_id)
+        if key is None:
+            return False
+        rows = await self._run(self._fetchall, f"DELETE FROM {self.TABLES[entity]} WHERE id = ? RETURNING id", [key])
+        return len(rows) == 1
+
+
+MONGO_OPERATORS = {"=": "$eq", "!=": "$ne", ">": "$gt", ">=": "$gte", "<": "$lt", "<=": "$lte"}
+
+
+class MongoRepository(Repository):
+    """Repositório MongoDB com o driver assíncrono motor.
+
+    Os documentos usam ObjectId como _id, cuja ordem de criação serve de
+    chave para o cursor; o id exposto pela API é o ObjectId em hexadecimal.
+    Cada campo único ganha uma cópia normalizada (``<campo>_unique``) com
+    índice único parcial, que ignora os documentos sem o valor.
+    """
+
+    mode = "mongodb"
+
+    COLLECTIONS = {
+        CLIENTS: "clients",
+        TRANSACTIONS: "transactions",
+        FILES: "file_uploads",
+        RECORDS: "data_records",
+    }
+    INDEXES = {
+        TRANSACTIONS: ("status", "transaction_type"),
+        FILES: ("status", "file_type"),
+        RECORDS: ("file_id", "record_type"),
+    }
+
+    def __init__(self, uri: str, database: str):
+        self.uri = uri
+        self.database = database
+        self._client = None
+        self._db = None
+        self._content_indexes = set()
+        self._content_index_policy = create_content_index_policy()
+
+    async def connect(self):
+        try:
+            from motor.motor_asyncio import AsyncIOMotorClient
+        except ImportError:
+            raise RuntimeError("O modo mongodb requer o pacote motor (pip install motor)")
+        self._client = AsyncIOMotorClient(self.uri)
+        self._db = self._client[self.database]
+        for entity, fields in self.INDEXES.items():
+            collection = self._db[self.COLLECTIONS[entity]]
+            for field in fields:
+                await collection.create_index([(field, 1), ("_id", 1)])
+        await self._ensure_unique_indexes()
+
+    async def _ensure_unique_indexes(self) -> None:
+        from pymongo.errors import DuplicateKeyError as MongoDuplicateKeyError
+        for entity, fields in UNIQUE_FIELDS.items():
+            collection = self._db[self.COLLECTIONS[entity]]
+            for field in fields:
+                shadow = f"{field}_unique"
+                # Documentos gravados antes da restrição ganham a cópia normalizada ("" fica fora do índice)
+                normalized = {"$trim": {"input": f"${field}"}}
+                if field == "email":
+                    normalized = {"$toLower": normalized}
+                await collection.update_many({shadow: {"$exists": False}}, [{"$set": {shadow: normalized}}])
+                await collection.update_many({shadow: ""}, {"$set": {shadow: None}})
+                try:
+                    await collection.create_index(
+                        [(shadow, 1)], unique=True, name=_unique_index_name(self.COLLECTIONS[entity], field),
+                        partialFilterExpression={shadow: {"$type": "string"}})
+                except MongoDuplicateKeyError:
+                    logger.warning("%s com %s repetido: a unicidade fica inativa até a limpeza "
+                                   "(veja relatorio_duplicados.py)", self.COLLECTIONS[entity], field)
+
+    async def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    @staticmethod
+    def _object_id(row_id: Any):
+        from bson import ObjectId
+        if not isinstance(row_id, str) or not ObjectId.is_valid(row_id):
+            return None
+        return ObjectId(row_id)
+
+    @staticmethod
+    def _to_api(document) -> Optional[Dict[str, Any]]:
+        if document is None:
+            return None
+        document["id"] = str(document.pop("_id"))
+        document.pop("content_fields", None)
+        for field in UNIQUE_FIELDS[CLIENTS]:
+            document.pop(f"{field}_unique", None)
+        return document
+
+    @staticmethod
+    def _to_document(entity: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Cópia da linha; nos registros, junta o conteúdo já interpretado para as consultas where."""
+        document = dict(data)
+        if entity == RECORDS and "content" in document:
+            try:
+                parsed = json.loads(document["content"]) if document["content"] else None
+            except ValueError:
+                parsed = None
+            document["content_fields"] = parsed if isinstance(parsed, dict) else {}
+        for field in UNIQUE_FIELDS.get(entity, ()):
+            if field in document:
+                document[f"{field}_unique"] = unique_key(field, document[field])
+        return document
+
+    async def insert(self, entity, data):
+        from pymongo.errors import DuplicateKeyError as MongoDuplicateKeyError
+        document = self._to_document(entity, data)
+        try:
+            await self._db[self.COLLECTIONS[entity]].insert_one(document)
+        except MongoDuplicateKeyError as exc:
+            _raise_duplicate(entity, exc)
+            raise
+        return self._to_api(document)
+
+    async def insert_many(self, entity, rows):
+        from pymongo.errors import BulkWriteError
+        if not rows:
+            return []
+        documents = [self._to_document(entity, data) for data in rows]
+        try:
+            await self._db[self.COLLECTIONS[entity]].insert_many(documents)
+        except BulkWriteError as exc:
+            _raise_duplicate(entity, exc)
+            raise
+        return [self._to_api(document) for document in documents]
+
+    async def get(self, entity, row_id):
+        key = self._object_id(row_id)
+        if key is None:
+            return None
+        return self._to_api(await self._db[self.COLLECTIONS[entity]].find_one({"_id": key}))
+
+    async def version(self, entity, row_id):
+        key = self._object_id(row_id)
+        if key is None:
+            return None
+        document = await self._db[self.COLLECTIONS[entity]].find_one({"_id": key}, {"updated_at": 1})
+        return document.get("updated_at") if document is not None else None
+
+    async def count(self, entity):
+        return await self._db[self.COLLECTIONS[entity]].estimated_document_count()
+
+    @staticmethod
+    def _content_clauses(where: Sequence[Condition]) -> List[Dict[str, Any]]:
+        """Uma cláusula por condição, para o $and: no mesmo documento, duas condições no mesmo campo se sobrescreveriam."""
+        # $type restringe ao mesmo tipo do valor, como nos demais backends
+        return [{"content_fields." + condition.field: {
+            MONGO_OPERATORS[condition.op]: condition.value,
+            "$type": "number" if condition.numeric else "string",
+        }} for condition in where]
+
+    async def find(self, entity, filters, skip=0, limit=100, after=None, where=()):
+        _check_where(entity, where)
+        if limit <= 0:
+            return Page([])
+        skip = max(skip, 0)
+        query = _active_filters(filters)
+        for condition in where:
+            if condition.path not in self._content_indexes and self._content_index_policy.admit(condition.path):
+                await self._db[self.COLLECTIONS[entity]].create_index([("content_fields." + condition.field, 1),
+                                                                       ("_id", 1)])
+                self._content_indexes.add(condition.path)
+        if where:
+            query["$and"] = self._content_clauses(where)
+        if after is not None:
+            key = self._object_id(after)
+            if key is None:
+                raise InvalidCursorError(after)
+            query["_id"] = {"$gt": key}
+            skip = 0
+        cursor = self._db[self.COLLECTIONS[entity]].find(query).sort("_id", 1).skip(skip).limit(limit + 1)
+        documents = await cursor.to_list(length=limit + 1)
+        rows = [self._to_api(document) for document in documents[:limit]]
+        if len(documents) > limit:
+            return Page(rows, rows[-1]["id"])
+        return Page(rows)
+
+    def sort_key(self, entity, row):
+        # ObjectIds em hexadecimal têm o mesmo tamanho: a ordem do texto é a de criação
+        return row["id"]
+
+    async def update(self, entity, row_id, changes, expected=None):
+        from pymongo import ReturnDocument
+        from pymongo.errors import DuplicateKeyError as MongoDuplicateKeyError
+        key = self._object_id(row_id)
+        if key is None:
+            return None
+        try:
+            document = await self._db[self.COLLECTIONS[entity]].find_one_and_update(
+                {**(expected or {}), "_id": key}, {"$set": self._to_document(entity, changes)},
+                return_document=ReturnDocument.AFTER)
+        except MongoDuplicateKeyError as exc:
+            _raise_duplicate(entity, exc)
+            raise
+        return self._to_api(document)
+
+    async def delete(self, entity, row_id):
+        key = self._object_id(row_id)
+        if key is None:
+            return False
+        result = await self._db[self.COLLECTIONS[entity]].delete_one({"_id": key})
+        return result.deleted_count == 1
+
+
+def create_repository(mode: Optional[str] = None) -> Repository:
+    """Cria o repositório indicado por DATABRIDGE_DB_MODE (memory, sqlite, postgres ou mongodb)."""
+    mode = (mode or os.environ.get("DATABRIDGE_DB_MODE", "memory")).lower()
+    if mode == "memory":
+        return MemoryRepository(create_persistence())
+    if mode == "sqlite":
+        return SQLiteRepository(
+            os.environ.get("DATABRIDGE_SQLITE_PATH", "databridge.db"),
+            busy_timeout=float(os.environ.get("DATABRIDGE_SQLITE_BUSY_TIMEOUT", "10")),
+        )
+    if mode in ("postgres", "postgresql"):
+        from cloud_config import POSTGRES_CLOUD
+        return PostgresRepository(
+            os.environ.get("DATABRIDGE_POSTGRES_URI", POSTGRES_CLOUD["uri"]),
+            min_size=int(os.environ.get("DATABRIDGE_PG_POOL_MIN", "1")),
+            max_size=int(os.environ.get("DATABRIDGE_PG_POOL_MAX", "10")),
+        )
+    if mode in ("mongodb", "mongo"):
+        from cloud_config import MONGODB_CLOUD
+        return MongoRepository(
+            os.environ.get("DATABRIDGE_MONGODB_URI", MONGODB_CLOUD["uri"]),
+            os.environ.get("DATABRIDGE_MONGODB_DB", MONGODB_CLOUD["database"]),
+        )
+    raise ValueError(f"Modo de banco de dados desconhecido: {mode}")
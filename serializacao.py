@@ -0,0 +1,87 @@
+"""
+Caminho rápido de serialização para as listagens da API do DataBridge Bank.
+As linhas devolvidas pelos repositórios já têm o formato dos modelos de
+leitura, então podem ir direto para o codificador JSON sem passar de novo
+pela validação do Pydantic. O codificador usa orjson quando disponível,
+que escreve datetimes diretamente, e cai para o json da biblioteca padrão.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Type
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+# Endpoints que usam o caminho rápido, configuráveis por DATABRIDGE_FAST_SERIALIZATION:
+# "all" (padrão), "none" ou uma lista de nomes de endpoints separados por vírgula
+LIST_ENDPOINTS = ("list_clients", "list_transactions", "list_files", "list_records", "list_file_records")
+
+
+def _enabled_from_env() -> set:
+    setting = os.environ.get("DATABRIDGE_FAST_SERIALIZATION", "all").strip().lower()
+    if setting == "all":
+        return set(LIST_ENDPOINTS)
+    if setting in ("none", ""):
+        return set()
+    return {name.strip() for name in setting.split(",") if name.strip()}
+
+
+FAST_PATH_ENDPOINTS = _enabled_from_env()
+
+
+def fast_path_enabled(endpoint: str) -> bool:
+    return endpoint in FAST_PATH_ENDPOINTS
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Codifica em JSON compacto, com datetimes em ISO 8601."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    """Resposta JSON codificada com ``dumps``."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+_PROJECTIONS: Dict[Type[BaseModel], Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+
+
+def _projection(model: Type[BaseModel]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Gera (uma vez por modelo) a função que copia só os campos do modelo."""
+    projection = _PROJECTIONS.get(model)
+    if projection is None:
+        items = ", ".join(f"{field!r}: row.get({field!r})" for field in model.model_fields)
+        namespace: Dict[str, Any] = {}
+        exec(f"def project(row):\n    return {{{items}}}\n", namespace)
+        projection = _PROJECTIONS[model] = namespace["project"]
+    return projection
+
+
+def project_rows(rows: Iterable[Dict[str, Any]], model: Type[BaseModel]) -> List[Dict[str, Any]]:
+    """Reduz linhas confiáveis aos campos do modelo de leitura, sem validá-las."""
+    projection = _projection(model)
+    return [projection(row) for row in rows]
+
+
+def fast_list_response(rows: Iterable[Dict[str, Any]], model: Type[BaseModel],
+                       headers: Optional[Dict[str, str]] = None) -> FastJSONResponse:
+    """Resposta de listagem que pula a revalidação pelo response_model."""
+    return FastJSONResponse(project_rows(rows, model), headers=headers)
@@ -0,0 +1,442 @@
+"""
+Formato binário de snapshot do modo memória, lido via mmap.
+Cada tabela vira um conjunto de colunas: inteiros (datas) e números (valores)
+em colunas de largura fixa, textos numa área contínua com tabela de
+posições, e campos de baixa cardinalidade (status, moeda, routing_info)
+codificados por dicionário. O arquivo traz também uma tabela hash de ids e
+as listas de sequências dos índices secundários, de modo que abrir um
+snapshot custa só mapear o arquivo e ler o cabeçalho: as linhas viram
+objetos apenas quando são lidas ou alteradas.
+
+Layout: MAGIC, seções alinhadas em 8 bytes, cabeçalho JSON, tamanho do
+cabeçalho (u64) e MAGIC de novo no fim, o que permite detectar um arquivo
+truncado antes de confiar nas posições.
+"""
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from armazenamento_memoria import CompactRow
+
+MAGIC = b"DBMAP001"
+FORMAT_VERSION = 1
+INT_NULL = -(2 ** 63)
+# Linhas acumuladas por coluna antes de descarregar no arquivo temporário
+FLUSH_ROWS = 65536
+_TRAILER = struct.Struct("<Q8s")
+
+
+class MappedSnapshotError(ValueError):
+    """Arquivo de snapshot truncado, de outro formato ou inconsistente."""
+
+
+def _id_hash(row_id: str) -> int:
+    return zlib.crc32(row_id.encode())
+
+
+def _json_value(value: Any) -> Any:
+    # Tuplas do formato interno (routing_info) viram listas no cabeçalho
+    if isinstance(value, tuple):
+        return [_json_value(item) for item in value]
+    return value
+
+
+# ------ Escrita ------
+class _Spool:
+    """Conteúdo de uma seção, descarregado num arquivo temporário conforme cresce."""
+
+    def __init__(self):
+        self._file = None
+        self.size = 0
+
+    def write(self, data) -> None:
+        if not len(data):
+            return
+        if self._file is None:
+            self._file = tempfile.TemporaryFile()
+        self._file.write(data)
+        self.size += len(data) * getattr(data, "itemsize", 1)
+
+    def copy_to(self, out: "_SectionWriter") -> int:
+        offset = out.begin()
+        if self._file is not None:
+            self._file.seek(0)
+            shutil.copyfileobj(self._file, out.file, 1 << 20)
+            self._file.close()
+            self._file = None
+        out.position += self.size
+        return offset
+
+
+class _SectionWriter:
+    def __init__(self, file):
+        self.file = file
+        self.position = 0
+
+    def begin(self) -> int:
+        padding = -self.position % 8
+        if padding:
+            self.file.write(b"\0" * padding)
+            self.position += padding
+        return self.position
+
+    def write(self, data) -> int:
+        offset = self.begin()
+        data = memoryview(data).cast("B")
+        self.file.write(data)
+        self.position += len(data)
+        return offset
+
+
+class _FixedColumn:
+    """Coluna de largura fixa: inteiros de 64 bits ou números de ponto flutuante."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._typecode = "q" if kind == "int" else "d"
+        self._null = INT_NULL if kind == "int" else float("nan")
+        self._values = array(self._typecode)
+        self._spool = _Spool()
+
+    def add(self, value: Any) -> None:
+        if value is None:
+            value = self._null
+        elif self.kind == "float":
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise MappedSnapshotError(f"Valor não numérico numa coluna numérica: {value!r}")
+            value = float(value)
+        self._values.append(value)
+        if len(self._values) >= FLUSH_ROWS:
+            self._spool.write(self._values)
+            self._values = array(self._typecode)
+
+    def finish(self, out: _SectionWriter) -> Dict[str, Any]:
+        self._spool.write(self._values)
+        return {"kind": self.kind, "offset": self._spool.copy_to(out)}
+
+
+class _DictColumn:
+    """Coluna codificada por dicionário; o código 0 representa None."""
+
+    def __init__(self):
+        self._codes_by_value: Dict[Any, int] = {None: 0}
+        self._values: List[Any] = [None]
+        self._codes = array("I")
+        self._spool = _Spool()
+
+    def add(self, value: Any) -> None:
+        code = self._codes_by_value.get(value)
+        if code is None:
+            code = self._codes_by_value[value] = len(self._values)
+            self._values.append(value)
+        self._codes.append(code)
+        if len(self._codes) >= FLUSH_ROWS:
+            self._spool.write(self._codes)
+            self._codes = array("I")
+
+    def finish(self, out: _SectionWriter) -> Dict[str, Any]:
+        self._spool.write(self._codes)
+        return {
+            "kind": "dict",
+            "offset": self._spool.copy_to(out),
+            "values": [_json_value(value) for value in self._values],
+        }
+
+
+class _TextColumn:
+    """Textos UTF-8 numa área contínua, com a posição final de cada um e marcas de None."""
+
+    def __init__(self):
+        self._ends = array("q")
+        self._nulls = bytearray()
+        self._data = bytearray()
+        self._end = 0
+        self._ends_spool = _Spool()
+        self._nulls_spool = _Spool()
+        self._data_spool = _Spool()
+
+    def add(self, value: Any) -> None:
+        if value is None:
+            self._nulls.append(1)
+        else:
+            if not isinstance(value, str):
+                raise MappedSnapshotError(f"Valor não textual numa coluna de texto: {value!r}")
+            encoded = value.encode()
+            self._data += encoded
+            self._end += len(encoded)
+            self._nulls.append(0)
+        self._ends.append(self._end)
+        if len(self._ends) >= FLUSH_ROWS:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._ends_spool.write(self._ends)
+        self._nulls_spool.write(self._nulls)
+        self._data_spool.write(self._data)
+        self._ends, self._nulls, self._data = array("q"), bytearray(), bytearray()
+
+    def finish(self, out: _SectionWriter) -> Dict[str, Any]:
+        self._flush()
+        return {
+            "kind": "text",
+            "ends": self._ends_spool.copy_to(out),
+            "nulls": self._nulls_spool.copy_to(out),
+            "data": self._data_spool.copy_to(out),
+        }
+
+
+class _PlainColumn:
+    """Escolhe entre coluna numérica e de texto pelo primeiro valor não nulo."""
+
+    def __init__(self):
+        self._leading_nulls = 0
+        self._column = None
+
+    def add(self, value: Any) -> None:
+        if self._column is None:
+            if value is None:
+                self._leading_nulls += 1
+                return
+            numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+            self._column = _FixedColumn("float") if numeric else _TextColumn()
+            for _ in range(self._leading_nulls):
+                self._column.add(None)
+        self._column.add(value)
+
+    def finish(self, out: _SectionWriter) -> Dict[str, Any]:
+        if self._column is None:
+            self._column = _TextColumn()
+            for _ in range(self._leading_nulls):
+                self._column.add(None)
+        return self._column.finish(out)
+
+
+def _column_for(row_type: Type[CompactRow], field: str):
+    if field in row_type.datetime_fields:
+        return _FixedColumn("int")
+    if field in row_type._restorers:
+        return _DictColumn()
+    return _PlainColumn()
+
+
+class MappedSnapshotWriter:
+    """Grava um snapshot colunar, tabela por tabela, sem manter as colunas inteiras em memória."""
+
+    def __init__(self, path: Path, start_lsn: int):
+        self.path = Path(path)
+        self.start_lsn = start_lsn
+        self.rows = 0
+        self._file = open(self.path, "wb")
+        self._file.write(MAGIC)
+        self._out = _SectionWriter(self._file)
+        self._out.position = len(MAGIC)
+        self._tables: Dict[str, Any] = {}
+
+    def add_table(self, entity: str, table) -> None:
+        """Grava uma MemoryTable (pode rodar enquanto o event loop altera a tabela).
+
+        As sequências são fixadas antes da leitura: linhas inseridas depois
+        ficam fora do snapshot e voltam pelo log como linhas novas, em vez de
+        deixarem posições vazias reservadas no arquivo.
+        """
+        slots = table.next_seq
+        self.add_rows(entity, table.row_type, table.indexed_fields, table.iter_encoded(slots), slots=slots)
+
+    def add_rows(self, entity: str, row_type: Type[CompactRow], indexed_fields: Sequence[str],
+                 rows: Iterable[Tuple[int, Sequence[Any]]], slots: int = 0) -> None:
+        """Grava linhas (sequência, valores internos) em ordem crescente de sequência."""
+        fields = row_type.fields
+        columns = [_column_for(row_type, field) for field in fields]
+        positions = [fields.index(field) for field in indexed_fields]
+        postings: List[Dict[Any, array]] = [{} for _ in indexed_fields]
+        live = bytearray()
+        id_hashes, id_seqs = array("L"), array("q")
+        next_slot = 0
+
+        for seq, values in rows:
+            if seq < next_slot:
+                raise MappedSnapshotError(f"Sequências fora de ordem em {entity}")
+            for _ in range(seq - next_slot):
+                for column in columns:
+                    column.add(None)
+                live.append(0)
+            for column, value in zip(columns, values):
+                column.add(value)
+            live.append(1)
+            for position, index in zip(positions, postings):
+                seqs = index.get(values[position])
+                if seqs is None:
+                    seqs = index[values[position]] = array("q")
+                seqs.append(seq)
+            id_hashes.append(_id_hash(values[0]))
+            id_seqs.append(seq)
+            next_slot = seq + 1
+
+        # Sequências já atribuídas depois da última linha lida continuam reservadas
+        total = max(next_slot, slots)
+        for _ in range(total - next_slot):
+            for column in columns:
+                column.add(None)
+            live.append(0)
+
+        capacity = 8
+        while capacity < 2 * len(id_seqs):
+            capacity *= 2
+        mask = capacity - 1
+        id_table = array("q", [-1]) * capacity
+        for hashed, seq in zip(id_hashes, id_seqs):
+            slot = hashed & mask
+            while id_table[slot] != -1:
+                slot = (slot + 1) & mask
+            id_table[slot] = seq
+
+        out = self._out
+        self._tables[entity] = {
+            "slots": total,
+            "live": len(id_seqs),
+            "columns": {field: column.finish(out) for field, column in zip(fields, columns)},
+            "live_map": out.write(live),
+            "id_table": {"offset": out.write(id_table), "capacity": capacity},
+            "postings": {
+                field: [[_json_value(value), out.write(seqs), len(seqs)] for value, seqs in index.items()]
+                for field, index in zip(indexed_fields, postings)
+            },
+        }
+        self.rows += len(id_seqs)
+
+    def close(self) -> int:
+        """Grava o cabeçalho, sincroniza o arquivo com o disco e devolve o tamanho em bytes."""
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "start_lsn": self.start_lsn,
+            "created_at": time.time(),
+            "tables": self._tables,
+        }).encode()
+        self._out.begin()
+        self._file.write(header)
+        self._file.write(_TRAILER.pack(len(header), MAGIC))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        return self._out.position + len(header) + _TRAILER.size
+
+    def abort(self) -> None:
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+
+# ------ Leitura ------
+class MappedTable:
+    """Linhas de uma tabela servidas direto do arquivo mapeado."""
+
+    def __init__(self, row_type: Type[CompactRow], buffer: memoryview, meta: Dict[str, Any]):
+        self.row_type = row_type
+        self.slots: int = meta["slots"]
+        self.live: int = meta["live"]
+        self._buffer = buffer
+        self._live = buffer[meta["live_map"]:meta["live_map"] + self.slots]
+        self._readers = [self._reader(field, meta["columns"][field]) for field in row_type.fields]
+        id_table = meta["id_table"]
+        self._id_mask = id_table["capacity"] - 1
+        self._id_table = self._array(id_table["offset"], id_table["capacity"], "q")
+        self._id_reader = self._readers[0]
+        self._postings = meta["postings"]
+
+    def _array(self, offset: int, count: int, typecode: str) -> memoryview:
+        size = struct.calcsize(typecode)
+        return self._buffer[offset:offset + count * size].cast(typecode)
+
+    def _reader(self, field: str, column: Dict[str, Any]) -> Callable[[int], Any]:
+        kind = column["kind"]
+        if kind == "int":
+            values = self._array(column["offset"], self.slots, "q")
+            return lambda seq: None if values[seq] == INT_NULL else values[seq]
+        if kind == "float":
+            values = self._array(column["offset"], self.slots, "d")
+            return lambda seq: None if values[seq] != values[seq] else values[seq]
+        if kind == "dict":
+            codes = self._array(column["offset"], self.slots, "I")
+            restore = self.row_type.restore_value
+            decoded = [None if value is None else restore(field, value) for value in column["values"]]
+            return lambda seq: decoded[codes[seq]]
+        if kind == "text":
+            ends = self._array(column["ends"], self.slots, "q")
+            nulls = self._buffer[column["nulls"]:column["nulls"] + self.slots]
+            data = self._buffer[column["data"]:]
+
+            def read_text(seq: int) -> Optional[str]:
+                if nulls[seq]:
+                    return None
+                return str(data[ends[seq - 1] if seq else 0:ends[seq]], "utf-8")
+            return read_text
+        raise MappedSnapshotError(f"Tipo de coluna desconhecido: {kind}")
+
+    def row(self, seq: int) -> Optional[CompactRow]:
+        """Materializa a linha de uma sequência (None se a posição está vazia)."""
+        if not self._live[seq]:
+            return None
+        row = self.row_type.__new__(self.row_type)
+        for field, read in zip(self.row_type.fields, self._readers):
+            setattr(row, field, read(seq))
+        row._seq = seq
+        return row
+
+    def seq_of_id(self, row_id: str) -> Optional[int]:
+        """Sequência da linha com o id informado, pela tabela hash do arquivo."""
+        table, mask, read_id = self._id_table, self._id_mask, self._id_reader
+        slot = _id_hash(row_id) & mask
+        while True:
+            seq = table[slot]
+            if seq == -1:
+                return None
+            if read_id(seq) == row_id:
+                return seq
+            slot = (slot + 1) & mask
+
+    def postings(self, field: str) -> Optional[Dict[Any, memoryview]]:
+        """Sequências ordenadas por valor de um campo indexado (None se o snapshot não as tem)."""
+        entries = self._postings.get(field)
+        if entries is None:
+            return None
+        restore = self.row_type.restore_value
+        return {
+            None if value is None else restore(field, value): self._array(offset, count, "q")
+            for value, offset, count in entries
+        }
+
+
+class MappedSnapshot:
+    """Snapshot aberto: mantém o arquivo mapeado enquanto as tabelas o usam."""
+
+    def __init__(self, path: Path, row_types: Dict[str, Type[CompactRow]]):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        if len(buffer) < len(MAGIC) + _TRAILER.size or bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise MappedSnapshotError(f"{self.path.name} não é um snapshot mapeado")
+        header_size, trailer_magic = _TRAILER.unpack(buffer[-_TRAILER.size:])
+        if trailer_magic != MAGIC:
+            raise MappedSnapshotError(f"{self.path.name} está truncado")
+        end = len(buffer) - _TRAILER.size
+        header = json.loads(bytes(buffer[end - header_size:end]))
+        if header.get("version") != FORMAT_VERSION:
+            raise MappedSnapshotError(f"Versão de snapshot não suportada em {self.path.name}")
+        self.start_lsn: int = header["start_lsn"]
+        self.tables: Dict[str, MappedTable] = {
+            entity: MappedTable(row_types[entity], buffer, meta)
+            for entity, meta in header["tables"].items()
+            if entity in row_types
+        }
+
+    @property
+    def rows(self) -> int:
+        return sum(table.live for table in self.tables.values())
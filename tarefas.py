@@ -0,0 +1,173 @@
+"""
+Fila de tarefas em segundo plano do DataBridge Bank.
+Trabalhos demorados (como o processamento de um arquivo) são enfileirados
+e devolvidos na hora com um id; executores assíncronos consomem a fila e
+mandam a parte pesada de CPU para um pool de processos, sem prender o
+laço de eventos da API. A fila tem tamanho limitado: cheia, ela recusa
+novos trabalhos em vez de acumular memória.
+"""
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+JOB_STATUSES = ("queued", "running", "completed", "failed")
+
+
+class QueueFullError(RuntimeError):
+    """A fila atingiu o limite de trabalhos aguardando execução."""
+
+
+class Job:
+    """Um trabalho enfileirado e o seu andamento."""
+
+    def __init__(self, kind: str, target: str, handler: Callable[["Job"], Awaitable[Any]]):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.target = target
+        self.handler = handler
+        self.status = "queued"
+        self.rows_done = 0
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = 0.0
+        if self._started is not None:
+            elapsed = (self._finished or time.perf_counter()) - self._started
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "target": self.target,
+            "status": self.status,
+            "rows_done": self.rows_done,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows_done / elapsed, 1) if elapsed else 0.0,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """Fila limitada de trabalhos, consumida por ``concurrency`` executores.
+
+    Cada trabalho é uma corrotina que recebe o próprio Job (para atualizar
+    ``rows_done``) e usa ``run_in_pool`` para o que consome CPU. Um alvo com
+    trabalho ainda pendente não é enfileirado de novo: o pedido repetido
+    recebe o trabalho existente. Os trabalhos encerrados ficam consultáveis
+    até serem descartados pelos ``max_finished`` mais recentes.
+    """
+
+    def __init__(self, process_workers: int = 1, max_pending: int = 100,
+                 concurrency: Optional[int] = None, max_finished: int = 1000):
+        if process_workers < 1 or max_pending < 1:
+            raise ValueError("process_workers e max_pending devem ser pelo menos 1")
+        self.process_workers = process_workers
+        self.max_pending = max_pending
+        self.concurrency = concurrency or process_workers
+        self.max_finished = max_finished
+        self._queue: Optional[asyncio.Queue] = None
+        self._runners: List[asyncio.Task] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self.rejected = 0
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(self.max_pending)
+        self._runners = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def close(self) -> None:
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._runners = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, kind: str, target: str, handler: Callable[[Job], Awaitable[Any]]) -> Job:
+        """Enfileira um trabalho e o devolve; levanta QueueFullError se a fila estiver cheia."""
+        key = f"{kind}:{target}"
+        existing = self._active.get(key)
+        if existing is not None:
+            return existing
+        job = Job(kind, target, handler)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"Fila com {self.max_pending} trabalhos aguardando")
+        self._active[key] = job
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_finished + self.max_pending + self.concurrency:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.active:
+                break
+            self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def run_in_pool(self, function: Callable, *args: Any) -> Any:
+        """Executa ``function`` (de módulo, serializável) num processo do pool."""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.process_workers)
+        return await asyncio.get_running_loop().run_in_executor(self._pool, function, *args)
+
+    async def _run(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = datetime.now()
+            job._started = time.perf_counter()
+            try:
+                await job.handler(job)
+                job.status = "completed"
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Interrompido no encerramento da API"
+                raise
+            except Exception as exc:
+                job.status = "failed"
+                job.error = f"{type(exc).__name__}: {exc}"
+            finally:
+                job.finished_at = datetime.now()
+                job._finished = time.perf_counter()
+                self._active.pop(f"{job.kind}:{job.target}", None)
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {
+            "process_workers": self.process_workers,
+            "max_pending": self.max_pending,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "rejected": self.rejected,
+            "jobs": counts,
+        }
+
+
+def create_job_queue() -> JobQueue:
+    """Cria a fila a partir de DATABRIDGE_JOB_WORKERS e DATABRIDGE_JOB_QUEUE_SIZE."""
+    return JobQueue(
+        process_workers=int(os.environ.get("DATABRIDGE_JOB_WORKERS") or os.cpu_count() or 1),
+        max_pending=int(os.environ.get("DATABRIDGE_JOB_QUEUE_SIZE", "100")),
+    )
@@ -0,0 +1,402 @@
+"""
+Testes da API (api_teste.py) no modo memória, chamando a aplicação ASGI sem rede.
+
+Uso:
+    python -m pytest -q test_api_teste.py
+"""
+import asyncio
+import json
+import os
+
+os.environ["DATABRIDGE_DB_MODE"] = "memory"
+os.environ.pop("DATABRIDGE_PERSISTENCE_DIR", None)
+
+import httpx  # noqa: E402
+
+import api_teste  # noqa: E402
+
+
+def run(scenario):
+    """Roda ``scenario(client)`` com a aplicação iniciada e um cliente HTTP ligado a ela."""
+    async def wrapped():
+        async with api_teste.lifespan(api_teste.app):
+            transport = httpx.ASGITransport(app=api_teste.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://teste") as client:
+                return await scenario(client)
+    return asyncio.run(wrapped())
+
+
+async def create_transaction(client, origin, destination, amount=100.0, currency="BRL"):
+    response = await client.post("/api/v1/transactions", json={
+        "origin_account": origin, "destination_account": destination, "amount": amount,
+        "currency": currency, "transaction_type": "pix",
+    })
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_concurrent_completions_post_once():
+    async def scenario(client):
+        row = await create_transaction(client, "100001-1", "100002-2", 250.0)
+        await client.get("/api/v1/accounts/100001-1/balance")
+        responses = await asyncio.gather(*(
+            client.put(f"/api/v1/transactions/{row['id']}", params={"status": "completed"}) for _ in range(5)
+        ))
+        balance = await client.get("/api/v1/accounts/100001-1/balance")
+        return [response.status_code for response in responses], balance.json()
+
+    statuses, balance = run(scenario)
+    assert statuses == [200] * 5
+    assert balance["balances"] == {"BRL": -250.0}
+    assert balance["movements"] == 1
+
+
+def test_status_change_updates_stats_ledger_and_cache():
+    async def scenario(client):
+        row = await create_transaction(client, "200001-1", "200002-2", 40.0, "USD")
+        stats = (await client.get("/api/v1/transactions/stats")).json()
+        listed = (await client.get("/api/v1/transactions", params={"status": "completed"})).json()
+        await client.put(f"/api/v1/transactions/{row['id']}", params={"status": "completed"})
+        after = (await client.get("/api/v1/transactions/stats")).json()
+        relisted = (await client.get("/api/v1/transactions", params={"status": "completed"})).json()
+        balance = (await client.get("/api/v1/accounts/200002-2/balance")).json()
+        return row, stats, listed, after, relisted, balance
+
+    row, stats, listed, after, relisted, balance = run(scenario)
+    assert row["id"] not in {item["id"] for item in listed}
+    assert row["id"] in {item["id"] for item in relisted}
+    completed_before = stats["by_status"].get("completed", {}).get("USD", {}).get("count", 0)
+    assert after["by_status"]["completed"]["USD"]["count"] == completed_before + 1
+    assert after["by_currency"]["USD"]["count"] == stats["by_currency"]["USD"]["count"]
+    assert balance["balances"]["USD"] == 40.0
+
+
+def test_multi_worker_reads_writes_from_other_processes(monkeypatch):
+    monkeypatch.setattr(api_teste, "MULTI_WORKER", True)
+
+    async def scenario(client):
+        # Escritas de outro worker: vão direto ao banco, sem passar pelas estruturas deste processo
+        now = api_teste.datetime.now()
+        row = await api_teste.repository.insert(api_teste.TRANSACTIONS, {
+            "origin_account": "300001-1", "destination_account": "300002-2", "amount": 75.0, "currency": "EUR",
+            "transaction_type": "pix", "description": None, "reference_id": "outro-worker-1", "status": "completed",
+            "routing_info": {"route": "instant"}, "created_at": now, "updated_at": now,
+        })
+        await api_teste.repository.insert(api_teste.CLIENTS, {
+            "name": "Zuleide Outroworker", "email": "zuleide@example.com", "phone": None, "tax_id": None,
+            "created_at": now, "updated_at": now,
+        })
+        balance = await client.get("/api/v1/accounts/300001-1/balance")
+        stats = (await client.get("/api/v1/transactions/stats")).json()
+        found = (await client.get("/api/v1/clients/search", params={"q": "outroworker"})).json()
+        replay = await client.post("/api/v1/transactions", json={
+            "origin_account": "300001-1", "destination_account": "300002-2", "amount": 75.0, "currency": "EUR",
+            "transaction_type": "pix", "reference_id": "outro-worker-1",
+        })
+        header_only = await client.post("/api/v1/transactions", headers={"Idempotency-Key": "k-1"}, json={
+            "origin_account": "300001-1", "destination_account": "300002-2", "amount": 1.0, "currency": "EUR",
+            "transaction_type": "pix",
+        })
+        rebuild = await client.post("/api/v1/accounts/rebuild")
+        return row, balance, stats, found, replay, header_only, rebuild
+
+    row, balance, stats, found, replay, header_only, rebuild = run(scenario)
+    assert balance.status_code == 200
+    assert balance.json()["balances"] == {"EUR": -75.0}
+    assert stats["by_status"]["completed"]["EUR"]["count"] >= 1
+    assert [client["name"] for client in found] == ["Zuleide Outroworker"]
+    assert replay.headers.get("Idempotent-Replayed") == "true"
+    assert replay.json()["id"] == row["id"]
+    assert header_only.status_code == 400
+    assert rebuild.status_code == 409
+
+
+def test_multi_worker_lists_skip_the_response_cache(monkeypatch):
+    monkeypatch.setattr(api_teste, "MULTI_WORKER", True)
+
+    async def scenario(client):
+        entries = api_teste.response_cache.stats()["entries"]
+        first = (await client.get("/api/v1/transactions", params={"status": "completed"})).json()
+        # Conclusão gravada por outro worker: este processo não invalida nada
+        row = await create_transaction(client, "400001-1", "400002-2", 12.0)
+        await api_teste.repository.update(api_teste.TRANSACTIONS, row["id"], {"status": "completed"})
+        second = (await client.get("/api/v1/transactions", params={"status": "completed"})).json()
+        stats = (await client.get("/api/v1/cache/stats")).json()
+        return row, first, second, stats, entries
+
+    row, first, second, stats, entries = run(scenario)
+    assert row["id"] not in {item["id"] for item in first}
+    assert row["id"] in {item["id"] for item in second}
+    assert stats["enabled"] is False
+    assert stats["entries"] == entries
+
+
+def test_where_matches_numeric_csv_and_xml_fields():
+    async def scenario(client):
+        boundary = "teste-boundary"
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"valores.csv\"\r\n"
+                f"Content-Type: text/csv\r\n\r\nid,amount\r\n1,999.99\r\n2,1000.01\r\n\r\n"
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"valores.xml\"\r\n"
+                f"Content-Type: application/xml\r\n\r\n<rows><row><amount>5000</amount></row>"
+                f"<row><amount>10</amount></row></rows>\r\n--{boundary}--\r\n").encode()
+        uploaded = await client.post("/api/v1/files/upload", content=body,
+                                     headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        file_ids = [item["file_id"] for item in uploaded.json()]
+        found = []
+        for file_id in file_ids:
+            response = await client.get("/api/v1/records", params={"file_id": file_id, "where": "amount>1000"})
+            found.append([json.loads(row["content"])["amount"] for row in response.json()])
+        return uploaded.status_code, found
+
+    status_code, found = run(scenario)
+    assert status_code == 200
+    assert found == [[1000.01], [5000]]
+
+
+def test_processing_normalizes_legacy_csv_records():
+    async def scenario(client):
+        boundary = "teste-boundary"
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"antigo.csv\"\r\n"
+                f"Content-Type: text/csv\r\n\r\nid,amount\r\n1,2000\r\n2,30\r\n\r\n--{boundary}--\r\n").encode()
+        uploaded = await client.post("/api/v1/files/upload", content=body,
+                                     headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        file_id = uploaded.json()[0]["file_id"]
+        # Registros gravados antes da conversão numérica: valores como texto
+        stored = await api_teste.repository.find(api_teste.RECORDS, {"file_id": file_id})
+        for row in stored.rows:
+            legacy = {key: str(value) for key, value in json.loads(row["content"]).items()}
+            await api_teste.repository.update(api_teste.RECORDS, row["id"], {"content": api_teste.json.dumps(legacy)})
+        before = await client.get("/api/v1/records", params={"file_id": file_id, "where": "amount>1000"})
+        job = (await client.post(f"/api/v1/files/{file_id}/process")).json()
+        while job["status"] not in ("completed", "failed"):
+            await asyncio.sleep(0.05)
+            job = (await client.get(f"/api/v1/jobs/{job['id']}")).json()
+        after = await client.get("/api/v1/records", params={"file_id": file_id, "where": "amount>1000"})
+        return before.json(), job["status"], after.json()
+
+    before, status, after = run(scenario)
+    assert before == []
+    assert status == "completed"
+    assert [json.loads(row["content"]) for row in after] == [{"id": 1, "amount": 2000}]
+    assert after[0]["status"] == "processed"
+
+
+def test_client_writes_invalidate_cached_pages():
+    async def scenario(client):
+        names = []
+        created = await client.post("/api/v1/clients", json={"name": "Cacilda Cache", "email": "cacilda@example.com"})
+        client_id = created.json()["id"]
+        names.append([row["name"] for row in (await client.get("/api/v1/clients")).json()])
+        hits = (await client.get("/api/v1/cache/stats")).json()["hits"]
+        names.append([row["name"] for row in (await client.get("/api/v1/clients")).json()])
+        cached = (await client.get("/api/v1/cache/stats")).json()["hits"] > hits
+        await client.put(f"/api/v1/clients/{client_id}", json={"name": "Cacilda Renomeada"})
+        names.append([row["name"] for row in (await client.get("/api/v1/clients")).json()])
+        await client.delete(f"/api/v1/clients/{client_id}")
+        names.append([row["name"] for row in (await client.get("/api/v1/clients")).json()])
+        return cached, names
+
+    cached, (first, again, renamed, deleted) = run(scenario)
+    assert cached
+    assert "Cacilda Cache" in first and again == first
+    assert "Cacilda Renomeada" in renamed and "Cacilda Cache" not in renamed
+    assert "Cacilda Renomeada" not in deleted
+
+
+def test_list_endpoints_reject_invalid_bounds():
+    async def scenario(client):
+        paths = ["/api/v1/clients", "/api/v1/transactions", "/api/v1/files", "/api/v1/records"]
+        statuses = []
+        for params in ({"limit": 0}, {"limit": -1}, {"skip": -1}, {"limit": api_teste.MAX_PAGE_LIMIT + 1}):
+            statuses += [(await client.get(path, params=params)).status_code for path in paths]
+        valid = await client.get("/api/v1/transactions", params={"skip": 0, "limit": 1})
+        return statuses, valid.status_code
+
+    statuses, valid = run(scenario)
+    assert statuses == [400] * 16
+    assert valid == 200
+
+
+def test_not_modified_repeats_the_etag_of_the_compressed_response():
+    async def scenario(client):
+        created = await client.post("/api/v1/clients", json={"name": "Etelvina Etag " + "x" * 2000})
+        path = f"/api/v1/clients/{created.json()['id']}"
+        results = []
+        for encoding in ("gzip", "identity"):
+            full = await client.get(path, headers={"Accept-Encoding": encoding})
+            cached = await client.get(path, headers={"Accept-Encoding": encoding,
+                                                     "If-None-Match": full.headers["ETag"]})
+            results.append((full.headers.get("Content-Encoding"), full.headers["ETag"],
+                            cached.status_code, cached.headers["ETag"]))
+        return results
+
+    (encoding, etag, status, repeated), (plain, strong, plain_status, plain_repeated) = run(scenario)
+    assert encoding == "gzip" and etag.startswith('W/"')
+    assert status == 304 and repeated == etag
+    assert plain is None and not strong.startswith("W/")
+    assert plain_status == 304 and plain_repeated == strong
+
+
+async def upload(client, *files):
+    """Envia arquivos (nome, conteúdo) num único multipart e devolve os file_id na mesma ordem."""
+    boundary = "teste-boundary"
+    body = b"".join(f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"{name}\"\r\n"
+                    f"Content-Type: application/octet-stream\r\n\r\n".encode() + content + b"\r\n"
+                    for name, content in files) + f"--{boundary}--\r\n".encode()
+    response = await client.post("/api/v1/files/upload", content=body,
+                                 headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    assert response.status_code == 200
+    return [item["file_id"] for item in response.json()]
+
+
+def test_file_records_are_paged_by_cursor():
+    async def scenario(client):
+        first, second = await upload(client, ("a.csv", b"n\n1\n2\n3\n4\n5\n"), ("b.csv", b"n\n10\n20\n"))
+        pages, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            response = await client.get(f"/api/v1/files/{first}/records", params=params)
+            pages.append([json.loads(row["content"])["n"] for row in response.json()])
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+        other = (await client.get(f"/api/v1/files/{second}/records")).json()
+        missing = await client.get("/api/v1/files/999999/records")
+        return pages, [json.loads(row["content"])["n"] for row in other], missing.status_code
+
+    pages, other, missing = run(scenario)
+    assert pages == [[1, 2], [3, 4], [5]]
+    assert other == [10, 20]
+    assert missing == 404
+
+
+def test_batch_ingests_valid_lines_and_reports_the_rest():
+    line = json.dumps({"origin_account": "300001-1", "destination_account": "300002-2", "amount": 5.0,
+                       "currency": "CHF", "transaction_type": "pix"}).encode()
+    body = b"\n".join([line, b"{not json", line, b"", b'{"amount": -1}', line]) + b"\n"
+
+    async def scenario(client):
+        async def chunks():
+            for start in range(0, len(body), 7):
+                yield body[start:start + 7]
+
+        before = (await client.get("/api/v1/transactions/stats")).json()["by_currency"].get("CHF", {})
+        response = await client.post("/api/v1/transactions/batch", params={"chunk_size": 2}, content=chunks())
+        after = (await client.get("/api/v1/transactions/stats")).json()["by_currency"]["CHF"]
+        invalid = await client.post("/api/v1/transactions/batch", params={"chunk_size": 0}, content=body)
+        return response.json(), after["count"] - before.get("count", 0), invalid.status_code
+
+    summary, stored, invalid = run(scenario)
+    assert (summary["accepted"], summary["rejected"], stored) == (3, 2, 3)
+    assert [error["line"] for error in summary["errors"]] == [2, 5]
+    assert not summary["errors_truncated"]
+    assert invalid == 400
+
+
+def test_records_export_in_both_formats():
+    async def scenario(client):
+        [file_id] = await upload(client, ("export.csv", b"n,name\n1,Ana\n2,Bia\n"))
+        ndjson = await client.get("/api/v1/records/export", params={"file_id": file_id})
+        csv_export = await client.get("/api/v1/records/export", params={"file_id": file_id, "format": "csv"})
+        invalid = await client.get("/api/v1/records/export", params={"format": "xml"})
+        return ndjson, csv_export, invalid.status_code
+
+    ndjson, csv_export, invalid = run(scenario)
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert 'filename="records.ndjson"' in ndjson.headers["content-disposition"]
+    assert [json.loads(json.loads(line)["content"]) for line in ndjson.text.splitlines()] == [
+        {"n": 1, "name": "Ana"}, {"n": 2, "name": "Bia"}]
+    lines = csv_export.text.splitlines()
+    assert lines[0] == "id,file_id,record_type,content,status,created_at" and len(lines) == 3
+    assert invalid == 400
+
+
+def test_repeated_idempotency_key_returns_the_first_transaction():
+    payload = {"origin_account": "400001-1", "destination_account": "400002-2", "amount": 12.0,
+               "currency": "BRL", "transaction_type": "pix"}
+
+    async def scenario(client):
+        headers = {"Idempotency-Key": "pedido-400001"}
+        responses = await asyncio.gather(*(
+            client.post("/api/v1/transactions", json=payload, headers=headers) for _ in range(3)))
+        conflict = await client.post("/api/v1/transactions", json={**payload, "amount": 13.0}, headers=headers)
+        return responses, conflict.status_code
+
+    responses, conflict = run(scenario)
+    assert [response.status_code for response in responses] == [201] * 3
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert sorted(response.headers.get("Idempotent-Replayed", "") for response in responses) == ["", "true", "true"]
+    assert conflict == 409
+
+
+def test_client_search_follows_writes():
+    async def scenario(client):
+        created = await client.post("/api/v1/clients", json={
+            "name": "Genoveva Quintela", "email": "genoveva@exemplo.com", "tax_id": "987.654.321-00"})
+        client_id = created.json()["id"]
+        by_prefix = (await client.get("/api/v1/clients/search", params={"q": "genoveva quin"})).json()
+        by_tax_id = (await client.get("/api/v1/clients/search", params={"q": "98765432100"})).json()
+        await client.put(f"/api/v1/clients/{client_id}", json={"name": "Genoveva Ramalho"})
+        renamed = (await client.get("/api/v1/clients/search", params={"q": "ramalho"})).json()
+        old_name = (await client.get("/api/v1/clients/search", params={"q": "quintela"})).json()
+        blank = await client.get("/api/v1/clients/search", params={"q": " "})
+        return client_id, by_prefix, by_tax_id, renamed, old_name, blank.status_code
+
+    client_id, by_prefix, by_tax_id, renamed, old_name, blank = run(scenario)
+    assert [row["id"] for row in by_prefix] == [client_id]
+    assert [row["id"] for row in by_tax_id] == [client_id]
+    assert [row["name"] for row in renamed] == ["Genoveva Ramalho"]
+    assert client_id not in {row["id"] for row in old_name}
+    assert blank == 400
+
+
+def test_duplicate_client_answers_conflict():
+    async def scenario(client):
+        first = await client.post("/api/v1/clients", json={"name": "Heitor", "tax_id": "555.444.333-22",
+                                                            "email": "heitor@exemplo.com"})
+        same_tax_id = await client.post("/api/v1/clients", json={"name": "Outro", "tax_id": " 555.444.333-22"})
+        other = await client.post("/api/v1/clients", json={"name": "Iara", "email": "iara@exemplo.com"})
+        same_email = await client.put(f"/api/v1/clients/{other.json()['id']}",
+                                      json={"name": "Iara", "email": "HEITOR@exemplo.com"})
+        return first.status_code, same_tax_id, same_email
+
+    first, same_tax_id, same_email = run(scenario)
+    assert first == 201
+    assert (same_tax_id.status_code, same_tax_id.json()["detail"]) == (409, "Já existe um cliente com este tax_id")
+    assert (same_email.status_code, same_email.json()["detail"]) == (409, "Já existe um cliente com este email")
+
+
+def test_conditional_get_changes_with_the_transaction():
+    async def scenario(client):
+        row = await create_transaction(client, "500001-1", "500002-2", 8.0)
+        path = f"/api/v1/transactions/{row['id']}"
+        plain = {"Accept-Encoding": "identity"}
+        first = await client.get(path, headers=plain)
+        unchanged = await client.get(path, headers={**plain, "If-None-Match": first.headers["ETag"]})
+        since = await client.get(path, headers={**plain, "If-Modified-Since": first.headers["Last-Modified"]})
+        await asyncio.sleep(0.001)
+        await client.put(path, params={"status": "completed"})
+        changed = await client.get(path, headers={**plain, "If-None-Match": first.headers["ETag"]})
+        return first, unchanged, since.status_code, changed
+
+    first, unchanged, since, changed = run(scenario)
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    assert unchanged.headers["ETag"] == first.headers["ETag"]
+    assert since == 304
+    assert changed.status_code == 200 and changed.json()["status"] == "completed"
+    assert changed.headers["ETag"] != first.headers["ETag"]
+
+
+def test_metrics_use_the_route_template():
+    async def scenario(client):
+        row = await create_transaction(client, "600001-1", "600002-2")
+        await client.get(f"/api/v1/transactions/{row['id']}")
+        await client.get("/api/v1/nao-existe/123")
+        return await client.get("/metrics")
+
+    response = run(scenario)
+    assert response.status_code == 200
+    assert 'route="/api/v1/transactions/{transaction_id}",status="200"' in response.text
+    assert 'route="unmatched",status="404"' in response.text
+    assert "/nao-existe/" not in response.text
+    assert "databridge_store_rows{" in response.text
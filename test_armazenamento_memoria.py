@@ -0,0 +1,85 @@
+"""
+Testes das tabelas em memória (armazenamento_memoria.py).
+
+Uso:
+    python -m pytest -q test_armazenamento_memoria.py
+"""
+import json
+import random
+from datetime import datetime
+
+from armazenamento_memoria import MemoryTable, TransactionRow, decode_datetime, encode_datetime
+
+STATUSES = ("pending", "processing", "completed", "failed", "cancelled")
+TYPES = ("pix", "transfer", "payment")
+
+
+def transaction(row_id, status="pending", transaction_type="pix", amount=10.0):
+    return {
+        "id": row_id, "origin_account": "000001-1", "destination_account": "000002-2", "amount": amount,
+        "currency": "BRL", "transaction_type": transaction_type, "description": None, "reference_id": None,
+        "status": status, "routing_info": {"route": "instant"},
+        "created_at": datetime(2026, 1, 1), "updated_at": datetime(2026, 1, 1),
+    }
+
+
+def test_compact_rows_round_trip():
+    data = transaction("t1", status="".join(["comp", "leted"]))
+    data["created_at"] = datetime(2026, 3, 4, 5, 6, 7, 891011)
+    row = TransactionRow.from_dict(data)
+    assert not hasattr(row, "__dict__")
+    assert row.as_dict() == data
+    assert isinstance(row.created_at, int)
+    assert decode_datetime(encode_datetime(datetime(1969, 12, 31, 23, 59))) == datetime(1969, 12, 31, 23, 59)
+
+    other = TransactionRow.from_dict(transaction("t2", status="".join(["comp", "leted"])))
+    assert other.status is row.status and other.routing_info is row.routing_info
+    assert other.as_dict()["routing_info"] is not row.as_dict()["routing_info"]
+
+    # Os valores internos passam por JSON nos snapshots, onde as tuplas viram listas
+    restored = TransactionRow.from_encoded(json.loads(json.dumps(row.encoded())))
+    assert restored.as_dict() == data
+    assert restored.routing_info is row.routing_info and restored.status is row.status
+
+    table = MemoryTable(TransactionRow)
+    table.insert(data)
+    table["t1"]["routing_info"]["route"] = "changed"
+    assert table["t1"] == data
+
+
+def test_indexed_filters_match_a_full_scan():
+    rng = random.Random(1)
+    table = MemoryTable(TransactionRow, indexed_fields=("status", "transaction_type"))
+    for i in range(300):
+        table.insert(transaction(f"t{i}", rng.choice(STATUSES), rng.choice(TYPES)))
+    for i in rng.sample(range(300), 120):
+        table.update(f"t{i}", status=rng.choice(STATUSES))
+    for i in rng.sample(range(300), 40):
+        if f"t{i}" in table:
+            table.delete(f"t{i}")
+
+    everything = list(table.values())
+    for status in (None, *STATUSES):
+        for transaction_type in (None, *TYPES):
+            filters = {"status": status, "transaction_type": transaction_type}
+            expected = [row["id"] for row in everything
+                        if status in (None, row["status"]) and transaction_type in (None, row["transaction_type"])]
+            assert [row["id"] for row in table.find(filters, limit=1000)] == expected
+            assert [row["id"] for row in table.find(filters, skip=5, limit=7)] == expected[5:12]
+    for status in STATUSES:
+        assert table.count("status", status) == sum(row["status"] == status for row in everything)
+
+
+def test_cursor_pages_follow_insertion_order():
+    table = MemoryTable(TransactionRow, indexed_fields=("status",))
+    for i in range(10):
+        table.insert(transaction(f"t{i}", "completed" if i % 2 else "pending"))
+    table.update("t0", status="completed")
+    seen, after = [], None
+    while True:
+        page = table.find({"status": "completed"}, limit=2, after=after)
+        if not page:
+            break
+        seen += [row["id"] for row in page]
+        after = table.seq_of(page[-1]["id"])
+    assert seen == ["t0", "t1", "t3", "t5", "t7", "t9"]
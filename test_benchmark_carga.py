@@ -0,0 +1,49 @@
+"""
+Testes do teste de carga (benchmark_carga.py), numa execução curta no mesmo processo.
+
+Uso:
+    python -m pytest -q test_benchmark_carga.py
+"""
+import argparse
+import asyncio
+
+import pytest
+
+import benchmark_carga
+from benchmark_carga import DEFAULT_MIX, PROFILES, latency_summary, parse_mix, percentile
+
+
+def test_percentile_and_summary():
+    ordered = [0.001 * i for i in range(1, 101)]
+    assert percentile(ordered, 0.5) == ordered[49]
+    assert percentile(ordered, 0.99) == ordered[98]
+    assert percentile([], 0.5) == 0.0
+    assert latency_summary([0.002, 0.001, 0.003]) == {"mean": 2.0, "p50": 2.0, "p95": 3.0, "p99": 3.0, "max": 3.0}
+
+
+def test_parse_mix():
+    assert parse_mix("transaction_get=10, client_create=2.5") == {"transaction_get": 10.0, "client_create": 2.5}
+    assert parse_mix("") == DEFAULT_MIX
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_mix("drop_tables=1")
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_mix("client_get=muito")
+
+
+def test_short_in_process_run(monkeypatch):
+    monkeypatch.delenv("DATABRIDGE_PERSISTENCE_DIR", raising=False)
+    monkeypatch.setenv("DATABRIDGE_DB_MODE", "memory")
+    args = argparse.Namespace(target="asgi", db_mode="memory", concurrency=[1, 4], duration=0.3, warmup=0,
+                              profile="mixed", mix=dict(PROFILES["mixed"]), seed_clients=5, seed_transactions=20,
+                              upload_rows=10, seed=3)
+    result = asyncio.run(benchmark_carga.run(args))
+
+    assert result["profile"] == "mixed" and result["db_mode"] == "memory"
+    assert [level["concurrency"] for level in result["levels"]] == [1, 4]
+    for level in result["levels"]:
+        assert level["requests"] > 0 and level["errors"] == 0
+        assert sum(level["status_codes"].values()) == level["requests"]
+        assert sum(operation["requests"] for operation in level["operations"].values()) == level["requests"]
+        assert set(level["operations"]) <= set(DEFAULT_MIX)
+        latency = level["latency_ms"]
+        assert latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
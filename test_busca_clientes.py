@@ -0,0 +1,94 @@
+"""
+Testes do índice de busca de clientes (busca_clientes.py).
+
+Uso:
+    python -m pytest -q test_busca_clientes.py
+"""
+import asyncio
+import random
+
+from busca_clientes import ClientSearchIndex, SortedTokens, digits, tokenize
+from repositorios import CLIENTS, MemoryRepository
+
+FIRST = ("Ana", "João", "José", "Joana", "Maria", "Mário", "Bia")
+LAST = ("Silva", "Souza", "Santos", "Araújo", "Sá")
+
+
+def client(rng, i):
+    first, last = rng.choice(FIRST), rng.choice(LAST)
+    return {"name": f"{first} {last}", "email": f"{first}.{i}@exemplo.com".lower(), "phone": None,
+            "tax_id": f"{i:03d}.456.789-{i % 100:02d}"}
+
+
+def build(clients, page_size=7):
+    async def scenario():
+        repository = MemoryRepository()
+        await repository.connect()
+        rows = [await repository.insert(CLIENTS, data) for data in clients]
+        index = ClientSearchIndex(page_size=page_size)
+        await index.ensure_ready(repository, CLIENTS)
+        return repository, rows, index
+    return asyncio.run(scenario())
+
+
+def brute_force(rows, query):
+    tokens = tokenize(query)
+    found = []
+    for row in rows:
+        terms = tokenize(row["name"]) + tokenize(row["email"])
+        if all(token in terms for token in tokens[:-1]) and any(term.startswith(tokens[-1]) for term in terms):
+            found.append(row["id"])
+    return found
+
+
+def test_search_matches_a_full_scan():
+    rng = random.Random(7)
+    _, rows, index = build([client(rng, i) for i in range(60)])
+    for query in ("jo", "JOÃO", "joao s", "maria santos", "mar", "sa", "ana araujo", "exemplo", "x"):
+        found = index.search(query, limit=100)
+        assert len(found) == len(set(found)) and set(found) == set(brute_force(rows, query)), query
+    limited = index.search("jo", limit=3)
+    assert len(limited) == 3 and set(limited) <= set(brute_force(rows, "jo"))
+    assert index.search("maria santos", limit=2) == brute_force(rows, "maria santos")[:2]
+
+
+def test_exact_tax_id_comes_first():
+    rng = random.Random(1)
+    _, rows, index = build([client(rng, i) for i in range(20)])
+    assert index.search("012.456.789-12") == [rows[12]["id"]]
+    assert index.search("01245678912") == [rows[12]["id"]]
+    assert index.search("0124") == []
+    assert digits("(11) 9999-0000") == "1199990000"
+
+
+def test_writes_keep_the_index_current():
+    rng = random.Random(2)
+    _, rows, index = build([client(rng, i) for i in range(10)])
+    first = rows[0]
+    index.updated({**first, "name": "Zacarias Prado"}, key=1)
+    assert index.search("zacarias") == [first["id"]]
+    assert first["id"] not in index.search(first["name"])
+    index.created({"id": "999", "name": "Zuleica", "email": None, "phone": "11 99999-0000", "tax_id": None}, key=999)
+    assert index.search("z") == [first["id"], "999"]
+    assert index.search("11999990000") == ["999"]
+    index.deleted("999")
+    assert index.search("zuleica") == [] and len(index) == 10
+
+
+def test_sorted_tokens_with_small_blocks():
+    rng = random.Random(4)
+    vocabulary, tokens = SortedTokens(), set()
+    SortedTokens.LOAD, load = 2, SortedTokens.LOAD
+    try:
+        for _ in range(300):
+            token = "".join(rng.choice("abc") for _ in range(rng.randint(1, 4)))
+            if token in tokens and rng.random() < 0.4:
+                vocabulary.remove(token)
+                tokens.discard(token)
+            elif token not in tokens:
+                vocabulary.add(token)
+                tokens.add(token)
+        for prefix in ("", "a", "ab", "cab", "cc"):
+            assert list(vocabulary.with_prefix(prefix)) == sorted(t for t in tokens if t.startswith(prefix))
+    finally:
+        SortedTokens.LOAD = load
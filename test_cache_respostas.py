@@ -0,0 +1,62 @@
+"""
+Testes do cache de respostas das listagens (cache_respostas.py).
+
+Uso:
+    python -m pytest -q test_cache_respostas.py
+"""
+from fastapi.responses import Response
+
+from cache_respostas import ResponseCache
+
+
+def cache_page(cache, status):
+    key = cache.key("list_transactions", {"status": status, "currency": None}, skip=0, limit=100)
+    cache.put(key, "transactions", {"status": status}, Response(f'["{status}"]'.encode()),
+              cache.version("transactions"))
+    return key
+
+
+def test_write_drops_only_pages_its_rows_match():
+    cache = ResponseCache()
+    pending, completed, failed = (cache_page(cache, status) for status in ("pending", "completed", "failed"))
+    assert cache.get(pending).body == b'["pending"]'
+
+    # Antes e depois da escrita: pending -> completed
+    cache.invalidate("transactions", {"status": "pending"}, {"status": "completed"})
+    assert cache.get(pending) is None
+    assert cache.get(completed) is None
+    assert cache.get(failed).body == b'["failed"]'
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_partial_rows_and_full_invalidation():
+    cache = ResponseCache()
+    pending, failed = cache_page(cache, "pending"), cache_page(cache, "failed")
+    # Linha sem o campo filtrado: a página pode mudar
+    cache.invalidate("transactions", {"transaction_type": "pix"})
+    assert cache.get(pending) is None and cache.get(failed) is None
+
+    pending = cache_page(cache, "pending")
+    cache.invalidate("clients")
+    assert cache.get(pending) is not None
+    cache.invalidate("transactions")
+    assert cache.get(pending) is None
+
+
+def test_invalidate_rows_checks_each_distinct_row():
+    cache = ResponseCache()
+    pending, completed, failed = (cache_page(cache, status) for status in ("pending", "completed", "failed"))
+    cache.invalidate_rows("transactions", ({"status": "pending"} for _ in range(100)))
+    cache.invalidate_rows("transactions", [{"status": "completed"}])
+    assert cache.get(pending) is None and cache.get(completed) is None
+    assert cache.get(failed) is not None
+
+
+def test_read_crossing_a_write_is_not_stored():
+    cache = ResponseCache()
+    key = cache.key("list_transactions", {"status": "pending"}, skip=0, limit=100)
+    version = cache.version("transactions")
+    cache.invalidate("transactions", {"status": "pending"})
+    cache.put(key, "transactions", {"status": "pending"}, Response(b"[]"), version)
+    assert cache.get(key) is None
+    assert cache.stats()["entries"] == 0
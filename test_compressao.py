@@ -0,0 +1,81 @@
+"""
+Testes da compressão negociada das respostas (compressao.py).
+
+Uso:
+    python -m pytest -q test_compressao.py
+"""
+import asyncio
+import gzip
+import json
+import zlib
+
+from compressao import CompressionMiddleware, compress, negotiate
+
+BODY = json.dumps([{"id": str(i), "status": "completed", "amount": 10.5} for i in range(200)]).encode()
+
+
+def test_negotiate_uses_the_q_weights():
+    assert negotiate("gzip, br", ("br", "gzip")) == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5", ("br", "gzip")) == "gzip"
+    assert negotiate("br;q=0, *;q=0.1", ("br", "gzip")) == "gzip"
+    assert negotiate("identity", ("br", "gzip")) is None
+    assert negotiate("gzip;q=abc", ("gzip",)) is None
+    assert negotiate("", ("gzip",)) is None
+
+
+def respond(chunks, accept_encoding="gzip", content_type="application/json", status=200, etag='"v1"'):
+    """Passa pelo middleware uma resposta com os blocos ``chunks`` e devolve (start, blocos enviados)."""
+    async def app(scope, receive, send):
+        headers = [(b"content-type", content_type.encode())]
+        if etag:
+            headers.append((b"etag", etag.encode()))
+        if len(chunks) == 1:
+            headers.append((b"content-length", str(len(chunks[0])).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        for position, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": position < len(chunks) - 1})
+
+    async def scenario():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+        await CompressionMiddleware(app, encodings=("gzip",), minimum_size=100)(scope, None, send)
+        return {name.decode(): value.decode() for name, value in sent[0]["headers"]}, sent[1:]
+    return asyncio.run(scenario())
+
+
+def test_large_json_is_gzipped_with_a_weak_etag():
+    headers, messages = respond([BODY])
+    [message] = messages
+    assert headers["content-encoding"] == "gzip" and headers["vary"] == "Accept-Encoding"
+    assert headers["etag"] == 'W/"v1"'
+    assert int(headers["content-length"]) == len(message["body"]) < len(BODY)
+    assert gzip.decompress(message["body"]) == BODY
+
+
+def test_small_or_binary_bodies_are_sent_as_they_are():
+    headers, [message] = respond([b'{"ok": true}'])
+    assert "content-encoding" not in headers and message["body"] == b'{"ok": true}'
+    assert headers["etag"] == 'W/"v1"' and headers["vary"] == "Accept-Encoding"
+    headers, [message] = respond([b"\x89PNG" * 100], content_type="image/png")
+    assert "content-encoding" not in headers and headers["etag"] == '"v1"'
+    headers, [message] = respond([BODY], accept_encoding="identity")
+    assert "content-encoding" not in headers and headers["vary"] == "Accept-Encoding"
+
+
+def test_streamed_chunks_can_be_read_as_they_arrive():
+    chunks = [BODY[start:start + 500] for start in range(0, len(BODY), 500)]
+    headers, messages = respond(chunks, content_type="application/x-ndjson")
+    assert headers["content-encoding"] == "gzip" and "content-length" not in headers
+    decompressor = zlib.decompressobj(31)
+    for chunk, message in zip(chunks, messages):
+        assert decompressor.decompress(message["body"]) == chunk
+    assert not messages[-1]["more_body"]
+    assert decompressor.flush() == b"" and decompressor.eof
+
+
+def test_compress_round_trip():
+    assert gzip.decompress(compress(BODY, "gzip", gzip_level=1)) == BODY
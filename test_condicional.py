@@ -0,0 +1,39 @@
+"""
+Testes dos validadores HTTP das leituras condicionais (condicional.py).
+
+Uso:
+    python -m pytest -q test_condicional.py
+"""
+from datetime import datetime, timedelta, timezone
+
+from condicional import not_modified, validators
+
+UPDATED_AT = datetime(2026, 5, 6, 7, 8, 9, 123456, tzinfo=timezone.utc)
+
+
+def test_validators_follow_the_version():
+    headers = validators(UPDATED_AT)
+    assert headers["Last-Modified"] == "Wed, 06 May 2026 07:08:09 GMT"
+    assert headers["ETag"].startswith('"') and headers["ETag"].endswith('"')
+    assert validators(UPDATED_AT + timedelta(microseconds=1))["ETag"] != headers["ETag"]
+    assert validators(UPDATED_AT)["ETag"] == headers["ETag"]
+
+
+def test_if_none_match():
+    headers = validators(UPDATED_AT)
+    etag = headers["ETag"]
+    assert not_modified({"if-none-match": etag}, headers)
+    assert not_modified({"if-none-match": f'"outro", W/{etag}'}, headers)
+    assert not_modified({"if-none-match": " * "}, headers)
+    assert not not_modified({"if-none-match": '"outro"'}, headers)
+    # If-None-Match tem precedência sobre If-Modified-Since
+    assert not not_modified({"if-none-match": '"outro"', "if-modified-since": headers["Last-Modified"]}, headers)
+
+
+def test_if_modified_since():
+    headers = validators(UPDATED_AT)
+    assert not_modified({"if-modified-since": headers["Last-Modified"]}, headers)
+    assert not_modified({"if-modified-since": "Thu, 07 May 2026 00:00:00 GMT"}, headers)
+    assert not not_modified({"if-modified-since": "Wed, 06 May 2026 07:08:08 GMT"}, headers)
+    assert not not_modified({"if-modified-since": "ontem"}, headers)
+    assert not not_modified({}, headers)
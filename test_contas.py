@@ -0,0 +1,94 @@
+"""
+Testes do razão por conta (contas.py).
+
+Uso:
+    python -m pytest -q test_contas.py
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from contas import AccountLedger
+from repositorios import TRANSACTIONS, MemoryRepository
+
+
+def transaction(origin, destination, amount, minute):
+    moment = datetime(2026, 1, 1, 10, minute)
+    return {
+        "origin_account": origin, "destination_account": destination, "amount": amount,
+        "currency": "BRL", "transaction_type": "pix", "description": None, "reference_id": None,
+        "status": "pending", "routing_info": {"route": "instant"}, "created_at": moment, "updated_at": moment,
+    }
+
+
+async def complete(repository, ledger, row, status="completed", minute=None):
+    changes = {"status": status}
+    if minute is not None:
+        changes["updated_at"] = datetime(2026, 1, 1, 11, minute)
+    previous = await repository.get(TRANSACTIONS, row["id"])
+    updated = await repository.update(TRANSACTIONS, row["id"], changes)
+    ledger.status_changed(previous["status"], updated, repository.sort_key(TRANSACTIONS, updated))
+    return updated
+
+
+def pages(ledger, account, limit, after=None):
+    seen = []
+    while True:
+        rows, after = ledger.movements(account, limit, after)
+        seen += rows
+        if after is None:
+            return seen
+
+
+def test_movement_cursor_survives_rebuild():
+    async def scenario():
+        repository = MemoryRepository()
+        ledger = AccountLedger()
+        await ledger.ensure_ready(repository, TRANSACTIONS)
+        rows = [await repository.insert(TRANSACTIONS, transaction("A", f"B{i}", 10.0 + i, i)) for i in range(6)]
+        for minute, row in enumerate(rows):
+            await complete(repository, ledger, row, minute=minute)
+        # Um estorno no meio do extrato: a reconstrução o descarta e as posições mudam
+        await complete(repository, ledger, rows[1], status="failed", minute=30)
+        first_page, cursor = ledger.movements("A", 3)
+        await ledger.rebuild(repository, TRANSACTIONS)
+        return [row["id"] for row in rows], first_page, pages(ledger, "A", 2, cursor), ledger.balance("A")
+
+    ids, first_page, rest, balance = asyncio.run(scenario())
+    assert [row["transaction_id"] for row in first_page] == ids[:3]
+    assert [row["transaction_id"] for row in rest] == ids[3:]
+    assert balance["balances"]["BRL"] == -(10.0 + 12.0 + 13.0 + 14.0 + 15.0)
+
+
+def test_invalid_movement_cursor():
+    async def scenario():
+        repository = MemoryRepository()
+        ledger = AccountLedger()
+        row = await repository.insert(TRANSACTIONS, transaction("A", "B", 1.0, 0))
+        await ledger.ensure_ready(repository, TRANSACTIONS)
+        await complete(repository, ledger, row)
+        return ledger
+
+    ledger = asyncio.run(scenario())
+    for cursor in (5, ["x", "1", "debit"], ["2026-01-01T10:00:00", "1"]):
+        with pytest.raises(ValueError):
+            ledger.movements("A", 10, cursor)
+
+
+def test_rebuild_of_one_account():
+    async def scenario():
+        repository = MemoryRepository()
+        full = AccountLedger()
+        await full.ensure_ready(repository, TRANSACTIONS)
+        for minute, (origin, destination) in enumerate((("A", "B"), ("B", "A"), ("A", "A"), ("C", "B"))):
+            row = await repository.insert(TRANSACTIONS, transaction(origin, destination, 10.0 * (minute + 1), minute))
+            await complete(repository, full, row, minute=minute)
+        single = AccountLedger()
+        summary = await single.rebuild(repository, TRANSACTIONS, account="A")
+        return full, single, summary
+
+    full, single, summary = asyncio.run(scenario())
+    assert summary["transactions"] == 3
+    assert single.balance("A") == full.balance("A")
+    assert pages(single, "A", 2) == pages(full, "A", 2)
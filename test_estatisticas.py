@@ -0,0 +1,73 @@
+"""
+Testes dos agregados de transações (estatisticas.py).
+
+Uso:
+    python -m pytest -q test_estatisticas.py
+"""
+import asyncio
+from datetime import datetime
+
+from estatisticas import TransactionStats
+from repositorios import TRANSACTIONS, MemoryRepository
+
+
+def transaction(amount, currency="BRL", status="pending", minute=0):
+    return {
+        "origin_account": "000001-1", "destination_account": "000002-2", "amount": amount,
+        "currency": currency, "transaction_type": "pix", "description": None, "reference_id": None,
+        "status": status, "routing_info": {"route": "instant"},
+        "created_at": datetime(2026, 1, 1, 10, minute), "updated_at": datetime(2026, 1, 1, 10, minute),
+    }
+
+
+async def built_stats(*rows):
+    repository = MemoryRepository()
+    inserted = [await repository.insert(TRANSACTIONS, row) for row in rows]
+    stats = TransactionStats(page_size=2)
+    await stats.ensure_ready(repository, TRANSACTIONS)
+    return repository, stats, inserted
+
+
+def test_sums_are_kept_per_currency():
+    async def scenario():
+        _, stats, _ = await built_stats(transaction(100.0), transaction(50.0, "USD"), transaction(25.5))
+        return stats.summary("minute", 2)
+
+    summary = asyncio.run(scenario())
+    assert summary["total"] == {"count": 3}
+    assert summary["by_currency"]["BRL"] == {"count": 2, "sum": 125.5, "min": 25.5, "max": 100.0}
+    assert summary["by_currency"]["USD"]["sum"] == 50.0
+    assert set(summary["by_status"]["pending"]) == {"BRL", "USD"}
+    assert summary["by_status"]["pending"]["BRL"]["sum"] == 125.5
+    assert summary["buckets"][-1]["count"] == 3
+    assert summary["buckets"][-1]["by_currency"]["USD"]["count"] == 1
+
+
+def test_status_change_moves_amount_between_cells():
+    async def scenario():
+        repository, stats, (row, _) = await built_stats(transaction(100.0), transaction(10.0))
+        updated = await repository.update(TRANSACTIONS, row["id"], {"status": "completed"})
+        stats.status_changed("pending", updated, repository.sort_key(TRANSACTIONS, updated))
+        return stats.summary()
+
+    summary = asyncio.run(scenario())
+    assert summary["by_status"]["pending"]["BRL"] == {"count": 1, "sum": 10.0, "min": 10.0, "max": 10.0}
+    assert summary["by_status"]["completed"]["BRL"]["sum"] == 100.0
+
+
+def test_unseen_previous_status_discards_and_rebuilds():
+    async def scenario():
+        repository, stats, (row, _) = await built_stats(transaction(100.0), transaction(10.0))
+        # Outro processo concluiu a transação sem passar por este cubo
+        await repository.update(TRANSACTIONS, row["id"], {"status": "completed"})
+        updated = await repository.update(TRANSACTIONS, row["id"], {"status": "failed"})
+        stats.status_changed("completed", updated, repository.sort_key(TRANSACTIONS, updated))
+        discarded = not stats.ready
+        await stats.ensure_ready(repository, TRANSACTIONS)
+        return discarded, stats.summary()
+
+    discarded, summary = asyncio.run(scenario())
+    assert discarded
+    assert summary["by_status"]["failed"]["BRL"]["sum"] == 100.0
+    assert summary["by_status"]["pending"]["BRL"]["count"] == 1
+    assert "completed" not in summary["by_status"]
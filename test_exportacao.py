@@ -0,0 +1,56 @@
+"""
+Testes da exportação em fluxo (exportacao.py).
+
+Uso:
+    python -m pytest -q test_exportacao.py
+"""
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+from exportacao import TRANSACTION_EXPORT_COLUMNS, iter_export
+from repositorios import TRANSACTIONS, MemoryRepository
+
+
+def transaction(status, amount):
+    return {
+        "origin_account": "000001-1", "destination_account": "000002-2", "amount": amount,
+        "currency": "BRL", "transaction_type": "pix", "description": 'com "aspas", vírgula\ne quebra',
+        "reference_id": None, "status": status, "routing_info": {"route": "instant"},
+        "created_at": datetime(2026, 1, 1, 12), "updated_at": datetime(2026, 1, 1, 12),
+    }
+
+
+def export(export_format, filters):
+    async def scenario():
+        repository = MemoryRepository()
+        await repository.connect()
+        for i in range(7):
+            await repository.insert(TRANSACTIONS, transaction("completed" if i % 3 else "pending", float(i)))
+        chunks = [chunk async for chunk in iter_export(
+            repository, TRANSACTIONS, filters, export_format, TRANSACTION_EXPORT_COLUMNS, page_size=2)]
+        await repository.close()
+        return chunks
+    return asyncio.run(scenario())
+
+
+def test_ndjson_export_walks_every_page():
+    chunks = export("ndjson", {"status": "completed"})
+    rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert len(chunks) == 2
+    assert [row["amount"] for row in rows] == [1.0, 2.0, 4.0, 5.0]
+    assert list(rows[0]) == list(TRANSACTION_EXPORT_COLUMNS)
+    assert rows[0]["created_at"] == "2026-01-01T12:00:00"
+    assert rows[0]["routing_info"] == {"route": "instant"}
+
+
+def test_csv_export_starts_with_the_header():
+    chunks = export("csv", {"status": None})
+    assert chunks[0] == b",".join(column.encode() for column in TRANSACTION_EXPORT_COLUMNS) + b"\r\n"
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert [row["amount"] for row in rows] == [str(float(i)) for i in range(7)]
+    assert rows[0]["description"] == 'com "aspas", vírgula\ne quebra'
+    assert rows[0]["reference_id"] == ""
+    assert json.loads(rows[0]["routing_info"]) == {"route": "instant"}
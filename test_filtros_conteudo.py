@@ -0,0 +1,103 @@
+"""
+Testes dos filtros sobre o conteúdo dos registros (filtros_conteudo.py).
+
+Uso:
+    python -m pytest -q test_filtros_conteudo.py
+"""
+import random
+
+import pytest
+
+from filtros_conteudo import (Condition, ContentIndexes, ContentIndexPolicy, FieldIndex, SortedPairs,
+                              WhereSyntaxError, create_content_index_policy, matches, parse_number, parse_where)
+
+
+def test_integer_literals_keep_full_precision():
+    [condition] = parse_where(["id=9007199254740993"])
+    assert condition == Condition("id", "=", 9007199254740993)
+    assert isinstance(condition.value, int)
+    assert matches(9007199254740993, condition)
+    assert not matches(9007199254740992, condition)
+
+
+def test_decimal_and_exponent_literals_are_floats():
+    assert parse_where(["amount>1000.5", "rate<=1e3"]) == [
+        Condition("amount", ">", 1000.5), Condition("rate", "<=", 1000.0)]
+    assert isinstance(parse_where(["rate<=1e3"])[0].value, float)
+
+
+def test_quoted_and_plain_text_stay_strings():
+    conditions = parse_where(["status='100' and name=Ana"])
+    assert conditions == [Condition("status", "=", "100"), Condition("name", "=", "Ana")]
+    assert not conditions[0].numeric
+    assert not matches(100, conditions[0])
+
+
+def test_parse_number():
+    assert parse_number("-42") == -42
+    assert parse_number("0.25") == 0.25
+    assert parse_number("12a") is None
+
+
+def test_invalid_condition():
+    with pytest.raises(WhereSyntaxError):
+        parse_where(["amount>"])
+
+
+def test_leading_zeros_stay_text():
+    assert parse_where(["account=000123"]) == [Condition("account", "=", "000123")]
+    assert parse_number("1e400") is None
+
+
+def test_field_index_matches_a_full_scan():
+    rng = random.Random(5)
+    index = FieldIndex(("amount",))
+    SortedPairs.LOAD, load = 4, SortedPairs.LOAD
+    try:
+        index.build((seq, f"r{seq}", rng.randrange(50)) for seq in range(40))
+        values = dict(index.values)
+        for seq in range(40, 400):
+            if values and rng.random() < 0.3:
+                row_id = rng.choice(sorted(values))
+                index.remove(int(row_id[1:]), row_id)
+                del values[row_id]
+            value = rng.choice((rng.randrange(50), rng.random() * 50, f"t{rng.randrange(5)}"))
+            index.add(seq, f"r{seq}", value)
+            values[f"r{seq}"] = value
+        for op in ("=", ">", ">=", "<", "<="):
+            for literal in (-1, 0, 17, 17.5, 49, 60, "t2"):
+                condition = Condition("amount", op, literal)
+                expected = sorted(int(row_id[1:]) for row_id, value in values.items() if matches(value, condition))
+                assert sorted(index.seqs(condition)) == expected, condition
+                assert index.count(condition) == len(expected), condition
+    finally:
+        SortedPairs.LOAD = load
+
+
+def test_index_policy_allowlist_and_cap(monkeypatch):
+    allowlist = ContentIndexPolicy(fields=["amount", "customer.id"])
+    assert allowlist.admit(("customer", "id")) and not allowlist.admit(("other",))
+    capped = ContentIndexPolicy(max_paths=2)
+    assert [capped.admit((field,)) for field in ("a", "b", "c", "a")] == [True, True, False, True]
+    monkeypatch.setenv("DATABRIDGE_CONTENT_INDEX_FIELDS", "amount, status")
+    assert create_content_index_policy().fields == {("amount",), ("status",)}
+    monkeypatch.setenv("DATABRIDGE_CONTENT_INDEX_FIELDS", "amount;drop")
+    with pytest.raises(ValueError):
+        create_content_index_policy()
+
+
+class Row:
+    def __init__(self, row_id, content):
+        self.id, self.content = row_id, content
+
+
+def test_paths_outside_the_policy_are_checked_without_index():
+    rows = [Row(f"r{seq}", f'{{"amount": {seq}, "kind": "{"ab"[seq % 2]}"}}') for seq in range(100)]
+    indexes = ContentIndexes(lambda: ((seq, row.id, row.content) for seq, row in enumerate(rows)), lambda: len(rows),
+                             policy=ContentIndexPolicy(max_paths=1))
+    candidates, predicate = indexes.plan(parse_where(["amount<10", "kind=a"]))
+    assert list(indexes.fields) == [("amount",)]
+    assert [seq for seq in candidates if predicate(rows[seq])] == [0, 2, 4, 6, 8]
+    candidates, predicate = indexes.plan(parse_where(["kind=b"]))
+    assert candidates is None and list(indexes.fields) == [("amount",)]
+    assert sum(map(predicate, rows)) == 50
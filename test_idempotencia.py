@@ -0,0 +1,91 @@
+"""
+Testes do cache de idempotência (idempotencia.py).
+
+Uso:
+    python -m pytest -q test_idempotencia.py
+"""
+import asyncio
+
+import pytest
+
+from idempotencia import IdempotencyCache, IdempotencyConflictError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def counting_operation():
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+    return calls, operation
+
+
+def test_concurrent_requests_run_the_operation_once():
+    async def scenario():
+        cache = IdempotencyCache()
+        calls, operation = counting_operation()
+        results = await asyncio.gather(*(cache.run("k", "body", operation) for _ in range(5)))
+        return calls, results, cache.stats()
+
+    calls, results, stats = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [(1, False)] + [(1, True)] * 4
+    assert (stats["misses"], stats["hits"], stats["collapsed"]) == (1, 4, 4)
+
+
+def test_same_key_with_another_body_conflicts():
+    async def scenario():
+        cache = IdempotencyCache()
+        _, operation = counting_operation()
+        await cache.run("k", "body", operation)
+        with pytest.raises(IdempotencyConflictError):
+            await cache.run("k", "other", operation)
+
+    asyncio.run(scenario())
+
+
+def test_failures_are_not_cached():
+    async def scenario():
+        cache = IdempotencyCache()
+
+        async def failing():
+            raise RuntimeError("falhou")
+
+        with pytest.raises(RuntimeError):
+            await cache.run("k", "body", failing)
+        _, operation = counting_operation()
+        return await cache.run("k", "body", operation)
+
+    assert asyncio.run(scenario()) == (1, False)
+
+
+def test_entries_expire_and_are_evicted_by_use():
+    async def scenario():
+        clock = Clock()
+        cache = IdempotencyCache(max_entries=2, ttl_seconds=10, clock=clock)
+        calls, operation = counting_operation()
+        for key in ("a", "b"):
+            await cache.run(key, "body", operation)
+        await cache.run("a", "body", operation)
+        await cache.run("c", "body", operation)
+        replayed_a = (await cache.run("a", "body", operation))[1]
+        replayed_b = (await cache.run("b", "body", operation))[1]
+        clock.now = 11
+        expired = (await cache.run("b", "body", operation))[1]
+        return len(calls), replayed_a, replayed_b, expired, cache.stats()
+
+    calls, replayed_a, replayed_b, expired, stats = asyncio.run(scenario())
+    assert (replayed_a, replayed_b, expired) == (True, False, False)
+    assert calls == 5
+    assert stats["evictions"] >= 1 and stats["expirations"] >= 1
+    with pytest.raises(ValueError):
+        IdempotencyCache(max_entries=0)
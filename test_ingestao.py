@@ -0,0 +1,140 @@
+"""
+Testes da leitura de registros de arquivos (ingestao.py).
+
+Uso:
+    python -m pytest -q test_ingestao.py
+"""
+import asyncio
+
+import pytest
+
+from ingestao import (CSVRecordParser, FileParseError, JSONRecordParser, LineTooLongError, RecordParseError,
+                      XMLRecordParser, check_record_batch, coerce_numbers, detect_file_type, iter_multipart,
+                      iter_ndjson_lines)
+
+
+def read_lines(chunks, max_line_bytes):
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [item async for item in iter_ndjson_lines(stream(), max_line_bytes)]
+    return asyncio.run(collect())
+
+
+def test_ndjson_lines_split_across_chunks():
+    lines = read_lines([b'{"a"', b': 1}\n\n  \n{"b": 2}\n{"c"', b": 3}"], max_line_bytes=16)
+    assert lines == [(1, b'{"a": 1}'), (4, b'{"b": 2}'), (5, b'{"c": 3}')]
+
+
+def test_ndjson_long_lines_are_reported_and_skipped():
+    lines = read_lines([b"x" * 10, b"x" * 10, b"\nok\n", b"y" * 30], max_line_bytes=16)
+    assert [number for number, _ in lines] == [1, 2, 3]
+    assert isinstance(lines[0][1], LineTooLongError)
+    assert lines[1] == (2, b"ok")
+    assert isinstance(lines[2][1], LineTooLongError)
+
+
+def test_csv_numeric_cells_become_numbers():
+    parser = CSVRecordParser()
+    items = parser.feed(b"id,account,amount,rate,note\r\n7,000123-1,1500.50,1e3,12a\r\n", final=True)
+    assert items == [("csv_row", {"id": 7, "account": "000123-1", "amount": 1500.5, "rate": 1000.0, "note": "12a"})]
+
+
+def test_xml_numeric_text_and_attributes_become_numbers():
+    parser = XMLRecordParser()
+    items = parser.feed(b'<rows><row id="9007199254740993"><amount currency="BRL">2500</amount>'
+                        b'<cpf>01234567890</cpf></row></rows>', final=True)
+    assert items == [("row", {"id": 9007199254740993, "amount": {"currency": "BRL", "#text": 2500},
+                              "cpf": "01234567890"})]
+
+
+def test_json_strings_are_kept():
+    items = JSONRecordParser().feed(b'[{"amount": "1500"}]', final=True)
+    assert items == [("json_object", {"amount": "1500"})]
+
+
+def test_coerce_numbers_leaves_non_canonical_text():
+    assert coerce_numbers({"a": ["+1", "007", "-0.5", " 42 ", ""]}) == {"a": ["+1", "007", -0.5, 42, ""]}
+
+
+def test_check_record_batch_normalizes_csv_and_xml():
+    contents = ['{"amount": "1500.50", "cpf": "01234567890"}', '{"amount": 10}', "[1, 2]", "{quebrado"]
+    assert check_record_batch("csv", contents) == [
+        ("processed", '{"amount": 1500.5, "cpf": "01234567890"}'),
+        ("processed", None),
+        ("failed", None),
+        ("failed", None),
+    ]
+    assert check_record_batch("json", contents) == [
+        ("processed", None), ("processed", None), ("processed", None), ("failed", None),
+    ]
+
+
+def feed_in_chunks(parser, data, size):
+    items = []
+    for start in range(0, len(data), size):
+        items += parser.feed(data[start:start + size])
+    return items + parser.feed(b"", final=True)
+
+
+@pytest.mark.parametrize("parser_type, data", [
+    (CSVRecordParser, 'nome,obs,valor\r\n"Ana","linha 1\nlinha 2, com vírgula",10\r\nJoão,"",-2.5\r\n'.encode()),
+    (JSONRecordParser, '[{"nome": "Ana", "valor": 12345}, 67890, {"lista": [1, "ç"]}]'.encode()),
+    (JSONRecordParser, '{"a": 1}\n{"b": "ã"}\n\n12345\n'.encode()),
+    (XMLRecordParser, '<rows><row id="1"><nome>Ana</nome></row><row id="2"><nome>Zé</nome></row></rows>'.encode()),
+])
+def test_parsers_give_the_same_records_for_any_chunking(parser_type, data):
+    expected = parser_type().feed(data, final=True)
+    assert expected
+    for size in (1, 2, 3, 7, 64):
+        assert feed_in_chunks(parser_type(), data, size) == expected, size
+
+
+def test_csv_bad_rows_are_reported_and_reading_continues():
+    items = CSVRecordParser().feed(b"a,b\n1,2\n3\n4,5\n", final=True)
+    assert items[0] == ("csv_row", {"a": 1, "b": 2}) and items[2] == ("csv_row", {"a": 4, "b": 5})
+    assert isinstance(items[1], RecordParseError)
+    with pytest.raises(FileParseError):
+        CSVRecordParser().feed(b'a,b\n"aberto,1\n', final=True)
+
+
+def test_oversized_and_unfinished_records_stop_the_file():
+    with pytest.raises(FileParseError):
+        feed_in_chunks(CSVRecordParser(max_record_bytes=16), b"a\n" + b"x" * 40 + b"\n", 8)
+    with pytest.raises(FileParseError):
+        feed_in_chunks(JSONRecordParser(max_record_bytes=16), b'[{"a": "' + b"x" * 40 + b'"}]', 8)
+    with pytest.raises(FileParseError):
+        JSONRecordParser().feed(b'[{"a": 1}', final=True)
+    with pytest.raises(FileParseError):
+        XMLRecordParser().feed(b"<rows><row>", final=True)
+
+
+def test_multipart_parts_split_across_chunks():
+    body = (b"--limite\r\nContent-Disposition: form-data; name=\"files\"; filename=\"a.csv\"\r\n\r\n"
+            b"n\r\n1\r\n--limite\r\nContent-Disposition: form-data; name=\"files\"; filename=\"b.json\"\r\n\r\n"
+            b"[]\r\n--limite--\r\n")
+
+    async def events(size):
+        async def chunks():
+            for start in range(0, len(body), size):
+                yield body[start:start + size]
+        parts = []
+        async for event, value in iter_multipart(chunks(), b"limite"):
+            if event == "part":
+                parts.append([value["content-disposition"], b""])
+            elif event == "data":
+                parts[-1][1] += value
+        return parts
+
+    for size in (1, 5, len(body)):
+        parts = asyncio.run(events(size))
+        assert [data for _, data in parts] == [b"n\r\n1", b"[]"]
+        assert 'filename="b.json"' in parts[1][0]
+
+
+def test_detect_file_type():
+    assert detect_file_type("dados.NDJSON") == "json"
+    assert detect_file_type("dados", "text/xml; charset=utf-8") == "xml"
+    assert detect_file_type("dados.txt") is None
@@ -0,0 +1,82 @@
+"""
+Testes das métricas no formato do Prometheus (metricas.py).
+
+Uso:
+    python -m pytest -q test_metricas.py
+"""
+import asyncio
+
+import pytest
+
+from metricas import MetricsMiddleware, MetricsRegistry, create_metrics_registry
+
+
+def samples(text):
+    """Linhas de amostra da exposição como {nome com rótulos: valor}."""
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+            for line in text.splitlines() if line and not line.startswith("#")}
+
+
+def test_histograms_are_cumulative():
+    registry = MetricsRegistry(namespace="teste")
+    for seconds in (0.0004, 0.003, 0.003, 20.0):
+        registry.observe("GET", "/itens/{id}", 200, seconds, 0, 300)
+    values = samples(asyncio.run(registry.render()))
+    labels = 'method="GET",route="/itens/{id}",status="200"'
+    assert values[f'teste_http_request_duration_seconds_bucket{{{labels},le="0.0005"}}'] == 1
+    assert values[f'teste_http_request_duration_seconds_bucket{{{labels},le="0.005"}}'] == 3
+    assert values[f'teste_http_request_duration_seconds_bucket{{{labels},le="10.0"}}'] == 3
+    assert values[f'teste_http_request_duration_seconds_bucket{{{labels},le="+Inf"}}'] == 4
+    assert values[f"teste_http_request_duration_seconds_count{{{labels}}}"] == 4
+    assert values[f"teste_http_request_duration_seconds_sum{{{labels}}}"] == pytest.approx(20.0064)
+    assert values[f'teste_http_response_size_bytes_bucket{{{labels},le="256.0"}}'] == 0
+    assert values[f'teste_http_response_size_bytes_bucket{{{labels},le="1024.0"}}'] == 4
+
+
+def test_gauges_are_read_at_collection_time():
+    registry = MetricsRegistry(namespace="teste")
+    rows = {"clients": 2}
+
+    async def pending():
+        return [({"queue": 'a"b'}, 1.5)]
+
+    registry.gauge("rows", "Linhas.", lambda: [({"entity": name}, count) for name, count in rows.items()])
+    registry.gauge("pending", "Pendentes.", pending, kind="counter")
+    rows["clients"] = 3
+    text = asyncio.run(registry.render())
+    assert "# TYPE teste_pending counter" in text
+    assert samples(text)['teste_rows{entity="clients"}'] == 3
+    assert samples(text)['teste_pending{queue="a\\"b"}'] == 1.5
+
+
+def test_middleware_measures_each_request():
+    async def app(scope, receive, send):
+        body = (await receive())["body"]
+        scope["route"] = type("Route", (), {"path": "/eco/{valor}"})()
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": body * 2})
+
+    async def scenario(registry):
+        async def receive():
+            return {"type": "http.request", "body": b"abc"}
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "method": "POST", "root_path": "/api/v1"}
+        await MetricsMiddleware(app, registry)(scope, receive, send)
+        await MetricsMiddleware(app, registry)({**scope, "method": "GET"}, receive, send)
+
+    registry = MetricsRegistry()
+    asyncio.run(scenario(registry))
+    metrics = registry.routes[("POST", "/api/v1/eco/{valor}", 201)]
+    assert (metrics.request_size.sum, metrics.response_size.sum, metrics.latency.count) == (3, 6, 1)
+    assert registry.in_flight == {"POST": 0, "GET": 0}
+
+
+def test_collection_can_be_turned_off(monkeypatch):
+    monkeypatch.setenv("DATABRIDGE_METRICS", "off")
+    registry = create_metrics_registry()
+    assert not registry.enabled
+    asyncio.run(MetricsMiddleware(lambda *args: asyncio.sleep(0), registry)({"type": "http"}, None, None))
+    assert registry.routes == {}
@@ -0,0 +1,154 @@
+"""
+Testes do log de escrita e do snapshot mapeado do modo memória (persistencia.py).
+
+Uso:
+    python -m pytest -q test_persistencia.py
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from armazenamento_memoria import MemoryTable, TransactionRow
+from persistencia import MemoryPersistence
+from repositorios import TRANSACTIONS, MemoryRepository
+from snapshot_mapeado import MappedSnapshot, MappedSnapshotWriter
+
+
+def transaction(reference, status="pending", amount=100.0):
+    return {
+        "origin_account": "000001-1", "destination_account": "000002-2", "amount": amount,
+        "currency": "BRL", "transaction_type": "pix", "description": None, "reference_id": reference,
+        "status": status, "routing_info": {"route": "instant"},
+        "created_at": datetime(2026, 1, 1), "updated_at": datetime(2026, 1, 1),
+    }
+
+
+def open_repository(directory):
+    return MemoryRepository(MemoryPersistence(directory, snapshot_interval=0))
+
+
+async def stop(repository):
+    # Sem snapshot final: a próxima partida precisa reaplicar o log
+    await repository.persistence.close(snapshot=False)
+
+
+async def reopen(directory):
+    repository = open_repository(directory)
+    await repository.connect()
+    rows = list(repository.tables[TRANSACTIONS].values())
+    pending = await repository.find(TRANSACTIONS, {"status": "pending"})
+    return repository, rows, [row["reference_id"] for row in pending.rows]
+
+
+def test_replay_without_snapshot_ignores_a_truncated_line(tmp_path):
+    async def scenario():
+        repository = MemoryRepository(MemoryPersistence(tmp_path, sync_mode="commit", snapshot_interval=0))
+        await repository.connect()
+        rows = [await repository.insert(TRANSACTIONS, transaction(f"ref-{i}")) for i in range(3)]
+        await repository.update(TRANSACTIONS, rows[2]["id"], {"status": "failed"})
+        stats = repository.persistence.stats()
+        await stop(repository)
+        # Queda no meio da gravação do próximo registro
+        [segment] = tmp_path.glob("wal-*.log")
+        with open(segment, "ab") as f:
+            f.write(b'[4,"d","transactions",')
+
+        reopened, stored, pending = await reopen(tmp_path)
+        recovery = reopened.persistence.recovery
+        row = await reopened.insert(TRANSACTIONS, transaction("ref-3"))
+        await stop(reopened)
+        return stats, recovery, stored, pending, row, rows
+
+    stats, recovery, stored, pending, row, rows = asyncio.run(scenario())
+    assert stats["wal"]["fsyncs"] >= 1 and stats["wal"]["records"] == 4
+    assert recovery["snapshot"] is None and recovery["replayed_records"] == 4
+    assert len(stored) == 3 and pending == ["ref-0", "ref-1"]
+    assert row["id"] not in {stored_row["id"] for stored_row in rows}
+    with pytest.raises(ValueError):
+        MemoryPersistence(tmp_path, sync_mode="never")
+
+
+def test_replay_after_snapshot(tmp_path):
+    async def scenario():
+        repository = open_repository(tmp_path)
+        await repository.connect()
+        rows = [await repository.insert(TRANSACTIONS, transaction(f"ref-{i}")) for i in range(4)]
+        await repository.persistence.snapshot()
+        rows.append(await repository.insert(TRANSACTIONS, transaction("ref-4")))
+        await repository.update(TRANSACTIONS, rows[0]["id"], {"status": "completed"})
+        await repository.update(TRANSACTIONS, rows[4]["id"], {"amount": 7.5})
+        await repository.delete(TRANSACTIONS, rows[1]["id"])
+        await stop(repository)
+
+        reopened, stored, pending = await reopen(tmp_path)
+        found = [await reopened.get(TRANSACTIONS, row["id"]) for row in rows]
+        await stop(reopened)
+        return reopened.persistence.recovery, stored, pending, found
+
+    recovery, stored, pending, found = asyncio.run(scenario())
+    assert recovery["snapshot_rows"] == 4
+    assert recovery["replayed_records"] == 4
+    assert [row["reference_id"] for row in stored] == ["ref-0", "ref-2", "ref-3", "ref-4"]
+    assert pending == ["ref-2", "ref-3", "ref-4"]
+    assert found[0]["status"] == "completed"
+    assert found[1] is None
+    assert found[4]["amount"] == 7.5
+
+
+def test_rows_written_during_snapshot_survive_restart(tmp_path):
+    async def scenario():
+        repository = open_repository(tmp_path)
+        await repository.connect()
+        loop = asyncio.get_running_loop()
+        table = repository.tables[TRANSACTIONS]
+        for i in range(3):
+            await repository.insert(TRANSACTIONS, transaction(f"ref-{i}"))
+        late = []
+        iter_encoded = table.iter_encoded
+
+        def racing(stop=None):
+            yield from iter_encoded(stop)
+            # Inserções que chegam depois da leitura da tabela, com o snapshot ainda em gravação
+            for reference in ("late-0", "late-1"):
+                insert = repository.insert(TRANSACTIONS, transaction(reference))
+                late.append(asyncio.run_coroutine_threadsafe(insert, loop).result())
+
+        table.iter_encoded = racing
+        await repository.persistence.snapshot()
+        del table.iter_encoded
+        await repository.update(TRANSACTIONS, late[0]["id"], {"status": "completed"})
+        await repository.delete(TRANSACTIONS, late[1]["id"])
+        await stop(repository)
+
+        reopened, stored, pending = await reopen(tmp_path)
+        found = [await reopened.get(TRANSACTIONS, row["id"]) for row in late]
+        await stop(reopened)
+        return stored, pending, found
+
+    stored, pending, found = asyncio.run(scenario())
+    assert [row["reference_id"] for row in stored] == ["ref-0", "ref-1", "ref-2", "late-0"]
+    assert pending == ["ref-0", "ref-1", "ref-2"]
+    assert found[0]["status"] == "completed"
+    assert found[1] is None
+
+
+def test_restore_into_reserved_snapshot_slot(tmp_path):
+    source = MemoryTable(TransactionRow, indexed_fields=("status",))
+    rows = [source.insert({**transaction(f"ref-{i}"), "id": f"id-{i}"}) for i in range(3)]
+    # Snapshots antigos reservavam posições vazias para linhas inseridas durante a gravação
+    writer = MappedSnapshotWriter(tmp_path / "snapshot.map", 0)
+    writer.add_rows(TRANSACTIONS, TransactionRow, ("status",), source.iter_encoded(2), slots=3)
+    writer.close()
+    snapshot = MappedSnapshot(tmp_path / "snapshot.map", {TRANSACTIONS: TransactionRow})
+    table = MemoryTable(TransactionRow, indexed_fields=("status",))
+    table.attach_base(snapshot.tables[TRANSACTIONS])
+    table.restore(*source.encoded_row(rows[2]["id"]))
+
+    assert table.get("id-2")["reference_id"] == "ref-2"
+    assert len(table) == 3
+    table.update("id-2", status="completed")
+    assert [row["id"] for row in table.find({"status": "completed"})] == ["id-2"]
+    table.delete("id-2")
+    assert "id-2" not in table
+    assert [row["id"] for row in table.values()] == ["id-0", "id-1"]
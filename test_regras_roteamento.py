@@ -0,0 +1,86 @@
+"""
+Testes do motor de regras de roteamento (regras_roteamento.py).
+
+Uso:
+    python -m pytest -q test_regras_roteamento.py
+"""
+import json
+import os
+import random
+
+import pytest
+
+from regras_roteamento import (CompiledRoutingTable, RoutingEngine, RoutingRulesError, decide_linear,
+                               parse_rules)
+
+TABLE = {
+    "default": {"route": "standard"},
+    "rules": [
+        {"name": "pix_pequeno", "transaction_type": "pix", "amount_lte": 100, "routing": {"route": "instant"}},
+        {"name": "conta_vip", "account_prefix": "99", "routing": {"route": "vip"}},
+        {"name": "vip_dolar", "account_prefix": "990", "currency": "USD", "routing": {"route": "vip_usd"}},
+        {"name": "faixa_usd", "currency": ["USD", "EUR"], "amount_gt": 100, "amount_lt": 5000,
+         "routing": {"route": "fx"}},
+        {"name": "alto_valor", "amount_gte": 10000, "routing": {"route": "high_value"}},
+    ],
+}
+
+
+def test_compiled_table_matches_linear_evaluation():
+    rng = random.Random(3)
+    rules, default = parse_rules(TABLE)
+    table = CompiledRoutingTable(rules, default)
+    amounts = [0, 99.5, 100, 100.01, 4999, 5000, 9999.99, 10000, 25000]
+    for _ in range(3000):
+        currency = rng.choice(("BRL", "USD", "EUR", "GBP"))
+        transaction_type = rng.choice(("pix", "transfer", "payment"))
+        account = rng.choice(("990123-1", "991234-5", "9", "123456-7", ""))
+        amount = rng.choice(amounts) if rng.random() < 0.5 else rng.uniform(0, 20000)
+        arguments = (currency, transaction_type, account, amount)
+        assert table.decide(*arguments) == decide_linear(rules, default, *arguments), arguments
+
+
+def test_first_matching_rule_wins():
+    table = CompiledRoutingTable(*parse_rules(TABLE))
+    assert table.decide("USD", "pix", "990000-1", 50) == {"route": "instant"}
+    assert table.decide("USD", "transfer", "990000-1", 50) == {"route": "vip"}
+    assert table.decide("USD", "transfer", "123456-7", 100) == {"route": "standard"}
+    assert table.decide("EUR", "transfer", "123456-7", 100.5) == {"route": "fx"}
+    assert table.decide("BRL", "transfer", "123456-7", 10000) == {"route": "high_value"}
+
+
+@pytest.mark.parametrize("rule", [
+    {"amount_gt": 1},
+    {"routing": {}, "amount_gt": 1, "amount_gte": 2},
+    {"routing": {}, "amount_lt": "10"},
+    {"routing": {}, "currency": []},
+    {"routing": {}, "account_prefix": ""},
+    {"routing": {}, "unknown": 1},
+])
+def test_invalid_rules_are_rejected(rule):
+    with pytest.raises(RoutingRulesError):
+        parse_rules({"rules": [rule]})
+
+
+def test_reload_keeps_the_previous_table_on_error(tmp_path):
+    path = tmp_path / "regras.json"
+    path.write_text(json.dumps(TABLE), encoding="utf-8")
+    engine = RoutingEngine(path)
+    assert engine.describe()["rules"] == 5
+
+    path.write_text(json.dumps({"rules": [{"amount_gt": 0, "routing": {"route": "all"}}]}), encoding="utf-8")
+    os.utime(path, (1, 1))
+    assert engine.reload_if_changed()
+    assert engine.decide("BRL", "pix", "1", 10) == {"route": "all"}
+    assert not engine.reload_if_changed()
+
+    path.write_text("{invalid", encoding="utf-8")
+    os.utime(path, (2, 2))
+    assert not engine.reload_if_changed()
+    assert engine.decide("BRL", "pix", "1", 10) == {"route": "all"}
+
+
+def test_missing_file_uses_the_builtin_rules(tmp_path):
+    engine = RoutingEngine(tmp_path / "ausente.json")
+    assert engine.decide("BRL", "pix", "1", 20000) == {"route": "high_value", "priority": "high"}
+    assert engine.decide("BRL", "pix", "1", 10000) == {"route": "standard", "priority": "normal"}
@@ -0,0 +1,276 @@
+"""
+Testes dos repositórios em memória e SQLite (repositorios.py).
+
+Uso:
+    python -m pytest -q test_repositorios.py
+"""
+import asyncio
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from filtros_conteudo import parse_where
+from ingestao import CSVRecordParser
+from relatorio_duplicados import find_duplicates
+from repositorios import (CLIENTS, FILES, RECORDS, TRANSACTIONS, DuplicateKeyError, InvalidCursorError,
+                          MemoryRepository, MongoRepository, SQLiteRepository, create_repository)
+
+
+def transaction(status="pending", amount=100.0):
+    return {
+        "origin_account": "000001-1", "destination_account": "000002-2", "amount": amount,
+        "currency": "BRL", "transaction_type": "pix", "description": None, "reference_id": None,
+        "status": status, "routing_info": {"route": "instant"},
+        "created_at": datetime(2026, 1, 1), "updated_at": datetime(2026, 1, 1),
+    }
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repository(request, tmp_path):
+    if request.param == "memory":
+        return MemoryRepository()
+    return SQLiteRepository(str(tmp_path / "databridge.db"))
+
+
+def run(repository, scenario):
+    async def wrapped():
+        await repository.connect()
+        try:
+            return await scenario()
+        finally:
+            await repository.close()
+    return asyncio.run(wrapped())
+
+
+def test_create_repository_follows_db_mode(monkeypatch, tmp_path):
+    monkeypatch.delenv("DATABRIDGE_DB_MODE", raising=False)
+    monkeypatch.delenv("DATABRIDGE_PERSISTENCE_DIR", raising=False)
+    assert isinstance(create_repository(), MemoryRepository)
+    monkeypatch.setenv("DATABRIDGE_DB_MODE", "SQLite")
+    monkeypatch.setenv("DATABRIDGE_SQLITE_PATH", str(tmp_path / "modo.db"))
+    repository = create_repository()
+    assert isinstance(repository, SQLiteRepository) and repository.path == str(tmp_path / "modo.db")
+    with pytest.raises(ValueError):
+        create_repository("oracle")
+
+
+def test_crud_and_cursor_pages(repository):
+    async def scenario():
+        rows = [await repository.insert(TRANSACTIONS, transaction(amount=float(i))) for i in range(5)]
+        assert len({row["id"] for row in rows}) == 5 and all(isinstance(row["id"], str) for row in rows)
+        assert await repository.get(TRANSACTIONS, rows[0]["id"]) == rows[0]
+        updated = await repository.update(TRANSACTIONS, rows[1]["id"], {"status": "completed"})
+        assert updated["status"] == "completed" and updated["amount"] == 1.0
+        assert await repository.delete(TRANSACTIONS, rows[2]["id"])
+        assert not await repository.delete(TRANSACTIONS, rows[2]["id"])
+        assert await repository.get(TRANSACTIONS, rows[2]["id"]) is None
+        assert await repository.count(TRANSACTIONS) == 4
+
+        amounts, after = [], None
+        while True:
+            page = await repository.find(TRANSACTIONS, {"status": None}, limit=2, after=after)
+            amounts.append([row["amount"] for row in page.rows])
+            if page.next_key is None:
+                break
+            after = page.next_key
+        assert amounts == [[0.0, 1.0], [3.0, 4.0]]
+        assert [row["amount"] for row in (await repository.find(TRANSACTIONS, {"status": "completed"})).rows] == [1.0]
+        with pytest.raises(InvalidCursorError):
+            await repository.find(TRANSACTIONS, {}, after="abc")
+
+    run(repository, scenario)
+
+
+def test_update_with_expected_only_writes_matching_rows(repository):
+    async def scenario():
+        row = await repository.insert(TRANSACTIONS, transaction())
+        stale = await repository.update(TRANSACTIONS, row["id"], {"status": "failed"},
+                                        expected={"status": "processing"})
+        current = await repository.update(TRANSACTIONS, row["id"], {"status": "completed"},
+                                          expected={"status": "pending"})
+        again = await repository.update(TRANSACTIONS, row["id"], {"status": "completed"},
+                                        expected={"status": "pending"})
+        return stale, current, again, await repository.get(TRANSACTIONS, row["id"])
+
+    stale, current, again, stored = run(repository, scenario)
+    assert stale is None
+    assert current["status"] == "completed"
+    assert again is None
+    assert stored["status"] == "completed"
+
+
+def test_update_with_expected_on_missing_row(repository):
+    async def scenario():
+        return await repository.update(TRANSACTIONS, "999999", {"status": "failed"}, expected={"status": "pending"})
+
+    assert run(repository, scenario) is None
+
+
+def test_concurrent_transitions_have_one_winner(repository):
+    async def scenario():
+        row = await repository.insert(TRANSACTIONS, transaction())
+        return await asyncio.gather(*(
+            repository.update(TRANSACTIONS, row["id"], {"status": "completed"}, expected={"status": "pending"})
+            for _ in range(5)
+        ))
+
+    results = run(repository, scenario)
+    assert sum(result is not None for result in results) == 1
+
+
+def test_sqlite_workers_share_one_file(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "compartilhado.db")
+        first, second = SQLiteRepository(path), SQLiteRepository(path)
+        await first.connect()
+        await second.connect()
+        try:
+            row = await first.insert(TRANSACTIONS, transaction())
+            seen = await second.get(TRANSACTIONS, row["id"])
+            winners = await asyncio.gather(*(
+                repository.update(TRANSACTIONS, row["id"], {"status": "completed"}, expected={"status": "pending"})
+                for repository in (first, second, first, second)
+            ))
+            other = await second.insert(TRANSACTIONS, transaction())
+            journal = await first._run(lambda: first._connection.execute("PRAGMA journal_mode").fetchone()[0])
+            return (row, seen, winners, other, await first.get(TRANSACTIONS, row["id"]),
+                    await first.count(TRANSACTIONS), journal)
+        finally:
+            await first.close()
+            await second.close()
+
+    row, seen, winners, other, stored, count, journal = asyncio.run(scenario())
+    assert seen == row
+    assert sum(result is not None for result in winners) == 1
+    assert stored["status"] == "completed"
+    assert int(other["id"]) > int(row["id"]) and count == 2
+    assert journal == "wal"
+
+
+def person(name, tax_id=None, email=None):
+    return {"name": name, "email": email, "phone": None, "tax_id": tax_id,
+            "created_at": datetime(2026, 1, 1), "updated_at": datetime(2026, 1, 1)}
+
+
+def test_unique_client_fields(repository):
+    async def scenario():
+        ana = await repository.insert(CLIENTS, person("Ana", "123.456.789-00", "ana@exemplo.com"))
+        errors = []
+        for data in (person("Outra", " 123.456.789-00 "), person("Outra", email="ANA@Exemplo.com ")):
+            with pytest.raises(DuplicateKeyError) as error:
+                await repository.insert(CLIENTS, data)
+            errors.append(error.value.field)
+        # Vazio e ausente não participam da restrição
+        blanks = [await repository.insert(CLIENTS, person(f"Sem dados {i}", " ", "")) for i in range(2)]
+        bia = await repository.insert(CLIENTS, person("Bia", "999", "bia@exemplo.com"))
+        with pytest.raises(DuplicateKeyError):
+            await repository.update(CLIENTS, bia["id"], {"email": "ana@exemplo.com"})
+        await repository.update(CLIENTS, ana["id"], {"email": "ana.nova@exemplo.com"})
+        await repository.update(CLIENTS, bia["id"], {"email": "Ana@exemplo.com"})
+        await repository.delete(CLIENTS, ana["id"])
+        await repository.insert(CLIENTS, person("Ana de novo", "123.456.789-00"))
+        return errors, len(blanks), await repository.count(CLIENTS)
+
+    assert run(repository, scenario) == (["tax_id", "email"], 2, 4)
+
+
+def test_existing_duplicates_are_reported(tmp_path, caplog):
+    path = tmp_path / "legado.db"
+    connection = sqlite3.connect(path)
+    connection.executescript(SQLiteRepository.SCHEMA)
+    connection.executemany("INSERT INTO clients (name, email, tax_id) VALUES (?, ?, ?)",
+                           [("Ana", "ana@exemplo.com", "1"), ("Ana 2", " ANA@exemplo.com", "2"), ("Bia", None, "2")])
+    connection.commit()
+    connection.close()
+    repository = SQLiteRepository(str(path))
+
+    report = run(repository, lambda: find_duplicates(repository, page_size=2))
+    assert report["clients"] == 3
+    assert report["duplicates"]["email"] == [{"value": "ana@exemplo.com", "ids": ["1", "2"]}]
+    assert report["duplicates"]["tax_id"] == [{"value": "2", "ids": ["2", "3"]}]
+    assert "relatorio_duplicados.py" in caplog.text
+
+
+def test_where_compares_numbers_as_numbers(repository):
+    async def scenario():
+        file_row = await repository.insert(FILES, {"filename": "valores.csv", "file_type": "csv", "status": "processed",
+                                                   "created_at": datetime(2026, 1, 1), "processed_at": None})
+        items = CSVRecordParser().feed(b"id,amount\n1,999.99\n2,1000.01\n3,9007199254740993\n", final=True)
+        await repository.insert_many(RECORDS, [{
+            "file_id": file_row["id"], "record_type": record_type, "content": json.dumps(value),
+            "status": "processed", "created_at": datetime(2026, 1, 1),
+        } for record_type, value in items])
+        page = await repository.find(RECORDS, {"file_id": file_row["id"]}, where=parse_where(["amount>1000"]))
+        exact = await repository.find(RECORDS, {}, where=parse_where(["amount=9007199254740993"]))
+        return [json.loads(row["content"])["id"] for row in page.rows], len(exact.rows)
+
+    assert run(repository, scenario) == ([2, 3], 1)
+
+
+def test_find_with_empty_or_negative_bounds(repository):
+    async def scenario():
+        for amount in (1.0, 2.0, 3.0):
+            await repository.insert(TRANSACTIONS, transaction(amount=amount))
+        pages = [await repository.find(TRANSACTIONS, {}, skip=skip, limit=limit)
+                 for skip, limit in ((0, 0), (0, -5), (-3, 2))]
+        return [([row["amount"] for row in page.rows], page.next_key is not None) for page in pages]
+
+    assert run(repository, scenario) == [([], False), ([], False), ([1.0, 2.0], True)]
+
+
+def test_where_outside_the_index_policy(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATABRIDGE_CONTENT_INDEX_FIELDS", "amount")
+    for repository in (MemoryRepository(), SQLiteRepository(str(tmp_path / "politica.db"))):
+        async def scenario():
+            file_row = await repository.insert(FILES, {"filename": "v.csv", "file_type": "csv", "status": "processed",
+                                                       "created_at": datetime(2026, 1, 1), "processed_at": None})
+            await repository.insert_many(RECORDS, [{
+                "file_id": file_row["id"], "record_type": "csv_row",
+                "content": json.dumps({"amount": amount, "kind": "ab"[amount % 2]}),
+                "status": "processed", "created_at": datetime(2026, 1, 1),
+            } for amount in range(20)])
+            page = await repository.find(RECORDS, {}, where=parse_where(["amount<6", "kind=b"]))
+            return [json.loads(row["content"])["amount"] for row in page.rows]
+
+        assert run(repository, scenario) == [1, 3, 5]
+        if isinstance(repository, MemoryRepository):
+            assert list(repository.content_indexes.fields) == [("amount",)]
+        else:
+            assert repository._content_indexes == {("amount",)}
+
+
+SAME_FIELD_WHERE = [
+    (["amount>10", "amount>1000"], [5000]),
+    (["amount>1000", "amount>10"], [5000]),
+    (["amount>=10 and amount<=1000"], [10, 1000]),
+    (["amount>10", "amount='5000'"], []),
+]
+
+
+def test_conditions_on_the_same_field_are_all_applied(repository):
+    async def scenario():
+        file_row = await repository.insert(FILES, {"filename": "v.csv", "file_type": "csv", "status": "processed",
+                                                   "created_at": datetime(2026, 1, 1), "processed_at": None})
+        await repository.insert_many(RECORDS, [{
+            "file_id": file_row["id"], "record_type": "csv_row", "content": json.dumps({"amount": amount}),
+            "status": "processed", "created_at": datetime(2026, 1, 1),
+        } for amount in (5, 10, 1000, 5000)])
+        found = []
+        for expressions, _ in SAME_FIELD_WHERE:
+            page = await repository.find(RECORDS, {}, where=parse_where(expressions))
+            found.append([json.loads(row["content"])["amount"] for row in page.rows])
+        return found
+
+    assert run(repository, scenario) == [expected for _, expected in SAME_FIELD_WHERE]
+
+
+def test_mongo_keeps_every_condition_on_the_same_field():
+    # O motor não está instalado aqui: confere a consulta que o MongoDB receberia
+    clauses = MongoRepository._content_clauses(parse_where(["amount>10", "amount>1000", "amount='5000'"]))
+    assert clauses == [
+        {"content_fields.amount": {"$gt": 10, "$type": "number"}},
+        {"content_fields.amount": {"$gt": 1000, "$type": "number"}},
+        {"content_fields.amount": {"$eq": "5000", "$type": "string"}},
+    ]
@@ -0,0 +1,50 @@
+"""
+Testes do caminho rápido de serialização das listagens (serializacao.py).
+
+Uso:
+    python -m pytest -q test_serializacao.py
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, TypeAdapter
+
+import serializacao
+from serializacao import fast_list_response, project_rows
+
+
+class Item(BaseModel):
+    id: str
+    amount: float
+    description: Optional[str] = None
+    routing_info: Optional[Dict[str, Any]] = None
+    created_at: datetime
+
+
+ROWS = [
+    {"id": "1", "amount": 10.5, "description": "café ☕", "routing_info": {"route": "instant", "fee": 0.0},
+     "created_at": datetime(2026, 1, 2, 3, 4, 5, 678901), "internal": "não exposto"},
+    {"id": "2", "amount": 0.1, "description": None, "routing_info": None, "created_at": datetime(2026, 1, 2)},
+]
+
+
+def test_fast_response_matches_the_response_model():
+    expected = TypeAdapter(List[Item]).dump_python([Item(**row) for row in ROWS], mode="json")
+    response = fast_list_response(ROWS, Item, headers={"X-Next-Cursor": "abc"})
+    assert json.loads(response.body) == expected
+    assert response.media_type == "application/json"
+    assert response.headers["X-Next-Cursor"] == "abc"
+
+
+def test_projection_keeps_only_model_fields():
+    assert [list(row) for row in project_rows(ROWS, Item)] == [list(Item.model_fields)] * 2
+
+
+def test_fast_path_setting(monkeypatch):
+    monkeypatch.setenv("DATABRIDGE_FAST_SERIALIZATION", "none")
+    assert serializacao._enabled_from_env() == set()
+    monkeypatch.setenv("DATABRIDGE_FAST_SERIALIZATION", " List_Clients, list_records ")
+    assert serializacao._enabled_from_env() == {"list_clients", "list_records"}
+    monkeypatch.delenv("DATABRIDGE_FAST_SERIALIZATION")
+    assert serializacao._enabled_from_env() == set(serializacao.LIST_ENDPOINTS)
@@ -78,6 +78,40 @@ def criar_tabelas_basicas():
         );
         """)
         
+        # Colunas de contato usadas pela API (repositorios.PostgresRepository)
+        cursor.execute("""
+        ALTER TABLE clients
+            ADD COLUMN IF NOT EXISTS email VARCHAR(255) NULL,
+            ADD COLUMN IF NOT EXISTS phone VARCHAR(50) NULL,
+            ADD COLUMN IF NOT EXISTS tax_id VARCHAR(50) NULL;
+        """)
+        
+        # Criar tabela de transações
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id SERIAL PRIMARY KEY,
+            origin_account VARCHAR(50) NOT NULL,
+            destination_account VARCHAR(50) NOT NULL,
+            amount NUMERIC(18, 2) NOT NULL,
+            currency VARCHAR(3) NOT NULL,
+            transaction_type VARCHAR(50) NOT NULL,
+            description TEXT NULL,
+            reference_id VARCHAR(100) NULL,
+            status VARCHAR(50) DEFAULT 'pending',
+            routing_info JSONB NOT NULL DEFAULT '{}',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+        
+        # Índices para os filtros das listagens (a paginação usa o id)
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_status ON transactions (status, id);
+        CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions (transaction_type, id);
+        CREATE INDEX IF NOT EXISTS idx_file_uploads_status ON file_uploads (status, id);
+        CREATE INDEX IF NOT EXISTS idx_data_records_file ON data_records (file_id, id);
+        """)
+        
         # Criar alguns dados de exemplo
         cursor.execute("""
         INSERT INTO clients (name, status)